@@ -0,0 +1,32 @@
+"""create stock_price_history table
+
+Revision ID: 20261018_0002
+Revises: 20260214_0001
+Create Date: 2026-10-18 00:02:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261018_0002"
+down_revision = "20260214_0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "stock_price_history",
+        sa.Column("ticker_symbol", sa.String(length=20), nullable=False),
+        sa.Column("scraped_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("stock_price", sa.Float(), nullable=False),
+        sa.Column("stock_change", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("ticker_symbol", "scraped_at", name="pk_stock_price_history"),
+    )
+    op.create_index("ix_stock_price_history_scraped_at", "stock_price_history", ["scraped_at"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_stock_price_history_scraped_at", table_name="stock_price_history")
+    op.drop_table("stock_price_history")
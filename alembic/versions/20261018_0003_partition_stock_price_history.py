@@ -0,0 +1,89 @@
+"""partition stock_price_history by month
+
+Revision ID: 20261018_0003
+Revises: 20261018_0002
+Create Date: 2026-10-18 00:03:00
+"""
+
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261018_0003"
+down_revision = "20261018_0002"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_history_table(name, partitioned):
+    op.execute(
+        f"""
+        CREATE TABLE {name} (
+            ticker_symbol VARCHAR(20) NOT NULL,
+            scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            stock_price FLOAT NOT NULL,
+            stock_change FLOAT,
+            CONSTRAINT pk_{name} PRIMARY KEY (ticker_symbol, scraped_at)
+        ){" PARTITION BY RANGE (scraped_at)" if partitioned else ""}
+        """
+    )
+
+
+def _rename_primary_key(table, name):
+    # Migrated tables name it pk_<table>; tables made by metadata.create_all use <table>_pkey.
+    current = sa.inspect(op.get_bind()).get_pk_constraint(table)["name"]
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {current} TO {name}")
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.drop_index("ix_stock_price_history_scraped_at", table_name="stock_price_history")
+    op.execute("ALTER TABLE stock_price_history RENAME TO stock_price_history_unpartitioned")
+    _rename_primary_key("stock_price_history_unpartitioned", "pk_stock_price_history_unpartitioned")
+
+    _create_history_table("stock_price_history", partitioned=True)
+    op.execute("CREATE TABLE stock_price_history_default PARTITION OF stock_price_history DEFAULT")
+
+    today = datetime.now(timezone.utc).date()
+    oldest = bind.execute(sa.text("SELECT min(scraped_at) FROM stock_price_history_unpartitioned")).scalar()
+    first = oldest.astimezone(timezone.utc).date() if oldest else today
+    month = date(first.year, first.month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE stock_price_history_p{month.year:04d}_{month.month:02d} "
+            f"PARTITION OF stock_price_history "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        )
+        month = upper
+
+    op.execute(
+        "INSERT INTO stock_price_history (ticker_symbol, scraped_at, stock_price, stock_change) "
+        "SELECT ticker_symbol, scraped_at, stock_price, stock_change FROM stock_price_history_unpartitioned"
+    )
+    op.drop_table("stock_price_history_unpartitioned")
+    op.create_index("ix_stock_price_history_scraped_at", "stock_price_history", ["scraped_at"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_stock_price_history_scraped_at", table_name="stock_price_history")
+    op.execute("ALTER TABLE stock_price_history RENAME TO stock_price_history_partitioned")
+    _rename_primary_key("stock_price_history_partitioned", "pk_stock_price_history_partitioned")
+    _create_history_table("stock_price_history", partitioned=False)
+    op.execute(
+        "INSERT INTO stock_price_history (ticker_symbol, scraped_at, stock_price, stock_change) "
+        "SELECT ticker_symbol, scraped_at, stock_price, stock_change FROM stock_price_history_partitioned"
+    )
+    # Dropping the parent drops every attached partition with it.
+    op.execute("DROP TABLE stock_price_history_partitioned")
+    op.create_index("ix_stock_price_history_scraped_at", "stock_price_history", ["scraped_at"], unique=False)
@@ -0,0 +1,121 @@
+"""create stock_daily_ohlc and stock_summary tables
+
+Revision ID: 20261018_0004
+Revises: 20261018_0003
+Create Date: 2026-10-18 00:04:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Backfill statements as of this revision. They are inlined rather than taken
+# from nse_scraper.db.aggregates so later changes there cannot alter what this
+# migration does.
+BACKFILL_DAILY = """
+INSERT INTO stock_daily_ohlc (
+    ticker_symbol, trade_date, open, high, low, close, last_change, sample_count, first_at, last_at
+)
+SELECT
+    ticker_symbol,
+    (scraped_at AT TIME ZONE 'Africa/Nairobi')::date AS trade_date,
+    (array_agg(stock_price ORDER BY scraped_at))[1],
+    max(stock_price),
+    min(stock_price),
+    (array_agg(stock_price ORDER BY scraped_at DESC))[1],
+    (array_agg(stock_change ORDER BY scraped_at DESC))[1],
+    count(*),
+    min(scraped_at),
+    max(scraped_at)
+FROM stock_price_history
+GROUP BY ticker_symbol, (scraped_at AT TIME ZONE 'Africa/Nairobi')::date
+"""
+
+BACKFILL_SUMMARY = """
+INSERT INTO stock_summary (
+    ticker_symbol, trade_date, latest_price, latest_change, latest_at,
+    change_1d_pct, change_1w_pct, change_1m_pct, change_ytd_pct, high_52w, low_52w, updated_at
+)
+SELECT
+    l.ticker_symbol, l.trade_date, l.close, l.last_change, l.last_at,
+    100.0 * (l.close - d1.close) / NULLIF(d1.close, 0),
+    100.0 * (l.close - w1.close) / NULLIF(w1.close, 0),
+    100.0 * (l.close - m1.close) / NULLIF(m1.close, 0),
+    100.0 * (l.close - ytd.close) / NULLIF(ytd.close, 0),
+    y.high_52w, y.low_52w, now()
+FROM (
+    SELECT DISTINCT ON (ticker_symbol) *
+    FROM stock_daily_ohlc
+    ORDER BY ticker_symbol, trade_date DESC
+) l
+LEFT JOIN LATERAL (
+    SELECT close FROM stock_daily_ohlc p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date < l.trade_date
+    ORDER BY p.trade_date DESC LIMIT 1
+) d1 ON true
+LEFT JOIN LATERAL (
+    SELECT close FROM stock_daily_ohlc p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date <= l.trade_date - 7
+    ORDER BY p.trade_date DESC LIMIT 1
+) w1 ON true
+LEFT JOIN LATERAL (
+    SELECT close FROM stock_daily_ohlc p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date <= (l.trade_date - interval '1 month')::date
+    ORDER BY p.trade_date DESC LIMIT 1
+) m1 ON true
+LEFT JOIN LATERAL (
+    SELECT close FROM stock_daily_ohlc p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date < date_trunc('year', l.trade_date)::date
+    ORDER BY p.trade_date DESC LIMIT 1
+) ytd ON true
+LEFT JOIN LATERAL (
+    SELECT max(high) AS high_52w, min(low) AS low_52w FROM stock_daily_ohlc p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date > (l.trade_date - interval '1 year')::date
+) y ON true
+"""
+
+# revision identifiers, used by Alembic.
+revision = "20261018_0004"
+down_revision = "20261018_0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "stock_daily_ohlc",
+        sa.Column("ticker_symbol", sa.String(length=20), nullable=False),
+        sa.Column("trade_date", sa.Date(), nullable=False),
+        sa.Column("open", sa.Float(), nullable=False),
+        sa.Column("high", sa.Float(), nullable=False),
+        sa.Column("low", sa.Float(), nullable=False),
+        sa.Column("close", sa.Float(), nullable=False),
+        sa.Column("last_change", sa.Float(), nullable=True),
+        sa.Column("sample_count", sa.Integer(), nullable=False),
+        sa.Column("first_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("ticker_symbol", "trade_date", name="pk_stock_daily_ohlc"),
+    )
+    op.create_table(
+        "stock_summary",
+        sa.Column("ticker_symbol", sa.String(length=20), nullable=False),
+        sa.Column("trade_date", sa.Date(), nullable=False),
+        sa.Column("latest_price", sa.Float(), nullable=False),
+        sa.Column("latest_change", sa.Float(), nullable=True),
+        sa.Column("latest_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("change_1d_pct", sa.Float(), nullable=True),
+        sa.Column("change_1w_pct", sa.Float(), nullable=True),
+        sa.Column("change_1m_pct", sa.Float(), nullable=True),
+        sa.Column("change_ytd_pct", sa.Float(), nullable=True),
+        sa.Column("high_52w", sa.Float(), nullable=True),
+        sa.Column("low_52w", sa.Float(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("ticker_symbol", name="pk_stock_summary"),
+    )
+    # Backfill from existing history; afterwards the write paths keep both current.
+    op.execute(BACKFILL_DAILY)
+    op.execute(BACKFILL_SUMMARY)
+
+
+def downgrade():
+    op.drop_table("stock_summary")
+    op.drop_table("stock_daily_ohlc")
@@ -0,0 +1,40 @@
+"""add scrape_runs and stock_price_history.run_id
+
+Revision ID: 20261019_0005
+Revises: 20261018_0004
+Create Date: 2026-10-19 00:05:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261019_0005"
+down_revision = "20261018_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scrape_runs",
+        sa.Column("run_id", sa.String(length=40), nullable=False),
+        sa.Column("spider", sa.String(length=64), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("run_id", name="pk_scrape_runs"),
+    )
+    op.create_index("ix_scrape_runs_started_at", "scrape_runs", ["started_at"])
+    # Adding a nullable column is metadata-only, and both statements cascade to
+    # every partition. Rows written before this revision keep a NULL run_id.
+    op.add_column("stock_price_history", sa.Column("run_id", sa.String(length=40), nullable=True))
+    op.create_index("ix_stock_price_history_run_id", "stock_price_history", ["run_id"])
+
+
+def downgrade():
+    op.drop_index("ix_stock_price_history_run_id", table_name="stock_price_history")
+    op.drop_column("stock_price_history", "run_id")
+    op.drop_index("ix_scrape_runs_started_at", table_name="scrape_runs")
+    op.drop_table("scrape_runs")
@@ -0,0 +1,102 @@
+"""
+Per-item cost of the spider-to-storage item path: plain dicts vs typed items.
+
+``dict`` is the old path: the spider yields a dict, ``NseScraperPipeline``
+validates its keys by hand and copies it with ``dict(item)``. ``typed`` is
+the current one: the spider builds an ``AfxQuote`` (validation and coercion
+in one generated function) and the pipeline only materialises the storage
+record with ``as_dict()``. Also reports the retained memory per item, as
+measured by tracemalloc while holding ``--items`` of them.
+
+Usage:
+    python benchmarks/item_validation.py
+    python benchmarks/item_validation.py --items 200000 --json
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from nse_scraper.items import AfxQuote  # noqa: E402
+from nse_scraper.pipelines import NseScraperPipeline  # noqa: E402
+
+
+def _rows(count):
+    scraped_at = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+    return [(f"T{n % 60}", f"Company {n % 60}", 10.0 + n % 7, 0.25, scraped_at) for n in range(count)]
+
+
+def as_dict(ticker, name, price, change, scraped_at):
+    return {"ticker_symbol": ticker, "stock_name": name, "stock_price": price, "stock_change": change,
+            "scraped_at": scraped_at, "created_at": scraped_at}
+
+
+def as_typed(ticker, name, price, change, scraped_at):
+    return AfxQuote.build(ticker_symbol=ticker, stock_name=name, stock_price=price, stock_change=change,
+                          scraped_at=scraped_at, created_at=scraped_at)
+
+
+def dict_path(rows):
+    validate = NseScraperPipeline._validate
+    for row in rows:
+        item = as_dict(*row)
+        validate(item)
+        dict(item)
+
+
+def typed_path(rows):
+    record = NseScraperPipeline._record
+    for row in rows:
+        record(as_typed(*row))
+
+
+def _best_ns(path, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows) * 1e9
+
+
+def _bytes_per_item(make, rows):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [make(*row) for row in rows]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return used / len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    rows = _rows(args.items)
+    results = {
+        "items": args.items,
+        "dict_ns_per_item": round(_best_ns(dict_path, rows, args.repeat), 1),
+        "typed_ns_per_item": round(_best_ns(typed_path, rows, args.repeat), 1),
+        "dict_bytes_per_item": round(_bytes_per_item(as_dict, rows), 1),
+        "typed_bytes_per_item": round(_bytes_per_item(as_typed, rows), 1),
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for name, value in results.items():
+            print(f"{name:>22}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Write-throughput benchmark: ``postgres`` vs ``postgres_async`` under concurrent spiders.
+
+Simulates ``--spiders`` crawls writing at the same time. The synchronous
+backend gets one thread per spider (the best a blocking pipeline can do);
+the async backend gets one task per spider, each with ``--concurrent-items``
+upserts in flight as Scrapy's ``CONCURRENT_ITEMS`` allows. Rows use
+``BENCH*`` tickers and are deleted afterwards.
+
+Usage:
+    SQL_DATABASE_URL=postgresql+psycopg2://... python benchmarks/postgres_async_write.py
+    python benchmarks/postgres_async_write.py --spiders 4 --items 2000 --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from postgres_bulk_load import cleanup, synthetic_records  # noqa: E402
+
+from nse_scraper.db.postgres_async_backend import AsyncPostgresBackend  # noqa: E402
+from nse_scraper.db.postgres_backend import PostgresBackend  # noqa: E402
+
+
+def _spider_records(spider, items):
+    # Distinct tickers per spider, like separate boards being crawled.
+    for record in synthetic_records(items):
+        record["ticker_symbol"] = f"{record['ticker_symbol']}S{spider}"
+        yield record
+
+
+def bench_sync(url, spiders, items):
+    backend = PostgresBackend(sql_database_url=url)
+    backend.open()
+    cleanup(backend)
+
+    def crawl(spider):
+        for record in _spider_records(spider, items):
+            backend.upsert_stock(record)
+
+    threads = [threading.Thread(target=crawl, args=(n,)) for n in range(spiders)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cleanup(backend)
+    backend.close()
+    return elapsed
+
+
+async def bench_async(url, spiders, items, concurrent_items, batch_size):
+    backend = AsyncPostgresBackend(sql_database_url=url, batch_size=batch_size)
+    await backend.open()
+
+    async def crawl(spider):
+        semaphore = asyncio.Semaphore(concurrent_items)
+
+        async def write(record):
+            async with semaphore:
+                await backend.upsert_stock(record)
+
+        await asyncio.gather(*(write(record) for record in _spider_records(spider, items)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(crawl(n) for n in range(spiders)))
+    await backend.flush()
+    elapsed = time.perf_counter() - start
+    await backend.close()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("SQL_DATABASE_URL"))
+    parser.add_argument("--spiders", type=int, default=4)
+    parser.add_argument("--items", type=int, default=1000, help="Items per spider")
+    parser.add_argument("--concurrent-items", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = parser.parse_args(argv)
+    if not args.url:
+        parser.error("--url or SQL_DATABASE_URL is required")
+
+    rows = args.spiders * args.items
+    sync_s = bench_sync(args.url, args.spiders, args.items)
+    async_s = asyncio.run(bench_async(args.url, args.spiders, args.items, args.concurrent_items, args.batch_size))
+    sync_backend = PostgresBackend(sql_database_url=args.url)
+    sync_backend.open()
+    cleanup(sync_backend)
+    sync_backend.close()
+
+    results = [
+        {"backend": "postgres", "rows": rows, "seconds": round(sync_s, 3), "rows_per_sec": round(rows / sync_s, 1)},
+        {"backend": "postgres_async", "rows": rows, "seconds": round(async_s, 3),
+         "rows_per_sec": round(rows / async_s, 1)},
+    ]
+    if args.json:
+        print(json.dumps({"spiders": args.spiders, "results": results, "speedup": round(sync_s / async_s, 1)},
+                         indent=2))
+        return 0
+    for result in results:
+        print(f"{result['backend']:<15} {result['rows']:>8} rows {result['seconds']:>9.3f}s "
+              f"{result['rows_per_sec']:>12,.0f} rows/s")
+    print(f"async speedup with {args.spiders} concurrent spiders: {sync_s / async_s:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Write-path benchmark: per-row ``upsert_stock`` vs the COPY bulk loader.
+
+Generates synthetic quotes for ``BENCH*`` tickers, loads them through both
+paths against a real PostgreSQL database and reports rows/sec. Benchmark rows
+are deleted before and after each run.
+
+Usage:
+    SQL_DATABASE_URL=postgresql+psycopg2://... python benchmarks/postgres_bulk_load.py
+    python benchmarks/postgres_bulk_load.py --url ... --rows 2000 --bulk-rows 200000 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import text  # noqa: E402
+
+from nse_scraper.db.postgres_backend import PostgresBackend  # noqa: E402
+
+TICKER_PREFIX = "BENCH"
+
+
+def synthetic_records(count, tickers=67, start=None):
+    """Yield ``count`` quotes spread over ``tickers`` symbols, one minute apart per round."""
+    start = start or datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        scraped_at = start + timedelta(minutes=i // tickers)
+        yield {
+            "ticker_symbol": f"{TICKER_PREFIX}{i % tickers:03d}",
+            "stock_name": f"Benchmark Co {i % tickers}",
+            "stock_price": 10.0 + (i % 997) / 100.0,
+            "stock_change": ((i % 41) - 20) / 100.0,
+            "created_at": scraped_at,
+            "scraped_at": scraped_at,
+        }
+
+
+def cleanup(backend):
+    with backend.engine.begin() as conn:
+        for table in ("stock_price_history", "stock_data"):
+            conn.execute(text(f"DELETE FROM {table} WHERE ticker_symbol LIKE :prefix"),
+                         {"prefix": f"{TICKER_PREFIX}%"})
+
+
+def bench_per_row(backend, rows):
+    cleanup(backend)
+    start = time.perf_counter()
+    for record in synthetic_records(rows):
+        backend.upsert_stock(record)
+    elapsed = time.perf_counter() - start
+    return {"path": "per_row", "rows": rows, "seconds": round(elapsed, 3), "rows_per_sec": round(rows / elapsed, 1)}
+
+
+def bench_bulk(backend, rows, batch_size):
+    cleanup(backend)
+    start = time.perf_counter()
+    totals = backend.bulk_load(synthetic_records(rows), batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {
+        "path": "bulk_copy",
+        "rows": rows,
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1),
+        "history_inserted": totals["history_inserted"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("SQL_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=2000, help="Rows for the per-row path")
+    parser.add_argument("--bulk-rows", type=int, default=100000, help="Rows for the bulk path")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = parser.parse_args(argv)
+    if not args.url:
+        parser.error("--url or SQL_DATABASE_URL is required")
+
+    backend = PostgresBackend(sql_database_url=args.url)
+    backend.open()
+    try:
+        results = [bench_per_row(backend, args.rows), bench_bulk(backend, args.bulk_rows, args.batch_size)]
+    finally:
+        cleanup(backend)
+        backend.close()
+
+    speedup = results[1]["rows_per_sec"] / results[0]["rows_per_sec"]
+    if args.json:
+        print(json.dumps({"results": results, "speedup": round(speedup, 1)}, indent=2))
+        return 0
+    for result in results:
+        print(f"{result['path']:<10} {result['rows']:>9} rows {result['seconds']:>9.3f}s "
+              f"{result['rows_per_sec']:>12,.0f} rows/s")
+    print(f"bulk speedup: {speedup:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
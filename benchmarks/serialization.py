@@ -0,0 +1,99 @@
+"""
+Encode/decode throughput of the serialization layer: orjson vs stdlib json.
+
+Encodes a batch of quote records (aware datetimes, ``price_history`` lists)
+and StockAnalysis records (metric blobs), the way the Supabase backend
+builds upsert bodies and the spool writes JSON lines, then decodes the
+result the way API responses and spool files are read. ``json`` is the
+stdlib path ``nse_scraper.serialization`` falls back to; ``orjson`` is
+skipped when it is not installed.
+
+Usage:
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --records 20000 --history 30 --json
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from nse_scraper import serialization  # noqa: E402
+
+
+def synthetic_records(count, history):
+    start = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+    records = []
+    for n in range(count):
+        at = start + timedelta(minutes=n)
+        if n % 2:
+            records.append({
+                "ticker_symbol": f"T{n % 60}", "stock_name": f"Company {n % 60}", "stock_price": 10.0 + n % 7,
+                "stock_change": -0.25, "scraped_at": at, "created_at": at,
+                "price_history": [{"scraped_at": (at - timedelta(days=d)).isoformat(), "stock_price": 10.0 + d % 5,
+                                   "stock_change": 0.1} for d in range(history)],
+            })
+        else:
+            records.append({
+                "ticker_symbol": f"T{n % 60}", "company_name": f"Company {n % 60}", "rank": n % 60,
+                "stock_price": 10.0 + n % 7, "scraped_at": at.isoformat(),
+                "overview_metrics": {"marketCap": 5.6e11, "industry": "Telecom Services", "sector": "Communication"},
+                "profile_metrics": {"country": "Kenya", "employees": 6300, "founded": 1997},
+            })
+    return records
+
+
+def engines():
+    found = {"json": (serialization._json_dumpb, json.loads)}
+    if serialization.orjson is not None:
+        import orjson
+
+        found["orjson"] = (serialization.dumpb, orjson.loads)
+    return found
+
+
+def bench(dumpb, loads, records, repeat):
+    encode = decode = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = [dumpb(record) for record in records]
+        encode = min(encode, time.perf_counter() - start)
+        start = time.perf_counter()
+        for line in lines:
+            loads(line)
+        decode = min(decode, time.perf_counter() - start)
+    size = sum(len(line) for line in lines)
+    return {
+        "encode_records_per_s": round(len(records) / encode),
+        "decode_records_per_s": round(len(records) / decode),
+        "encode_mb_per_s": round(size / encode / 1e6, 1),
+        "decode_mb_per_s": round(size / decode / 1e6, 1),
+        "bytes": size,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=20, help="price_history entries per quote record")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    records = synthetic_records(args.records, args.history)
+    results = {name: bench(dumpb, loads, records, args.repeat) for name, (dumpb, loads) in engines().items()}
+    if args.json:
+        print(json.dumps({"records": args.records, "engine": serialization.ENGINE, "results": results}))
+    else:
+        print(f"{args.records} records, active engine: {serialization.ENGINE}")
+        for name, result in results.items():
+            print(f"{name:>7}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Startup benchmark: cold-start import cost of the scraper entry points.
+
+Runs each target module in a fresh interpreter with ``-X importtime`` and
+reports the cumulative import time of the module itself plus the heaviest
+dependencies it pulled in.
+
+Usage:
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --runs 5 --top 15
+    python benchmarks/startup_importtime.py --json > reports/startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_TARGETS = (
+    "nse_scraper.pipelines",
+    "nse_scraper.stock_notification",
+    "nse_scraper.db.mongo_backend",
+    "nse_scraper.db.postgres_backend",
+    "nse_scraper.db.supabase_backend",
+)
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr_text):
+    """Parse ``-X importtime`` output into {module: (self_us, cumulative_us, depth)}."""
+    modules = {}
+    for line in stderr_text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return modules
+
+
+def measure_import(module_name, python=sys.executable):
+    """Import ``module_name`` in a fresh interpreter and return parsed importtime data."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    env.pop("PYTHONIMPORTTIME", None)
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module_name} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def benchmark(targets, runs=3, top=10):
+    results = []
+    for target in targets:
+        samples = []
+        last = {}
+        for _ in range(runs):
+            try:
+                last = measure_import(target)
+            except RuntimeError as exc:
+                last = {}
+                results.append({"module": target, "error": str(exc).splitlines()[0]})
+                break
+            samples.append(last[target][1] / 1000.0)
+        if not samples:
+            continue
+        heaviest = sorted(
+            ((name, data[1] / 1000.0) for name, data in last.items() if data[2] == 1),
+            key=lambda pair: pair[1],
+            reverse=True,
+        )[:top]
+        results.append(
+            {
+                "module": target,
+                "runs": runs,
+                "median_ms": round(statistics.median(samples), 2),
+                "min_ms": round(min(samples), 2),
+                "max_ms": round(max(samples), 2),
+                "modules_loaded": len(last),
+                "top_dependencies_ms": [{"module": n, "cumulative_ms": round(ms, 2)} for n, ms in heaviest],
+            }
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.targets, runs=args.runs, top=args.top)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    for result in results:
+        if "error" in result:
+            print(f"{result['module']}: ERROR {result['error']}")
+            continue
+        print(
+            f"{result['module']}: median {result['median_ms']} ms "
+            f"(min {result['min_ms']}, max {result['max_ms']}, {result['modules_loaded']} modules)"
+        )
+        for dep in result["top_dependencies_ms"]:
+            print(f"    {dep['cumulative_ms']:>10.2f} ms  {dep['module']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Intraday polling daemon for the AFX board.
+
+Keeps one warm process with a persistent HTTP session and an open storage
+backend, and re-fetches https://afx.kwayisi.org/nse/ every
+``AFX_POLL_INTERVAL`` seconds while the NSE session is open. Rows are parsed
+with ``AfxScraperSpider.parse`` and only tickers whose price or change moved
+since the previous cycle are written. Each fetched board is its own run
+(``nse_scraper.runs``), recorded with ``upsert_run`` when the backend has it.
+With ``--reconcile`` every fetched board is also checked against the latest
+StockAnalysis snapshot (``nse_scraper.reconcile``). Written quotes also
+update the rolling statistics (``nse_scraper.rolling``) when
+``ROLLING_STATE_PATH`` is set; they are saved after every cycle.
+
+Writes go through the same stack as the crawl pipelines: every backend in a
+comma-separated ``DB_BACKEND``, each behind the write retries and spool
+(``nse_scraper.db.resilience``) unless ``WRITE_RESILIENCE`` is off.
+Reconciliation reads from the first listed backend.
+
+    python -m nse_scraper.daemon                 # poll during session hours
+    python -m nse_scraper.daemon --once          # single cycle, ignore hours
+    python -m nse_scraper.daemon --reconcile     # reconcile against the backend's StockAnalysis rows
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from scrapy.http import HtmlResponse, Request
+
+from .scheduler import TradingCalendar
+from .spiders.afx_scraper import AfxScraperSpider
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 300
+# Sleeps wake this often (seconds) to retry failed writes and drain the spool.
+_RETRY_INTERVAL = 15
+
+
+@dataclass
+class CycleReport:
+    started_at: str
+    status: int
+    fetch_ms: float
+    parse_ms: float
+    write_ms: float
+    total_ms: float
+    rows: int
+    changed: int
+    errors: int
+
+
+class AfxPollingDaemon:
+    """Polls the AFX board and writes changed quotes to a storage backend."""
+
+    def __init__(self, backend, http_session, calendar=None, interval=DEFAULT_POLL_INTERVAL,
+                 url=None, user_agent=None, timeout=30, reconciler=None, rolling=None):
+        self.backend = backend
+        self.reconciler = reconciler
+        self.rolling = rolling
+        self.http = http_session
+        self.calendar = calendar or TradingCalendar()
+        self.interval = interval
+        self.spider = AfxScraperSpider()
+        self.url = url or self.spider.start_urls[0]
+        self.timeout = timeout
+        if user_agent:
+            self.http.headers["User-Agent"] = user_agent
+        self._last_quotes = {}
+        self._validators = {}
+        self._stop = threading.Event()
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def _fetch(self):
+        headers = {}
+        if self._validators.get("etag"):
+            headers["If-None-Match"] = self._validators["etag"]
+        if self._validators.get("last_modified"):
+            headers["If-Modified-Since"] = self._validators["last_modified"]
+        response = self.http.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 200:
+            self._validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+        return response
+
+    def _changed_items(self, items):
+        for item in items:
+            quote = (item["stock_price"], item.get("stock_change"))
+            if self._last_quotes.get(item["ticker_symbol"]) != quote:
+                yield item
+
+    def run_cycle(self):
+        """Fetch, parse and write once; returns a ``CycleReport``."""
+        started = time.perf_counter()
+        started_at = datetime.now(timezone.utc).isoformat()
+        response = self._fetch()
+        fetched = time.perf_counter()
+
+        if response.status_code == 304:
+            return CycleReport(started_at, 304, round((fetched - started) * 1000, 2), 0.0, 0.0,
+                               round((fetched - started) * 1000, 2), 0, 0, 0)
+        response.raise_for_status()
+
+        run = self.spider.start_run()
+        request = Request(url=self.url)
+        html = HtmlResponse(url=self.url, request=request, body=response.content,
+                            encoding=response.encoding or "utf-8")
+        items = list(self.spider.parse(html))
+        parsed = time.perf_counter()
+
+        changed = errors = 0
+        for item in self._changed_items(items):
+            try:
+                self.backend.upsert_stock(item.as_dict())
+            except Exception:
+                errors += 1
+                logger.exception("Failed to write %s", item["ticker_symbol"])
+                continue
+            self._last_quotes[item["ticker_symbol"]] = (item["stock_price"], item.get("stock_change"))
+            changed += 1
+            if self.rolling is not None:
+                self.rolling.update(item)
+        self._record_run(run.finish(changed))
+        self._flush()
+        self._save_rolling()
+        written = time.perf_counter()
+        if self.reconciler is not None:
+            self._reconcile(items, run)
+
+        return CycleReport(
+            started_at=started_at,
+            status=response.status_code,
+            fetch_ms=round((fetched - started) * 1000, 2),
+            parse_ms=round((parsed - fetched) * 1000, 2),
+            write_ms=round((written - parsed) * 1000, 2),
+            total_ms=round((written - started) * 1000, 2),
+            rows=len(items),
+            changed=changed,
+            errors=errors,
+        )
+
+    def _record_run(self, run):
+        if not hasattr(self.backend, "upsert_run"):
+            return
+        try:
+            self.backend.upsert_run(run.as_record())
+        except Exception:
+            logger.exception("Failed to record run %s", run.run_id)
+
+    def _flush(self):
+        # Backends that batch per-write work (Postgres summaries) settle it once per cycle.
+        flush = getattr(self.backend, "flush", None)
+        if flush is None:
+            return
+        try:
+            flush()
+        except Exception:
+            logger.exception("Failed to flush the storage backend")
+
+    def _save_rolling(self):
+        if self.rolling is None:
+            return
+        try:
+            self.rolling.save()
+        except Exception:
+            logger.exception("Failed to save rolling state %s", self.rolling.path)
+
+    def _reconcile(self, items, run):
+        try:
+            report = self.reconciler.reconcile(items, run_id=run.run_id)
+        except Exception:
+            logger.exception("Failed to reconcile run %s", run.run_id)
+            return
+        logger.log(logging.INFO if report.ok else logging.WARNING, "%s", report.summary())
+
+    def _log_cycle(self, report):
+        logger.info(
+            "cycle status=%s rows=%s changed=%s errors=%s fetch=%.1fms parse=%.1fms write=%.1fms total=%.1fms",
+            report.status, report.rows, report.changed, report.errors,
+            report.fetch_ms, report.parse_ms, report.write_ms, report.total_ms,
+        )
+
+    def _retry_due(self):
+        # Between cycles nothing writes, so queued retries and the spool are driven from here.
+        retry_due = getattr(self.backend, "retry_due", None)
+        if retry_due is None:
+            return
+        try:
+            retry_due()
+        except Exception:
+            logger.exception("Failed to retry pending writes")
+
+    def _sleep(self, seconds):
+        end = time.monotonic() + max(0.0, seconds)
+        while not self._stop.is_set():
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stop.wait(min(remaining, _RETRY_INTERVAL))
+            self._retry_due()
+
+    def run_forever(self, ignore_session=False):
+        """Poll until ``stop()`` is called, sleeping outside session hours."""
+        while not self._stop.is_set():
+            now = datetime.now(timezone.utc)
+            if not ignore_session and not self.calendar.is_session_open(now):
+                opens = self.calendar.next_session_open(now)
+                logger.info("Market closed; sleeping until %s", opens.isoformat())
+                self._sleep((opens - now).total_seconds())
+                continue
+
+            cycle_start = time.monotonic()
+            try:
+                self._log_cycle(self.run_cycle())
+            except Exception:
+                logger.exception("Polling cycle failed")
+            self._sleep(self.interval - (time.monotonic() - cycle_start))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.daemon", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float,
+                        default=float(os.getenv("AFX_POLL_INTERVAL") or DEFAULT_POLL_INTERVAL))
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit")
+    parser.add_argument("--ignore-session", action="store_true", help="Poll outside NSE session hours too")
+    parser.add_argument("--reconcile", nargs="?", const="", metavar="FEED",
+                        help="Reconcile each board against StockAnalysis (a feed file, default the backend)")
+    args = parser.parse_args(argv)
+
+    import requests
+
+    from . import settings
+    from .db import create_backend_from_settings
+
+    backend = create_backend_from_settings(settings, writer=True)
+    reader = None
+    reconciler = None
+    if args.reconcile is not None:
+        from .reconcile import Reconciler
+
+        if not args.reconcile:
+            reader = create_backend_from_settings(settings)
+            if not hasattr(reader, "iter_stockanalysis_stocks"):
+                parser.error(f"{type(reader).__name__} has no StockAnalysis data; use --reconcile FEED")
+        reconciler = Reconciler.from_settings(settings, args.reconcile or reader)
+    rolling = None
+    if settings.ROLLING_STATE_PATH:
+        from .rolling import RollingStore
+
+        rolling = RollingStore(settings.ROLLING_STATE_PATH).open()
+    backend.open()
+    if reader is not None:
+        reader.open()
+    daemon = AfxPollingDaemon(
+        backend,
+        requests.Session(),
+        calendar=TradingCalendar.from_env(),
+        interval=args.interval,
+        user_agent=settings.USER_AGENT,
+        reconciler=reconciler,
+        rolling=rolling,
+    )
+    try:
+        if args.once:
+            daemon._log_cycle(daemon.run_cycle())
+            return 0
+        signal.signal(signal.SIGINT, daemon.stop)
+        signal.signal(signal.SIGTERM, daemon.stop)
+        logger.info("AFX polling daemon started (interval %ss)", args.interval)
+        daemon.run_forever(ignore_session=args.ignore_session)
+    finally:
+        backend.close()
+        if reader is not None:
+            reader.close()
+    logger.info("AFX polling daemon stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
@@ -1,5 +1,19 @@
 """Database backend adapters for NSE scraper."""
 
-from .backends import create_backend
+from .backends import (
+    STOCKANALYSIS_BACKENDS,
+    backend_names,
+    backend_options_from_settings,
+    create_backend,
+    create_backend_from_settings,
+    sync_backend_name,
+)
 
-__all__ = ["create_backend"]
+__all__ = [
+    "STOCKANALYSIS_BACKENDS",
+    "backend_names",
+    "backend_options_from_settings",
+    "create_backend",
+    "create_backend_from_settings",
+    "sync_backend_name",
+]
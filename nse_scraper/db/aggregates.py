@@ -0,0 +1,205 @@
+"""
+Precomputed price aggregates (PostgreSQL).
+
+``stock_daily_ohlc`` holds one row per ticker per NSE trading date (open,
+high, low, close, last change, sample count) and ``stock_summary`` one row
+per ticker (latest quote, 1d/1w/1m/YTD change, 52-week high/low).
+
+Both are maintained by the write paths: every statement that inserts
+history rows feeds the rows it actually inserted into ``ohlc_upsert_sql``
+(so replays never double count), and the touched tickers' summaries are
+refreshed from the daily table afterwards. Consumers read a single row
+instead of scanning history.
+
+After a migration or a backfill outside the loaders, rebuild from
+``stock_price_history``. Do not rebuild dates that ``nse_scraper.retention``
+has already downsampled: the daily rows were built from every tick, while
+the compacted history keeps only one per day or week.
+
+    python -m nse_scraper.db.aggregates rebuild
+    python -m nse_scraper.db.aggregates rebuild --ticker SCOM --since 2026-01-01
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import text
+
+from .models import StockDailyOhlc, StockPriceHistory, StockSummary
+
+logger = logging.getLogger(__name__)
+
+# Trading dates are NSE-local (EAT, UTC+3, no DST), as in nse_scraper.scheduler.
+NSE_TIMEZONE = "Africa/Nairobi"
+
+OHLC_TABLE = StockDailyOhlc.__tablename__
+SUMMARY_TABLE = StockSummary.__tablename__
+HISTORY_TABLE = StockPriceHistory.__tablename__
+
+_TRADE_DATE = f"(scraped_at AT TIME ZONE '{NSE_TIMEZONE}')::date"
+
+_DAILY_SELECT = f"""
+SELECT
+    ticker_symbol,
+    {_TRADE_DATE} AS trade_date,
+    (array_agg(stock_price ORDER BY scraped_at))[1] AS open,
+    max(stock_price) AS high,
+    min(stock_price) AS low,
+    (array_agg(stock_price ORDER BY scraped_at DESC))[1] AS close,
+    (array_agg(stock_change ORDER BY scraped_at DESC))[1] AS last_change,
+    count(*) AS sample_count,
+    min(scraped_at) AS first_at,
+    max(scraped_at) AS last_at
+FROM {{source}}
+{{where}}
+GROUP BY ticker_symbol, {_TRADE_DATE}
+"""
+
+_COLUMNS = "ticker_symbol, trade_date, open, high, low, close, last_change, sample_count, first_at, last_at"
+
+
+def ohlc_upsert_sql(source):
+    """Statement folding the tick rows of relation ``source`` into the daily table.
+
+    ``source`` is normally a CTE holding the rows just inserted into history.
+    """
+    return f"""
+INSERT INTO {OHLC_TABLE} AS d ({_COLUMNS})
+{_DAILY_SELECT.format(source=source, where="")}
+ON CONFLICT (ticker_symbol, trade_date) DO UPDATE SET
+    open = CASE WHEN EXCLUDED.first_at < d.first_at THEN EXCLUDED.open ELSE d.open END,
+    high = GREATEST(d.high, EXCLUDED.high),
+    low = LEAST(d.low, EXCLUDED.low),
+    close = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.close ELSE d.close END,
+    last_change = CASE WHEN EXCLUDED.last_at >= d.last_at THEN EXCLUDED.last_change ELSE d.last_change END,
+    sample_count = d.sample_count + EXCLUDED.sample_count,
+    first_at = LEAST(d.first_at, EXCLUDED.first_at),
+    last_at = GREATEST(d.last_at, EXCLUDED.last_at)
+"""
+
+
+def _close_before(alias, bound):
+    return f"""LEFT JOIN LATERAL (
+    SELECT close FROM {OHLC_TABLE} p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date {bound}
+    ORDER BY p.trade_date DESC LIMIT 1
+) {alias} ON true"""
+
+
+def _pct(alias):
+    return f"100.0 * (l.close - {alias}.close) / NULLIF({alias}.close, 0)"
+
+
+def summary_refresh_sql(ticker_filter):
+    """Statement recomputing ``stock_summary`` for tickers matching ``ticker_filter``.
+
+    ``ticker_filter`` completes ``WHERE ticker_symbol ...``, e.g. ``= ANY(:tickers)``.
+    Each ticker reads at most a year of daily rows through the primary key.
+    """
+    return f"""
+INSERT INTO {SUMMARY_TABLE} AS s (
+    ticker_symbol, trade_date, latest_price, latest_change, latest_at,
+    change_1d_pct, change_1w_pct, change_1m_pct, change_ytd_pct, high_52w, low_52w, updated_at
+)
+SELECT
+    l.ticker_symbol, l.trade_date, l.close, l.last_change, l.last_at,
+    {_pct("d1")}, {_pct("w1")}, {_pct("m1")}, {_pct("ytd")},
+    y.high_52w, y.low_52w, now()
+FROM (
+    SELECT DISTINCT ON (ticker_symbol) *
+    FROM {OHLC_TABLE}
+    WHERE ticker_symbol {ticker_filter}
+    ORDER BY ticker_symbol, trade_date DESC
+) l
+{_close_before("d1", "< l.trade_date")}
+{_close_before("w1", "<= l.trade_date - 7")}
+{_close_before("m1", "<= (l.trade_date - interval '1 month')::date")}
+{_close_before("ytd", "< date_trunc('year', l.trade_date)::date")}
+LEFT JOIN LATERAL (
+    SELECT max(high) AS high_52w, min(low) AS low_52w FROM {OHLC_TABLE} p
+    WHERE p.ticker_symbol = l.ticker_symbol AND p.trade_date > (l.trade_date - interval '1 year')::date
+) y ON true
+ON CONFLICT (ticker_symbol) DO UPDATE SET
+    trade_date = EXCLUDED.trade_date,
+    latest_price = EXCLUDED.latest_price,
+    latest_change = EXCLUDED.latest_change,
+    latest_at = EXCLUDED.latest_at,
+    change_1d_pct = EXCLUDED.change_1d_pct,
+    change_1w_pct = EXCLUDED.change_1w_pct,
+    change_1m_pct = EXCLUDED.change_1m_pct,
+    change_ytd_pct = EXCLUDED.change_ytd_pct,
+    high_52w = EXCLUDED.high_52w,
+    low_52w = EXCLUDED.low_52w,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def refresh_summaries(conn, ticker_symbols):
+    tickers = sorted(set(ticker_symbols))
+    if tickers:
+        conn.execute(text(summary_refresh_sql("= ANY(:tickers)")), {"tickers": tickers})
+
+
+def rebuild(conn, ticker_symbols=None, since=None):
+    """Recompute daily rows (and summaries) from ``stock_price_history``.
+
+    Limited to ``ticker_symbols`` and trade dates on or after ``since`` when
+    given. Returns the number of daily rows written.
+    """
+    conditions, params = [], {}
+    if ticker_symbols:
+        conditions.append("ticker_symbol = ANY(:tickers)")
+        params["tickers"] = list(ticker_symbols)
+    if since:
+        conditions.append(f"{_TRADE_DATE} >= :since")
+        params["since"] = since
+    history_where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    ohlc_where = history_where.replace(_TRADE_DATE, "trade_date")
+
+    conn.execute(text(f"DELETE FROM {OHLC_TABLE} {ohlc_where}"), params)
+    written = conn.execute(
+        text(f"INSERT INTO {OHLC_TABLE} ({_COLUMNS}) "
+             f"{_DAILY_SELECT.format(source=HISTORY_TABLE, where=history_where)}"),
+        params,
+    ).rowcount
+    if ticker_symbols:
+        refresh_summaries(conn, ticker_symbols)
+    else:
+        conn.execute(text(f"DELETE FROM {SUMMARY_TABLE} WHERE ticker_symbol NOT IN "
+                          f"(SELECT DISTINCT ticker_symbol FROM {OHLC_TABLE})"))
+        conn.execute(text(summary_refresh_sql(f"IN (SELECT DISTINCT ticker_symbol FROM {OHLC_TABLE})")))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.db.aggregates", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQL_DATABASE_URL)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("rebuild", help="Recompute daily OHLC and summaries from history")
+    run.add_argument("--ticker", action="append", dest="tickers", help="Limit to a ticker (repeatable)")
+    run.add_argument("--since", type=date.fromisoformat, help="Only trade dates on or after YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    from .postgres_backend import PostgresBackend
+
+    url = args.url or os.getenv("SQL_DATABASE_URL")
+    if not url:
+        parser.error("--url or SQL_DATABASE_URL is required")
+    backend = PostgresBackend(sql_database_url=url)
+    backend.open()
+    try:
+        with backend.engine.begin() as conn:
+            written = rebuild(conn, ticker_symbols=args.tickers, since=args.since)
+    finally:
+        backend.close()
+    print(f"rebuilt {written} daily rows")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
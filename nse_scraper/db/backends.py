@@ -1,16 +1,56 @@
+"""Backend factory and helpers shared by all storage backends.
+
+Driver packages (pymongo, SQLAlchemy, supabase) are imported by the concrete
+backend modules only, and those modules are loaded on demand by
+``create_backend``. Importing this module (and therefore the pipelines) stays
+cheap regardless of which ``DB_BACKEND`` is selected.
+"""
+
+import importlib
 import logging
 from datetime import datetime, timezone
-import json
-import os
 
-import pymongo
-from sqlalchemy import create_engine, desc
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy.orm import sessionmaker
+logger = logging.getLogger(__name__)
 
-from .models import Base, StockData
+# Backend class name -> module that defines it, loaded lazily.
+_BACKEND_CLASSES = {
+    "MongoBackend": ".mongo_backend",
+    "PostgresBackend": ".postgres_backend",
+    "AsyncPostgresBackend": ".postgres_async_backend",
+    "SupabaseBackend": ".supabase_backend",
+    "EmbeddedBackend": ".embedded_backend",
+    "FanoutBackend": ".fanout_backend",
+    "ResilientBackend": ".resilience",
+}
 
-logger = logging.getLogger(__name__)
+# Backends that can store the StockAnalysis spider's per-stock records
+# (``upsert_stockanalysis_stock``).
+STOCKANALYSIS_BACKENDS = ("supabase", "embedded")
+
+# Backends whose methods are coroutines, mapped to the synchronous backend that
+# reads and writes the same tables. Used by the command-line utilities.
+_SYNC_EQUIVALENTS = {"postgres_async": "postgres"}
+
+
+# Rows per query for the paginated readers (iter_stocks, iter_history).
+DEFAULT_PAGE_SIZE = 1000
+
+
+def backend_names(backend_name):
+    """The backends named by a ``DB_BACKEND`` value, which may be a comma-separated list."""
+    names = [name.strip().lower() for name in (backend_name or "").split(",")]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def sync_backend_name(backend_name):
+    """Return the synchronous backend to use in place of ``backend_name``.
+
+    For a list of backends this is the first one: utilities read from and
+    maintain a single store.
+    """
+    names = backend_names(backend_name)
+    backend = names[0] if names else ""
+    return _SYNC_EQUIVALENTS.get(backend, backend)
 
 
 def _normalize_record(record):
@@ -29,288 +69,201 @@ def _normalize_record(record):
     return normalized
 
 
-class MongoBackend:
-    def __init__(self, mongodb_uri, mongo_database, stock_table):
-        if not mongodb_uri:
-            raise ValueError("MONGODB_URI is required when DB_BACKEND=mongo")
-        self.mongodb_uri = mongodb_uri
-        self.mongo_database = mongo_database
-        self.stock_table = stock_table
-        self.client = None
-        self.db = None
-
-    def open(self):
-        self.client = pymongo.MongoClient(self.mongodb_uri)
-        self.db = self.client[self.mongo_database]
-        self.db[self.stock_table].create_index([("ticker_symbol", pymongo.ASCENDING)], unique=True)
-        logger.info("MongoDB backend ready")
-
-    def close(self):
-        if self.client:
-            self.client.close()
-
-    def upsert_stock(self, record):
-        payload = _normalize_record(record)
-        self.db[self.stock_table].replace_one(
-            {"ticker_symbol": payload["ticker_symbol"]},
-            payload,
-            upsert=True,
-        )
-
-    def get_latest_by_ticker(self, ticker_symbol):
-        return self.db[self.stock_table].find_one(
-            {"ticker_symbol": ticker_symbol},
-            sort=[("created_at", -1)],
-        )
-
-
-class PostgresBackend:
-    def __init__(self, sql_database_url, stock_table="stock_data", sql_echo=False):
-        if not sql_database_url:
-            raise ValueError("SQL_DATABASE_URL is required when DB_BACKEND=postgres")
-        self.sql_database_url = sql_database_url
-        self.stock_table = stock_table
-        self.sql_echo = sql_echo
-        self.engine = None
-        self.Session = None
-
-    def open(self):
-        self.engine = create_engine(self.sql_database_url, echo=self.sql_echo, future=True)
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine, future=True)
-        logger.info("PostgreSQL backend ready")
-
-    def close(self):
-        if self.engine:
-            self.engine.dispose()
-
-    def upsert_stock(self, record):
-        payload = _normalize_record(record)
-        with self.engine.begin() as conn:
-            stmt = pg_insert(StockData).values(
-                ticker_symbol=payload["ticker_symbol"],
-                stock_name=payload["stock_name"],
-                stock_price=float(payload["stock_price"]),
-                stock_change=float(payload["stock_change"]) if payload.get("stock_change") is not None else None,
-                created_at=payload["created_at"],
-            )
-            update_values = {
-                "stock_name": stmt.excluded.stock_name,
-                "stock_price": stmt.excluded.stock_price,
-                "stock_change": stmt.excluded.stock_change,
-                "created_at": stmt.excluded.created_at,
-            }
-            conn.execute(stmt.on_conflict_do_update(index_elements=["ticker_symbol"], set_=update_values))
-
-    def get_latest_by_ticker(self, ticker_symbol):
-        with self.Session() as session:
-            record = (
-                session.query(StockData)
-                .filter(StockData.ticker_symbol == ticker_symbol)
-                .order_by(desc(StockData.created_at))
-                .first()
-            )
-            if record is None:
-                return None
-            return {
-                "ticker_symbol": record.ticker_symbol,
-                "stock_name": record.stock_name,
-                "stock_price": record.stock_price,
-                "stock_change": record.stock_change,
-                "created_at": record.created_at,
-            }
-
-
-class SupabaseBackend:
-    def __init__(self, supabase_url, supabase_key, supabase_table, stockanalysis_table="stockanalysis_stocks"):
-        if not supabase_url or not supabase_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY are required when DB_BACKEND=supabase")
-        self.supabase_url = supabase_url
-        self.supabase_key = supabase_key
-        self.supabase_table = supabase_table
-        self.stockanalysis_table = stockanalysis_table
-        self.client = None
-        # Local fallback directory for failed Supabase writes (relative to CWD)
-        self.local_fallback_dir = "reports/local_fallback"
-
-    def open(self):
-        from supabase import create_client
-
-        self.client = create_client(self.supabase_url, self.supabase_key)
-        logger.info("Supabase backend ready")
-
-    def close(self):
-        return None
-
-    def _ensure_local_dir(self):
-        if not self.local_fallback_dir:
-            return
-        try:
-            os.makedirs(self.local_fallback_dir, exist_ok=True)
-        except Exception:
-            logger.exception("Failed to create local fallback directory %s", self.local_fallback_dir)
-
-    def _write_local_fallback(self, kind, payload):
-        """Write a failed Supabase payload to local JSONL for later inspection/replay."""
-        if not self.local_fallback_dir:
-            return
-        self._ensure_local_dir()
-        try:
-            date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            filename = f"{kind}_fallback-{date_str}.jsonl"
-            path = os.path.join(self.local_fallback_dir, filename)
-            with open(path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(payload, default=str) + "\n")
-        except Exception:
-            logger.exception("Failed to write local fallback record for %s", kind)
-
-    def upsert_stockanalysis_stock(self, record):
-        """Upsert one normalized stock record (all tab data) into stockanalysis_stocks, updating existing records."""
-        scraped_at = record.get("scraped_at")
-        if scraped_at is None:
-            scraped_at = datetime.now(timezone.utc)
-        if hasattr(scraped_at, "isoformat"):
-            scraped_at = scraped_at.isoformat()
-        
-        # Get existing record to preserve price_history
-        existing = None
-        try:
-            response = self.client.table(self.stockanalysis_table).select("price_history, stock_price, stock_change").eq("ticker_symbol", record["ticker_symbol"]).execute()
-            if response.data:
-                existing = response.data[0]
-        except Exception:
-            existing = None
-        
-        # Build price_history entry
-        history_entry = {
-            "scraped_at": scraped_at,
-            "stock_price": float(record["stock_price"]) if record.get("stock_price") is not None else None,
-            "stock_change": float(record["stock_change"]) if record.get("stock_change") is not None else None,
-        }
-        
-        # Append to existing history or create new array
-        price_history = existing.get("price_history", []) if existing else []
-        if not isinstance(price_history, list):
-            price_history = []
-        
-        # Only add if price or change actually changed (avoid duplicates)
-        if not price_history or price_history[-1].get("stock_price") != history_entry["stock_price"] or price_history[-1].get("stock_change") != history_entry["stock_change"]:
-            price_history.append(history_entry)
-        
-        payload = {
-            "ticker_symbol": record["ticker_symbol"],
-            "company_name": record["company_name"],
-            "rank": record.get("rank"),
-            "stock_price": float(record["stock_price"]) if record.get("stock_price") is not None else None,
-            "stock_change": float(record["stock_change"]) if record.get("stock_change") is not None else None,
-            "scraped_at": scraped_at,
-            "overview_metrics": record.get("overview_metrics"),
-            "performance_metrics": record.get("performance_metrics"),
-            "dividends_metrics": record.get("dividends_metrics"),
-            "price_metrics": record.get("price_metrics"),
-            "profile_metrics": record.get("profile_metrics"),
-            "price_history": price_history,
-        }
-        # Use upsert to update existing records or insert new ones.
-        # On Supabase failure, write a local fallback record.
-        try:
-            self.client.table(self.stockanalysis_table).upsert(payload, on_conflict="ticker_symbol").execute()
-        except Exception:
-            logger.exception("Supabase upsert_stockanalysis_stock failed; writing local fallback")
-            self._write_local_fallback("stockanalysis_stocks", payload)
-
-    def upsert_stock(self, record):
-        payload = _normalize_record(record)
-        scraped_at = payload.get("scraped_at")
-        if scraped_at is None:
-            scraped_at = payload.get("created_at", datetime.now(timezone.utc))
-        if hasattr(scraped_at, "isoformat"):
-            scraped_at_iso = scraped_at.isoformat()
-        else:
-            scraped_at_iso = scraped_at
-        
-        # Get existing record to preserve price_history
-        existing = None
-        try:
-            response = self.client.table(self.supabase_table).select("price_history, stock_price, stock_change").eq("ticker_symbol", payload["ticker_symbol"]).execute()
-            if response.data:
-                existing = response.data[0]
-        except Exception:
-            existing = None
-        
-        # Build price_history entry
-        history_entry = {
-            "scraped_at": scraped_at_iso,
-            "stock_price": float(payload["stock_price"]),
-            "stock_change": float(payload["stock_change"]) if payload.get("stock_change") is not None else None,
-        }
-        
-        # Append to existing history or create new array
-        price_history = existing.get("price_history", []) if existing else []
-        if not isinstance(price_history, list):
-            price_history = []
-        
-        # Only add if price or change actually changed (avoid duplicates)
-        if not price_history or price_history[-1].get("stock_price") != history_entry["stock_price"] or price_history[-1].get("stock_change") != history_entry["stock_change"]:
-            price_history.append(history_entry)
-        
-        serialized = {
-            "ticker_symbol": payload["ticker_symbol"],
-            "stock_name": payload["stock_name"],
-            "stock_price": float(payload["stock_price"]),
-            "stock_change": float(payload["stock_change"]) if payload.get("stock_change") is not None else None,
-            "scraped_at": scraped_at_iso,
-            "created_at": payload["created_at"].isoformat() if hasattr(payload["created_at"], "isoformat") else payload["created_at"],
-            "price_history": price_history,
-        }
-        # Use upsert to update existing records or insert new ones.
-        # On Supabase failure, write a local fallback record.
-        try:
-            self.client.table(self.supabase_table).upsert(serialized, on_conflict="ticker_symbol").execute()
-        except Exception:
-            logger.exception("Supabase upsert_stock failed; writing local fallback")
-            self._write_local_fallback("stock_data", serialized)
-
-    def get_latest_by_ticker(self, ticker_symbol):
-        response = (
-            self.client.table(self.supabase_table)
-            .select("ticker_symbol,stock_name,stock_price,stock_change,created_at")
-            .eq("ticker_symbol", ticker_symbol)
-            .order("created_at", desc=True)
-            .limit(1)
-            .execute()
-        )
-        if not response.data:
-            return None
-        return response.data[0]
-
-
 def create_backend(
     backend_name,
     mongodb_uri=None,
     mongo_database="nse_data",
     stock_table="stock_data",
+    mongo_history_mode=False,
+    mongo_history_collection=None,
+    mongo_ts_granularity="minutes",
+    mongo_history_ttl_days=None,
+    mongo_history_batch_size=500,
     sql_database_url=None,
     sql_echo=False,
+    sql_async_batch_size=200,
     supabase_url=None,
     supabase_key=None,
     supabase_table="stock_data",
     stockanalysis_table="stockanalysis_stocks",
+    embedded_path=None,
+    embedded_batch_size=500,
+    fanout_queue_size=10000,
+    fanout_batch_size=100,
+    resilience=None,
+    spool_label=None,
 ):
-    backend = backend_name.strip().lower()
+    """Build the backend named by ``backend_name`` (or a ``FanoutBackend`` for a list).
+
+    ``resilience`` (``ResilientBackend`` keyword arguments) wraps synchronous
+    backends' writes with retries, a circuit breaker and a local spool. Every
+    fan-out target is wrapped, with the defaults when ``resilience`` is not
+    given: its writes run on a worker thread that has no caller to raise to.
+    ``spool_label`` keeps the spool and counters of one writer apart from
+    another writing to the same backend in the same process
+    (``<backend>-<label>``).
+    """
+    arguments = dict(locals())
+    names = backend_names(backend_name)
+    if len(names) > 1:
+        from .fanout_backend import FanoutBackend
+
+        options = {key: value for key, value in arguments.items()
+                   if key != "backend_name" and not key.startswith("fanout_")}
+        options["resilience"] = resilience or {}
+        targets = [(name, create_backend(sync_backend_name(name), **options)) for name in names]
+        return FanoutBackend(targets, queue_size=fanout_queue_size, batch_size=fanout_batch_size)
+    if resilience is not None:
+        from .resilience import ResilientBackend
+
+        storage = create_backend(**{**arguments, "resilience": None})
+        if getattr(storage, "is_async", False):
+            return storage
+        name = f"{names[0]}-{spool_label}" if spool_label else names[0]
+        return ResilientBackend(storage, name, **resilience)
+    backend = names[0] if names else ""
     if backend == "mongo":
-        return MongoBackend(mongodb_uri=mongodb_uri, mongo_database=mongo_database, stock_table=stock_table)
+        from .mongo_backend import MongoBackend
+
+        return MongoBackend(
+            mongodb_uri=mongodb_uri,
+            mongo_database=mongo_database,
+            stock_table=stock_table,
+            history_mode=mongo_history_mode,
+            history_collection=mongo_history_collection,
+            history_granularity=mongo_ts_granularity,
+            history_ttl_days=mongo_history_ttl_days,
+            history_batch_size=mongo_history_batch_size,
+        )
     if backend == "postgres":
+        from .postgres_backend import PostgresBackend
+
         return PostgresBackend(
             sql_database_url=sql_database_url,
             stock_table=stock_table,
             sql_echo=sql_echo,
         )
+    if backend == "postgres_async":
+        from .postgres_async_backend import AsyncPostgresBackend
+
+        return AsyncPostgresBackend(
+            sql_database_url=sql_database_url,
+            stock_table=stock_table,
+            sql_echo=sql_echo,
+            batch_size=sql_async_batch_size,
+        )
     if backend == "supabase":
+        from .supabase_backend import SupabaseBackend
+
         return SupabaseBackend(
             supabase_url=supabase_url,
             supabase_key=supabase_key,
             supabase_table=supabase_table,
             stockanalysis_table=stockanalysis_table,
         )
-    raise ValueError("Unsupported DB_BACKEND. Use one of: mongo, postgres, supabase")
+    if backend == "embedded":
+        from .embedded_backend import EmbeddedBackend
+
+        return EmbeddedBackend(
+            embedded_path=embedded_path,
+            stock_table=stock_table,
+            stockanalysis_table=stockanalysis_table,
+            batch_size=embedded_batch_size,
+        )
+    raise ValueError("Unsupported DB_BACKEND. Use one of (or a comma-separated list of): "
+                     "mongo, postgres, postgres_async, supabase, embedded")
+
+
+def _settings_getter(settings):
+    if hasattr(settings, "get"):
+        return settings.get
+
+    def get(name, default=None):
+        return getattr(settings, name, default)
+
+    return get
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return bool(value)
+
+
+def backend_options_from_settings(settings):
+    """Backend tuning options (batch sizes, history mode, fan-out, write retries) as ``create_backend`` kwargs."""
+    get = _settings_getter(settings)
+    resilience = None
+    if _flag(get("WRITE_RESILIENCE", True)):
+        resilience = {
+            "spool_dir": get("WRITE_SPOOL_DIR") or "reports/local_fallback",
+            "retries": int(get("WRITE_RETRIES", 3) or 0),
+            "base_delay": float(get("WRITE_RETRY_BASE_DELAY", 1.0) or 0),
+            "max_delay": float(get("WRITE_RETRY_MAX_DELAY", 60.0) or 0),
+            "queue_size": int(get("WRITE_RETRY_QUEUE_SIZE", 1000) or 1000),
+            "failure_threshold": int(get("CIRCUIT_BREAKER_THRESHOLD", 5) or 5),
+            "reset_timeout": float(get("CIRCUIT_BREAKER_RESET_SECONDS", 30.0) or 0),
+            "drain_batch_size": int(get("SPOOL_DRAIN_BATCH_SIZE", 100) or 100),
+        }
+    return {
+        "sql_async_batch_size": int(get("SQL_ASYNC_BATCH_SIZE", 200) or 200),
+        "mongo_history_mode": _flag(get("MONGO_HISTORY_MODE", False)),
+        "mongo_history_collection": get("MONGO_HISTORY_COLLECTION") or None,
+        "mongo_ts_granularity": get("MONGO_TS_GRANULARITY", "minutes") or "minutes",
+        "mongo_history_ttl_days": float(get("MONGO_HISTORY_TTL_DAYS", 0) or 0) or None,
+        "mongo_history_batch_size": int(get("MONGO_HISTORY_BATCH_SIZE", 500) or 500),
+        "embedded_path": get("EMBEDDED_DB_PATH") or None,
+        "embedded_batch_size": int(get("EMBEDDED_BATCH_SIZE", 500) or 500),
+        # Fan-out options are either one value or per-backend "name=value" pairs
+        "fanout_queue_size": get("FANOUT_QUEUE_SIZE", 10000) or 10000,
+        "fanout_batch_size": get("FANOUT_BATCH_SIZE", 100) or 100,
+        "resilience": resilience,
+    }
+
+
+def create_backend_from_settings(settings, backend_name=None, writer=False):
+    """Build the configured backend from Scrapy ``Settings`` or the ``nse_scraper.settings`` module.
+
+    Used by the command-line utilities so they share one mapping from
+    settings to ``create_backend`` arguments with the pipelines. The
+    utilities are synchronous, so ``postgres_async`` resolves to the
+    ``postgres`` backend on the same database.
+
+    By default the result is for reading and maintenance: a fan-out list
+    resolves to its first backend, and writes are not wrapped in the
+    retry/spool layer, so utilities fail loudly. Long-running writers such as
+    the polling daemon pass ``writer=True`` to get the same stack as the
+    pipelines: every listed backend behind a ``FanoutBackend``, each wrapped
+    in ``ResilientBackend`` unless ``WRITE_RESILIENCE`` is off.
+    """
+    get = _settings_getter(settings)
+    name = backend_name or get("DB_BACKEND", "mongo")
+    options = backend_options_from_settings(settings)
+    if writer:
+        name = ",".join(_SYNC_EQUIVALENTS.get(backend, backend) for backend in backend_names(name))
+    else:
+        name = sync_backend_name(name)
+        options["resilience"] = None
+    return create_backend(
+        backend_name=name,
+        mongodb_uri=get("MONGODB_URI"),
+        mongo_database=get("MONGO_DATABASE", "nse_data"),
+        stock_table=get("STOCK_TABLE", "stock_data"),
+        sql_database_url=get("SQL_DATABASE_URL"),
+        sql_echo=get("SQL_ECHO", False),
+        supabase_url=get("SUPABASE_URL"),
+        supabase_key=get("SUPABASE_KEY"),
+        supabase_table=get("SUPABASE_TABLE", "stock_data"),
+        stockanalysis_table=get("STOCKANALYSIS_TABLE", "stockanalysis_stocks"),
+        **options,
+    )
+
+
+def __getattr__(name):
+    # Keep ``from nse_scraper.db.backends import PostgresBackend`` working
+    # without importing every driver up front.
+    module_name = _BACKEND_CLASSES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(module_name, __package__)
+    return getattr(module, name)
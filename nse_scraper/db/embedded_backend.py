@@ -0,0 +1,494 @@
+"""Embedded storage backend (SQLite, standard library only).
+
+Keeps everything in one local file, so development, CI and single-box
+deployments need no database service:
+
+- ``stock_data`` and ``stockanalysis_stocks``: latest row per ticker;
+- ``stock_price_history`` and ``stockanalysis_price_history``: one row per
+  ticker per ``scraped_at`` (``WITHOUT ROWID`` tables clustered on that key,
+  plus a ``scraped_at`` index for cross-ticker range scans and a
+  ``run_id`` index for whole-run lookups);
+- ``scrape_runs``: one row per scrape run (``nse_scraper.runs``);
+- ``market_index_points``: exchange, sector and industry index points per
+  StockAnalysis run (``nse_scraper.indices``), clustered on
+  ``(scope, name, as_of)``.
+
+The database runs in WAL mode, so readers (notebooks, the CLI utilities)
+never block the writer. Quotes are buffered and written ``batch_size`` at a
+time, each batch in one ``BEGIN IMMEDIATE`` transaction; reads flush first.
+Timestamps are stored as UTC ISO 8601 text, which sorts chronologically.
+``query()`` runs ad-hoc analytical SQL (window functions included) in-process.
+
+StockAnalysis screener metrics are typed, indexed columns (see
+``stockanalysis_metrics``); the ``*_metrics`` JSON columns keep only
+unrecognised keys, and readers merge the two back together.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from ..serialization import dumps, loads, parse_timestamp, to_iso
+from .backends import DEFAULT_PAGE_SIZE, _normalize_record
+from .stockanalysis_metrics import INDEXED_COLUMNS, METRICS, merge_metrics, split_metrics
+
+logger = logging.getLogger(__name__)
+
+METRIC_VIEWS = ("overview", "performance", "dividends", "price", "profile")
+
+_INDEX_COLUMNS = ("scope", "name", "as_of", "trade_date", "run_id", "constituents", "market_cap", "weight_pct",
+                  "change_pct", "mean_change_pct", "level", "advancers", "decliners")
+
+_SQLITE_TYPES = {"numeric": "REAL", "integer": "INTEGER", "date": "TEXT", "text": "TEXT"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {stock_table} (
+    ticker_symbol TEXT PRIMARY KEY,
+    stock_name TEXT NOT NULL,
+    stock_price REAL NOT NULL,
+    stock_change REAL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stock_price_history (
+    ticker_symbol TEXT NOT NULL,
+    scraped_at TEXT NOT NULL,
+    stock_price REAL NOT NULL,
+    stock_change REAL,
+    run_id TEXT,
+    PRIMARY KEY (ticker_symbol, scraped_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_stock_price_history_scraped_at ON stock_price_history (scraped_at);
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    run_id TEXT PRIMARY KEY,
+    spider TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_scrape_runs_started_at ON scrape_runs (started_at);
+CREATE TABLE IF NOT EXISTS market_index_points (
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    run_id TEXT,
+    constituents INTEGER NOT NULL,
+    market_cap REAL NOT NULL,
+    weight_pct REAL,
+    change_pct REAL,
+    mean_change_pct REAL,
+    level REAL NOT NULL,
+    advancers INTEGER NOT NULL DEFAULT 0,
+    decliners INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, name, as_of)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_market_index_points_trade_date ON market_index_points (trade_date);
+CREATE TABLE IF NOT EXISTS {stockanalysis_table} (
+    ticker_symbol TEXT PRIMARY KEY,
+    company_name TEXT,
+    rank INTEGER,
+    stock_price REAL,
+    stock_change REAL,
+    scraped_at TEXT,
+    overview_metrics TEXT,
+    performance_metrics TEXT,
+    dividends_metrics TEXT,
+    price_metrics TEXT,
+    profile_metrics TEXT
+);
+CREATE TABLE IF NOT EXISTS stockanalysis_price_history (
+    ticker_symbol TEXT NOT NULL,
+    scraped_at TEXT NOT NULL,
+    stock_price REAL,
+    stock_change REAL,
+    PRIMARY KEY (ticker_symbol, scraped_at)
+) WITHOUT ROWID;
+"""
+
+
+def _iso(value):
+    """UTC ISO 8601 text for a datetime (or ISO string), so text order is time order."""
+    if hasattr(value, "astimezone"):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+    if isinstance(value, str):
+        parsed = parse_timestamp(value)
+        return _iso(parsed) if parsed is not None else value
+    return value
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _decode_metrics(row):
+    for view in METRIC_VIEWS:
+        key = f"{view}_metrics"
+        row[key] = loads(row[key]) if row[key] is not None else None
+    return merge_metrics(row)
+
+
+class EmbeddedBackend:
+    def __init__(self, embedded_path, stock_table="stock_data", stockanalysis_table="stockanalysis_stocks",
+                 batch_size=500):
+        if not embedded_path:
+            raise ValueError("EMBEDDED_DB_PATH is required when DB_BACKEND=embedded")
+        self.embedded_path = embedded_path
+        self.stock_table = stock_table
+        self.stockanalysis_table = stockanalysis_table
+        self.batch_size = max(1, batch_size)
+        self.conn = None
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def open(self):
+        directory = os.path.dirname(self.embedded_path)
+        if directory and self.embedded_path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; transactions are explicit (BEGIN IMMEDIATE per batch).
+        self.conn = sqlite3.connect(self.embedded_path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(_SCHEMA.format(stock_table=self.stock_table,
+                                               stockanalysis_table=self.stockanalysis_table))
+        self._ensure_run_column()
+        self._ensure_metric_columns()
+        logger.info("Embedded backend ready (%s)", self.embedded_path)
+
+    def _ensure_run_column(self):
+        """Add ``stock_price_history.run_id`` (and its index) to databases created before runs existed."""
+        existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(stock_price_history)")}
+        if "run_id" not in existing:
+            self.conn.execute("ALTER TABLE stock_price_history ADD COLUMN run_id TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_stock_price_history_run_id ON stock_price_history (run_id)")
+
+    def _ensure_metric_columns(self):
+        """Add the typed metric columns (and their indexes) to databases created before they existed."""
+        table = self.stockanalysis_table
+        existing = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for metric in METRICS:
+            if metric.column not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {metric.column} {_SQLITE_TYPES[metric.kind]}")
+        for column in INDEXED_COLUMNS:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
+            self.conn = None
+
+    def _transaction(self):
+        return _Transaction(self.conn, self._lock)
+
+    def upsert_stock(self, record):
+        payload = _normalize_record(record)
+        self._pending.append({
+            "ticker_symbol": payload["ticker_symbol"],
+            "stock_name": payload["stock_name"],
+            "stock_price": float(payload["stock_price"]),
+            "stock_change": _float(payload.get("stock_change")),
+            "created_at": _iso(payload["created_at"]),
+            "scraped_at": _iso(payload["scraped_at"]),
+            "run_id": payload.get("run_id"),
+        })
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def upsert_stocks(self, records):
+        for record in records:
+            self.upsert_stock(record)
+
+    def flush(self):
+        """Write buffered quotes (latest rows and history) in one transaction.
+
+        The buffer is cleared only once the transaction commits: if it fails
+        (``SQLITE_BUSY`` after the busy timeout, disk full) every quote stays
+        buffered for the next flush, not just the one whose write raised.
+        """
+        batch = self._pending
+        if not batch:
+            return 0
+        with self._transaction() as conn:
+            conn.executemany(
+                f"INSERT INTO {self.stock_table} (ticker_symbol, stock_name, stock_price, stock_change, created_at) "
+                "VALUES (:ticker_symbol, :stock_name, :stock_price, :stock_change, :created_at) "
+                "ON CONFLICT (ticker_symbol) DO UPDATE SET stock_name = excluded.stock_name, "
+                "stock_price = excluded.stock_price, stock_change = excluded.stock_change, "
+                f"created_at = excluded.created_at WHERE excluded.created_at >= {self.stock_table}.created_at",
+                batch,
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO stock_price_history (ticker_symbol, scraped_at, stock_price, stock_change, run_id) "
+                "VALUES (:ticker_symbol, :scraped_at, :stock_price, :stock_change, :run_id)",
+                batch,
+            )
+        self._pending = []
+        return len(batch)
+
+    def upsert_run(self, record):
+        """Insert or update one ``scrape_runs`` row (``nse_scraper.runs.ScrapeRun.as_record()``)."""
+        self.flush()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO scrape_runs (run_id, spider, started_at, finished_at, status, rows) "
+                "VALUES (:run_id, :spider, :started_at, :finished_at, :status, :rows) "
+                "ON CONFLICT (run_id) DO UPDATE SET finished_at = excluded.finished_at, "
+                "status = excluded.status, rows = excluded.rows",
+                {
+                    "run_id": record["run_id"],
+                    "spider": record["spider"],
+                    "started_at": _iso(record["started_at"]),
+                    "finished_at": _iso(record.get("finished_at")),
+                    "status": record["status"],
+                    "rows": int(record.get("rows") or 0),
+                },
+            )
+
+    def list_runs(self, limit=20, spider=None):
+        """The most recent runs, newest first."""
+        sql, params = "SELECT * FROM scrape_runs", []
+        if spider is not None:
+            sql += " WHERE spider = ?"
+            params.append(spider)
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY started_at DESC LIMIT ?", [*params, limit])]
+
+    def get_run_board(self, run_id):
+        """The quotes written by one run (``ix_stock_price_history_run_id``), by ticker."""
+        self.flush()
+        return [dict(row) for row in self.conn.execute(
+            f"SELECT h.ticker_symbol, d.stock_name, h.stock_price, h.stock_change, h.scraped_at, h.run_id "
+            f"FROM stock_price_history h LEFT JOIN {self.stock_table} d ON d.ticker_symbol = h.ticker_symbol "
+            "WHERE h.run_id = ? ORDER BY h.ticker_symbol",
+            (run_id,),
+        )]
+
+    def get_board_as_of(self, as_of, tickers=None):
+        """The board as it stood at ``as_of``: each ticker's newest quote not after it.
+
+        One backward probe of the ``(ticker_symbol, scraped_at)`` primary key
+        per ticker; tickers first quoted after ``as_of`` are left out.
+        """
+        self.flush()
+        sql = (
+            f"SELECT d.ticker_symbol, d.stock_name, h.stock_price, h.stock_change, h.scraped_at, h.run_id "
+            f"FROM {self.stock_table} d JOIN stock_price_history h ON h.ticker_symbol = d.ticker_symbol "
+            "AND h.scraped_at = (SELECT scraped_at FROM stock_price_history "
+            "WHERE ticker_symbol = d.ticker_symbol AND scraped_at <= ? ORDER BY scraped_at DESC LIMIT 1)"
+        )
+        params = [_iso(as_of)]
+        if tickers is not None:
+            tickers = list(tickers)
+            sql += f" WHERE d.ticker_symbol IN ({', '.join('?' * len(tickers))})"
+            params.extend(tickers)
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY d.ticker_symbol", params)]
+
+    def upsert_index_point(self, record):
+        """Insert or replace one ``market_index_points`` row (``nse_scraper.indices``)."""
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO market_index_points ({', '.join(_INDEX_COLUMNS)}) "
+                f"VALUES ({', '.join(':' + column for column in _INDEX_COLUMNS)})",
+                {**{column: record.get(column) for column in _INDEX_COLUMNS},
+                 "as_of": _iso(record["as_of"]), "trade_date": str(record["trade_date"])},
+            )
+
+    def get_index_series(self, scope, name=None, since=None, until=None):
+        """Index points of one series (every series in ``scope`` without ``name``), oldest first."""
+        conditions, params = ["scope = ?"], [scope]
+        if name is not None:
+            conditions.append("name = ?")
+            params.append(name)
+        if since is not None:
+            conditions.append("trade_date >= ?")
+            params.append(str(since))
+        if until is not None:
+            conditions.append("trade_date <= ?")
+            params.append(str(until))
+        return [dict(row) for row in self.conn.execute(
+            f"SELECT * FROM market_index_points WHERE {' AND '.join(conditions)} ORDER BY name, as_of", params)]
+
+    def latest_index_levels(self, before):
+        """``{(scope, name): level}`` from each series' newest point before trade date ``before``."""
+        # SQLite returns the bare columns of the row that holds max(as_of).
+        return {(row["scope"], row["name"]): row["level"] for row in self.conn.execute(
+            "SELECT scope, name, level, max(as_of) FROM market_index_points WHERE trade_date < ? "
+            "GROUP BY scope, name", (str(before),))}
+
+    def upsert_stockanalysis_stock(self, record):
+        """Upsert one normalized StockAnalysis record and append its quote to history."""
+        scraped_at = _iso(record.get("scraped_at") or datetime.now(timezone.utc))
+        row = {
+            "ticker_symbol": record["ticker_symbol"],
+            "company_name": record.get("company_name"),
+            "rank": record.get("rank"),
+            "stock_price": _float(record.get("stock_price")),
+            "stock_change": _float(record.get("stock_change")),
+            "scraped_at": scraped_at,
+        }
+        metrics, blobs = split_metrics(record)
+        row.update({column: to_iso(value) for column, value in metrics.items()})
+        row.update({key: dumps(blob) if blob is not None else None
+                    for key, blob in blobs.items()})
+        columns = list(row)
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT INTO {self.stockanalysis_table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(':' + c for c in columns)}) "
+                f"ON CONFLICT (ticker_symbol) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in columns[1:]),
+                row,
+            )
+            if row["stock_price"] is not None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO stockanalysis_price_history "
+                    "(ticker_symbol, scraped_at, stock_price, stock_change) "
+                    "VALUES (:ticker_symbol, :scraped_at, :stock_price, :stock_change)",
+                    row,
+                )
+
+    def get_latest_by_ticker(self, ticker_symbol):
+        self.flush()
+        row = self.conn.execute(
+            f"SELECT ticker_symbol, stock_name, stock_price, stock_change, created_at FROM {self.stock_table} "
+            "WHERE ticker_symbol = ?",
+            (ticker_symbol,),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_stockanalysis_stock(self, ticker_symbol):
+        row = self.conn.execute(
+            f"SELECT * FROM {self.stockanalysis_table} WHERE ticker_symbol = ?", (ticker_symbol,)
+        ).fetchone()
+        return _decode_metrics(dict(row)) if row is not None else None
+
+    def get_history(self, ticker_symbol, start=None, end=None, table="stock_price_history"):
+        """Quotes for one ticker in ``[start, end)``, oldest first."""
+        self.flush()
+        sql = f"SELECT ticker_symbol, scraped_at, stock_price, stock_change FROM {table} WHERE ticker_symbol = ?"
+        params = [ticker_symbol]
+        if start is not None:
+            sql += " AND scraped_at >= ?"
+            params.append(_iso(start))
+        if end is not None:
+            sql += " AND scraped_at < ?"
+            params.append(_iso(end))
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY scraped_at", params)]
+
+    def _iter_latest(self, table, page_size):
+        self.flush()
+        after = ""
+        while True:
+            rows = [dict(row) for row in self.conn.execute(
+                f"SELECT * FROM {table} WHERE ticker_symbol > ? ORDER BY ticker_symbol LIMIT ?", (after, page_size))]
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1]["ticker_symbol"]
+
+    def iter_stocks(self, page_size=DEFAULT_PAGE_SIZE):
+        """Every latest-quote row, ordered by ticker, ``page_size`` per query."""
+        return self._iter_latest(self.stock_table, page_size)
+
+    def iter_stockanalysis_stocks(self, page_size=DEFAULT_PAGE_SIZE):
+        """Every StockAnalysis row (typed metrics merged into the blobs), ordered by ticker."""
+        for row in self._iter_latest(self.stockanalysis_table, page_size):
+            yield _decode_metrics(row)
+
+    def iter_history(self, tickers=None, since=None, until=None, page_size=DEFAULT_PAGE_SIZE,
+                     table="stock_price_history"):
+        """History rows ordered by ticker and then ``scraped_at``, keyset-paginated on the primary key."""
+        self.flush()
+        conditions, params = [], []
+        if tickers is not None:
+            tickers = list(tickers)
+            conditions.append(f"ticker_symbol IN ({', '.join('?' * len(tickers))})")
+            params.extend(tickers)
+        if since is not None:
+            conditions.append("scraped_at >= ?")
+            params.append(_iso(since))
+        if until is not None:
+            conditions.append("scraped_at < ?")
+            params.append(_iso(until))
+        after = ("", "")
+        while True:
+            where = " AND ".join(conditions + ["(ticker_symbol, scraped_at) > (?, ?)"])
+            rows = [dict(row) for row in self.conn.execute(
+                f"SELECT ticker_symbol, scraped_at, stock_price, stock_change FROM {table} WHERE {where} "
+                "ORDER BY ticker_symbol, scraped_at LIMIT ?",
+                [*params, *after, page_size],
+            )]
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]["ticker_symbol"], rows[-1]["scraped_at"])
+
+    def query(self, sql, params=()):
+        """Run read-only analytical SQL against the store; rows come back as dicts."""
+        self.flush()
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def compact_history(self, policy, now=None, dry_run=False):
+        """Downsample both history tables per ``policy`` (see ``nse_scraper.retention``).
+
+        One ticker and four weeks per transaction. Bytes are the serialized
+        size of the removed rows; SQLite reuses the freed pages (``VACUUM``
+        returns them to the OS).
+        """
+        from ..retention import CompactionReport, compaction_windows, json_size, split_points
+
+        self.flush()
+        cutoffs = policy.cutoffs(now)
+        report = CompactionReport(backend="embedded", dry_run=dry_run)
+        for table in ("stock_price_history", "stockanalysis_price_history"):
+            oldest = self.conn.execute(
+                f"SELECT ticker_symbol, min(scraped_at) FROM {table} WHERE scraped_at < ? "
+                "GROUP BY ticker_symbol ORDER BY ticker_symbol",
+                (_iso(cutoffs.full),),
+            ).fetchall()
+            for ticker, first in oldest:
+                for lower, upper in compaction_windows(parse_timestamp(first), cutoffs):
+                    rows = self.get_history(ticker, lower, upper, table=table)
+                    if not rows:
+                        continue
+                    _kept, removed = split_points(rows, cutoffs)
+                    if removed and not dry_run:
+                        with self._transaction() as conn:
+                            conn.executemany(
+                                f"DELETE FROM {table} WHERE ticker_symbol = :ticker_symbol "
+                                "AND scraped_at = :scraped_at",
+                                removed,
+                            )
+                    report.add(table, len(rows), len(removed), sum(json_size(row) for row in removed))
+        return report
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` (``ROLLBACK`` on error), one writer at a time."""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            # ``__exit__`` does not run when ``BEGIN`` fails (busy timeout).
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
@@ -0,0 +1,252 @@
+"""Write-only backend that mirrors every record to several backends concurrently.
+
+Selected with a comma-separated ``DB_BACKEND`` (e.g. ``supabase,postgres``).
+Each target backend gets its own bounded queue, worker thread and counters:
+
+- ``upsert_*`` calls only enqueue, so the crawl does not wait on storage;
+- each worker drains its queue in batches of up to ``batch_size`` records
+  (``upsert_stocks`` when the backend has it). Retries are not done here:
+  ``create_backend`` wraps every target in ``ResilientBackend``, which
+  retries, and spools what it cannot write, on the worker thread;
+- a full queue blocks the caller until that backend's worker catches up
+  (counted as ``waits``), so records are never dropped; the queue only has
+  to absorb bursts, since a down backend is spooled rather than waited on;
+- an idle worker calls its backend's ``retry_due()`` every
+  ``IDLE_RETRY_INTERVAL`` seconds, so retries and spool drains do not wait
+  for the next write;
+- ``flush()`` and ``close()`` go through the queues, so a backend's own
+  ``flush`` runs on its worker thread after the records before it, and all
+  queues drain in parallel: shutdown takes as long as the slowest backend.
+
+Async backends are replaced by their synchronous equivalent (the worker
+threads already provide the concurrency). Reads are not fanned out: the
+command-line utilities use the first listed backend. The one exception is
+``latest_index_levels``, which index points chain from; it is read from the
+first opened backend that stores them.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = "nse/fanout"
+IDLE_RETRY_INTERVAL = 1.0
+
+# Queued after the records a flush() has to wait for.
+_FLUSH = "flush"
+
+
+def per_backend(value, name, default):
+    """Resolve a setting that is either one value or ``name=value`` pairs (``"3"``, ``"supabase=5,postgres=1"``)."""
+    if value is None or value == "":
+        return default
+    if not isinstance(value, str) or "=" not in value:
+        return value
+    for pair in value.split(","):
+        key, _, setting = pair.partition("=")
+        if key.strip().lower() == name:
+            return setting.strip()
+    return default
+
+
+class _Target:
+    """One backend behind its own queue and worker thread."""
+
+    def __init__(self, name, backend, queue_size, batch_size):
+        self.name = name
+        self.backend = backend
+        self.batch_size = max(1, int(batch_size))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.thread = None
+        self.stopping = threading.Event()
+        self.opened = False
+        self.counts = {"written": 0, "failed": 0, "waits": 0, "batches": 0, "max_queue": 0}
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._overflowing = False
+        self._last_idle = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f"fanout-{self.name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, method, record):
+        try:
+            self.queue.put_nowait((method, record))
+            self._overflowing = False
+        except queue.Full:
+            self.counts["waits"] += 1
+            if not self._overflowing:
+                logger.warning("Fan-out queue for %s is full (%s records); waiting for it to drain",
+                               self.name, self.queue.maxsize)
+            self._overflowing = True
+            start = time.perf_counter()
+            self.queue.put((method, record))
+            self.wait_seconds += time.perf_counter() - start
+        self.counts["max_queue"] = max(self.counts["max_queue"], self.queue.qsize())
+
+    def _run(self):
+        # Runs until close() sets ``stopping`` and the queue is empty.
+        while True:
+            try:
+                batch = [self.queue.get(timeout=0.2)]
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return
+                self._idle()
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _idle(self):
+        retry_due = getattr(self.backend, "retry_due", None)
+        if retry_due is None or time.monotonic() - self._last_idle < IDLE_RETRY_INTERVAL:
+            return
+        self._last_idle = time.monotonic()
+        try:
+            retry_due()
+        except Exception:
+            logger.exception("Fan-out retry for %s failed", self.name)
+
+    def _write(self, work):
+        start = time.perf_counter()
+        records = sum(1 for method, _ in work if method != _FLUSH)
+        try:
+            stocks = [record for method, record in work if method == "upsert_stock"]
+            if len(stocks) > 1 and hasattr(self.backend, "upsert_stocks"):
+                self.backend.upsert_stocks(stocks)
+                work = [entry for entry in work if entry[0] != "upsert_stock"]
+            for method, record in work:
+                if method == _FLUSH:
+                    getattr(self.backend, "flush", lambda: None)()
+                else:
+                    getattr(self.backend, method)(record)
+            self.counts["written"] += records
+        except Exception:
+            # The backend's resilience layer spools failed writes rather than
+            # raising; anything that still gets here is a bug, and must not
+            # kill the worker thread.
+            self.counts["failed"] += records
+            logger.exception("Fan-out write of %s records to %s failed", records, self.name)
+        self.counts["batches"] += 1
+        self.busy_seconds += time.perf_counter() - start
+
+
+class FanoutBackend:
+    """Mirrors writes to ``targets`` (``(name, backend)`` pairs) concurrently.
+
+    ``queue_size`` and ``batch_size`` are each either one value for every
+    backend or ``name=value`` pairs.
+    """
+
+    def __init__(self, targets, queue_size=10000, batch_size=100, close_timeout=300):
+        if not targets:
+            raise ValueError("FanoutBackend needs at least one backend")
+        self.targets = [
+            _Target(name, backend, per_backend(queue_size, name, 10000), per_backend(batch_size, name, 100))
+            for name, backend in targets
+        ]
+        self.close_timeout = close_timeout
+
+    @property
+    def names(self):
+        return [target.name for target in self.targets]
+
+    @property
+    def fallback_count(self):
+        return sum(getattr(target.backend, "fallback_count", 0) for target in self.targets)
+
+    def open(self):
+        """Open every backend; one that fails to open is skipped, unless all of them do."""
+        for target in self.targets:
+            try:
+                target.backend.open()
+            except Exception:
+                logger.exception("Fan-out backend %s failed to open; its writes will be skipped", target.name)
+                continue
+            target.opened = True
+            target.start()
+        if not any(target.opened for target in self.targets):
+            raise RuntimeError(f"No fan-out backend could be opened ({', '.join(self.names)})")
+        logger.info("Fan-out writes to %s", ", ".join(target.name for target in self.targets if target.opened))
+
+    def _submit(self, method, record):
+        for target in self.targets:
+            if target.opened and hasattr(target.backend, method):
+                target.submit(method, record)
+
+    def upsert_stock(self, record):
+        self._submit("upsert_stock", record)
+
+    def upsert_stocks(self, records):
+        for record in records:
+            self._submit("upsert_stock", record)
+
+    def upsert_stockanalysis_stock(self, record):
+        self._submit("upsert_stockanalysis_stock", record)
+
+    def upsert_run(self, record):
+        # Queued like any write, so a run is recorded after the quotes submitted before it.
+        self._submit("upsert_run", record)
+
+    def upsert_index_point(self, record):
+        self._submit("upsert_index_point", record)
+
+    def latest_index_levels(self, before):
+        for target in self.targets:
+            if target.opened and hasattr(target.backend, "latest_index_levels"):
+                return target.backend.latest_index_levels(before)
+        return {}
+
+    def flush(self):
+        """Block until every queued record has been handed to its backend and each backend flushed."""
+        running = [target for target in self.targets if target.opened]
+        for target in running:
+            target.submit(_FLUSH, None)
+        for target in running:
+            target.queue.join()
+
+    def close(self):
+        """Drain all queues in parallel, then close the backends."""
+        start = time.perf_counter()
+        running = [target for target in self.targets if target.opened]
+        for target in running:
+            target.stopping.set()
+        deadline = time.monotonic() + self.close_timeout
+        for target in running:
+            target.thread.join(max(0.0, deadline - time.monotonic()))
+        for target in running:
+            if target.thread.is_alive():
+                logger.error("Fan-out backend %s did not drain within %ss (%s records left); not closing it",
+                             target.name, self.close_timeout, target.queue.qsize())
+                continue
+            try:
+                target.backend.close()
+            except Exception:
+                logger.exception("Failed to close fan-out backend %s", target.name)
+            target.opened = False
+            logger.info("Fan-out %s: %s", target.name, ", ".join(f"{k}={v}" for k, v in target.counts.items()))
+        logger.info("Fan-out drained in %.2fs", time.perf_counter() - start)
+
+    def record_stats(self, stats):
+        """Copy per-backend counters into a Scrapy stats collector under ``nse/fanout/<name>/``."""
+        for target in self.targets:
+            key = f"{STATS_PREFIX}/{target.name}"
+            for name, value in target.counts.items():
+                stats.set_value(f"{key}/{name}", value)
+            stats.set_value(f"{key}/busy_ms", round(target.busy_seconds * 1000.0, 3))
+            stats.set_value(f"{key}/wait_ms", round(target.wait_seconds * 1000.0, 3))
+            record_stats = getattr(target.backend, "record_stats", None)
+            if record_stats is not None:
+                record_stats(stats)
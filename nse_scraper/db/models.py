@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Float, String, func
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, String, func
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -12,3 +12,73 @@ class StockData(Base):
     stock_price = Column(Float, nullable=False)
     stock_change = Column(Float, nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class StockPriceHistory(Base):
+    """One row per ticker per scrape; ``stock_data`` only keeps the latest.
+
+    Range-partitioned by month on ``scraped_at``; see ``nse_scraper.db.partitions``.
+    """
+
+    __tablename__ = "stock_price_history"
+    __table_args__ = (
+        Index("ix_stock_price_history_scraped_at", "scraped_at"),
+        Index("ix_stock_price_history_run_id", "run_id"),
+        {"postgresql_partition_by": "RANGE (scraped_at)"},
+    )
+
+    ticker_symbol = Column(String(20), primary_key=True, nullable=False)
+    scraped_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    stock_price = Column(Float, nullable=False)
+    stock_change = Column(Float, nullable=True)
+    run_id = Column(String(40), nullable=True)
+
+
+class ScrapeRunRecord(Base):
+    """One row per scrape run (``nse_scraper.runs``); history rows reference it by ``run_id``."""
+
+    __tablename__ = "scrape_runs"
+    __table_args__ = (Index("ix_scrape_runs_started_at", "started_at"),)
+
+    run_id = Column(String(40), primary_key=True, nullable=False)
+    spider = Column(String(64), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    status = Column(String(16), nullable=False)
+    rows = Column(Integer, nullable=False, server_default="0")
+
+
+class StockDailyOhlc(Base):
+    """Per ticker per NSE trading date; maintained from history inserts (``db.aggregates``)."""
+
+    __tablename__ = "stock_daily_ohlc"
+
+    ticker_symbol = Column(String(20), primary_key=True, nullable=False)
+    trade_date = Column(Date, primary_key=True, nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    last_change = Column(Float, nullable=True)
+    sample_count = Column(Integer, nullable=False)
+    first_at = Column(DateTime(timezone=True), nullable=False)
+    last_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class StockSummary(Base):
+    """Latest quote, period changes (percent) and 52-week range per ticker."""
+
+    __tablename__ = "stock_summary"
+
+    ticker_symbol = Column(String(20), primary_key=True, nullable=False)
+    trade_date = Column(Date, nullable=False)
+    latest_price = Column(Float, nullable=False)
+    latest_change = Column(Float, nullable=True)
+    latest_at = Column(DateTime(timezone=True), nullable=False)
+    change_1d_pct = Column(Float, nullable=True)
+    change_1w_pct = Column(Float, nullable=True)
+    change_1m_pct = Column(Float, nullable=True)
+    change_ytd_pct = Column(Float, nullable=True)
+    high_52w = Column(Float, nullable=True)
+    low_52w = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
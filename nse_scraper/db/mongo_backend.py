@@ -0,0 +1,343 @@
+"""MongoDB storage backend.
+
+The ``stock_table`` collection keeps one document per ticker (latest quote).
+With ``history_mode`` every scrape is also appended to a native time-series
+collection (timeField ``scraped_at``, metaField ``ticker_symbol``), written in
+``insert_many`` batches, and served back through range queries and
+``$setWindowFields`` aggregations (moving averages, returns). Runs
+(``nse_scraper.runs``) are kept in ``scrape_runs``.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+import pymongo
+
+from .backends import DEFAULT_PAGE_SIZE, _normalize_record
+
+logger = logging.getLogger(__name__)
+
+TIMESERIES_GRANULARITIES = ("seconds", "minutes", "hours")
+
+RUNS_COLLECTION = "scrape_runs"
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _aware(value):
+    # pymongo returns naive UTC datetimes unless the client is tz_aware.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _time_filter(start=None, end=None):
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = _as_datetime(start)
+    if end is not None:
+        bounds["$lt"] = _as_datetime(end)
+    return {"scraped_at": bounds} if bounds else {}
+
+
+def history_window_pipeline(ticker_symbols, window=5, start=None, end=None):
+    """Aggregation computing a moving average and period returns per ticker.
+
+    Each output document carries ``stock_price``, ``moving_average`` (mean of
+    the last ``window`` quotes), ``previous_price`` and ``return_pct`` (change
+    since the previous quote, in percent).
+    """
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    match = {"ticker_symbol": {"$in": list(ticker_symbols)}}
+    match.update(_time_filter(start, end))
+    return [
+        {"$match": match},
+        {
+            "$setWindowFields": {
+                "partitionBy": "$ticker_symbol",
+                "sortBy": {"scraped_at": 1},
+                "output": {
+                    "moving_average": {"$avg": "$stock_price", "window": {"documents": [-(window - 1), 0]}},
+                    "previous_price": {"$shift": {"output": "$stock_price", "by": -1}},
+                },
+            }
+        },
+        {
+            "$addFields": {
+                "return_pct": {
+                    "$cond": [
+                        {"$gt": ["$previous_price", 0]},
+                        {"$multiply": [{"$divide": [{"$subtract": ["$stock_price", "$previous_price"]},
+                                                    "$previous_price"]}, 100]},
+                        None,
+                    ]
+                }
+            }
+        },
+        {"$project": {"_id": 0}},
+        {"$sort": {"ticker_symbol": 1, "scraped_at": 1}},
+    ]
+
+
+class MongoBackend:
+    def __init__(self, mongodb_uri, mongo_database, stock_table, history_mode=False, history_collection=None,
+                 history_granularity="minutes", history_ttl_days=None, history_batch_size=500):
+        if not mongodb_uri:
+            raise ValueError("MONGODB_URI is required when DB_BACKEND=mongo")
+        if history_granularity not in TIMESERIES_GRANULARITIES:
+            raise ValueError(f"MONGO_TS_GRANULARITY must be one of: {', '.join(TIMESERIES_GRANULARITIES)}")
+        self.mongodb_uri = mongodb_uri
+        self.mongo_database = mongo_database
+        self.stock_table = stock_table
+        self.history_mode = history_mode
+        self.history_collection = history_collection or f"{stock_table}_history"
+        self.history_granularity = history_granularity
+        self.history_ttl_seconds = int(history_ttl_days * 86400) if history_ttl_days else None
+        self.history_batch_size = max(1, history_batch_size)
+        self.client = None
+        self.db = None
+        self._history_buffer = []
+
+    def open(self):
+        self.client = pymongo.MongoClient(self.mongodb_uri)
+        self.db = self.client[self.mongo_database]
+        self.db[self.stock_table].create_index([("ticker_symbol", pymongo.ASCENDING)], unique=True)
+        self.db[RUNS_COLLECTION].create_index([("run_id", pymongo.ASCENDING)], unique=True)
+        self.db[RUNS_COLLECTION].create_index([("started_at", pymongo.DESCENDING)])
+        if self.history_mode:
+            self._ensure_history_collection()
+        logger.info("MongoDB backend ready%s", " (time-series history)" if self.history_mode else "")
+
+    def _ensure_history_collection(self):
+        existing = next(iter(self.db.list_collections(filter={"name": self.history_collection})), None)
+        if existing is None:
+            options = {
+                "timeseries": {
+                    "timeField": "scraped_at",
+                    "metaField": "ticker_symbol",
+                    "granularity": self.history_granularity,
+                }
+            }
+            if self.history_ttl_seconds:
+                options["expireAfterSeconds"] = self.history_ttl_seconds
+            self.db.create_collection(self.history_collection, **options)
+        else:
+            if "timeseries" not in existing.get("options", {}):
+                raise ValueError(f"{self.history_collection} exists but is not a time-series collection")
+            current_ttl = existing["options"].get("expireAfterSeconds")
+            if current_ttl != self.history_ttl_seconds:
+                self.db.command("collMod", self.history_collection,
+                                expireAfterSeconds=self.history_ttl_seconds or "off")
+        self.db[self.history_collection].create_index(
+            [("ticker_symbol", pymongo.ASCENDING), ("scraped_at", pymongo.ASCENDING)]
+        )
+        # Secondary index on a measurement field (MongoDB 6.0+).
+        self.db[self.history_collection].create_index([("run_id", pymongo.ASCENDING)])
+
+    def close(self):
+        if self.client:
+            if self._history_buffer:
+                self.flush_history()
+            self.client.close()
+
+    def upsert_stock(self, record):
+        payload = _normalize_record(record)
+        self.db[self.stock_table].replace_one(
+            {"ticker_symbol": payload["ticker_symbol"]},
+            payload,
+            upsert=True,
+        )
+        if self.history_mode:
+            document = {
+                "ticker_symbol": payload["ticker_symbol"],
+                "scraped_at": _as_datetime(payload["scraped_at"]),
+                "stock_name": payload.get("stock_name"),
+                "stock_price": float(payload["stock_price"]),
+                "stock_change": float(payload["stock_change"]) if payload.get("stock_change") is not None else None,
+                "run_id": payload.get("run_id"),
+            }
+            self._history_buffer.append(document)
+            if len(self._history_buffer) >= self.history_batch_size:
+                try:
+                    self.flush_history()
+                except Exception:
+                    # The caller retries (or spools) this record whole; drop its
+                    # document so the retry does not buffer it twice.
+                    self._history_buffer = [doc for doc in self._history_buffer if doc is not document]
+                    raise
+
+    def upsert_run(self, record):
+        """Insert or update one ``scrape_runs`` document (``nse_scraper.runs.ScrapeRun.as_record()``)."""
+        document = dict(record)
+        for field in ("started_at", "finished_at"):
+            if document.get(field) is not None:
+                document[field] = _as_datetime(document[field])
+        self.db[RUNS_COLLECTION].replace_one({"run_id": document["run_id"]}, document, upsert=True)
+
+    def list_runs(self, limit=20, spider=None):
+        """The most recent runs, newest first."""
+        query = {} if spider is None else {"spider": spider}
+        return list(self.db[RUNS_COLLECTION].find(query, {"_id": 0}).sort("started_at", pymongo.DESCENDING)
+                    .limit(limit))
+
+    def get_run_board(self, run_id):
+        """The quotes written by one run (``run_id`` index); empty unless ``history_mode`` is on."""
+        if not self.history_mode:
+            return []
+        self.flush_history()
+        return list(self.db[self.history_collection].find({"run_id": run_id}, {"_id": 0})
+                    .sort("ticker_symbol", pymongo.ASCENDING))
+
+    def get_board_as_of(self, as_of, tickers=None):
+        """Each ticker's newest quote not after ``as_of``; empty unless ``history_mode`` is on.
+
+        One ``find_one`` per ticker, served backwards by the
+        ``(ticker_symbol, scraped_at)`` index.
+        """
+        if not self.history_mode:
+            return []
+        self.flush_history()
+        as_of = _as_datetime(as_of)
+        query = {} if tickers is None else {"ticker_symbol": {"$in": list(tickers)}}
+        board = []
+        for latest in self.db[self.stock_table].find(query, {"_id": 0, "ticker_symbol": 1, "stock_name": 1}) \
+                .sort("ticker_symbol", pymongo.ASCENDING):
+            quote = self.db[self.history_collection].find_one(
+                {"ticker_symbol": latest["ticker_symbol"], "scraped_at": {"$lte": as_of}},
+                {"_id": 0},
+                sort=[("scraped_at", pymongo.DESCENDING)],
+            )
+            if quote is not None:
+                board.append({**quote, "stock_name": latest.get("stock_name")})
+        return board
+
+    def flush_history(self):
+        """Write buffered history documents with one unordered ``insert_many``.
+
+        Documents stay buffered until they are written: a failed insert keeps
+        the whole batch, and a partial one (``BulkWriteError``) keeps only the
+        documents the server reported as failed.
+        """
+        batch = self._history_buffer
+        if not batch:
+            return 0
+        try:
+            self.db[self.history_collection].insert_many(batch, ordered=False)
+        except pymongo.errors.BulkWriteError as exc:
+            failed = {error["index"] for error in exc.details.get("writeErrors", [])}
+            self._history_buffer = [doc for index, doc in enumerate(batch) if index in failed]
+            raise
+        self._history_buffer = []
+        return len(batch)
+
+    def compact_history(self, policy, now=None, dry_run=False, delete_batch_size=1000):
+        """Downsample the history collection per ``policy`` (see ``nse_scraper.retention``).
+
+        Reads one ticker and four weeks at a time and deletes the superseded
+        documents by ``_id`` in batches of ``delete_batch_size``. Deleting
+        from a time-series collection by a non-meta field needs MongoDB 7.0+.
+        Sizes are the BSON size of the removed documents; the storage engine
+        reuses the space rather than returning it to the OS.
+        """
+        import bson
+
+        from ..retention import CompactionReport, compaction_windows, split_points
+
+        report = CompactionReport(backend="mongo", dry_run=dry_run)
+        if not self.history_mode:
+            return report
+        self.flush_history()
+        cutoffs = policy.cutoffs(now)
+        collection = self.db[self.history_collection]
+        oldest = collection.aggregate([
+            {"$match": {"scraped_at": {"$lt": cutoffs.full}}},
+            {"$group": {"_id": "$ticker_symbol", "first": {"$min": "$scraped_at"}}},
+            {"$sort": {"_id": 1}},
+        ])
+        for entry in oldest:
+            ticker = entry["_id"]
+            for lower, upper in compaction_windows(_aware(entry["first"]), cutoffs):
+                documents = list(collection.find(
+                    {"ticker_symbol": ticker, "scraped_at": {"$gte": lower, "$lt": upper}}
+                ))
+                if not documents:
+                    continue
+                _kept, removed = split_points(documents, cutoffs)
+                size = sum(len(bson.encode(document)) for document in removed)
+                try:
+                    if not dry_run:
+                        ids = [document["_id"] for document in removed]
+                        for start in range(0, len(ids), delete_batch_size):
+                            collection.delete_many({"_id": {"$in": ids[start:start + delete_batch_size]}})
+                except Exception:
+                    logger.exception("Compaction of %s [%s, %s) failed", ticker, lower, upper)
+                    report.errors += 1
+                    continue
+                report.add(self.history_collection, len(documents), len(removed), size)
+        return report
+
+    def get_latest_by_ticker(self, ticker_symbol):
+        return self.db[self.stock_table].find_one(
+            {"ticker_symbol": ticker_symbol},
+            sort=[("created_at", -1)],
+        )
+
+    def get_history(self, ticker_symbol, start=None, end=None):
+        """Quotes for one ticker in ``[start, end)``, oldest first."""
+        query = {"ticker_symbol": ticker_symbol}
+        query.update(_time_filter(start, end))
+        return list(self.db[self.history_collection].find(query, {"_id": 0}).sort("scraped_at", pymongo.ASCENDING))
+
+    def iter_stocks(self, page_size=DEFAULT_PAGE_SIZE):
+        """Every latest-quote document, ordered by ticker, ``page_size`` per query."""
+        collection = self.db[self.stock_table]
+        after = None
+        while True:
+            query = {} if after is None else {"ticker_symbol": {"$gt": after}}
+            page = list(collection.find(query, {"_id": 0}).sort("ticker_symbol", pymongo.ASCENDING).limit(page_size))
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]["ticker_symbol"]
+
+    def iter_history(self, tickers=None, since=None, until=None, page_size=DEFAULT_PAGE_SIZE):
+        """History documents ordered by ticker and then ``scraped_at``, in constant memory.
+
+        Keyset pages on the ``(ticker_symbol, scraped_at)`` index; empty unless
+        ``history_mode`` is on.
+        """
+        if not self.history_mode:
+            return
+        self.flush_history()
+        collection = self.db[self.history_collection]
+        base = _time_filter(since, until)
+        if tickers is not None:
+            base["ticker_symbol"] = {"$in": list(tickers)}
+        after = None
+        while True:
+            query = dict(base)
+            if after is not None:
+                ticker, scraped_at = after
+                query = {"$and": [base, {"$or": [
+                    {"ticker_symbol": ticker, "scraped_at": {"$gt": scraped_at}},
+                    {"ticker_symbol": {"$gt": ticker}},
+                ]}]}
+            page = list(
+                collection.find(query, {"_id": 0})
+                .sort([("ticker_symbol", pymongo.ASCENDING), ("scraped_at", pymongo.ASCENDING)])
+                .limit(page_size)
+            )
+            yield from page
+            if len(page) < page_size:
+                return
+            after = (page[-1]["ticker_symbol"], page[-1]["scraped_at"])
+
+    def get_history_windows(self, ticker_symbols, window=5, start=None, end=None):
+        """Moving averages and returns computed server-side; see ``history_window_pipeline``."""
+        if isinstance(ticker_symbols, str):
+            ticker_symbols = [ticker_symbols]
+        pipeline = history_window_pipeline(ticker_symbols, window=window, start=start, end=end)
+        return list(self.db[self.history_collection].aggregate(pipeline))
@@ -0,0 +1,236 @@
+"""
+Monthly range partitions for ``stock_price_history`` (PostgreSQL).
+
+The history table is ``PARTITION BY RANGE (scraped_at)`` with one partition
+per calendar month (UTC), named ``<table>_pYYYY_MM``, plus a
+``<table>_default`` partition that catches anything outside the managed
+range. Writes route to the month's partition and queries that bound
+``scraped_at`` only touch the matching partitions.
+
+Maintenance (run daily from cron/systemd, or after a backfill):
+
+    python -m nse_scraper.db.partitions maintain                       # pre-create upcoming months
+    python -m nse_scraper.db.partitions maintain --retain-months 24    # detach older months
+    python -m nse_scraper.db.partitions maintain --retain-months 24 --drop
+    python -m nse_scraper.db.partitions list
+
+Detached partitions stay as ordinary tables (archive or drop them later);
+``--drop`` removes them outright. Either is a metadata-only operation, so
+expiring a month never runs a ``DELETE`` over the history.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from .models import StockPriceHistory
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = StockPriceHistory.__tablename__
+DEFAULT_MONTHS_AHEAD = 3
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+@dataclass
+class Partition:
+    name: str
+    month: date
+    rows: int = None
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(start, end):
+    """First days of every month from ``start``'s month to ``end``'s month, inclusive."""
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month, table=HISTORY_TABLE):
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def default_partition_name(table=HISTORY_TABLE):
+    return f"{table}_default"
+
+
+def _bound(month):
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+def _instant(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def is_partitioned(conn, table=HISTORY_TABLE):
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+             "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"),
+        {"table": table},
+    ).scalar())
+
+
+def list_partitions(conn, table=HISTORY_TABLE, with_rows=False):
+    """Monthly partitions currently attached to ``table``, oldest first."""
+    names = conn.execute(
+        text("SELECT c.relname FROM pg_inherits i "
+             "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+             "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"),
+        {"table": table},
+    ).scalars()
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.search(name)
+        if not match:
+            continue
+        rows = None
+        if with_rows:
+            rows = conn.execute(text(f'SELECT count(*) FROM "{name}"')).scalar()
+        partitions.append(Partition(name, date(int(match.group(1)), int(match.group(2)), 1), rows))
+    return sorted(partitions, key=lambda p: p.month)
+
+
+def _ensure_default_partition(conn, table):
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{default_partition_name(table)}" PARTITION OF "{table}" DEFAULT'
+    ))
+
+
+def create_partition(conn, month, table=HISTORY_TABLE):
+    """Create the partition for ``month``; rows already in the default partition are moved into it."""
+    name = partition_name(month, table)
+    default = default_partition_name(table)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    params = {"lower": _instant(month), "upper": _instant(add_months(month, 1))}
+    stranded = conn.execute(
+        text(f'SELECT count(*) FROM "{default}" WHERE scraped_at >= :lower AND scraped_at < :upper'),
+        params,
+    ).scalar()
+    if stranded:
+        # Postgres refuses to add a partition whose range has rows in the default
+        # partition, so detach it, move those rows and re-attach.
+        conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+        conn.execute(text(
+            f"CREATE TABLE \"{name}\" PARTITION OF \"{table}\" FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        ))
+        conn.execute(text(
+            f'WITH moved AS (DELETE FROM "{default}" WHERE scraped_at >= :lower AND scraped_at < :upper '
+            f'RETURNING *) INSERT INTO "{table}" SELECT * FROM moved'
+        ), params)
+        conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+        logger.info("Created partition %s (moved %s rows from %s)", name, stranded, default)
+    else:
+        conn.execute(text(
+            f"CREATE TABLE \"{name}\" PARTITION OF \"{table}\" FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        ))
+        logger.info("Created partition %s", name)
+    return name
+
+
+def ensure_partitions(conn, start, end, table=HISTORY_TABLE):
+    """Make sure monthly partitions exist for every month from ``start`` to ``end``.
+
+    Returns the names of partitions that were created. A no-op (empty list)
+    when ``table`` is not partitioned.
+    """
+    if not is_partitioned(conn, table):
+        return []
+    # Serialise concurrent spiders/maintenance runs creating the same month.
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table))"), {"table": table})
+    _ensure_default_partition(conn, table)
+    existing = {p.month for p in list_partitions(conn, table)}
+    return [create_partition(conn, month, table) for month in months_between(start, end) if month not in existing]
+
+
+def ensure_upcoming_partitions(conn, months_ahead=DEFAULT_MONTHS_AHEAD, today=None, table=HISTORY_TABLE):
+    today = today or datetime.now(timezone.utc).date()
+    return ensure_partitions(conn, today, add_months(month_start(today), months_ahead), table)
+
+
+def expire_partitions(conn, retain_months, today=None, drop=False, table=HISTORY_TABLE):
+    """Detach (or drop) partitions whose whole month is older than ``retain_months`` months.
+
+    The current month counts as the first retained month.
+    """
+    if retain_months < 1:
+        raise ValueError("retain_months must be >= 1")
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = add_months(month_start(today), -(retain_months - 1))
+    expired = []
+    for partition in list_partitions(conn, table):
+        if partition.month >= cutoff:
+            continue
+        conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{partition.name}"'))
+        if drop:
+            conn.execute(text(f'DROP TABLE "{partition.name}"'))
+        logger.info("%s partition %s", "Dropped" if drop else "Detached", partition.name)
+        expired.append(partition.name)
+    return expired
+
+
+def maintain(engine, months_ahead=DEFAULT_MONTHS_AHEAD, retain_months=None, drop=False, today=None):
+    """Pre-create upcoming partitions and expire old ones; returns what changed."""
+    with engine.begin() as conn:
+        created = ensure_upcoming_partitions(conn, months_ahead=months_ahead, today=today)
+        expired = expire_partitions(conn, retain_months, today=today, drop=drop) if retain_months else []
+    return {"created": created, "expired": expired}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.db.partitions", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL (default: SQL_DATABASE_URL)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("maintain", help="Create upcoming partitions and expire old ones")
+    run.add_argument("--months-ahead", type=int,
+                     default=int(os.getenv("HISTORY_PARTITION_MONTHS_AHEAD") or DEFAULT_MONTHS_AHEAD))
+    run.add_argument("--retain-months", type=int, default=int(os.getenv("HISTORY_RETENTION_MONTHS") or 0),
+                     help="Expire partitions older than this many months (0 keeps everything)")
+    run.add_argument("--drop", action="store_true", help="Drop expired partitions instead of detaching them")
+    sub.add_parser("list", help="Show monthly partitions and their row counts")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+
+    url = args.url or os.getenv("SQL_DATABASE_URL")
+    if not url:
+        parser.error("--url or SQL_DATABASE_URL is required")
+    engine = create_engine(url, future=True)
+    try:
+        if args.command == "list":
+            with engine.connect() as conn:
+                if not is_partitioned(conn):
+                    print(f"{HISTORY_TABLE} is not partitioned; run 'alembic upgrade head'")
+                    return 1
+                for partition in list_partitions(conn, with_rows=True):
+                    print(f"{partition.name:<36} {partition.month:%Y-%m} {partition.rows:>10} rows")
+            return 0
+        result = maintain(engine, months_ahead=args.months_ahead, retain_months=args.retain_months or None,
+                          drop=args.drop)
+    finally:
+        engine.dispose()
+    print(f"created {len(result['created'])} partitions, "
+          f"{'dropped' if args.drop else 'detached'} {len(result['expired'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""PostgreSQL storage backend on SQLAlchemy asyncio + asyncpg (``DB_BACKEND=postgres_async``).
+
+All methods are coroutines and run on the asyncio loop behind Scrapy's
+``AsyncioSelectorReactor``, so storage never blocks the reactor or needs a
+thread. Concurrent ``upsert_stock`` calls are coalesced into batches that are
+written with asyncpg ``executemany``: one prepared statement, rows pipelined
+over a single round trip, one transaction per batch.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from .backends import _normalize_record
+from .aggregates import ohlc_upsert_sql, summary_refresh_sql
+from .models import Base, StockData, StockPriceHistory, StockSummary
+from .partitions import ensure_upcoming_partitions
+from .postgres_backend import BOARD_AS_OF, board_params, run_upsert
+
+logger = logging.getLogger(__name__)
+
+# Latest quote, history row and daily aggregate in one statement, so each
+# record is a single pipelined execution of the prepared statement.
+_UPSERT_STOCK = f"""
+WITH latest AS (
+    INSERT INTO {StockData.__tablename__} (ticker_symbol, stock_name, stock_price, stock_change, created_at)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (ticker_symbol) DO UPDATE SET
+        stock_name = EXCLUDED.stock_name,
+        stock_price = EXCLUDED.stock_price,
+        stock_change = EXCLUDED.stock_change,
+        created_at = EXCLUDED.created_at
+), new_ticks AS (
+    INSERT INTO {StockPriceHistory.__tablename__} (ticker_symbol, scraped_at, stock_price, stock_change, run_id)
+    VALUES ($1, $6, $3, $4, $7)
+    ON CONFLICT (ticker_symbol, scraped_at) DO NOTHING
+    RETURNING *
+)
+{ohlc_upsert_sql("new_ticks")}
+"""
+
+# Summaries are refreshed once per batch for the tickers it touched.
+_REFRESH_SUMMARY = summary_refresh_sql("= ANY($1::varchar[])")
+
+_SELECT_LATEST = f"""
+SELECT ticker_symbol, stock_name, stock_price, stock_change, created_at
+FROM {StockData.__tablename__}
+WHERE ticker_symbol = ANY(:tickers)
+"""
+
+
+def async_database_url(url):
+    """Return ``url`` with its driver switched to asyncpg.
+
+    ``SQL_DATABASE_URL`` is shared with the synchronous backend and Alembic,
+    so it is usually a ``postgresql+psycopg2://`` URL.
+    """
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value
+
+
+def _row(record):
+    payload = _normalize_record(record)
+    change = payload.get("stock_change")
+    return (
+        payload["ticker_symbol"],
+        payload["stock_name"],
+        float(payload["stock_price"]),
+        float(change) if change is not None else None,
+        _timestamp(payload["created_at"]),
+        _timestamp(payload["scraped_at"]),
+        payload.get("run_id"),
+    )
+
+
+class AsyncPostgresBackend:
+    is_async = True
+
+    def __init__(self, sql_database_url, stock_table="stock_data", sql_echo=False,
+                 batch_size=200, linger_ms=5, pool_size=5):
+        if not sql_database_url:
+            raise ValueError("SQL_DATABASE_URL is required when DB_BACKEND=postgres_async")
+        self.sql_database_url = async_database_url(sql_database_url)
+        self.stock_table = stock_table
+        self.sql_echo = sql_echo
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000.0
+        self.pool_size = pool_size
+        self.engine = None
+        self._pending = []
+        self._flush_handle = None
+        self._inflight = set()
+
+    async def open(self):
+        self.engine = create_async_engine(self.sql_database_url, echo=self.sql_echo, pool_size=self.pool_size)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(ensure_upcoming_partitions)
+        logger.info("PostgreSQL (asyncpg) backend ready")
+
+    async def close(self):
+        await self.flush()
+        if self.engine:
+            await self.engine.dispose()
+
+    async def upsert_stock(self, record):
+        """Queue one record for the next batch and wait until it is committed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((_row(record), future))
+        if len(self._pending) >= self.batch_size:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.linger, self._start_flush)
+        await future
+
+    async def upsert_stocks(self, records):
+        """Write ``records`` in one transaction; returns the number of rows sent."""
+        rows = [_row(record) for record in records]
+        await self._write(rows)
+        return len(rows)
+
+    async def flush(self):
+        """Write anything still queued and wait for in-flight batches."""
+        if self._pending:
+            self._start_flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def _start_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._write_batch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _write_batch(self, batch):
+        try:
+            await self._write([row for row, _future in batch])
+        except Exception as exc:
+            logger.error("Batch upsert of %s rows failed: %s", len(batch), exc)
+            for _row_values, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for _row_values, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _write(self, rows):
+        if not rows:
+            return
+        async with self.engine.begin() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            await driver.executemany(_UPSERT_STOCK, rows)
+            await driver.execute(_REFRESH_SUMMARY, sorted({row[0] for row in rows}))
+
+    async def upsert_run(self, record):
+        """Insert or update one ``scrape_runs`` row (see ``nse_scraper.runs``)."""
+        async with self.engine.begin() as conn:
+            await conn.execute(run_upsert(record))
+
+    async def get_board_as_of(self, as_of, tickers=None):
+        """Each ticker's newest quote not after ``as_of`` (see ``PostgresBackend.get_board_as_of``)."""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(BOARD_AS_OF, board_params(as_of, tickers))
+            return [dict(row) for row in result.mappings()]
+
+    async def get_latest_for_tickers(self, ticker_symbols):
+        """Return ``{ticker_symbol: record}`` for every requested ticker that exists."""
+        tickers = list(ticker_symbols)
+        if not tickers:
+            return {}
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(_SELECT_LATEST), {"tickers": tickers})
+            return {row.ticker_symbol: dict(row._mapping) for row in result}
+
+    async def get_latest_by_ticker(self, ticker_symbol):
+        return (await self.get_latest_for_tickers([ticker_symbol])).get(ticker_symbol)
+
+    async def get_summaries(self, ticker_symbols):
+        """Return ``{ticker_symbol: summary}`` from ``stock_summary`` (see ``db.aggregates``)."""
+        tickers = list(ticker_symbols)
+        if not tickers:
+            return {}
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text(f"SELECT * FROM {StockSummary.__tablename__} WHERE ticker_symbol = ANY(:tickers)"),
+                {"tickers": tickers},
+            )
+            return {row.ticker_symbol: dict(row._mapping) for row in result}
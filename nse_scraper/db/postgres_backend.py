@@ -0,0 +1,342 @@
+"""PostgreSQL storage backend (SQLAlchemy)."""
+
+import logging
+
+from sqlalchemy import create_engine, desc, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import sessionmaker
+
+from ..serialization import parse_timestamp
+from .backends import DEFAULT_PAGE_SIZE, _normalize_record
+from .aggregates import NSE_TIMEZONE, ohlc_upsert_sql, refresh_summaries
+from .models import Base, ScrapeRunRecord, StockData, StockDailyOhlc, StockPriceHistory, StockSummary
+from .partitions import ensure_upcoming_partitions
+
+logger = logging.getLogger(__name__)
+
+# Append the tick to history and fold it into the daily aggregate only if it
+# was new, so replaying a record never double counts.
+_INSERT_TICK = text(f"""
+WITH new_ticks AS (
+    INSERT INTO {StockPriceHistory.__tablename__} (ticker_symbol, scraped_at, stock_price, stock_change, run_id)
+    VALUES (:ticker_symbol, :scraped_at, :stock_price, :stock_change, :run_id)
+    ON CONFLICT (ticker_symbol, scraped_at) DO NOTHING
+    RETURNING *
+)
+{ohlc_upsert_sql("new_ticks")}
+RETURNING ticker_symbol
+""")
+
+# The board at :as_of: per ticker, one backward probe of the (ticker_symbol,
+# scraped_at) primary key for the newest quote not after it. Partitions newer
+# than :as_of are pruned.
+BOARD_AS_OF = text(f"""
+SELECT d.ticker_symbol, d.stock_name, h.stock_price, h.stock_change, h.scraped_at, h.run_id
+FROM {StockData.__tablename__} d
+CROSS JOIN LATERAL (
+    SELECT stock_price, stock_change, scraped_at, run_id
+    FROM {StockPriceHistory.__tablename__}
+    WHERE ticker_symbol = d.ticker_symbol AND scraped_at <= :as_of
+    ORDER BY scraped_at DESC
+    LIMIT 1
+) h
+WHERE :all_tickers OR d.ticker_symbol = ANY(:tickers)
+ORDER BY d.ticker_symbol
+""")
+
+
+def _compaction_sql(drop_expired, dry_run):
+    """Statement downsampling one ticker's history in ``[:lower, :upper)``.
+
+    Rows are ranked newest first within their day (before ``:daily``) or ISO
+    week bucket; everything but the first of each bucket goes, plus rows
+    older than ``:drop_before`` when ``drop_expired``. Returns the rows
+    scanned, rows removed and their on-disk tuple size.
+    """
+    local = f"(scraped_at AT TIME ZONE '{NSE_TIMEZONE}')"
+    condition = "scope.rn > 1" + (" OR h.scraped_at < :drop_before" if drop_expired else "")
+    match = "h.ticker_symbol = scope.ticker_symbol AND h.scraped_at = scope.scraped_at"
+    if dry_run:
+        removed = f"SELECT pg_column_size(h.*) AS size FROM {StockPriceHistory.__tablename__} h " \
+                  f"JOIN scope ON {match} WHERE {condition}"
+    else:
+        removed = f"DELETE FROM {StockPriceHistory.__tablename__} h USING scope " \
+                  f"WHERE {match} AND ({condition}) RETURNING pg_column_size(h.*) AS size"
+    return text(f"""
+WITH scope AS (
+    SELECT ticker_symbol, scraped_at, row_number() OVER (
+        PARTITION BY CASE WHEN scraped_at >= :daily THEN {local}::date
+                          ELSE date_trunc('week', {local})::date END
+        ORDER BY scraped_at DESC
+    ) AS rn
+    FROM {StockPriceHistory.__tablename__}
+    WHERE ticker_symbol = :ticker AND scraped_at >= :lower AND scraped_at < :upper
+),
+removed AS ({removed})
+SELECT (SELECT count(*) FROM scope), count(*), coalesce(sum(size), 0) FROM removed
+""")
+
+
+def run_upsert(record):
+    """``INSERT ... ON CONFLICT (run_id) DO UPDATE`` for one ``ScrapeRun.as_record()``."""
+    stmt = pg_insert(ScrapeRunRecord).values(
+        run_id=record["run_id"],
+        spider=record["spider"],
+        started_at=parse_timestamp(record["started_at"]),
+        finished_at=parse_timestamp(record.get("finished_at")),
+        status=record["status"],
+        rows=int(record.get("rows") or 0),
+    )
+    update_values = {key: stmt.excluded[key] for key in ("finished_at", "status", "rows")}
+    return stmt.on_conflict_do_update(index_elements=["run_id"], set_=update_values)
+
+
+def board_params(as_of, tickers=None):
+    return {"as_of": parse_timestamp(as_of), "all_tickers": tickers is None, "tickers": list(tickers or [])}
+
+
+class PostgresBackend:
+    def __init__(self, sql_database_url, stock_table="stock_data", sql_echo=False):
+        if not sql_database_url:
+            raise ValueError("SQL_DATABASE_URL is required when DB_BACKEND=postgres")
+        self.sql_database_url = sql_database_url
+        self.stock_table = stock_table
+        self.sql_echo = sql_echo
+        self.engine = None
+        self.Session = None
+        # Tickers whose stock_summary row is behind stock_daily_ohlc; refreshed
+        # in one statement by flush() rather than once per tick.
+        self._stale_summaries = set()
+
+    def open(self):
+        self.engine = create_engine(self.sql_database_url, echo=self.sql_echo, future=True)
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            ensure_upcoming_partitions(conn)
+        self.Session = sessionmaker(bind=self.engine, future=True)
+        logger.info("PostgreSQL backend ready")
+
+    def close(self):
+        if self.engine:
+            self.flush()
+            self.engine.dispose()
+
+    def flush(self):
+        """Refresh the summaries of every ticker written since the last flush."""
+        tickers, self._stale_summaries = self._stale_summaries, set()
+        if tickers:
+            with self.engine.begin() as conn:
+                refresh_summaries(conn, tickers)
+
+    def upsert_stock(self, record):
+        payload = _normalize_record(record)
+        stock_price = float(payload["stock_price"])
+        stock_change = float(payload["stock_change"]) if payload.get("stock_change") is not None else None
+        with self.engine.begin() as conn:
+            stmt = pg_insert(StockData).values(
+                ticker_symbol=payload["ticker_symbol"],
+                stock_name=payload["stock_name"],
+                stock_price=stock_price,
+                stock_change=stock_change,
+                created_at=payload["created_at"],
+            )
+            update_values = {
+                "stock_name": stmt.excluded.stock_name,
+                "stock_price": stmt.excluded.stock_price,
+                "stock_change": stmt.excluded.stock_change,
+                "created_at": stmt.excluded.created_at,
+            }
+            conn.execute(stmt.on_conflict_do_update(index_elements=["ticker_symbol"], set_=update_values))
+            inserted = conn.execute(_INSERT_TICK, {
+                "ticker_symbol": payload["ticker_symbol"],
+                "scraped_at": payload["scraped_at"],
+                "stock_price": stock_price,
+                "stock_change": stock_change,
+                "run_id": payload.get("run_id"),
+            }).first()
+        if inserted is not None:
+            self._stale_summaries.add(payload["ticker_symbol"])
+
+    def upsert_run(self, record):
+        """Insert or update one ``scrape_runs`` row (``nse_scraper.runs.ScrapeRun.as_record()``)."""
+        with self.engine.begin() as conn:
+            conn.execute(run_upsert(record))
+
+    def list_runs(self, limit=20, spider=None):
+        """The most recent runs, newest first."""
+        query = select(ScrapeRunRecord).order_by(desc(ScrapeRunRecord.started_at)).limit(limit)
+        if spider is not None:
+            query = query.where(ScrapeRunRecord.spider == spider)
+        with self.Session() as session:
+            return [_row_dict(row) for row in session.scalars(query)]
+
+    def get_run_board(self, run_id):
+        """The quotes written by one run (``ix_stock_price_history_run_id``), by ticker."""
+        h = StockPriceHistory
+        query = (select(h.ticker_symbol, StockData.stock_name, h.stock_price, h.stock_change, h.scraped_at, h.run_id)
+                 .join(StockData, StockData.ticker_symbol == h.ticker_symbol, isouter=True)
+                 .where(h.run_id == run_id)
+                 .order_by(h.ticker_symbol))
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def get_board_as_of(self, as_of, tickers=None):
+        """The board as it stood at ``as_of``: each ticker's newest quote not after it.
+
+        Tickers first quoted after ``as_of`` are left out. Each quote keeps its
+        ``scraped_at`` and ``run_id``, so stale quotes are easy to spot.
+        """
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(BOARD_AS_OF, board_params(as_of, tickers)).mappings()]
+
+    def bulk_load(self, records, batch_size=None):
+        """Load many records via COPY + one set-based merge per batch.
+
+        Returns counts of staged rows, new history rows and updated
+        ``stock_data`` rows. See ``nse_scraper.db.postgres_bulk``.
+        """
+        from .postgres_bulk import DEFAULT_BATCH_SIZE, bulk_load
+
+        return bulk_load(self.engine, records, batch_size=batch_size or DEFAULT_BATCH_SIZE)
+
+    def get_latest_by_ticker(self, ticker_symbol):
+        with self.Session() as session:
+            record = (
+                session.query(StockData)
+                .filter(StockData.ticker_symbol == ticker_symbol)
+                .order_by(desc(StockData.created_at))
+                .first()
+            )
+            if record is None:
+                return None
+            return {
+                "ticker_symbol": record.ticker_symbol,
+                "stock_name": record.stock_name,
+                "stock_price": record.stock_price,
+                "stock_change": record.stock_change,
+                "created_at": record.created_at,
+            }
+
+    def get_history(self, ticker_symbol, start=None, end=None):
+        """Quotes for one ticker in ``[start, end)``, oldest first.
+
+        Bounding ``scraped_at`` lets Postgres prune to the matching monthly
+        partitions instead of scanning the whole history.
+        """
+        query = select(StockPriceHistory).where(StockPriceHistory.ticker_symbol == ticker_symbol)
+        if start is not None:
+            query = query.where(StockPriceHistory.scraped_at >= start)
+        if end is not None:
+            query = query.where(StockPriceHistory.scraped_at < end)
+        with self.Session() as session:
+            return [
+                {
+                    "ticker_symbol": row.ticker_symbol,
+                    "scraped_at": row.scraped_at,
+                    "stock_price": row.stock_price,
+                    "stock_change": row.stock_change,
+                }
+                for row in session.scalars(query.order_by(StockPriceHistory.scraped_at))
+            ]
+
+    def compact_history(self, policy, now=None, dry_run=False):
+        """Downsample ``stock_price_history`` per ``policy`` (see ``nse_scraper.retention``).
+
+        Works one ticker and four weeks at a time, each in its own short
+        transaction, so only the rows being compacted are ever locked. The
+        daily OHLC and summary tables are left alone: they were built from the
+        full-resolution ticks and stay exact.
+        """
+        from ..retention import CompactionReport, compaction_windows
+
+        cutoffs = policy.cutoffs(now)
+        report = CompactionReport(backend="postgres", dry_run=dry_run)
+        statement = _compaction_sql(cutoffs.drop is not None, dry_run)
+        table = StockPriceHistory.__tablename__
+        with self.engine.connect() as conn:
+            oldest = conn.execute(
+                text(f"SELECT ticker_symbol, min(scraped_at) FROM {table} "
+                     f"WHERE scraped_at < :full GROUP BY ticker_symbol ORDER BY ticker_symbol"),
+                {"full": cutoffs.full},
+            ).all()
+        for ticker, first in oldest:
+            for lower, upper in compaction_windows(first, cutoffs):
+                params = {"ticker": ticker, "lower": lower, "upper": upper, "daily": cutoffs.daily,
+                          "drop_before": cutoffs.drop}
+                try:
+                    with self.engine.begin() as conn:
+                        scanned, removed, size = conn.execute(statement, params).one()
+                except Exception:
+                    logger.exception("Compaction of %s [%s, %s) failed", ticker, lower, upper)
+                    report.errors += 1
+                    continue
+                if scanned:
+                    report.add(table, scanned, removed, int(size))
+        logger.info("Compacted %s: %s of %s rows %s", table, report.rows_removed, report.rows_scanned,
+                    "would be removed" if dry_run else "removed")
+        return report
+
+    def iter_stocks(self, page_size=DEFAULT_PAGE_SIZE):
+        """Every ``stock_data`` row, ordered by ticker, ``page_size`` rows per query."""
+        query = select(StockData).order_by(StockData.ticker_symbol).limit(page_size)
+        after = None
+        while True:
+            page = query if after is None else query.where(StockData.ticker_symbol > after)
+            with self.Session() as session:
+                rows = [_row_dict(row) for row in session.scalars(page)]
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1]["ticker_symbol"]
+
+    def iter_history(self, tickers=None, since=None, until=None, page_size=DEFAULT_PAGE_SIZE):
+        """History rows ordered by ticker and then ``scraped_at``, in constant memory.
+
+        Pages are fetched by keyset (``(ticker_symbol, scraped_at) > last
+        seen``, served by the primary key) so each query is short and an export
+        never holds a snapshot open for its whole run; within a page rows are
+        streamed from a server-side cursor. ``since``/``until`` bound
+        ``scraped_at`` to ``[since, until)`` and prune partitions.
+        """
+        h = StockPriceHistory
+        query = select(h.ticker_symbol, h.scraped_at, h.stock_price, h.stock_change)
+        if tickers is not None:
+            query = query.where(h.ticker_symbol.in_(list(tickers)))
+        if since is not None:
+            query = query.where(h.scraped_at >= since)
+        if until is not None:
+            query = query.where(h.scraped_at < until)
+        query = query.order_by(h.ticker_symbol, h.scraped_at).limit(page_size)
+        after = None
+        while True:
+            page = query if after is None else query.where(tuple_(h.ticker_symbol, h.scraped_at) > after)
+            count = 0
+            with self.engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=min(page_size, 1000)).execute(page)
+                for row in result.mappings():
+                    count += 1
+                    after = (row["ticker_symbol"], row["scraped_at"])
+                    yield dict(row)
+            if count < page_size:
+                return
+
+    def get_daily_ohlc(self, ticker_symbol, start=None, end=None):
+        """Daily open/high/low/close rows for ``[start, end)`` trade dates, oldest first."""
+        query = select(StockDailyOhlc).where(StockDailyOhlc.ticker_symbol == ticker_symbol)
+        if start is not None:
+            query = query.where(StockDailyOhlc.trade_date >= start)
+        if end is not None:
+            query = query.where(StockDailyOhlc.trade_date < end)
+        with self.Session() as session:
+            return [_row_dict(row) for row in session.scalars(query.order_by(StockDailyOhlc.trade_date))]
+
+    def get_summary(self, ticker_symbol):
+        """Latest quote, 1d/1w/1m/YTD change and 52-week range, or None."""
+        self.flush()
+        with self.Session() as session:
+            row = session.get(StockSummary, ticker_symbol)
+            return _row_dict(row) if row is not None else None
+
+
+def _row_dict(row):
+    return {column.name: getattr(row, column.name) for column in row.__table__.columns}
@@ -0,0 +1,280 @@
+"""
+COPY-based bulk loader for PostgreSQL.
+
+Records are streamed into a temporary staging table with ``COPY ... FROM
+STDIN`` (CSV generated lazily from an iterator, so memory stays flat for any
+input size) and merged into ``stock_price_history``, ``stock_data`` and the
+daily aggregates by one set-based statement per batch:
+
+- every staged row becomes a history row (duplicates of an existing
+  ``(ticker_symbol, scraped_at)`` are ignored),
+- the newest staged row per ticker replaces ``stock_data`` unless the stored
+  row is already newer, and
+- newly inserted history rows are folded into ``stock_daily_ohlc``; the
+  batch's tickers get their ``stock_summary`` rows refreshed.
+
+Replay spooled writes or JSONL backfills with:
+
+    python -m nse_scraper.db.postgres_bulk load reports/local_fallback/supabase.upsert_stock.jsonl
+"""
+import argparse
+import csv
+import io
+import itertools
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from ..serialization import JSONDecodeError, loads
+from .backends import _normalize_record
+from .aggregates import ohlc_upsert_sql, summary_refresh_sql
+from .models import StockData, StockPriceHistory
+from .partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50000
+
+STAGING_COLUMNS = ("ticker_symbol", "stock_name", "stock_price", "stock_change", "created_at", "scraped_at",
+                   "run_id")
+
+# Unquoted marker for NULL in the CSV stream; empty strings stay empty strings.
+_NULL = "\\N"
+
+_CREATE_STAGING = """
+CREATE TEMP TABLE stock_bulk_staging (
+    ticker_symbol varchar(20) NOT NULL,
+    stock_name varchar(255) NOT NULL,
+    stock_price double precision NOT NULL,
+    stock_change double precision,
+    created_at timestamptz NOT NULL,
+    scraped_at timestamptz NOT NULL,
+    run_id varchar(40)
+) ON COMMIT DROP
+"""
+
+_COPY_STAGING = (
+    f"COPY stock_bulk_staging ({', '.join(STAGING_COLUMNS)}) "
+    f"FROM STDIN WITH (FORMAT csv, NULL '{_NULL}')"
+)
+
+_MERGE = f"""
+WITH history AS (
+    INSERT INTO {StockPriceHistory.__tablename__} (ticker_symbol, scraped_at, stock_price, stock_change, run_id)
+    SELECT DISTINCT ON (ticker_symbol, scraped_at) ticker_symbol, scraped_at, stock_price, stock_change, run_id
+    FROM stock_bulk_staging
+    ORDER BY ticker_symbol, scraped_at
+    ON CONFLICT (ticker_symbol, scraped_at) DO NOTHING
+    RETURNING *
+), daily AS (
+    {ohlc_upsert_sql("history")}
+    RETURNING 1
+), latest AS (
+    INSERT INTO {StockData.__tablename__} AS existing (ticker_symbol, stock_name, stock_price, stock_change, created_at)
+    SELECT DISTINCT ON (ticker_symbol) ticker_symbol, stock_name, stock_price, stock_change, created_at
+    FROM stock_bulk_staging
+    ORDER BY ticker_symbol, scraped_at DESC, created_at DESC
+    ON CONFLICT (ticker_symbol) DO UPDATE SET
+        stock_name = EXCLUDED.stock_name,
+        stock_price = EXCLUDED.stock_price,
+        stock_change = EXCLUDED.stock_change,
+        created_at = EXCLUDED.created_at
+    WHERE existing.created_at <= EXCLUDED.created_at
+    RETURNING 1
+)
+SELECT (SELECT count(*) FROM history), (SELECT count(*) FROM latest), (SELECT count(*) FROM daily)
+"""
+
+_REFRESH_SUMMARIES = summary_refresh_sql("IN (SELECT DISTINCT ticker_symbol FROM stock_bulk_staging)")
+
+
+def _csv_value(value):
+    if value is None:
+        return _NULL
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def staging_rows(records):
+    """Yield one staging tuple per record, in ``STAGING_COLUMNS`` order."""
+    for record in records:
+        payload = _normalize_record(record)
+        change = payload.get("stock_change")
+        yield (
+            payload["ticker_symbol"],
+            payload["stock_name"],
+            float(payload["stock_price"]),
+            float(change) if change is not None else None,
+            payload["created_at"],
+            payload["scraped_at"],
+            payload.get("run_id"),
+        )
+
+
+def expand_price_history(records):
+    """Yield each record plus one record per entry of its ``price_history`` list.
+
+    Supabase exports carry the ticker's whole JSONB history; replaying
+    them this way restores the history rows as well as the latest quote.
+    """
+    for record in records:
+        history = record.get("price_history") or []
+        for entry in history if isinstance(history, list) else []:
+            if not isinstance(entry, dict) or entry.get("stock_price") is None or not entry.get("scraped_at"):
+                continue
+            yield {
+                "ticker_symbol": record["ticker_symbol"],
+                "stock_name": record["stock_name"],
+                "stock_price": entry["stock_price"],
+                "stock_change": entry.get("stock_change"),
+                "created_at": entry["scraped_at"],
+                "scraped_at": entry["scraped_at"],
+                "run_id": entry.get("run_id"),
+            }
+        yield {key: value for key, value in record.items() if key != "price_history"}
+
+
+class CsvCopyStream(io.RawIOBase):
+    """Read-only file object that renders rows to CSV on demand for COPY."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = b""
+        self.rows_written = 0
+
+    def readable(self):
+        return True
+
+    def _fill(self, size):
+        while len(self._pending) < size:
+            chunk = list(itertools.islice(self._rows, 500))
+            if not chunk:
+                break
+            self._writer.writerows([_csv_value(v) for v in row] for row in chunk)
+            self.rows_written += len(chunk)
+            self._pending += self._buffer.getvalue().encode("utf-8")
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            self._fill(float("inf"))
+            data, self._pending = self._pending, b""
+            return data
+        self._fill(size)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _copy(cursor, stream, driver):
+    if driver == "psycopg2":
+        cursor.copy_expert(_COPY_STAGING, stream)
+        return
+    # psycopg 3
+    with cursor.copy(_COPY_STAGING) as copy:
+        while True:
+            data = stream.read(65536)
+            if not data:
+                break
+            copy.write(data)
+
+
+def load_batch(engine, records):
+    """COPY one batch into staging and merge it; returns a counts dict."""
+    stream = CsvCopyStream(staging_rows(records))
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(_CREATE_STAGING)
+            _copy(cursor, stream, conn.dialect.driver)
+            cursor.execute("SELECT min(scraped_at), max(scraped_at) FROM stock_bulk_staging")
+            oldest, newest = cursor.fetchone()
+            if oldest is not None:
+                # Backfills reach back before the pre-created months; give them
+                # real partitions rather than filling the default one.
+                ensure_partitions(conn, oldest.astimezone(timezone.utc), newest.astimezone(timezone.utc))
+            cursor.execute(_MERGE)
+            history_rows, latest_rows, daily_rows = cursor.fetchone()
+            cursor.execute(_REFRESH_SUMMARIES)
+        finally:
+            cursor.close()
+    return {"staged": stream.rows_written, "history_inserted": history_rows, "latest_updated": latest_rows,
+            "daily_updated": daily_rows}
+
+
+def bulk_load(engine, records, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream ``records`` into Postgres in batches of ``batch_size``; one transaction per batch."""
+    totals = {"staged": 0, "history_inserted": 0, "latest_updated": 0, "daily_updated": 0, "batches": 0}
+    iterator = iter(records)
+    while True:
+        batch = itertools.islice(iterator, batch_size)
+        first = next(batch, None)
+        if first is None:
+            break
+        counts = load_batch(engine, itertools.chain((first,), batch))
+        for key, value in counts.items():
+            totals[key] += value
+        totals["batches"] += 1
+        logger.info("Bulk batch %s: %s", totals["batches"], counts)
+    return totals
+
+
+def iter_jsonl(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except JSONDecodeError:
+                    logger.warning("Skipping malformed line %s:%s", path, line_no)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.db.postgres_bulk", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="Bulk-load JSONL records (fallback files, backfills)")
+    load.add_argument("paths", nargs="+")
+    load.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    load.add_argument("--no-history", action="store_true",
+                      help="Ignore price_history arrays and load only the top-level quote")
+    load.add_argument("--url", help="Database URL (default: SQL_DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    from .postgres_backend import PostgresBackend
+
+    url = args.url or os.getenv("SQL_DATABASE_URL")
+    backend = PostgresBackend(sql_database_url=url)
+    backend.open()
+    try:
+        records = iter_jsonl(args.paths)
+        if not args.no_history:
+            records = expand_price_history(records)
+        start = time.perf_counter()
+        totals = backend.bulk_load(records, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.close()
+    rate = totals["staged"] / elapsed if elapsed else 0.0
+    print(f"staged {totals['staged']} rows in {totals['batches']} batches ({elapsed:.2f}s, {rate:,.0f} rows/s); "
+          f"history +{totals['history_inserted']}, stock_data updated {totals['latest_updated']}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
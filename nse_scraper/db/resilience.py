@@ -0,0 +1,380 @@
+"""Retrying, circuit-breaking write layer shared by the synchronous backends.
+
+``ResilientBackend`` wraps a backend's ``upsert_*`` methods; everything else
+passes through. A failed write never blocks the crawl and never loses data:
+
+- it goes to a bounded in-memory retry queue and is retried after an
+  exponential backoff with full jitter (``RetryPolicy``), on later writes or
+  when a long-running writer calls ``retry_due()`` while idle;
+- after ``failure_threshold`` consecutive failures the ``CircuitBreaker``
+  opens: writes go straight to the local spool, with no network calls,
+  until ``reset_timeout`` has passed and a trial write succeeds;
+- records that exhaust their retries, overflow the queue, or arrive while
+  the circuit is open are appended to a JSON-lines ``Spool``
+  (``<spool_dir>/<backend>.<method>.jsonl``, one plain record per line), and
+  are written back in batches once the backend is healthy again, including
+  on the next run's first write. A drain reads forward from an offset and
+  rewrites the file once when it stops, not after every batch.
+
+Writes for a ticker that already has a record waiting (queued or spooled)
+wait behind it, so a retried older quote never overwrites a newer one;
+other tickers are unaffected. A failed re-drain is retried after
+``reset_timeout``.
+Async backends are not wrapped. The spool files belong to one instance: two
+writers to the same backend in one process use distinct names.
+"""
+
+import logging
+import os
+import random
+import shutil
+import time
+from collections import Counter, deque
+
+from ..serialization import dump_lines, loads, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = ("upsert_stock", "upsert_stockanalysis_stock", "upsert_run", "upsert_index_point")
+STATS_PREFIX = "nse/storage"
+
+_TIMESTAMP_FIELDS = ("scraped_at", "created_at", "started_at", "finished_at", "as_of")
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt ``n`` waits ``uniform(0, min(max_delay, base * 2**n))``."""
+
+    def __init__(self, retries=3, base_delay=1.0, max_delay=60.0, rng=None):
+        self.retries = max(0, int(retries))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt):
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures; half-open after ``reset_timeout``."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+
+    def allow(self):
+        """Whether a write may be attempted now (an open circuit turns half-open once the timeout passes)."""
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        return self.state != self.OPEN
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+
+class Spool:
+    """Append-only JSON-lines files of records waiting to be written, one per write method."""
+
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        self._tickers = {}  # method -> Counter of spooled records per ticker
+        self._offsets = {}  # method -> byte offset of the oldest record not yet drained
+        self._read = {}  # method -> (end offset, ticker) of each record returned by the last read
+
+    def path(self, method):
+        return os.path.join(self.directory, f"{self.name}.{method}.jsonl")
+
+    def _load(self, method):
+        if method not in self._tickers:
+            try:
+                with open(self.path(method), "rb") as handle:
+                    lines = [line for line in handle if line.strip()]
+            except FileNotFoundError:
+                lines = []
+            self._tickers[method] = Counter(loads(line).get("ticker_symbol") for line in lines)
+        return self._tickers[method]
+
+    def pending(self, method):
+        return sum(self._load(method).values())
+
+    def holds(self, method, ticker):
+        """Whether ``ticker`` has spooled records (newer ones must queue behind them)."""
+        return self._load(method)[ticker] > 0
+
+    def append(self, method, records):
+        tickers = self._load(method)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(method), "ab") as handle:
+            handle.write(dump_lines(records))
+        tickers.update(record.get("ticker_symbol") for record in records)
+
+    def read(self, method, limit):
+        """The oldest ``limit`` spooled records, timestamps parsed back into datetimes."""
+        records, positions = [], []
+        if not self.pending(method):
+            return records
+        with open(self.path(method), "rb") as handle:
+            handle.seek(self._offsets.get(method, 0))
+            for line in iter(handle.readline, b""):
+                if not line.strip():
+                    continue
+                record = loads(line)
+                positions.append((handle.tell(), record.get("ticker_symbol")))
+                for field in _TIMESTAMP_FIELDS:
+                    if isinstance(record.get(field), str):
+                        record[field] = parse_timestamp(record[field]) or record[field]
+                records.append(record)
+                if len(records) >= limit:
+                    break
+        self._read[method] = positions
+        return records
+
+    def discard(self, method, count):
+        """Drop the oldest ``count`` records (after they were written) by moving the read offset past them.
+
+        The file is rewritten by ``compact``, or removed once nothing is left.
+        Until then a crash replays the drained records, which is safe because
+        upserts are idempotent.
+        """
+        positions = self._read.pop(method, [])[:count]
+        if not positions:
+            return
+        tickers = self._load(method)
+        tickers.subtract(ticker for _, ticker in positions)
+        self._tickers[method] = +tickers
+        self._offsets[method] = positions[-1][0]
+        if not self._tickers[method]:
+            os.remove(self.path(method))
+            self._offsets.pop(method)
+
+    def compact(self, method):
+        """Rewrite the file without the drained records, atomically."""
+        offset = self._offsets.pop(method, 0)
+        if not offset:
+            return
+        path = self.path(method)
+        tmp = path + ".tmp"
+        with open(path, "rb") as source, open(tmp, "wb") as target:
+            source.seek(offset)
+            shutil.copyfileobj(source, target)
+        os.replace(tmp, path)
+
+
+class _Pending:
+    __slots__ = ("method", "record", "attempt", "due")
+
+    def __init__(self, method, record, attempt, due):
+        self.method, self.record, self.attempt, self.due = method, record, attempt, due
+
+
+class ResilientBackend:
+    """Wraps ``backend`` writes with retries, a circuit breaker and a local spool."""
+
+    def __init__(self, backend, name, spool_dir="reports/local_fallback", retries=3, base_delay=1.0,
+                 max_delay=60.0, queue_size=1000, failure_threshold=5, reset_timeout=30.0, drain_batch_size=100,
+                 clock=time.monotonic, rng=None):
+        self._backend = backend
+        self.name = name
+        self.policy = RetryPolicy(retries, base_delay, max_delay, rng)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self.spool = Spool(spool_dir, name)
+        self.queue_size = max(1, int(queue_size))
+        self.drain_batch_size = max(1, int(drain_batch_size))
+        self.clock = clock
+        self._queue = deque()
+        self._next_drain = 0.0
+        self.counts = {"retries": 0, "recovered": 0, "spooled": 0, "drained": 0}
+
+    def __getattr__(self, attr):
+        return getattr(self._backend, attr)
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def fallback_count(self):
+        return self.counts["spooled"] + getattr(self._backend, "fallback_count", 0)
+
+    def upsert_stock(self, record):
+        self._submit("upsert_stock", record)
+
+    def upsert_stocks(self, records):
+        for record in records:
+            self._submit("upsert_stock", record)
+
+    def upsert_stockanalysis_stock(self, record):
+        self._submit("upsert_stockanalysis_stock", record)
+
+    def upsert_run(self, record):
+        self._submit("upsert_run", record)
+
+    def upsert_index_point(self, record):
+        self._submit("upsert_index_point", record)
+
+    def _submit(self, method, record):
+        self._retry_due()
+        key = record.get("ticker_symbol")
+        if self.spool.pending(method) and self.clock() >= self._next_drain and self.breaker.allow():
+            self._drain(method)
+        if not self.breaker.allow() or self.spool.holds(method, key):
+            self._spool(method, [record])
+        elif any(item.method == method and item.record.get("ticker_symbol") == key for item in self._queue):
+            # Keep per-ticker order: wait behind the queued record.
+            self._enqueue(_Pending(method, record, 0, self.clock()))
+        else:
+            self._attempt(_Pending(method, record, 0, self.clock()))
+
+    def _attempt(self, item):
+        """Write ``item`` once; on failure schedule a retry (or spool it). Returns success."""
+        try:
+            getattr(self._backend, item.method)(item.record)
+        except Exception as exc:
+            self.breaker.record_failure()
+            if item.attempt >= self.policy.retries or self.breaker.state == CircuitBreaker.OPEN:
+                logger.warning("%s %s failed (%s); spooling %s", self.name, item.method, exc,
+                               item.record.get("ticker_symbol"))
+                if self.breaker.state == CircuitBreaker.OPEN:
+                    # Spool everything in arrival order; a retried record is older than anything
+                    # still queued for its ticker, a fresh one has nothing queued behind it.
+                    if item.attempt:
+                        self._queue.appendleft(item)
+                    else:
+                        self._queue.append(item)
+                    self._spool_queue()
+                else:
+                    self._spool(item.method, [item.record])
+            else:
+                item.due = self.clock() + self.policy.delay(item.attempt)
+                item.attempt += 1
+                self.counts["retries"] += 1
+                logger.warning("%s %s failed (%s); retry %s in %.1fs", self.name, item.method, exc,
+                               item.attempt, item.due - self.clock())
+                self._enqueue(item)
+            return False
+        if item.attempt:
+            self.counts["recovered"] += 1
+        self.breaker.record_success()
+        return True
+
+    def _enqueue(self, item):
+        if len(self._queue) >= self.queue_size:
+            self._spool(item.method, [item.record])
+        else:
+            self._queue.append(item)
+
+    def _retry_due(self, force=False):
+        """Retry queued records whose backoff has elapsed, oldest first, one ticker at a time."""
+        if not self._queue:
+            return
+        blocked = set()
+        for item in list(self._queue):
+            key = (item.method, item.record.get("ticker_symbol"))
+            if key in blocked or (not force and item.due > self.clock()):
+                blocked.add(key)
+                continue
+            if not self.breaker.allow():
+                return
+            self._queue.remove(item)
+            if not self._attempt(item):
+                blocked.add(key)
+
+    def _spool(self, method, records):
+        # Records queued behind these for the same ticker follow them into the spool.
+        keys = {record.get("ticker_symbol") for record in records}
+        followers = [item for item in self._queue if item.method == method and item.record.get("ticker_symbol") in keys]
+        for item in followers:
+            self._queue.remove(item)
+        records = list(records) + [item.record for item in followers]
+        try:
+            self.spool.append(method, records)
+        except OSError:
+            logger.exception("Failed to spool %s %s records to %s", len(records), method, self.spool.directory)
+            return
+        self.counts["spooled"] += len(records)
+
+    def _spool_queue(self):
+        while self._queue:
+            item = self._queue.popleft()
+            self._spool(item.method, [item.record])
+
+    def _drain(self, method):
+        """Write spooled records back in batches while the backend stays healthy."""
+        try:
+            self._drain_batches(method)
+        finally:
+            self.spool.compact(method)
+
+    def _drain_batches(self, method):
+        while self.spool.pending(method) and self.breaker.allow():
+            batch = self.spool.read(method, self.drain_batch_size)
+            try:
+                if method == "upsert_stock" and hasattr(self._backend, "upsert_stocks"):
+                    self._backend.upsert_stocks(batch)
+                else:
+                    for record in batch:
+                        getattr(self._backend, method)(record)
+            except Exception as exc:
+                # Upserts are idempotent, so the records of a partly written batch are simply retried later.
+                self.breaker.record_failure()
+                self._next_drain = self.clock() + self.breaker.reset_timeout
+                logger.warning("Draining the %s %s spool failed (%s); %s records left", self.name, method, exc,
+                               self.spool.pending(method))
+                return
+            self.breaker.record_success()
+            self.spool.discard(method, len(batch))
+            self.counts["drained"] += len(batch)
+            logger.info("Re-drained %s spooled %s records to %s", len(batch), method, self.name)
+
+    def retry_due(self):
+        """Retry queued records whose backoff has elapsed, and re-drain the spool once it may be.
+
+        Writes do this on their own; long-running writers call it while idle
+        so a retry or an outage's spool does not wait for the next write.
+        """
+        self._retry_due()
+        for method in WRITE_METHODS:
+            if self.spool.pending(method) and self.clock() >= self._next_drain and self.breaker.allow():
+                self._drain(method)
+
+    def flush(self):
+        self._retry_due(force=True)
+        for method in WRITE_METHODS:
+            if self.spool.pending(method) and self.breaker.allow():
+                self._drain(method)
+        flush = getattr(self._backend, "flush", None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        """Give queued records one last try, spool what is left, then close the backend."""
+        self._retry_due(force=True)
+        self._spool_queue()
+        try:
+            self._backend.close()
+        finally:
+            if self.counts["spooled"]:
+                logger.warning("%s: %s records spooled to %s for the next run", self.name, self.counts["spooled"],
+                               self.spool.directory)
+
+    def record_stats(self, stats):
+        """Copy retry/spool counters into a Scrapy stats collector under ``nse/storage/<backend>/``."""
+        for name, value in self.counts.items():
+            stats.set_value(f"{STATS_PREFIX}/{self.name}/{name}", value)
+        stats.set_value(f"{STATS_PREFIX}/{self.name}/circuit_opens", self.breaker.opens)
@@ -0,0 +1,158 @@
+"""Typed columns for the StockAnalysis screener metrics.
+
+The known screener columns (the spider's ``_TARGET_VIEW_COLUMNS``) are
+stored as typed, indexable columns on ``stockanalysis_stocks`` instead of
+being repeated as keys inside every row's ``*_metrics`` JSONB. The blobs
+keep only keys not in ``METRICS`` and values that do not parse (usually
+none), so screener filters
+like ``revenue > 1e11 ORDER BY dividend_yield`` become index scans.
+
+``split_metrics`` turns a pipeline record into column values plus the
+leftover blobs; ``merge_metrics`` rebuilds the per-view dicts from a stored
+row for callers that still want the old shape.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime
+
+Metric = namedtuple("Metric", "column views key kind")
+
+# kind: "numeric" (double precision), "integer", "date" or "text".
+METRICS = (
+    Metric("market_cap", ("overview",), "marketCap", "numeric"),
+    Metric("revenue", ("overview",), "revenue", "numeric"),
+    Metric("volume", ("overview", "price"), "volume", "numeric"),
+    Metric("industry", ("overview", "profile"), "industry", "text"),
+    Metric("sector", ("overview",), "sector", "text"),
+    Metric("revenue_growth", ("overview",), "revenueGrowth", "numeric"),
+    Metric("net_income", ("overview",), "netIncome", "numeric"),
+    Metric("fcf", ("overview",), "fcf", "numeric"),
+    Metric("net_cash", ("overview",), "netCash", "numeric"),
+    Metric("tr_1m", ("performance",), "tr1m", "numeric"),
+    Metric("tr_6m", ("performance",), "tr6m", "numeric"),
+    Metric("tr_ytd", ("performance",), "trYTD", "numeric"),
+    Metric("tr_1y", ("performance",), "tr1y", "numeric"),
+    Metric("tr_5y", ("performance",), "tr5y", "numeric"),
+    Metric("tr_10y", ("performance",), "tr10y", "numeric"),
+    Metric("dps", ("dividends",), "dps", "numeric"),
+    Metric("dividend_yield", ("dividends",), "dividendYield", "numeric"),
+    Metric("dividend_growth", ("dividends",), "dividendGrowth", "numeric"),
+    Metric("ex_div_date", ("dividends",), "exDivDate", "date"),
+    Metric("payout_ratio", ("dividends",), "payoutRatio", "numeric"),
+    Metric("payout_frequency", ("dividends",), "payoutFrequency", "text"),
+    Metric("low_52w", ("price",), "low52", "numeric"),
+    Metric("low_52w_change", ("price",), "low52ch", "numeric"),
+    Metric("high_52w", ("price",), "high52", "numeric"),
+    Metric("high_52w_change", ("price",), "high52ch", "numeric"),
+    Metric("country", ("profile",), "country", "text"),
+    Metric("employees", ("profile",), "employees", "integer"),
+    Metric("founded", ("profile",), "founded", "integer"),
+)
+
+METRIC_COLUMNS = tuple(metric.column for metric in METRICS)
+VIEWS = ("overview", "performance", "dividends", "price", "profile")
+
+# Screener filters/sorts that get a btree index.
+INDEXED_COLUMNS = ("market_cap", "revenue", "dividend_yield", "tr_1y", "tr_ytd", "sector")
+
+SQL_TYPES = {"numeric": "DOUBLE PRECISION", "integer": "BIGINT", "date": "DATE", "text": "TEXT"}
+
+_NULL_WORDS = {"", "-", "--", "n/a", "na", "null", "none"}
+_UNIT_MULTIPLIERS = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000, "T": 1_000_000_000_000}
+_DATE_FORMATS = ("%Y-%m-%d", "%b %d, %Y", "%B %d, %Y", "%d %b %Y")
+
+
+def normalize_metric_value(value):
+    """Parse screener display values: ``"1.36T"`` -> 1.36e12, ``"-2.28%"`` -> -2.28, ``"-"`` -> None.
+
+    Anything that is not a number is returned as stripped text.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip()
+    if text.lower() in _NULL_WORDS:
+        return None
+    if text.endswith("%"):
+        try:
+            return float(text[:-1].replace(",", "").strip())
+        except ValueError:
+            return text
+    compact = text.replace(",", "")
+    if compact and compact[-1].upper() in _UNIT_MULTIPLIERS:
+        try:
+            return float(compact[:-1]) * _UNIT_MULTIPLIERS[compact[-1].upper()]
+        except ValueError:
+            return text
+    try:
+        return float(compact) if "." in compact else int(compact)
+    except ValueError:
+        return text
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        return None
+
+
+def coerce(value, kind):
+    """Convert a raw metric to ``kind``; values that do not fit become None."""
+    if kind == "date":
+        return _parse_date(value) if value not in (None, "") else None
+    value = normalize_metric_value(value)
+    if value is None:
+        return None
+    if kind == "text":
+        return str(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return int(value) if kind == "integer" else float(value)
+
+
+def split_metrics(record):
+    """Column values for ``METRICS`` and the leftover ``<view>_metrics`` blobs of ``record``.
+
+    A key leaves its blob only when its value coerces; values that do not
+    (an unparsable date, ``"n/a"``) stay in the blob as scraped, so nothing
+    is lost. Returns ``(columns, blobs)``; a blob is None when it ends up empty.
+    """
+    blobs = {view: dict(record.get(f"{view}_metrics") or {}) for view in VIEWS}
+    columns = {}
+    for metric in METRICS:
+        value = None
+        for view in metric.views:
+            blob = blobs[view]
+            if metric.key not in blob:
+                continue
+            coerced = coerce(blob[metric.key], metric.kind)
+            if coerced is None and blob[metric.key] is not None:
+                continue
+            del blob[metric.key]
+            if value is None:
+                value = coerced
+        columns[metric.column] = value
+    return columns, {f"{view}_metrics": blob or None for view, blob in blobs.items()}
+
+
+def merge_metrics(row):
+    """Rebuild the per-view ``*_metrics`` dicts of a stored row from its typed columns."""
+    merged = dict(row)
+    for view in VIEWS:
+        blob = dict(merged.get(f"{view}_metrics") or {})
+        for metric in METRICS:
+            if view in metric.views and merged.get(metric.column) is not None:
+                value = merged[metric.column]
+                blob[metric.key] = value.isoformat() if isinstance(value, date) else value
+        merged[f"{view}_metrics"] = blob or None
+    return merged
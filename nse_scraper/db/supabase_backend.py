@@ -0,0 +1,366 @@
+"""Supabase (PostgREST) storage backend.
+
+Write errors (including the read of the existing ``price_history``) are
+raised, never swallowed: ``ResilientBackend`` retries them and spools the
+record locally during outages, so a failed read can no longer reset a
+ticker's history to a single entry.
+
+There is no file fallback in this class any more. The crawl pipelines and the
+polling daemon wrap it, so their failed writes are spooled; with
+``WRITE_RESILIENCE=false``, and in the command-line utilities, a failed write
+raises to the caller and nothing is kept locally.
+
+Upsert bodies are serialized once by ``nse_scraper.serialization`` (orjson
+when installed) and POSTed as is; ``upsert_stocks`` writes a whole batch
+with one history read and one request.
+
+``price_history`` entries carry the ``run_id`` of the scrape that wrote them;
+runs themselves go to ``scrape_runs`` (``sql/009_create_scrape_runs.sql``).
+Index points (``nse_scraper.indices``) go to ``market_index_points``
+(``sql/010_create_market_index_points.sql``).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from ..serialization import dumpb, dumps, parse_timestamp, to_iso
+from .backends import DEFAULT_PAGE_SIZE, _normalize_record
+from .stockanalysis_metrics import METRIC_COLUMNS, VIEWS, merge_metrics, split_metrics
+
+logger = logging.getLogger(__name__)
+
+RUNS_TABLE = "scrape_runs"
+INDEX_TABLE = "market_index_points"
+# Series missing from the latest trading dates still chain from a point this recent.
+INDEX_LEVEL_LOOKBACK_DAYS = 31
+
+
+class SupabaseBackend:
+    def __init__(self, supabase_url, supabase_key, supabase_table, stockanalysis_table="stockanalysis_stocks"):
+        if not supabase_url or not supabase_key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY are required when DB_BACKEND=supabase")
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.supabase_table = supabase_table
+        self.stockanalysis_table = stockanalysis_table
+        self.client = None
+
+    def open(self):
+        from supabase import create_client
+
+        self.client = create_client(self.supabase_url, self.supabase_key)
+        logger.info("Supabase backend ready")
+
+    def close(self):
+        return None
+
+    def _upsert(self, table, rows, on_conflict="ticker_symbol"):
+        """Upsert ``rows`` (a dict or a list of dicts with the same keys) on ``on_conflict``."""
+        builder = self.client.table(table)
+        session = getattr(builder, "session", None)
+        if session is None:
+            # Clients without a raw HTTP session serialize the payload themselves.
+            builder.upsert(rows, on_conflict=on_conflict).execute()
+            return
+        # Sent the way postgrest sends its own requests: ``path`` is a yarl URL
+        # that httpx does not accept, and ``auth`` is the client's basic auth.
+        response = session.post(
+            str(builder.path),
+            params={"on_conflict": on_conflict},
+            headers={**builder.headers, "Content-Type": "application/json",
+                     "Prefer": "resolution=merge-duplicates,return=minimal"},
+            content=dumpb(rows),
+            auth=builder.auth,
+        )
+        response.raise_for_status()
+
+    def upsert_stockanalysis_stock(self, record):
+        """Upsert one normalized stock record (all tab data) into stockanalysis_stocks, updating existing records."""
+        scraped_at = record.get("scraped_at")
+        if scraped_at is None:
+            scraped_at = datetime.now(timezone.utc)
+        scraped_at = to_iso(scraped_at)
+        
+        # Get existing record to preserve price_history (errors propagate so the write is retried)
+        existing = None
+        response = self.client.table(self.stockanalysis_table).select("price_history, stock_price, stock_change").eq("ticker_symbol", record["ticker_symbol"]).execute()
+        if response.data:
+            existing = response.data[0]
+        
+        # Build price_history entry
+        history_entry = {
+            "scraped_at": scraped_at,
+            "stock_price": float(record["stock_price"]) if record.get("stock_price") is not None else None,
+            "stock_change": float(record["stock_change"]) if record.get("stock_change") is not None else None,
+        }
+        
+        # Append to existing history or create new array
+        price_history = existing.get("price_history", []) if existing else []
+        if not isinstance(price_history, list):
+            price_history = []
+        
+        # Only add if price or change actually changed (avoid duplicates)
+        if not price_history or price_history[-1].get("stock_price") != history_entry["stock_price"] or price_history[-1].get("stock_change") != history_entry["stock_change"]:
+            price_history.append(history_entry)
+        
+        payload = {
+            "ticker_symbol": record["ticker_symbol"],
+            "company_name": record["company_name"],
+            "rank": record.get("rank"),
+            "stock_price": float(record["stock_price"]) if record.get("stock_price") is not None else None,
+            "stock_change": float(record["stock_change"]) if record.get("stock_change") is not None else None,
+            "scraped_at": scraped_at,
+            "price_history": price_history,
+        }
+        # Known screener metrics go to typed columns (sql/008); the blobs keep the rest.
+        metrics, blobs = split_metrics(record)
+        payload.update({column: to_iso(value) for column, value in metrics.items()})
+        payload.update(blobs)
+        # Use upsert to update existing records or insert new ones.
+        self._upsert(self.stockanalysis_table, payload)
+
+    @staticmethod
+    def _stock_row(payload, price_history):
+        """The ``stock_data`` row for a normalized quote, appending it to ``price_history`` if it moved."""
+        scraped_at = payload.get("scraped_at")
+        if scraped_at is None:
+            scraped_at = payload.get("created_at", datetime.now(timezone.utc))
+        scraped_at_iso = to_iso(scraped_at)
+
+        # Build price_history entry
+        history_entry = {
+            "scraped_at": scraped_at_iso,
+            "stock_price": float(payload["stock_price"]),
+            "stock_change": float(payload["stock_change"]) if payload.get("stock_change") is not None else None,
+        }
+        if payload.get("run_id"):
+            history_entry["run_id"] = payload["run_id"]
+
+        # Append to existing history or create new array
+        if not isinstance(price_history, list):
+            price_history = []
+
+        # Only add if price or change actually changed (avoid duplicates)
+        if not price_history or price_history[-1].get("stock_price") != history_entry["stock_price"] or price_history[-1].get("stock_change") != history_entry["stock_change"]:
+            price_history.append(history_entry)
+
+        return {
+            "ticker_symbol": payload["ticker_symbol"],
+            "stock_name": payload["stock_name"],
+            "stock_price": float(payload["stock_price"]),
+            "stock_change": float(payload["stock_change"]) if payload.get("stock_change") is not None else None,
+            "scraped_at": scraped_at_iso,
+            "created_at": to_iso(payload["created_at"]),
+            "price_history": price_history,
+        }
+
+    def upsert_stock(self, record):
+        payload = _normalize_record(record)
+
+        # Get existing record to preserve price_history (errors propagate so the write is retried)
+        existing = None
+        response = self.client.table(self.supabase_table).select("price_history, stock_price, stock_change").eq("ticker_symbol", payload["ticker_symbol"]).execute()
+        if response.data:
+            existing = response.data[0]
+
+        price_history = existing.get("price_history", []) if existing else []
+        # Use upsert to update existing records or insert new ones.
+        self._upsert(self.supabase_table, self._stock_row(payload, price_history))
+
+    def upsert_stocks(self, records):
+        """Upsert a batch of quotes: one ``price_history`` read and one pre-serialized upsert body.
+
+        Several quotes for one ticker are applied in order to the same row.
+        """
+        payloads = [_normalize_record(record) for record in records]
+        if not payloads:
+            return
+        tickers = sorted({payload["ticker_symbol"] for payload in payloads})
+        response = (self.client.table(self.supabase_table).select("ticker_symbol, price_history")
+                    .in_("ticker_symbol", tickers).execute())
+        histories = {row["ticker_symbol"]: row.get("price_history") for row in response.data or []}
+        rows = {}
+        for payload in payloads:
+            ticker = payload["ticker_symbol"]
+            history = rows[ticker]["price_history"] if ticker in rows else histories.get(ticker) or []
+            rows[ticker] = self._stock_row(payload, history)
+        self._upsert(self.supabase_table, list(rows.values()))
+
+    def upsert_run(self, record):
+        """Insert or update one ``scrape_runs`` row (``nse_scraper.runs.ScrapeRun.as_record()``)."""
+        row = {key: to_iso(record.get(key)) for key in ("run_id", "spider", "started_at", "finished_at", "status")}
+        row["rows"] = int(record.get("rows") or 0)
+        self._upsert(RUNS_TABLE, row, on_conflict="run_id")
+
+    def upsert_index_point(self, record):
+        """Insert or replace one ``market_index_points`` row (``nse_scraper.indices``)."""
+        row = {key: to_iso(value) for key, value in record.items()}
+        self._upsert(INDEX_TABLE, row, on_conflict="scope,name,as_of")
+
+    def get_index_series(self, scope, name=None, since=None, until=None):
+        """Index points of one series (every series in ``scope`` without ``name``), oldest first."""
+        query = self.client.table(INDEX_TABLE).select("*").eq("scope", scope)
+        if name is not None:
+            query = query.eq("name", name)
+        if since is not None:
+            query = query.gte("trade_date", str(since))
+        if until is not None:
+            query = query.lte("trade_date", str(until))
+        return query.order("name").order("as_of").execute().data or []
+
+    def latest_index_levels(self, before):
+        """``{(scope, name): level}`` from each series' newest point before trade date ``before``."""
+        since = before - timedelta(days=INDEX_LEVEL_LOOKBACK_DAYS)
+        rows = (self.client.table(INDEX_TABLE).select("scope,name,level,as_of")
+                .gte("trade_date", since.isoformat()).lt("trade_date", before.isoformat())
+                .order("as_of").execute().data or [])
+        return {(row["scope"], row["name"]): row["level"] for row in rows}
+
+    def list_runs(self, limit=20, spider=None):
+        """The most recent runs, newest first."""
+        query = self.client.table(RUNS_TABLE).select("*")
+        if spider is not None:
+            query = query.eq("spider", spider)
+        return query.order("started_at", desc=True).limit(limit).execute().data or []
+
+    def get_run_board(self, run_id):
+        """The quotes one run appended to ``price_history``, by ticker.
+
+        Rows are selected with a JSONB containment filter (passed as JSON
+        text; a list would be sent as a Postgres array), which the
+        ``price_history`` GIN index (``sql/007``) serves. A ticker whose quote
+        did not move in that run has no entry for it.
+        """
+        response = (self.client.table(self.supabase_table).select("ticker_symbol,stock_name,price_history")
+                    .contains("price_history", dumps([{"run_id": run_id}])).order("ticker_symbol").execute())
+        board = []
+        for row in response.data or []:
+            for point in row.get("price_history") or []:
+                if point.get("run_id") == run_id:
+                    board.append({"ticker_symbol": row["ticker_symbol"], "stock_name": row.get("stock_name"),
+                                  **point})
+                    break
+        return board
+
+    def get_board_as_of(self, as_of, tickers=None, page_size=50):
+        """Each ticker's newest ``price_history`` entry not after ``as_of``.
+
+        PostgREST cannot index into the arrays, so this reads them page by
+        page (``page_size`` tickers per request) and bisects each in memory;
+        the SQL backends answer from indexes instead.
+        """
+        from bisect import bisect_right
+
+        as_of = parse_timestamp(as_of)
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        board = []
+        for row in self._iter_rows(self.supabase_table, "ticker_symbol,stock_name,price_history", page_size, tickers):
+            history = row.get("price_history")
+            if not isinstance(history, list) or not history:
+                continue
+            points = sorted(((parse_timestamp(point.get("scraped_at")) or oldest, n, point)
+                             for n, point in enumerate(history)), key=lambda entry: entry[:2])
+            index = bisect_right([at for at, _n, _point in points], as_of)
+            if index:
+                board.append({"ticker_symbol": row["ticker_symbol"], "stock_name": row.get("stock_name"),
+                              **points[index - 1][2]})
+        return board
+
+    def _iter_rows(self, table, columns, page_size, tickers=None):
+        """Rows of ``table`` by ticker, keyset-paginated so PostgREST's row cap never truncates."""
+        after = None
+        while True:
+            query = self.client.table(table).select(columns).order("ticker_symbol")
+            if tickers is not None:
+                query = query.in_("ticker_symbol", list(tickers))
+            if after is not None:
+                query = query.gt("ticker_symbol", after)
+            rows = query.limit(page_size).execute().data or []
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1]["ticker_symbol"]
+
+    def iter_stocks(self, page_size=DEFAULT_PAGE_SIZE):
+        """Every latest-quote row (without ``price_history``), ordered by ticker."""
+        return self._iter_rows(self.supabase_table, "ticker_symbol,stock_name,stock_price,stock_change,scraped_at,"
+                                                    "created_at", page_size)
+
+    def iter_stockanalysis_stocks(self, page_size=DEFAULT_PAGE_SIZE):
+        """Every StockAnalysis row (without ``price_history``, typed metrics merged into the blobs)."""
+        columns = ",".join(("ticker_symbol", "company_name", "rank", "stock_price", "stock_change", "scraped_at",
+                            *(f"{view}_metrics" for view in VIEWS), *METRIC_COLUMNS))
+        for row in self._iter_rows(self.stockanalysis_table, columns, page_size):
+            yield merge_metrics(row)
+
+    def iter_history(self, tickers=None, since=None, until=None, page_size=50):
+        """``price_history`` entries ordered by ticker and then ``scraped_at``.
+
+        Each row carries its whole array, so ``page_size`` counts tickers per
+        request. ``since``/``until`` bound ``scraped_at`` to ``[since, until)``.
+        """
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        lower, upper = parse_timestamp(since), parse_timestamp(until)
+        for row in self._iter_rows(self.supabase_table, "ticker_symbol,price_history", page_size, tickers):
+            history = row.get("price_history")
+            if not isinstance(history, list):
+                continue
+            points = [(parse_timestamp(point.get("scraped_at")) or oldest, point) for point in history]
+            for at, point in sorted(points, key=lambda pair: pair[0]):
+                if (lower is None or at >= lower) and (upper is None or at < upper):
+                    yield {"ticker_symbol": row["ticker_symbol"], **point}
+
+    def compact_history(self, policy, now=None, dry_run=False, page_size=50):
+        """Downsample the ``price_history`` arrays per ``policy`` (see ``nse_scraper.retention``).
+
+        Pages through both tables by ticker and rewrites one row per request,
+        only when its history actually shrinks. The update is conditional on
+        ``scraped_at`` being unchanged, so a row the scraper wrote to in the
+        meantime is skipped (and picked up by the next run) rather than losing
+        the new tick. Sizes are the change in the serialized JSON.
+        """
+        from ..retention import CompactionReport
+
+        cutoffs = policy.cutoffs(now)
+        report = CompactionReport(backend="supabase", dry_run=dry_run)
+        for table in (self.supabase_table, self.stockanalysis_table):
+            rows = self._iter_rows(table, "ticker_symbol,scraped_at,price_history", page_size)
+            try:
+                for row in rows:
+                    self._compact_row(table, row, cutoffs, report, dry_run)
+            except Exception:
+                logger.exception("Supabase compaction could not read %s", table)
+                report.errors += 1
+        return report
+
+    def _compact_row(self, table, row, cutoffs, report, dry_run):
+        from ..retention import json_size, split_points
+
+        history = row.get("price_history")
+        if not isinstance(history, list) or not history:
+            return
+        kept, removed = split_points(history, cutoffs)
+        size = json_size(history) - json_size(kept) if removed else 0
+        if removed and not dry_run:
+            try:
+                (self.client.table(table).update({"price_history": kept})
+                 .eq("ticker_symbol", row["ticker_symbol"]).eq("scraped_at", row["scraped_at"])
+                 .execute())
+            except Exception:
+                logger.exception("Supabase compaction of %s/%s failed", table, row["ticker_symbol"])
+                report.errors += 1
+                return
+        report.add(table, len(history), len(removed), size)
+
+    def get_latest_by_ticker(self, ticker_symbol):
+        response = (
+            self.client.table(self.supabase_table)
+            .select("ticker_symbol,stock_name,stock_price,stock_change,created_at")
+            .eq("ticker_symbol", ticker_symbol)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        if not response.data:
+            return None
+        return response.data[0]
@@ -0,0 +1,85 @@
+"""
+Stream the board or price history out of the configured backend.
+
+Rows come from the backends' keyset-paginated readers (``iter_stocks``,
+``iter_history``, ``iter_stockanalysis_stocks``) and are written as they
+arrive, so exports of any size run in constant memory:
+
+    python -m nse_scraper.export stocks > board.jsonl
+    python -m nse_scraper.export history --since 2026-01-01 --ticker SCOM --format csv -o scom.csv
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+from datetime import datetime
+
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+READERS = {
+    "stocks": "iter_stocks",
+    "history": "iter_history",
+    "stockanalysis": "iter_stockanalysis_stocks",
+}
+
+
+def write_rows(rows, out, fmt="jsonl"):
+    """Write ``rows`` (dicts) to ``out`` as JSON lines or CSV; returns the row count."""
+    count = 0
+    writer = None
+    for row in rows:
+        if fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow({key: dumps(value) if isinstance(value, (dict, list)) else value
+                             for key, value in row.items()})
+        else:
+            out.write(dumps(row) + "\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.export", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("what", choices=sorted(READERS))
+    parser.add_argument("--backend", help="Override DB_BACKEND")
+    parser.add_argument("--ticker", action="append", dest="tickers", help="History only; repeatable")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="History only; scraped_at >= this")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="History only; scraped_at < this")
+    parser.add_argument("--page-size", type=int, help="Rows per backend query")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    from . import settings
+    from .db import create_backend_from_settings
+
+    backend = create_backend_from_settings(settings, backend_name=args.backend)
+    reader = getattr(backend, READERS[args.what], None)
+    if reader is None:
+        parser.error(f"{type(backend).__name__} has no {args.what} data")
+    kwargs = {"page_size": args.page_size} if args.page_size else {}
+    if args.what == "history":
+        kwargs.update(tickers=args.tickers, since=args.since, until=args.until)
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    backend.open()
+    try:
+        count = write_rows(reader(**kwargs), out, args.format)
+    finally:
+        backend.close()
+        if args.output:
+            out.close()
+    logger.info("Exported %s %s rows", count, args.what)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), stream=sys.stderr,
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
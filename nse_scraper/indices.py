@@ -0,0 +1,215 @@
+"""
+Market-cap-weighted exchange, sector and industry indices per StockAnalysis run.
+
+After each StockAnalysis crawl the overview snapshot (``marketCap``,
+``sector``, ``industry`` and the day's ``change`` in percent for every
+listed stock) is grouped in one vectorized pass (``np.unique`` plus
+``np.bincount`` over the screener's NumPy columns) into index points:
+
+- ``exchange`` / ``NSE All-Share``: every stock with a market cap;
+- ``sector`` / ``industry``: one point per sector or industry.
+
+Each point has the constituent count, total market cap, share of the
+exchange's cap, advancers and decliners, the equal-weighted mean change and
+the cap-weighted daily change. The cap-weighted change is
+``sum(cap) / sum(cap / (1 + change)) - 1``, i.e. the move in total market
+value since the previous close. ``level`` chains those changes from the
+series' last point on an earlier NSE trading date, starting at 100. Several
+runs on one date each restate that day's level, so reruns never compound.
+
+Points are written through the backend's ``upsert_index_point`` into
+``market_index_points`` (embedded and Supabase, ``sql/010``), keyed by
+``(scope, name, as_of)``, so dashboards read a precomputed series
+(``get_index_series``) instead of aggregating the metric blobs on every
+page load. The StockAnalysis pipeline publishes them when the crawl closes.
+To compute them for an existing snapshot, or to inspect a series:
+
+    python -m nse_scraper.indices compute                               # snapshot from DB_BACKEND
+    python -m nse_scraper.indices compute --source stockanalysis_output.jsonl --dry-run
+    python -m nse_scraper.indices show --scope sector --since 2026-01-01
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from .retention import NSE_TZ
+from .screener import Snapshot, flatten_row, records_from_backend, records_from_feed
+from .serialization import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE = "exchange"
+SECTOR = "sector"
+INDUSTRY = "industry"
+SCOPES = (EXCHANGE, SECTOR, INDUSTRY)
+ALL_SHARE = "NSE All-Share"
+BASE_LEVEL = 100.0
+
+
+def trade_date(as_of):
+    """The NSE (EAT) trading date of a timestamp."""
+    return parse_timestamp(as_of).astimezone(NSE_TZ).date()
+
+
+def _optional(snapshot, name):
+    try:
+        return snapshot.column(name)
+    except KeyError:
+        return None
+
+
+def _round(value, digits=6):
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+
+def compute(snapshot, as_of, previous_levels=None, run_id=None, base_level=BASE_LEVEL):
+    """Index points for ``snapshot`` at ``as_of``.
+
+    ``previous_levels`` maps ``(scope, name)`` to the series' level on an
+    earlier trading date (``latest_index_levels`` on the backends); a series
+    without one starts at ``base_level``.
+    """
+    cap = _optional(snapshot, "market_cap")
+    if cap is None or cap.dtype.kind != "f":
+        return []
+    change = _optional(snapshot, "stock_change")
+    if change is None or change.dtype.kind != "f":
+        change = np.full(len(snapshot), np.nan)
+    listed = np.isfinite(cap) & (cap > 0)
+    moved = np.isfinite(change)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # A stock without a change counts as unchanged.
+        previous_cap = np.where(moved & (change > -100.0), cap / (1.0 + change / 100.0), cap)
+    total_cap = cap[listed].sum()
+    previous_levels = previous_levels or {}
+    day = trade_date(as_of)
+
+    points = []
+    for scope in SCOPES:
+        if scope == EXCHANGE:
+            member = listed
+            names = np.array([ALL_SHARE], dtype=object)
+            group = np.zeros(int(member.sum()), dtype=np.intp)
+        else:
+            labels = _optional(snapshot, scope)
+            if labels is None:
+                continue
+            member = listed & (labels != None)  # noqa: E711 - elementwise
+            names, group = np.unique(labels[member].astype(str), return_inverse=True)
+        if not len(group):
+            continue
+        size = len(names)
+        caps = np.bincount(group, weights=cap[member], minlength=size)
+        previous_caps = np.bincount(group, weights=previous_cap[member], minlength=size)
+        counts = np.bincount(group, minlength=size)
+        member_change, member_moved = change[member], moved[member]
+        reported = np.bincount(group, weights=member_moved, minlength=size)
+        change_sums = np.bincount(group, weights=np.where(member_moved, member_change, 0.0), minlength=size)
+        advancers = np.bincount(group, weights=member_moved & (member_change > 0), minlength=size)
+        decliners = np.bincount(group, weights=member_moved & (member_change < 0), minlength=size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_pct = (caps / previous_caps - 1.0) * 100.0
+            mean_change = change_sums / reported
+        for i, name in enumerate(names.tolist()):
+            previous = previous_levels.get((scope, name))
+            moved_pct = change_pct[i] if np.isfinite(change_pct[i]) else 0.0
+            level = base_level if previous is None else previous * (1.0 + moved_pct / 100.0)
+            points.append({
+                "scope": scope,
+                "name": name,
+                "as_of": as_of,
+                "trade_date": day.isoformat(),
+                "run_id": run_id,
+                "constituents": int(counts[i]),
+                "market_cap": float(caps[i]),
+                "weight_pct": _round(caps[i] / total_cap * 100.0),
+                "change_pct": _round(change_pct[i]),
+                "mean_change_pct": _round(mean_change[i]),
+                "level": round(level, 6),
+                "advancers": int(advancers[i]),
+                "decliners": int(decliners[i]),
+            })
+    return points
+
+
+def snapshot_as_of(records):
+    """The newest ``scraped_at`` among screener records, or now."""
+    stamps = [record["_at"] for record in records if record.get("_at") is not None]
+    return max(stamps) if stamps else datetime.now(timezone.utc)
+
+
+def points_for(storage, records, as_of=None, run_id=None):
+    """The points for screener ``records``, chained from the levels ``storage`` holds."""
+    as_of = as_of or snapshot_as_of(records)
+    levels_for = getattr(storage, "latest_index_levels", None)
+    levels = levels_for(trade_date(as_of)) if levels_for is not None else {}
+    return compute(Snapshot(records), as_of, levels, run_id=run_id)
+
+
+def publish(storage, records, as_of=None, run_id=None):
+    """Compute the points for screener ``records`` and write them with ``storage.upsert_index_point``."""
+    points = points_for(storage, records, as_of, run_id)
+    for point in points:
+        storage.upsert_index_point(point)
+    return points
+
+
+def publish_rows(storage, rows, run_id=None):
+    """``publish`` for StockAnalysis rows as the pipeline upserts them (``*_metrics`` blobs)."""
+    return publish(storage, [flatten_row(row) for row in rows], run_id=run_id)
+
+
+def _format(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.indices", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", help="Override DB_BACKEND")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("compute", help="Compute and store the points for the latest snapshot")
+    run.add_argument("--source", help="StockAnalysis feed file (default: the backend's rows)")
+    run.add_argument("--run-id", default=os.getenv("NSE_RUN_ID"))
+    run.add_argument("--dry-run", action="store_true", help="Print the points without storing them")
+    show = sub.add_parser("show", help="Print a stored series")
+    show.add_argument("--scope", choices=SCOPES, default=EXCHANGE)
+    show.add_argument("--name", help="Sector or industry (default: every one in the scope)")
+    show.add_argument("--since", type=date.fromisoformat, help="Only trade dates on or after YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    from . import settings
+    from .db import create_backend_from_settings
+
+    backend = create_backend_from_settings(settings, backend_name=args.backend)
+    needed = "get_index_series" if args.command == "show" else "upsert_index_point"
+    if not hasattr(backend, needed) and not (args.command == "compute" and args.dry_run):
+        parser.error(f"{type(backend).__name__} does not store index points")
+    backend.open()
+    try:
+        if args.command == "show":
+            name = args.name or (ALL_SHARE if args.scope == EXCHANGE else None)
+            points = backend.get_index_series(args.scope, name, since=args.since)
+        else:
+            records = records_from_feed(args.source) if args.source else records_from_backend(backend)
+            stage = points_for if args.dry_run else publish
+            points = stage(backend, records, run_id=args.run_id)
+    finally:
+        backend.close()
+    for point in points:
+        print(f"{point['trade_date']} {point['scope']:<9} {point['name'][:32]:<32} n={point['constituents']:<3} "
+              f"cap={point['market_cap']:.4g} weight={_format(point['weight_pct'], '.2f')}% "
+              f"change={_format(point['change_pct'], '+.2f')}% level={point['level']:.2f}")
+    if args.command == "compute":
+        print(f"{'computed' if args.dry_run else 'stored'} {len(points)} index points")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+Per-stage timing instrumentation.
+
+Latency histograms, call counts, byte counts and errors for spider callbacks,
+pipeline stages and storage backend methods are recorded in the crawler stats
+collector under ``nse/stage/<stage>/...``. ``PrometheusExporter`` can publish
+the same numbers as a node_exporter textfile and/or a local ``/metrics`` HTTP
+endpoint.
+"""
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .serialization import encoded_size
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = "nse/stage"
+
+# Upper bounds (milliseconds) of the latency histogram buckets.
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class StageMetrics:
+    """Records stage observations into a Scrapy stats collector.
+
+    Passing ``stats=None`` turns every call into a no-op so components can be
+    used outside a crawl (tests, utilities) without special casing.
+    """
+
+    def __init__(self, stats=None, prefix=STATS_PREFIX):
+        self.stats = stats
+        self.prefix = prefix
+
+    def observe(self, stage, elapsed_seconds, error=False, nbytes=None):
+        stats = self.stats
+        if stats is None:
+            return
+        key = f"{self.prefix}/{stage}"
+        elapsed_ms = elapsed_seconds * 1000.0
+        stats.inc_value(f"{key}/count")
+        stats.inc_value(f"{key}/time_ms_sum", elapsed_ms)
+        stats.max_value(f"{key}/time_ms_max", elapsed_ms)
+        for bound in LATENCY_BUCKETS_MS:
+            if elapsed_ms <= bound:
+                stats.inc_value(f"{key}/bucket/{bound}")
+                break
+        if error:
+            stats.inc_value(f"{key}/errors")
+        if nbytes:
+            stats.inc_value(f"{key}/bytes", nbytes)
+
+    @contextmanager
+    def time(self, stage, nbytes=None):
+        """Time the enclosed block; exceptions are counted and re-raised."""
+        if self.stats is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.observe(stage, time.perf_counter() - start, error=True, nbytes=nbytes)
+            raise
+        self.observe(stage, time.perf_counter() - start, nbytes=nbytes)
+
+
+class InstrumentedBackend:
+    """Transparent proxy that times every public method of a storage backend.
+
+    Write methods (``upsert_*``) also record bytes sent. Encoding a payload
+    just to count it would add a full JSON encode to the path being measured,
+    so only one call in ``byte_sample_every`` per method is encoded and
+    counted with that weight: the ``bytes`` counter is an estimate. Coroutine
+    methods are timed until they complete. Bookkeeping methods
+    (``record_stats``) are passed through untimed.
+    """
+
+    UNTIMED = frozenset({"record_stats"})
+    BYTE_SAMPLE_EVERY = 32
+
+    def __init__(self, backend, metrics, name, byte_sample_every=BYTE_SAMPLE_EVERY):
+        self._backend = backend
+        self._metrics = metrics
+        self._name = name
+        self._byte_sample_every = max(1, int(byte_sample_every))
+
+    def __getattr__(self, attr):
+        value = getattr(self._backend, attr)
+        if attr.startswith("_") or attr in self.UNTIMED or not callable(value):
+            return value
+        stage = f"backend/{self._name}/{attr}"
+        metrics = self._metrics
+        every = self._byte_sample_every
+        calls = [0]
+
+        def sampled_size(args):
+            # Sample the first call and every ``every``-th one after it.
+            if not args or not attr.startswith("upsert"):
+                return None
+            calls[0] += 1
+            if (calls[0] - 1) % every:
+                return None
+            size = encoded_size(args[0])
+            return None if size is None else size * every
+
+        if inspect.iscoroutinefunction(value):
+            async def timed(*args, **kwargs):
+                with metrics.time(stage, nbytes=sampled_size(args)):
+                    return await value(*args, **kwargs)
+        else:
+            def timed(*args, **kwargs):
+                with metrics.time(stage, nbytes=sampled_size(args)):
+                    return value(*args, **kwargs)
+
+        timed.__name__ = attr
+        self.__dict__[attr] = timed
+        return timed
+
+
+def instrument_backend(backend, metrics, name):
+    """Wrap ``backend`` for timing when stats are available, else return it unchanged."""
+    if metrics is None or metrics.stats is None:
+        return backend
+    return InstrumentedBackend(backend, metrics, name)
+
+
+class StageTimingSpiderMiddleware:
+    """Times spider callbacks (``parse``, ``_parse_screener_api_view``, ...).
+
+    Only time spent inside the callback generator is measured; work done by
+    the engine between yielded values is excluded. One observation is
+    recorded per response, with the response body size as bytes.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(StageMetrics(crawler.stats))
+
+    @staticmethod
+    def _stage(response):
+        callback = getattr(response.request, "callback", None) if response.request else None
+        return f"spider/{getattr(callback, '__name__', None) or 'parse'}"
+
+    def process_spider_output(self, response, result, spider=None):
+        stage = self._stage(response)
+        iterator = iter(result)
+        elapsed = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                break
+            except Exception:
+                elapsed += time.perf_counter() - start
+                self.metrics.observe(stage, elapsed, error=True, nbytes=len(response.body))
+                raise
+            elapsed += time.perf_counter() - start
+            yield value
+        self.metrics.observe(stage, elapsed, nbytes=len(response.body))
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        stage = self._stage(response)
+        iterator = result.__aiter__()
+        elapsed = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                value = await iterator.__anext__()
+            except StopAsyncIteration:
+                elapsed += time.perf_counter() - start
+                break
+            except Exception:
+                elapsed += time.perf_counter() - start
+                self.metrics.observe(stage, elapsed, error=True, nbytes=len(response.body))
+                raise
+            elapsed += time.perf_counter() - start
+            yield value
+        self.metrics.observe(stage, elapsed, nbytes=len(response.body))
+
+
+# Scrapy core stats exported alongside the stage metrics.
+_CORE_STATS = {
+    "elapsed_time_seconds": "nse_scrapy_elapsed_seconds",
+    "item_scraped_count": "nse_scrapy_items_scraped",
+    "item_dropped_count": "nse_scrapy_items_dropped",
+    "response_received_count": "nse_scrapy_responses_received",
+    "downloader/request_bytes": "nse_scrapy_request_bytes",
+    "downloader/response_bytes": "nse_scrapy_response_bytes",
+    "retry/count": "nse_scrapy_retries",
+    "log_count/ERROR": "nse_scrapy_log_errors",
+}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus(stats, spider_name):
+    """Render stage metrics and core Scrapy stats in Prometheus text format."""
+    stages = {}
+    prefix = STATS_PREFIX + "/"
+    for key, value in stats.items():
+        if not key.startswith(prefix):
+            continue
+        stage, _, field = key[len(prefix):].rpartition("/")
+        if stage.endswith("/bucket"):
+            stage = stage[: -len("/bucket")]
+            stages.setdefault(stage, {}).setdefault("buckets", {})[float(field)] = value
+        else:
+            stages.setdefault(stage, {})[field] = value
+
+    spider = _label(spider_name)
+    lines = [
+        "# HELP nse_stage_latency_seconds Latency of spider callbacks, pipeline stages and backend calls.",
+        "# TYPE nse_stage_latency_seconds histogram",
+    ]
+    for stage in sorted(stages):
+        data = stages[stage]
+        labels = f'spider="{spider}",stage="{_label(stage)}"'
+        cumulative = 0
+        buckets = data.get("buckets", {})
+        for bound in LATENCY_BUCKETS_MS:
+            cumulative += buckets.get(float(bound), 0)
+            lines.append(f'nse_stage_latency_seconds_bucket{{{labels},le="{bound / 1000.0:g}"}} {cumulative}')
+        count = data.get("count", 0)
+        lines.append(f'nse_stage_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"nse_stage_latency_seconds_sum{{{labels}}} {data.get('time_ms_sum', 0) / 1000.0:.6f}")
+        lines.append(f"nse_stage_latency_seconds_count{{{labels}}} {count}")
+
+    for field, metric, help_text in (
+        ("errors", "nse_stage_errors_total", "Exceptions raised per stage."),
+        ("bytes", "nse_stage_bytes_total", "Bytes received (spider) or sent (backend writes) per stage."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for stage in sorted(stages):
+            if field in stages[stage]:
+                lines.append(f'{metric}{{spider="{spider}",stage="{_label(stage)}"}} {stages[stage][field]}')
+
+    for stat_key, metric in _CORE_STATS.items():
+        value = stats.get(stat_key)
+        if isinstance(value, (int, float)):
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f'{metric}{{spider="{spider}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """Publishes crawl metrics for Prometheus.
+
+    Enabled when ``PROMETHEUS_TEXTFILE`` (path for the node_exporter textfile
+    collector, written on spider close) and/or ``PROMETHEUS_PORT`` (serve
+    ``/metrics`` on localhost while the crawl runs) is set.
+    """
+
+    def __init__(self, stats, textfile=None, port=None, host="127.0.0.1"):
+        self.stats = stats
+        self.textfile = textfile
+        self.port = port
+        self.host = host
+        self.spider_name = ""
+        self._server = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        textfile = crawler.settings.get("PROMETHEUS_TEXTFILE")
+        port = crawler.settings.getint("PROMETHEUS_PORT", 0)
+        if not textfile and not port:
+            raise NotConfigured("PROMETHEUS_TEXTFILE / PROMETHEUS_PORT not set")
+        ext = cls(
+            crawler.stats,
+            textfile=textfile,
+            port=port or None,
+            host=crawler.settings.get("PROMETHEUS_HOST", "127.0.0.1"),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def render(self):
+        return render_prometheus(self.stats.get_stats(), self.spider_name)
+
+    def spider_opened(self, spider):
+        self.spider_name = spider.name
+        if self.port:
+            self._start_server()
+
+    def spider_closed(self, spider, reason=None):
+        if self.textfile:
+            self._write_textfile()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _write_textfile(self):
+        try:
+            directory = os.path.dirname(self.textfile)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.textfile}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.textfile)
+            logger.info("Prometheus metrics written to %s", self.textfile)
+        except OSError:
+            logger.exception("Failed to write Prometheus textfile %s", self.textfile)
+
+    def _start_server(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics endpoint: " + format, *args)
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        except OSError:
+            logger.exception("Could not bind Prometheus endpoint on %s:%s", self.host, self.port)
+            return
+        thread = threading.Thread(target=self._server.serve_forever, name="prometheus-metrics", daemon=True)
+        thread.start()
+        logger.info("Prometheus metrics served on http://%s:%s/metrics", self.host, self.port)
@@ -1,5 +1,22 @@
+"""Item schemas yielded by the spiders.
+
+``AfxQuote`` (afx_scraper) and ``StockAnalysisRecord`` (stockanalysis_scraper)
+are ``__slots__`` dataclasses built with ``build()``: each field's coercer
+(``_COERCE``) runs once at the spider boundary, and a row whose required
+field is missing or cannot be coerced raises ``InvalidItem``. Downstream stages trust built items: pipelines do not re-validate
+them, read them like mappings (``item["ticker_symbol"]``, ``item.get(...)``)
+and call ``as_dict()`` once for the storage record. Scrapy treats them as
+dataclass items, so feed exports and ``ItemAdapter`` work unchanged.
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+
 from scrapy.item import Item, Field
 
+from .db.stockanalysis_metrics import normalize_metric_value
+from .serialization import parse_timestamp
+
 
 class NseScraperItem(Item):
     """Item for holding stock data"""
@@ -8,3 +25,167 @@ class NseScraperItem(Item):
     stock_price = Field()
     stock_change = Field()
     created_at = Field()
+
+
+class InvalidItem(ValueError):
+    """A scraped row is missing a required field or has one that cannot be coerced."""
+
+
+def _text(value):
+    if value.__class__ is str:
+        return value.strip() or None
+    if value is None:
+        return None
+    text = value.strip() if isinstance(value, str) else str(value).strip()
+    return text or None
+
+
+def _symbol(value):
+    text = _text(value)
+    return text.upper() if text else None
+
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, float):
+        return value
+    if isinstance(value, int):
+        return float(value)
+    value = normalize_metric_value(value)
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def _integer(value):
+    value = _number(value)
+    return int(value) if value is not None and value.is_integer() else None
+
+
+def _timestamp(value):
+    """Aware ``datetime`` (naive values are taken as UTC)."""
+    if value.__class__ is datetime and value.tzinfo is not None:
+        return value
+    if not isinstance(value, datetime):
+        value = parse_timestamp(value) if isinstance(value, str) else None
+        if value is None:
+            return None
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _iso_timestamp(value):
+    """ISO-8601 text, the form StockAnalysis records are stored and exported in."""
+    value = _timestamp(value)
+    return value.isoformat() if value is not None else None
+
+
+def _mapping(value):
+    return value if isinstance(value, dict) else {}
+
+
+class _Record:
+    """Read-only mapping access shared by the item schemas."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self._FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._FIELD_SET else default
+
+    def __contains__(self, key):
+        return key in self._FIELD_SET
+
+    def keys(self):
+        return self._FIELDS
+
+    @classmethod
+    def build(cls, **raw):
+        """Validated, coerced item; raises ``InvalidItem`` for an unusable row."""
+        unknown = raw.keys() - cls._FIELD_SET
+        if unknown:
+            raise TypeError(f"{cls.__name__}.build() got unexpected fields: {', '.join(sorted(unknown))}")
+        values = []
+        for name, coerce, required in cls._CHECKS:
+            value = coerce(raw.get(name))
+            if value is None and required:
+                raise InvalidItem(f"{cls.__name__}: missing or invalid {name}")
+            values.append(value)
+        return cls(*values)
+
+    def as_dict(self):
+        """The item as a plain dict (shallow), for storage backends and serialisation."""
+        return {name: getattr(self, name) for name in self._FIELDS}
+
+
+def _schema(cls):
+    """Record the field order and the (name, coercer, required) checks ``build`` runs."""
+    names = tuple(field.name for field in fields(cls))
+    cls._FIELDS = names
+    cls._FIELD_SET = frozenset(names)
+    cls._CHECKS = tuple((name, cls._COERCE[name], name in cls._REQUIRED) for name in names)
+    return cls
+
+
+@_schema
+@dataclass(slots=True)
+class AfxQuote(_Record):
+    """One row of the afx.kwayisi.org NSE board."""
+
+    ticker_symbol: str
+    stock_name: str
+    stock_price: float
+    stock_change: float | None
+    scraped_at: datetime
+    created_at: datetime | None
+    run_id: str | None
+
+    _COERCE = {
+        "ticker_symbol": _text,
+        "stock_name": _text,
+        "stock_price": _number,
+        "stock_change": _number,
+        "scraped_at": _timestamp,
+        "created_at": _timestamp,
+        "run_id": _text,
+    }
+    _REQUIRED = ("ticker_symbol", "stock_name", "stock_price", "scraped_at")
+
+
+@_schema
+@dataclass(slots=True)
+class StockAnalysisRecord(_Record):
+    """One stock in one stockanalysis.com screener view; metrics are keyed by screener column id."""
+
+    source: str
+    view: str
+    symbol: str
+    ticker_symbol: str
+    rank: int | None
+    company_name: str | None
+    stock_name: str | None
+    stock_price: float | None
+    stock_change: float | None
+    created_at: str | None
+    metrics_raw: dict
+    metrics: dict
+    scraped_at: str | None
+
+    _COERCE = {
+        "source": _text,
+        "view": _text,
+        "symbol": _symbol,
+        "ticker_symbol": _symbol,
+        "rank": _integer,
+        "company_name": _text,
+        "stock_name": _text,
+        "stock_price": _number,
+        "stock_change": _number,
+        "created_at": _iso_timestamp,
+        "metrics_raw": _mapping,
+        "metrics": _mapping,
+        "scraped_at": _iso_timestamp,
+    }
+    _REQUIRED = ("source", "view", "symbol", "ticker_symbol")
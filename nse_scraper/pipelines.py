@@ -1,14 +1,32 @@
 # useful for handling different item types with a single interface
 import logging
+import time
+
 from scrapy.exceptions import DropItem
 
-from .db import create_backend
+from .db import STOCKANALYSIS_BACKENDS, backend_names, backend_options_from_settings, create_backend
+from .instrumentation import StageMetrics, instrument_backend
+from .items import AfxQuote
+from .runs import FINISHED
+from .serialization import to_iso
 
 logger = logging.getLogger(__name__)
 
 STOCKANALYSIS_VIEWS = ("overview", "performance", "dividends", "price", "profile")
 
 
+def _record_fallback_writes(storage, metrics):
+    """Copy the backend's local-fallback write count (and fan-out counters) into the crawl stats."""
+    if metrics.stats is None:
+        return
+    fallback_writes = getattr(storage, "fallback_count", 0)
+    if fallback_writes:
+        metrics.stats.inc_value("nse/storage/fallback_writes", fallback_writes)
+    record_stats = getattr(storage, "record_stats", None)
+    if record_stats is not None:
+        record_stats(metrics.stats)
+
+
 class NseScraperPipeline:
     def __init__(
         self,
@@ -21,9 +39,21 @@ class NseScraperPipeline:
         supabase_url,
         supabase_key,
         supabase_table,
+        stats=None,
+        tickstore_path=None,
+        rolling_state_path=None,
+        **backend_options,
     ):
         self.db_backend = db_backend
-        self.storage = create_backend(
+        self.metrics = StageMetrics(stats)
+        self.tickstore_path = tickstore_path
+        self.tickstore = None
+        self.rolling_state_path = rolling_state_path
+        self.rolling = None
+        self.crawler = None
+        self.run = None
+        self.written = 0
+        storage = create_backend(
             backend_name=db_backend,
             mongodb_uri=mongodb_uri,
             mongo_database=mongo_db,
@@ -33,11 +63,15 @@ class NseScraperPipeline:
             supabase_url=supabase_url,
             supabase_key=supabase_key,
             supabase_table=supabase_table,
+            **backend_options,
         )
+        # Async backends return coroutines, which Scrapy awaits on its asyncio loop.
+        self.is_async = getattr(storage, "is_async", False)
+        self.storage = instrument_backend(storage, self.metrics, db_backend)
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(
+        pipeline = cls(
             db_backend=crawler.settings.get("DB_BACKEND", "mongo"),
             mongodb_uri=crawler.settings.get("MONGODB_URI"),
             mongo_db=crawler.settings.get("MONGO_DATABASE", "nse_data"),
@@ -47,34 +81,152 @@ class NseScraperPipeline:
             supabase_url=crawler.settings.get("SUPABASE_URL"),
             supabase_key=crawler.settings.get("SUPABASE_KEY"),
             supabase_table=crawler.settings.get("SUPABASE_TABLE", "stock_data"),
+            stats=crawler.stats,
+            tickstore_path=crawler.settings.get("TICKSTORE_PATH") or None,
+            rolling_state_path=crawler.settings.get("ROLLING_STATE_PATH") or None,
+            **backend_options_from_settings(crawler.settings),
         )
+        pipeline.crawler = crawler
+        return pipeline
 
     def open_spider(self, spider=None):
         """Called when spider is opened"""
+        self._open_tickstore()
+        self._open_rolling()
+        spider = spider or getattr(self.crawler, "spider", None)
+        # Spiders that scrape a whole board in one go (AFX) carry a ``ScrapeRun``.
+        self.run = getattr(spider, "run", None)
+        self.written = 0
+        if self.is_async:
+            return self._open_spider_async()
         self.storage.open()
         logger.info("Storage backend active: %s", self.db_backend)
+        self._record_run()
+
+    async def _open_spider_async(self):
+        await self.storage.open()
+        logger.info("Storage backend active: %s", self.db_backend)
+        await self._record_run_async()
 
     def close_spider(self, spider=None):
         """Called when spider is closed"""
+        self._close_tickstore()
+        self._close_rolling()
+        if self.run is not None:
+            self.run.finish(self.written, FINISHED)
+        if self.is_async:
+            return self._close_spider_async()
+        self._record_run()
+        # A fan-out backend finishes its queued writes in close(), so count after it.
         self.storage.close()
+        _record_fallback_writes(self.storage, self.metrics)
+        logger.info("Storage backend closed")
+
+    async def _close_spider_async(self):
+        await self._record_run_async()
+        await self.storage.close()
+        _record_fallback_writes(self.storage, self.metrics)
         logger.info("Storage backend closed")
 
+    def _record_run(self):
+        """Upsert the run into ``scrape_runs``; bookkeeping never fails the crawl."""
+        if self.run is None or not hasattr(self.storage, "upsert_run"):
+            return
+        try:
+            self.storage.upsert_run(self.run.as_record())
+        except Exception:
+            logger.exception("Failed to record run %s", self.run.run_id)
+
+    async def _record_run_async(self):
+        if self.run is None or not hasattr(self.storage, "upsert_run"):
+            return
+        try:
+            await self.storage.upsert_run(self.run.as_record())
+        except Exception:
+            logger.exception("Failed to record run %s", self.run.run_id)
+
+    def _open_tickstore(self):
+        if not self.tickstore_path:
+            return
+        # numpy is only needed when the local tick store is enabled.
+        from .tickstore import TickStore
+
+        self.tickstore = TickStore(self.tickstore_path).open()
+
+    def _close_tickstore(self):
+        if self.tickstore is None:
+            return
+        try:
+            with self.metrics.time("pipeline/tickstore/flush"):
+                self.tickstore.close()
+        except Exception:
+            logger.exception("Failed to flush tick store %s", self.tickstore_path)
+
+    def _append_tick(self, data):
+        """Mirror a stored quote into the local tick store; never fails the item."""
+        if self.tickstore is None:
+            return
+        try:
+            self.tickstore.append(data)
+        except Exception:
+            logger.exception("Failed to append %s to tick store", data.get("ticker_symbol"))
+
+    def _open_rolling(self):
+        if not self.rolling_state_path:
+            return
+        from .rolling import RollingStore
+
+        self.rolling = RollingStore(self.rolling_state_path).open()
+
+    def _close_rolling(self):
+        if self.rolling is None:
+            return
+        try:
+            with self.metrics.time("pipeline/rolling/save"):
+                self.rolling.close()
+        except Exception:
+            logger.exception("Failed to save rolling state %s", self.rolling_state_path)
+
+    def _update_rolling(self, data):
+        """Fold a stored quote into the rolling statistics; never fails the item."""
+        if self.rolling is None:
+            return
+        try:
+            self.rolling.update(data)
+        except Exception:
+            logger.exception("Failed to update rolling state for %s", data.get("ticker_symbol"))
+
+    @classmethod
+    def _record(cls, item):
+        """The storage record for ``item``. Typed items were validated when the spider built them."""
+        if isinstance(item, AfxQuote):
+            return item.as_dict()
+        cls._validate(item)
+        return dict(item)
+
+    @staticmethod
+    def _validate(item):
+        if not item.get('ticker_symbol'):
+            raise DropItem(f'Missing ticker_symbol in {item}')
+        if not item.get('stock_name'):
+            raise DropItem(f'Missing stock_name in {item}')
+        if item.get('stock_price') is None:
+            raise DropItem(f'Missing stock_price in {item}')
+
     def process_item(self, item, spider=None):
         """Process item and store to database"""
+        if self.is_async:
+            return self._process_item_async(item)
+        start = time.perf_counter()
+        failed = False
         try:
-            # Validate required fields
-            if not item.get('ticker_symbol'):
-                raise DropItem(f'Missing ticker_symbol in {item}')
-            if not item.get('stock_name'):
-                raise DropItem(f'Missing stock_name in {item}')
-            if item.get('stock_price') is None:
-                raise DropItem(f'Missing stock_price in {item}')
-            
-            # Convert to dict
-            data = dict(item)
+            data = self._record(item)
             
             # Replace or insert the document
             self.storage.upsert_stock(data)
+            self.written += 1
+            self._append_tick(data)
+            self._update_rolling(data)
             logger.debug(f"Upserted stock data for {data['ticker_symbol']}")
             
             return item
@@ -83,26 +235,68 @@ class NseScraperPipeline:
             logger.warning(f"Dropped item: {e}")
             raise
         except Exception as e:
+            failed = True
+            logger.error(f"Error processing item: {e}", exc_info=True)
+            raise DropItem(f"Failed to process item: {e}")
+        finally:
+            self.metrics.observe("pipeline/process_item", time.perf_counter() - start, error=failed)
+
+    async def _process_item_async(self, item):
+        """Async variant: awaits the backend, which batches concurrent upserts."""
+        start = time.perf_counter()
+        failed = False
+        try:
+            data = self._record(item)
+            await self.storage.upsert_stock(data)
+            self.written += 1
+            self._append_tick(data)
+            self._update_rolling(data)
+            logger.debug(f"Upserted stock data for {data['ticker_symbol']}")
+            return item
+        except DropItem as e:
+            logger.warning(f"Dropped item: {e}")
+            raise
+        except Exception as e:
+            failed = True
             logger.error(f"Error processing item: {e}", exc_info=True)
             raise DropItem(f"Failed to process item: {e}")
+        finally:
+            self.metrics.observe("pipeline/process_item", time.perf_counter() - start, error=failed)
 
 
 class StockAnalysisPipeline:
-    """Groups per-view StockAnalysis items by ticker_symbol and upserts one row per stock to Supabase."""
+    """Groups per-view StockAnalysis items by ticker_symbol and upserts one row per stock.
+
+    Active for the backends in ``STOCKANALYSIS_BACKENDS`` (Supabase, embedded);
+    with a fan-out ``DB_BACKEND`` it writes to each listed backend that is one.
+    Its retry spool is ``<backend>-stockanalysis``, apart from the quote
+    pipeline's spool for the same backend.
+    When the crawl closes, the stored rows become the run's exchange, sector
+    and industry index points (``nse_scraper.indices``).
+    """
 
-    def __init__(self, db_backend, supabase_url, supabase_key, stockanalysis_table):
+    def __init__(self, db_backend, supabase_url, supabase_key, stockanalysis_table, stats=None, run_id=None,
+                 **backend_options):
         self.db_backend = (db_backend or "").strip().lower()
         self.stockanalysis_table = stockanalysis_table
+        self.metrics = StageMetrics(stats)
         self.storage = None
-        if self.db_backend == "supabase":
-            self.storage = create_backend(
-                backend_name="supabase",
+        targets = [name for name in backend_names(self.db_backend) if name in STOCKANALYSIS_BACKENDS]
+        if targets:
+            self.db_backend = ",".join(targets)
+            storage = create_backend(
+                backend_name=self.db_backend,
                 supabase_url=supabase_url,
                 supabase_key=supabase_key,
                 supabase_table="stock_data",
                 stockanalysis_table=stockanalysis_table,
+                spool_label="stockanalysis",
+                **backend_options,
             )
+            self.storage = instrument_backend(storage, self.metrics, self.db_backend)
+        self.run_id = run_id
         self._buffer = {}
+        self._stored = []
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -111,12 +305,15 @@ class StockAnalysisPipeline:
             supabase_url=crawler.settings.get("SUPABASE_URL"),
             supabase_key=crawler.settings.get("SUPABASE_KEY"),
             stockanalysis_table=crawler.settings.get("STOCKANALYSIS_TABLE", "stockanalysis_stocks"),
+            stats=crawler.stats,
+            run_id=crawler.settings.get("NSE_RUN_ID"),
+            **backend_options_from_settings(crawler.settings),
         )
 
     def open_spider(self, spider=None):
         if self.storage:
             self.storage.open()
-            logger.info("StockAnalysisPipeline: Supabase storage active")
+            logger.info("StockAnalysisPipeline: %s storage active", self.db_backend)
 
     def close_spider(self, spider=None):
         if self.storage and self._buffer:
@@ -124,7 +321,9 @@ class StockAnalysisPipeline:
                 self._upsert_one(ticker_symbol, views)
             self._buffer.clear()
         if self.storage:
+            self._publish_indices()
             self.storage.close()
+            _record_fallback_writes(self.storage, self.metrics)
 
     def _upsert_one(self, ticker_symbol, views):
         """Build one normalized record from view dict and upsert."""
@@ -132,10 +331,9 @@ class StockAnalysisPipeline:
         prefer = views.get("overview") or next(iter(views.values()), None)
         if not prefer:
             return
-        item = dict(prefer) if hasattr(prefer, "keys") else prefer
-        scraped_at = item.get("scraped_at")
-        if hasattr(scraped_at, "isoformat"):
-            scraped_at = scraped_at.isoformat()
+        # Typed records and dicts are read in place; nothing is copied.
+        item = prefer
+        scraped_at = to_iso(item.get("scraped_at"))
         record = {
             "ticker_symbol": ticker_symbol,
             "company_name": item.get("company_name") or item.get("stock_name") or "",
@@ -160,13 +358,38 @@ class StockAnalysisPipeline:
                 record["price_metrics"] = {k: raw[k] for k in raw if k not in ("price", "change")}
             else:
                 record[f"{view_name}_metrics"] = dict(raw)
+        start = time.perf_counter()
         try:
             self.storage.upsert_stockanalysis_stock(record)
             logger.debug("Upserted stockanalysis_stocks: %s", ticker_symbol)
         except Exception as e:
+            self.metrics.observe("pipeline/stockanalysis/_upsert_one", time.perf_counter() - start, error=True)
             logger.error("Failed to upsert stockanalysis_stocks %s: %s", ticker_symbol, e, exc_info=True)
+        else:
+            self.metrics.observe("pipeline/stockanalysis/_upsert_one", time.perf_counter() - start)
+            self._stored.append(record)
+
+    def _publish_indices(self):
+        """Write the run's index points; a failure is logged and never fails the crawl."""
+        if not self._stored or not hasattr(self.storage, "upsert_index_point"):
+            return
+        from .indices import publish_rows
+
+        try:
+            with self.metrics.time("pipeline/stockanalysis/indices"):
+                points = publish_rows(self.storage, self._stored, run_id=self.run_id)
+        except Exception:
+            logger.exception("Failed to publish index points")
+            return
+        finally:
+            self._stored = []
+        logger.info("Published %s index points", len(points))
 
     def process_item(self, item, spider=None):
+        with self.metrics.time("pipeline/stockanalysis/process_item"):
+            return self._process_item(item)
+
+    def _process_item(self, item):
         if getattr(item, "get", None) is None:
             item = dict(item)
         source = item.get("source")
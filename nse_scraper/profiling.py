@@ -0,0 +1,251 @@
+"""
+Opt-in profiling of spider runs.
+
+Enable with ``NSE_PROFILE`` (environment or ``-s NSE_PROFILE=...``), a
+comma-separated list of:
+
+- ``cprofile``: deterministic profile of the whole crawl (``profile.pstats``,
+  ``profile.txt``) plus ``callbacks.txt`` restricted to project code, i.e.
+  spider callbacks, pipeline stages and storage backends.
+- ``sampling``: wall-clock stack sampler of the reactor thread, written as
+  ``stacks.collapsed`` (flamegraph.pl / speedscope compatible) and
+  ``callbacks-sampled.txt`` sample counts per project function.
+- ``tracemalloc``: top allocation sites and peak traced memory
+  (``allocations.txt``).
+
+Output goes to ``PROFILE_DIR/<spider>-<timestamp>`` (default
+``reports/profiles``). When ``NSE_PROFILE`` is empty the extension is not
+installed at all, so a normal crawl pays nothing.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling", "tracemalloc")
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_modes(value):
+    """Parse an ``NSE_PROFILE`` value into an ordered tuple of modes."""
+    if not value:
+        return ()
+    modes = []
+    for part in str(value).replace(";", ",").split(","):
+        mode = part.strip().lower()
+        if not mode or mode in ("0", "off", "false", "none"):
+            continue
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unsupported NSE_PROFILE mode {mode!r}. Use any of: {', '.join(PROFILE_MODES)}")
+        if mode not in modes:
+            modes.append(mode)
+    return tuple(modes)
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(_PACKAGE_DIR):
+        module = "nse_scraper" + filename[len(_PACKAGE_DIR):-3].replace(os.sep, ".")
+    else:
+        module = os.path.splitext(os.path.basename(filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+def _is_project_code(filename):
+    return filename.startswith(_PACKAGE_DIR) and os.path.abspath(filename) != os.path.abspath(__file__)
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval.
+
+    Stacks are aggregated as ``root;...;leaf`` strings, the collapsed format
+    understood by flamegraph.pl, inferno and speedscope.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005, max_depth=128):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="nse-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def project_function_counts(self):
+        """Inclusive sample counts for every project function seen on a stack."""
+        counts = Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack.split(";")):
+                if label.startswith("nse_scraper."):
+                    counts[label] += count
+        return counts
+
+
+class CrawlProfiler:
+    """Scrapy extension that profiles a crawl from spider open to close."""
+
+    def __init__(self, modes, output_dir, sample_interval=0.005, tracemalloc_frames=10, top=40):
+        self.modes = modes
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top = top
+        self.run_dir = None
+        self._profile = None
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        modes = parse_modes(crawler.settings.get("NSE_PROFILE"))
+        if not modes:
+            raise NotConfigured("NSE_PROFILE not set")
+        ext = cls(
+            modes,
+            crawler.settings.get("PROFILE_DIR", os.path.join("reports", "profiles")),
+            sample_interval=crawler.settings.getfloat("PROFILE_SAMPLE_INTERVAL", 0.005),
+            tracemalloc_frames=crawler.settings.getint("PROFILE_TRACEMALLOC_FRAMES", 10),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+        self.run_dir = os.path.join(self.output_dir, f"{spider.name}-{stamp}")
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._started = time.perf_counter()
+        if "tracemalloc" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._started_tracemalloc = True
+        if "sampling" in self.modes:
+            self._sampler = StackSampler(interval=self.sample_interval)
+            self._sampler.start()
+        if "cprofile" in self.modes:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        logger.info("Profiling %s (%s) into %s", spider.name, ",".join(self.modes), self.run_dir)
+
+    def spider_closed(self, spider, reason=None):
+        if self.run_dir is None:
+            return
+        files = []
+        if self._profile is not None:
+            self._profile.disable()
+            files += self._dump_cprofile()
+            self._profile = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            files += self._dump_sampling()
+            self._sampler = None
+        if "tracemalloc" in self.modes and tracemalloc.is_tracing():
+            files += self._dump_tracemalloc()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        summary = {
+            "spider": spider.name,
+            "modes": list(self.modes),
+            "reason": reason,
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+            "files": files,
+        }
+        with open(os.path.join(self.run_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        logger.info("Profile written to %s", self.run_dir)
+
+    def _dump_cprofile(self):
+        self._profile.dump_stats(os.path.join(self.run_dir, "profile.pstats"))
+        text = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        with open(os.path.join(self.run_dir, "profile.txt"), "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+
+        rows = []
+        for (filename, lineno, name), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            if _is_project_code(filename):
+                module = "nse_scraper" + filename[len(_PACKAGE_DIR):-3].replace(os.sep, ".")
+                rows.append((ct, tt, nc, f"{module}:{name}:{lineno}"))
+        rows.sort(reverse=True)
+        with open(os.path.join(self.run_dir, "callbacks.txt"), "w", encoding="utf-8") as f:
+            f.write("Project functions (spider callbacks, pipelines, backends) by cumulative time\n")
+            f.write(f"{'cumtime_s':>12} {'tottime_s':>12} {'calls':>10}  function\n")
+            for ct, tt, nc, label in rows:
+                f.write(f"{ct:>12.6f} {tt:>12.6f} {nc:>10}  {label}\n")
+        return ["profile.pstats", "profile.txt", "callbacks.txt"]
+
+    def _dump_sampling(self):
+        self._sampler.write_collapsed(os.path.join(self.run_dir, "stacks.collapsed"))
+        counts = self._sampler.project_function_counts()
+        total = self._sampler.samples or 1
+        with open(os.path.join(self.run_dir, "callbacks-sampled.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Inclusive samples per project function ({self._sampler.samples} samples, "
+                    f"{self.sample_interval * 1000:g} ms interval)\n")
+            for label, count in counts.most_common():
+                f.write(f"{count:>10} {100.0 * count / total:>6.1f}%  {label}\n")
+        return ["stacks.collapsed", "callbacks-sampled.txt"]
+
+    def _dump_tracemalloc(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            )
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        with open(os.path.join(self.run_dir, "allocations.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n\n")
+            f.write(f"Top {self.top} allocation sites by size\n")
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                f.write(f"{stat}\n")
+            f.write("\nTop 10 allocation tracebacks\n")
+            for stat in snapshot.statistics("traceback")[:10]:
+                f.write(f"\n{stat.count} blocks, {stat.size / 1024:.1f} KiB\n")
+                for line in stat.traceback.format():
+                    f.write(f"{line}\n")
+        return ["allocations.txt"]
@@ -0,0 +1,393 @@
+"""
+Cross-source price reconciliation: the AFX board against StockAnalysis.
+
+Both spiders scrape the same NSE tickers. Once both have run, each source's
+latest quote per ticker is loaded into NumPy columns (sorted by ticker) and
+the two are joined and compared in one vectorized pass:
+
+- price divergence: ``|stockanalysis - afx| / afx`` above
+  ``RECONCILE_PRICE_TOLERANCE_PCT`` percent;
+- change divergence: StockAnalysis reports the day's change in percent and
+  AFX in shillings, so the AFX change is converted
+  (``change / (price - change)``) and compared against
+  ``RECONCILE_CHANGE_TOLERANCE_PCT`` percentage points;
+- coverage: tickers only one source has (``missing_in_afx``,
+  ``missing_in_stockanalysis``);
+- staleness: for every ticker, the source whose quote is more than
+  ``RECONCILE_STALE_AFTER`` seconds older than the other's is named stale,
+  and the source whose median quote lags by that much is the report's
+  ``stale_source``. A divergence with no stale side is a real disagreement.
+
+Each run appends one JSON line to ``RECONCILE_PATH`` (default
+``reports/reconciliation/runs.jsonl``): the counts, a stats summary
+(median/p95/max price gap, median lag) and the divergent tickers. The
+StockAnalysis snapshot is cached and only reloaded when its feed file
+changes (or after ``max_age`` seconds for a backend), so the polling daemon
+can reconcile after every cycle (``--reconcile``).
+
+    python -m nse_scraper.reconcile                     # both sources from DB_BACKEND
+    python -m nse_scraper.reconcile --stockanalysis stockanalysis_output.jsonl --afx afx_output.jsonl
+    python -m nse_scraper.reconcile --backend embedded --price-tolerance 0.5 --json
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .serialization import dumps, loads, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+AFX = "afx"
+STOCKANALYSIS = "stockanalysis"
+
+DEFAULT_RECONCILE_PATH = os.path.join("reports", "reconciliation", "runs.jsonl")
+DEFAULT_PRICE_TOLERANCE_PCT = 1.0
+DEFAULT_CHANGE_TOLERANCE_PCT = 0.5
+DEFAULT_STALE_AFTER = 1800.0
+DEFAULT_MAX_AGE = 300.0
+
+_NAT = np.datetime64("NaT", "us")
+
+
+def _float(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _datetime64(value):
+    at = parse_timestamp(value)
+    if at is None:
+        return _NAT
+    return np.datetime64(at.astimezone(timezone.utc).replace(tzinfo=None), "us")
+
+
+def read_feed(path):
+    """Records from a spider feed file (JSON lines or a JSON array)."""
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if data.lstrip().startswith(b"["):
+        return loads(data)
+    return [loads(line) for line in data.splitlines() if line.strip()]
+
+
+class Quotes:
+    """One source's latest quote per ticker as NumPy columns, sorted by ticker.
+
+    Records need ``ticker_symbol``, ``stock_price``, ``stock_change`` and
+    ``scraped_at`` (``created_at`` when there is none); when a ticker appears
+    more than once (one StockAnalysis record per screener view, several
+    scrapes in a feed) the newest quote wins.
+    """
+
+    def __init__(self, source, records, version=None):
+        self.source = source
+        self.version = version
+        latest = {}
+        for record in records:
+            ticker = record.get("ticker_symbol")
+            if not ticker:
+                continue
+            at = _datetime64(record.get("scraped_at") or record.get("created_at"))
+            current = latest.get(ticker)
+            if current is None or (not np.isnat(at) and (np.isnat(current[0]) or at >= current[0])):
+                latest[ticker] = (at, record.get("stock_price"), record.get("stock_change"))
+        tickers = sorted(latest)
+        self.tickers = np.array(tickers, dtype=str)
+        self.price = np.array([_float(latest[ticker][1]) for ticker in tickers], dtype=np.float64)
+        self.change = np.array([_float(latest[ticker][2]) for ticker in tickers], dtype=np.float64)
+        self.at = np.array([latest[ticker][0] for ticker in tickers], dtype="datetime64[us]")
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def latest_at(self):
+        present = self.at[~np.isnat(self.at)]
+        return _isoformat(present.max()) if len(present) else None
+
+
+def _isoformat(value):
+    if np.isnat(value):
+        return None
+    return value.astype(datetime).replace(tzinfo=timezone.utc).isoformat()
+
+
+def _number(value, digits=4):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+@dataclass
+class ReconciliationReport:
+    run_id: str
+    generated_at: str
+    afx_tickers: int
+    stockanalysis_tickers: int
+    matched: int
+    price_diverged: int
+    change_diverged: int
+    missing_in_afx: list
+    missing_in_stockanalysis: list
+    stale: dict
+    stale_source: str | None
+    afx_latest_at: str | None
+    stockanalysis_latest_at: str | None
+    tolerances: dict
+    stats: dict
+    divergences: list = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self):
+        return not (self.price_diverged or self.change_diverged or self.missing_in_afx
+                    or self.missing_in_stockanalysis or self.stale_source)
+
+    def as_dict(self):
+        return asdict(self)
+
+    def summary(self):
+        """One log line: the counts that matter after a cycle."""
+        return (f"reconcile run={self.run_id} matched={self.matched} price_diverged={self.price_diverged} "
+                f"change_diverged={self.change_diverged} missing_in_afx={len(self.missing_in_afx)} "
+                f"missing_in_stockanalysis={len(self.missing_in_stockanalysis)} "
+                f"stale_source={self.stale_source or '-'} "
+                f"p95_price_gap={_pct(self.stats['abs_price_gap_pct']['p95'])} in {self.elapsed_ms}ms")
+
+
+def _pct(value):
+    return "-" if value is None else f"{value}%"
+
+
+def _distribution(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"median": None, "p95": None, "max": None}
+    median, p95 = np.percentile(values, [50, 95])
+    return {"median": _number(median), "p95": _number(p95), "max": _number(values.max())}
+
+
+def reconcile(afx, stockanalysis, run_id=None, price_tolerance=DEFAULT_PRICE_TOLERANCE_PCT,
+              change_tolerance=DEFAULT_CHANGE_TOLERANCE_PCT, stale_after=DEFAULT_STALE_AFTER):
+    """Compare two ``Quotes`` snapshots; returns a ``ReconciliationReport``."""
+    started = time.perf_counter()
+    generated_at = datetime.now(timezone.utc)
+    common, ia, ib = np.intersect1d(afx.tickers, stockanalysis.tickers, assume_unique=True, return_indices=True)
+    missing_in_stockanalysis = np.setdiff1d(afx.tickers, stockanalysis.tickers, assume_unique=True)
+    missing_in_afx = np.setdiff1d(stockanalysis.tickers, afx.tickers, assume_unique=True)
+
+    afx_price, sa_price = afx.price[ia], stockanalysis.price[ib]
+    afx_change, sa_change_pct = afx.change[ia], stockanalysis.change[ib]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_gap_pct = (sa_price - afx_price) / afx_price * 100.0
+        afx_change_pct = afx_change / (afx_price - afx_change) * 100.0
+    price_gap_pct[~np.isfinite(price_gap_pct)] = np.nan
+    afx_change_pct[~np.isfinite(afx_change_pct)] = np.nan
+    change_gap = sa_change_pct - afx_change_pct
+    # NaN compares False: a missing price or change never counts as divergent.
+    price_flag = np.abs(price_gap_pct) > price_tolerance
+    change_flag = np.abs(change_gap) > change_tolerance
+
+    lag = (afx.at[ia] - stockanalysis.at[ib]) / np.timedelta64(1, "s")  # > 0: StockAnalysis is older
+    afx_stale = lag < -stale_after
+    sa_stale = lag > stale_after
+    median_lag = _number(np.nanmedian(lag), 1) if np.any(~np.isnan(lag)) else None
+    stale_source = None
+    if median_lag is not None and abs(median_lag) > stale_after:
+        stale_source = STOCKANALYSIS if median_lag > 0 else AFX
+
+    flagged = np.flatnonzero(price_flag | change_flag)
+    divergences = [
+        {
+            "ticker_symbol": str(common[n]),
+            "afx_price": _number(afx_price[n]),
+            "stockanalysis_price": _number(sa_price[n]),
+            "price_gap_pct": _number(price_gap_pct[n]),
+            "afx_change_pct": _number(afx_change_pct[n]),
+            "stockanalysis_change_pct": _number(sa_change_pct[n]),
+            "price_diverged": bool(price_flag[n]),
+            "change_diverged": bool(change_flag[n]),
+            "stale": AFX if afx_stale[n] else STOCKANALYSIS if sa_stale[n] else None,
+            "lag_s": _number(lag[n], 1),
+        }
+        for n in flagged
+    ]
+    report = ReconciliationReport(
+        run_id=run_id or generated_at.strftime("%Y%m%dT%H%M%SZ"),
+        generated_at=generated_at.isoformat(),
+        afx_tickers=len(afx),
+        stockanalysis_tickers=len(stockanalysis),
+        matched=len(common),
+        price_diverged=int(price_flag.sum()),
+        change_diverged=int(change_flag.sum()),
+        missing_in_afx=missing_in_afx.tolist(),
+        missing_in_stockanalysis=missing_in_stockanalysis.tolist(),
+        stale={AFX: int(afx_stale.sum()), STOCKANALYSIS: int(sa_stale.sum())},
+        stale_source=stale_source,
+        afx_latest_at=afx.latest_at,
+        stockanalysis_latest_at=stockanalysis.latest_at,
+        tolerances={"price_pct": price_tolerance, "change_pct": change_tolerance, "stale_after_s": stale_after},
+        stats={
+            "abs_price_gap_pct": _distribution(np.abs(price_gap_pct)),
+            "abs_change_gap_pct": _distribution(np.abs(change_gap)),
+            "median_lag_s": median_lag,
+        },
+        divergences=divergences,
+    )
+    report.elapsed_ms = round((time.perf_counter() - started) * 1000.0, 3)
+    return report
+
+
+def append_report(path, report):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(dumps(report.as_dict()) + "\n")
+
+
+def afx_records_from_backend(backend):
+    return backend.iter_stocks()
+
+
+def stockanalysis_records_from_backend(backend):
+    return backend.iter_stockanalysis_stocks()
+
+
+class Reconciler:
+    """Reconciles AFX quotes against a cached StockAnalysis snapshot and records each report.
+
+    ``stockanalysis`` is a feed path or a backend with
+    ``iter_stockanalysis_stocks``; a file is reloaded when it changes, a
+    backend after ``max_age`` seconds.
+    """
+
+    def __init__(self, stockanalysis, path=DEFAULT_RECONCILE_PATH, price_tolerance=DEFAULT_PRICE_TOLERANCE_PCT,
+                 change_tolerance=DEFAULT_CHANGE_TOLERANCE_PCT, stale_after=DEFAULT_STALE_AFTER,
+                 max_age=DEFAULT_MAX_AGE):
+        self.stockanalysis = stockanalysis
+        self.path = path
+        self.price_tolerance = price_tolerance
+        self.change_tolerance = change_tolerance
+        self.stale_after = stale_after
+        self.max_age = max_age
+        self._snapshot = None
+        self._loaded_at = 0.0
+
+    def _version(self):
+        if isinstance(self.stockanalysis, (str, os.PathLike)):
+            stat = os.stat(self.stockanalysis)
+            return stat.st_mtime_ns, stat.st_size
+        return None
+
+    def snapshot(self):
+        """The StockAnalysis ``Quotes``, reloaded if the source has a newer scrape."""
+        version = self._version()
+        stale = (self._snapshot is None
+                 or (version is not None and version != self._snapshot.version)
+                 or (version is None and time.monotonic() - self._loaded_at > self.max_age))
+        if stale:
+            if version is not None:
+                records = read_feed(self.stockanalysis)
+            else:
+                records = stockanalysis_records_from_backend(self.stockanalysis)
+            self._snapshot = Quotes(STOCKANALYSIS, records, version)
+            self._loaded_at = time.monotonic()
+        return self._snapshot
+
+    def reconcile(self, afx_records, run_id=None):
+        """Reconcile ``afx_records`` (dicts or items); the report is appended to ``path`` when set."""
+        report = reconcile(Quotes(AFX, afx_records), self.snapshot(), run_id=run_id,
+                           price_tolerance=self.price_tolerance, change_tolerance=self.change_tolerance,
+                           stale_after=self.stale_after)
+        if self.path:
+            try:
+                append_report(self.path, report)
+            except OSError:
+                logger.exception("Failed to write reconciliation report to %s", self.path)
+        return report
+
+    @classmethod
+    def from_settings(cls, settings, stockanalysis, path=None):
+        return cls(
+            stockanalysis,
+            path=getattr(settings, "RECONCILE_PATH", DEFAULT_RECONCILE_PATH) if path is None else path,
+            price_tolerance=getattr(settings, "RECONCILE_PRICE_TOLERANCE_PCT", DEFAULT_PRICE_TOLERANCE_PCT),
+            change_tolerance=getattr(settings, "RECONCILE_CHANGE_TOLERANCE_PCT", DEFAULT_CHANGE_TOLERANCE_PCT),
+            stale_after=getattr(settings, "RECONCILE_STALE_AFTER", DEFAULT_STALE_AFTER),
+        )
+
+
+def _latest_run_id(backend):
+    list_runs = getattr(backend, "list_runs", None)
+    if list_runs is None:
+        return None
+    try:
+        runs = list_runs(limit=1, spider="afx_scraper")
+    except Exception:
+        logger.exception("Could not read the latest AFX run")
+        return None
+    return runs[0]["run_id"] if runs else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.reconcile", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--afx", help="AFX feed file (default: latest rows from the backend)")
+    parser.add_argument("--stockanalysis", help="StockAnalysis feed file (default: the backend)")
+    parser.add_argument("--backend", help="Read from this backend instead of DB_BACKEND")
+    parser.add_argument("--run-id", default=os.getenv("NSE_RUN_ID"),
+                        help="Report id (default: NSE_RUN_ID, else the latest AFX run)")
+    parser.add_argument("--price-tolerance", type=float, help="Percent (default RECONCILE_PRICE_TOLERANCE_PCT)")
+    parser.add_argument("--change-tolerance", type=float,
+                        help="Percentage points (default RECONCILE_CHANGE_TOLERANCE_PCT)")
+    parser.add_argument("--stale-after", type=float, help="Seconds (default RECONCILE_STALE_AFTER)")
+    parser.add_argument("--output", help="Report file (default RECONCILE_PATH; empty to skip)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    from . import settings
+
+    backend = None
+    if not (args.afx and args.stockanalysis):
+        from .db import create_backend_from_settings
+
+        backend = create_backend_from_settings(settings, backend_name=args.backend)
+        if not args.stockanalysis and not hasattr(backend, "iter_stockanalysis_stocks"):
+            parser.error(f"{type(backend).__name__} has no StockAnalysis data; use --stockanalysis")
+        backend.open()
+    try:
+        reconciler = Reconciler.from_settings(settings, args.stockanalysis or backend, path=args.output)
+        for name in ("price_tolerance", "change_tolerance", "stale_after"):
+            if getattr(args, name) is not None:
+                setattr(reconciler, name, getattr(args, name))
+        afx_records = read_feed(args.afx) if args.afx else afx_records_from_backend(backend)
+        run_id = args.run_id or (None if backend is None else _latest_run_id(backend))
+        report = reconciler.reconcile(afx_records, run_id=run_id)
+    finally:
+        if backend is not None:
+            backend.close()
+    if args.json:
+        print(dumps(report.as_dict()))
+    else:
+        print(report.summary())
+        for row in report.divergences:
+            print(f"  {row['ticker_symbol']:<8} afx={row['afx_price']} stockanalysis={row['stockanalysis_price']} "
+                  f"gap={row['price_gap_pct']}% change afx={row['afx_change_pct']}% "
+                  f"stockanalysis={row['stockanalysis_change_pct']}% stale={row['stale'] or '-'}")
+        for source, tickers in (("afx", report.missing_in_afx), ("stockanalysis", report.missing_in_stockanalysis)):
+            if tickers:
+                print(f"  missing in {source}: {', '.join(tickers)}")
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), stream=sys.stderr,
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
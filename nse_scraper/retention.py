@@ -0,0 +1,213 @@
+"""
+Retention and downsampling of price history.
+
+Policy (ages measured in NSE-local days back from now):
+
+- younger than ``RETENTION_FULL_DAYS``: every tick is kept;
+- up to ``RETENTION_DAILY_DAYS``: only the daily close (last tick of each
+  NSE trading date);
+- older: only the weekly close (last tick of each ISO week);
+- older than ``RETENTION_MAX_DAYS`` (when non-zero): dropped.
+
+Cutoffs fall on NSE-local midnights (the daily/weekly one on a Monday), so a
+day or week is never split between two resolutions. Keeping the last tick
+of a bucket is stable under repetition: compacting already-compacted history
+removes nothing, so the job is safe to re-run or resume after interruption.
+
+Every backend implements ``compact_history(policy, now=None, dry_run=False)``
+and works in small chunks (one ticker and a few weeks per transaction on
+Postgres, one document per update on Supabase) so nothing holds a lock on a
+whole table:
+
+    python -m nse_scraper.retention compact --dry-run
+    python -m nse_scraper.retention compact --full-days 14 --daily-days 180 --json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, time, timedelta, timezone
+
+from .serialization import dumpb, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Same fixed offset as nse_scraper.scheduler.NSE_TZ (EAT, no DST).
+NSE_TZ = timezone(timedelta(hours=3), "EAT")
+
+
+def _local_midnight(day):
+    return datetime.combine(day, time.min, tzinfo=NSE_TZ)
+
+
+@dataclass(frozen=True)
+class Cutoffs:
+    full: datetime
+    daily: datetime
+    drop: datetime = None
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    full_days: int = 30
+    daily_days: int = 365
+    max_days: int = 0
+
+    def __post_init__(self):
+        if self.full_days < 0 or self.daily_days < self.full_days:
+            raise ValueError("Retention requires 0 <= full_days <= daily_days")
+        if self.max_days and self.max_days < self.daily_days:
+            raise ValueError("RETENTION_MAX_DAYS must be 0 or >= RETENTION_DAILY_DAYS")
+
+    @classmethod
+    def from_settings(cls, settings):
+        from .db.backends import _settings_getter
+
+        get = _settings_getter(settings)
+        return cls(
+            full_days=int(get("RETENTION_FULL_DAYS", 30) or 0),
+            daily_days=int(get("RETENTION_DAILY_DAYS", 365) or 0),
+            max_days=int(get("RETENTION_MAX_DAYS", 0) or 0),
+        )
+
+    def cutoffs(self, now=None):
+        today = (now or datetime.now(timezone.utc)).astimezone(NSE_TZ).date()
+        daily_start = today - timedelta(days=self.daily_days)
+        daily_start -= timedelta(days=daily_start.weekday())
+        return Cutoffs(
+            full=_local_midnight(today - timedelta(days=self.full_days)),
+            daily=_local_midnight(daily_start),
+            drop=_local_midnight(today - timedelta(days=self.max_days)) if self.max_days else None,
+        )
+
+
+def bucket_key(timestamp, cutoffs):
+    """Downsampling bucket for ``timestamp``: None keeps it, "drop" removes it."""
+    if timestamp >= cutoffs.full:
+        return None
+    if cutoffs.drop is not None and timestamp < cutoffs.drop:
+        return "drop"
+    local_day = timestamp.astimezone(NSE_TZ).date()
+    if timestamp >= cutoffs.daily:
+        return ("day", local_day)
+    return ("week", local_day - timedelta(days=local_day.weekday()))
+
+
+def compaction_windows(oldest, cutoffs, weeks=4):
+    """``[lower, upper)`` chunks covering ``oldest`` up to the full-resolution cutoff.
+
+    Chunks start on NSE-local Mondays and span whole weeks, so no downsampling
+    bucket is ever split across two chunks.
+    """
+    first = oldest.astimezone(NSE_TZ).date()
+    lower = _local_midnight(first - timedelta(days=first.weekday()))
+    while lower < cutoffs.full:
+        upper = min(lower + timedelta(weeks=weeks), cutoffs.full)
+        yield lower, upper
+        lower = upper
+
+
+def split_points(points, cutoffs, timestamp=lambda point: point.get("scraped_at")):
+    """Partition ``points`` into (kept, removed), preserving order.
+
+    Within each bucket the latest point is kept. Points without a readable
+    timestamp are always kept.
+    """
+    latest = {}
+    keys = []
+    for index, point in enumerate(points):
+        ts = parse_timestamp(timestamp(point))
+        key = bucket_key(ts, cutoffs) if ts is not None else None
+        keys.append(key)
+        if key is None or key == "drop":
+            continue
+        if key not in latest or ts >= latest[key][0]:
+            latest[key] = (ts, index)
+    winners = {index for _ts, index in latest.values()}
+    kept, removed = [], []
+    for index, (point, key) in enumerate(zip(points, keys)):
+        if key is None or index in winners:
+            kept.append(point)
+        else:
+            removed.append(point)
+    return kept, removed
+
+
+def json_size(value):
+    return len(dumpb(value))
+
+
+@dataclass
+class CompactionReport:
+    backend: str
+    dry_run: bool = False
+    rows_scanned: int = 0
+    rows_removed: int = 0
+    bytes_reclaimed: int = 0
+    chunks: int = 0
+    errors: int = 0
+    tables: dict = field(default_factory=dict)
+
+    def add(self, table, scanned=0, removed=0, nbytes=0):
+        self.rows_scanned += scanned
+        self.rows_removed += removed
+        self.bytes_reclaimed += nbytes
+        self.chunks += 1
+        stats = self.tables.setdefault(table, {"rows_scanned": 0, "rows_removed": 0, "bytes_reclaimed": 0})
+        stats["rows_scanned"] += scanned
+        stats["rows_removed"] += removed
+        stats["bytes_reclaimed"] += nbytes
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.retention", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("compact", help="Downsample stored price history")
+    run.add_argument("--backend", help="Override DB_BACKEND")
+    run.add_argument("--full-days", type=int)
+    run.add_argument("--daily-days", type=int)
+    run.add_argument("--max-days", type=int)
+    run.add_argument("--dry-run", action="store_true", help="Report what would be removed without changing data")
+    run.add_argument("--json", action="store_true", help="Emit the report as JSON")
+    args = parser.parse_args(argv)
+
+    from . import settings
+    from .db import create_backend_from_settings
+
+    policy = RetentionPolicy.from_settings(settings)
+    overrides = {name: getattr(args, name) for name in ("full_days", "daily_days", "max_days")
+                 if getattr(args, name) is not None}
+    if overrides:
+        policy = RetentionPolicy(**{**asdict(policy), **overrides})
+
+    backend = create_backend_from_settings(settings, backend_name=args.backend)
+    if not hasattr(backend, "compact_history"):
+        parser.error(f"{type(backend).__name__} does not store price history")
+    backend.open()
+    try:
+        report = backend.compact_history(policy, dry_run=args.dry_run)
+    finally:
+        backend.close()
+
+    if args.json:
+        print(json.dumps({"policy": asdict(policy), **report.as_dict()}, indent=2))
+    else:
+        verb = "would remove" if report.dry_run else "removed"
+        print(f"{report.backend}: scanned {report.rows_scanned} history points in {report.chunks} chunks, "
+              f"{verb} {report.rows_removed} ({report.bytes_reclaimed / 1024:.1f} KiB), errors {report.errors}")
+        for table, stats in sorted(report.tables.items()):
+            print(f"  {table}: {stats['rows_removed']}/{stats['rows_scanned']} points, "
+                  f"{stats['bytes_reclaimed'] / 1024:.1f} KiB")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
@@ -0,0 +1,392 @@
+"""
+Rolling per-ticker statistics kept up to date on write.
+
+Each ticker keeps a small state that every stored quote updates in O(1)
+amortized time, so reads never scan history:
+
+- the current NSE trading day's high, low and last price;
+- the last daily closes plus a running sum per moving-average period, for
+  the 20/50/200-day simple moving averages;
+- monotonic deques of daily highs and lows over the last 52 weeks, for the
+  52-week high and low (AFX has no equivalent of StockAnalysis'
+  ``high52``/``low52``);
+- a windowed Welford accumulator (count, mean, sum of squared deviations)
+  over daily log returns, for annualized volatility.
+
+Periods are NSE trading days (dates with at least one quote, in EAT). The
+open day counts as the latest period, with its last price as the close,
+until a quote from the next day arrives and the day is committed. Quotes
+not newer than a ticker's last one are ignored, so replays are harmless.
+
+The state is persisted as one compact JSON file: only the windows are
+stored; running sums and accumulators are recomputed from them on load.
+The pipeline and the polling daemon update it when ``ROLLING_STATE_PATH``
+is set. To recover (or after changing periods), rebuild it from a
+backend's history. Days ``nse_scraper.retention`` has already downsampled
+contribute their close only:
+
+    python -m nse_scraper.rolling rebuild
+    python -m nse_scraper.rolling rebuild --backend postgres --sma 10,20,50 --volatility 30
+    python -m nse_scraper.rolling show SCOM EQTY
+"""
+import argparse
+import logging
+import math
+import os
+import sys
+from collections import deque
+from dataclasses import asdict, dataclass
+
+from .retention import NSE_TZ
+from .serialization import dumpb, loads, parse_timestamp
+from .tickstore import FileLock, to_micros
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DEFAULT_SMA_PERIODS = (20, 50, 200)
+DEFAULT_VOLATILITY_PERIOD = 20
+DEFAULT_EXTREME_DAYS = 364  # 52 weeks
+TRADING_DAYS_PER_YEAR = 252
+
+
+@dataclass(frozen=True)
+class Windows:
+    sma_periods: tuple = DEFAULT_SMA_PERIODS
+    volatility_period: int = DEFAULT_VOLATILITY_PERIOD
+    extreme_days: int = DEFAULT_EXTREME_DAYS
+
+    @property
+    def closes_kept(self):
+        return max(max(self.sma_periods, default=1), self.volatility_period + 1)
+
+
+def _welford_add(count, mean, m2, x):
+    count += 1
+    delta = x - mean
+    mean += delta / count
+    return count, mean, m2 + delta * (x - mean)
+
+
+def _welford_remove(count, mean, m2, x):
+    if count <= 1:
+        return 0, 0.0, 0.0
+    new_mean = (count * mean - x) / (count - 1)
+    return count - 1, new_mean, max(0.0, m2 - (x - new_mean) * (x - mean))
+
+
+def _log_return(price, previous):
+    return math.log(price / previous) if price > 0 and previous > 0 else None
+
+
+class RollingState:
+    """One ticker's windows; ``update`` is O(1) amortized per quote."""
+
+    __slots__ = ("windows", "day", "high", "low", "close", "last_us",
+                 "closes", "sums", "highs", "lows", "returns", "welford")
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.day = self.high = self.low = self.close = self.last_us = None
+        self.closes = deque(maxlen=windows.closes_kept)
+        # sums[i]: sum of the last sma_periods[i] - 1 committed closes (the open day completes the period).
+        self.sums = [0.0] * len(windows.sma_periods)
+        self.highs = deque()  # (day ordinal, high), highs decreasing
+        self.lows = deque()  # (day ordinal, low), lows increasing
+        self.returns = deque()
+        self.welford = (0, 0.0, 0.0)
+
+    def update(self, at_us, day, price):
+        """Fold one quote in; returns False if it is not newer than the last one."""
+        if self.last_us is not None and at_us <= self.last_us:
+            return False
+        if self.day is None:
+            self.day, self.high, self.low = day, price, price
+        elif day != self.day:
+            self._commit()
+            self.day, self.high, self.low = day, price, price
+            self._evict()
+        else:
+            self.high = max(self.high, price)
+            self.low = min(self.low, price)
+        self.close = price
+        self.last_us = at_us
+        return True
+
+    def _commit(self):
+        """Close the open day into the windows."""
+        close = self.close
+        if self.closes:
+            self._push_return(_log_return(close, self.closes[-1]))
+        self.closes.append(close)
+        for i, period in enumerate(self.windows.sma_periods):
+            self.sums[i] += close
+            if len(self.closes) >= period:
+                self.sums[i] -= self.closes[-period]
+        while self.highs and self.highs[-1][1] <= self.high:
+            self.highs.pop()
+        self.highs.append((self.day, self.high))
+        while self.lows and self.lows[-1][1] >= self.low:
+            self.lows.pop()
+        self.lows.append((self.day, self.low))
+
+    def _push_return(self, value):
+        if value is None:
+            return
+        if len(self.returns) == self.windows.volatility_period:
+            self.welford = _welford_remove(*self.welford, self.returns.popleft())
+        self.returns.append(value)
+        self.welford = _welford_add(*self.welford, value)
+
+    def _evict(self):
+        cutoff = self.day - self.windows.extreme_days
+        while self.highs and self.highs[0][0] <= cutoff:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] <= cutoff:
+            self.lows.popleft()
+
+    def sma(self, period):
+        i = self.windows.sma_periods.index(period)
+        if self.close is None or len(self.closes) < period - 1:
+            return None
+        return (self.sums[i] + self.close) / period
+
+    def volatility(self):
+        """Annualized standard deviation of daily log returns, in percent, over a full window."""
+        count, mean, m2 = self.welford
+        today = _log_return(self.close, self.closes[-1]) if self.closes and self.close is not None else None
+        if today is not None:
+            if count == self.windows.volatility_period:
+                count, mean, m2 = _welford_remove(count, mean, m2, self.returns[0])
+            count, mean, m2 = _welford_add(count, mean, m2, today)
+        if count < max(2, self.windows.volatility_period):
+            return None
+        return math.sqrt(m2 / (count - 1) * TRADING_DAYS_PER_YEAR) * 100.0
+
+    def stats(self):
+        high = max(self.high, self.highs[0][1]) if self.highs else self.high
+        low = min(self.low, self.lows[0][1]) if self.lows else self.low
+        stats = {"price": self.close, "high_52w": high, "low_52w": low}
+        for period in self.windows.sma_periods:
+            stats[f"sma_{period}"] = self.sma(period)
+        stats[f"volatility_{self.windows.volatility_period}d_pct"] = self.volatility()
+        return stats
+
+    def as_state(self):
+        return {"day": self.day, "bar": [self.high, self.low, self.close], "last_us": self.last_us,
+                "closes": list(self.closes), "highs": list(self.highs), "lows": list(self.lows)}
+
+    @classmethod
+    def from_state(cls, windows, state):
+        rolling = cls(windows)
+        rolling.day, rolling.last_us = state["day"], state["last_us"]
+        rolling.high, rolling.low, rolling.close = state["bar"]
+        closes = state["closes"]
+        for i, period in enumerate(windows.sma_periods):
+            rolling.sums[i] = math.fsum(closes[len(closes) - period + 1:]) if period > 1 else 0.0
+        for previous, close in zip(closes, closes[1:]):
+            rolling._push_return(_log_return(close, previous))
+        rolling.closes.extend(closes)
+        rolling.highs.extend(tuple(pair) for pair in state["highs"])
+        rolling.lows.extend(tuple(pair) for pair in state["lows"])
+        return rolling
+
+
+class RollingStore:
+    """Rolling state for every ticker, persisted at ``path``.
+
+    ``windows`` only applies to a new file; an existing one keeps the
+    periods it was built with (rebuild to change them).
+    """
+
+    def __init__(self, path, windows=None):
+        self.path = path
+        self.windows = windows or Windows()
+        self.states = {}
+        self._dirty = set()
+        self.skipped = 0
+
+    def open(self):
+        if os.path.exists(self.path):
+            with self._locked():
+                document = self._read()
+            self.windows = self._windows(document)
+            self.states = {ticker: RollingState.from_state(self.windows, state)
+                           for ticker, state in document["tickers"].items()}
+        logger.info("Rolling state ready at %s (%s tickers)", self.path, len(self.states))
+        return self
+
+    def close(self):
+        self.save()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def tickers(self):
+        return sorted(self.states)
+
+    def update(self, record):
+        """Fold one stored quote into its ticker's state; returns False if it was skipped."""
+        ticker = record.get("ticker_symbol")
+        at = parse_timestamp(record.get("scraped_at") or record.get("created_at"))
+        price = record.get("stock_price")
+        if not ticker or at is None or price is None:
+            self.skipped += 1
+            return False
+        state = self.states.get(ticker)
+        if state is None:
+            state = self.states[ticker] = RollingState(self.windows)
+        if not state.update(to_micros(at), at.astimezone(NSE_TZ).toordinal(), float(price)):
+            self.skipped += 1
+            return False
+        self._dirty.add(ticker)
+        return True
+
+    def stats(self, ticker_symbol):
+        """Current statistics for one ticker, or None if it has no quotes."""
+        state = self.states.get(ticker_symbol)
+        if state is None:
+            return None
+        return {"ticker_symbol": ticker_symbol, "as_of_us": state.last_us, **state.stats()}
+
+    def save(self):
+        """Write changed tickers; another writer's newer state for a ticker is kept."""
+        if not self._dirty:
+            return 0
+        with self._locked():
+            document = self._read() if os.path.exists(self.path) else None
+            if document is None:
+                document = {"version": FORMAT_VERSION, "windows": asdict(self.windows), "tickers": {}}
+            elif self._windows(document) != self.windows:
+                logger.warning("%s was rebuilt with different windows; not saving %s tickers",
+                               self.path, len(self._dirty))
+                self._dirty.clear()
+                return 0
+            written = 0
+            for ticker in self._dirty:
+                stored = document["tickers"].get(ticker)
+                state = self.states[ticker]
+                if stored is None or (stored["last_us"] or 0) <= state.last_us:
+                    document["tickers"][ticker] = state.as_state()
+                    written += 1
+            self._write(document)
+        self._dirty.clear()
+        return written
+
+    def _locked(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return FileLock(f"{self.path}.lock")
+
+    def _read(self):
+        with open(self.path, "rb") as handle:
+            document = loads(handle.read())
+        if document.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported rolling state version {document.get('version')} in {self.path}")
+        return document
+
+    @staticmethod
+    def _windows(document):
+        windows = document["windows"]
+        return Windows(tuple(windows["sma_periods"]), windows["volatility_period"], windows["extreme_days"])
+
+    def _write(self, document):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as handle:
+            handle.write(dumpb(document))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, self.path)
+
+
+def rebuild(path, records, windows=None, tickers=None):
+    """Recompute state from ``records`` (ordered by ticker, then scraped_at) and write it to ``path``.
+
+    With ``tickers`` only those tickers are replaced; the rest of the file is kept.
+    """
+    store = RollingStore(path, windows)
+    for record in records:
+        store.update(record)
+    if tickers:
+        existing = RollingStore(path).open() if os.path.exists(path) else None
+        if existing is not None and existing.windows != store.windows:
+            raise ValueError(f"{path} uses {existing.windows}; rebuild every ticker to change windows")
+        if existing is not None:
+            for ticker in set(existing.states) - set(tickers):
+                store.states[ticker] = existing.states[ticker]
+    document = {"version": FORMAT_VERSION, "windows": asdict(store.windows),
+                "tickers": {ticker: state.as_state() for ticker, state in store.states.items()}}
+    with store._locked():
+        store._write(document)
+    store._dirty.clear()
+    return store
+
+
+def _periods(value):
+    return tuple(sorted({int(period) for period in value.split(",") if period.strip()}))
+
+
+def _format(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.rolling", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", help="State file (default: ROLLING_STATE_PATH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("rebuild", help="Recompute the state from a backend's price history")
+    build.add_argument("--backend", help="Override DB_BACKEND")
+    build.add_argument("--ticker", action="append", dest="tickers", help="Limit to a ticker (repeatable)")
+    build.add_argument("--sma", type=_periods, default=DEFAULT_SMA_PERIODS,
+                       help="Moving-average periods in trading days (default 20,50,200)")
+    build.add_argument("--volatility", type=int, default=DEFAULT_VOLATILITY_PERIOD,
+                       help="Volatility window in trading days (default 20)")
+    show = sub.add_parser("show", help="Print the current statistics")
+    show.add_argument("tickers", nargs="*")
+    args = parser.parse_args(argv)
+
+    from . import settings
+
+    path = args.path or settings.ROLLING_STATE_PATH
+    if not path:
+        parser.error("--path or ROLLING_STATE_PATH is required")
+
+    if args.command == "show":
+        store = RollingStore(path).open()
+        windows = store.windows
+        columns = [f"sma_{period}" for period in windows.sma_periods] + [
+            "high_52w", "low_52w", f"volatility_{windows.volatility_period}d_pct"]
+        print(f"{'ticker':<10}{'price':>10}" + "".join(f"{column:>20}" for column in columns))
+        for ticker in args.tickers or store.tickers():
+            stats = store.stats(ticker)
+            if stats is None:
+                print(f"{ticker:<10}{'-':>10}")
+                continue
+            print(f"{ticker:<10}{_format(stats['price']):>10}"
+                  + "".join(f"{_format(stats[column]):>20}" for column in columns))
+        return 0
+
+    from .db import create_backend_from_settings
+
+    backend = create_backend_from_settings(settings, backend_name=args.backend)
+    if not hasattr(backend, "iter_history"):
+        parser.error(f"{type(backend).__name__} does not store price history")
+    backend.open()
+    try:
+        store = rebuild(path, backend.iter_history(tickers=args.tickers),
+                        Windows(args.sma, args.volatility), tickers=args.tickers)
+    finally:
+        backend.close()
+    print(f"rebuilt rolling state for {len(store.states)} tickers into {path} (skipped {store.skipped})")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Scrape runs: one id and one timestamp shared by every row a run writes.
+
+A run starts when a crawl (or one daemon cycle) starts. Every quote it
+yields carries its ``run_id`` and uses its ``started_at`` as ``scraped_at``,
+so "the board from run X" is an index lookup on ``run_id`` and "the board at
+time T" is one ``(ticker_symbol, scraped_at)`` index probe per ticker
+(``get_board_as_of`` on the backends). Each backend records runs in a
+``scrape_runs`` table (collection) through ``upsert_run``: once as
+``running`` when the run starts and again when it finishes.
+
+Run ids are ``<UTC start, to the second>-<8 hex digits>``, so they sort in
+start order and stay unique across concurrent crawls. A scheduled run that
+sets ``NSE_RUN_ID`` uses that id instead, so its ``scrape_runs`` row,
+telemetry, index points and reconciliation reports share one id.
+"""
+
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+def new_run_id(started_at):
+    return f"{started_at.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+@dataclass
+class ScrapeRun:
+    run_id: str
+    spider: str
+    started_at: datetime
+    finished_at: datetime | None = None
+    status: str = RUNNING
+    rows: int = 0
+
+    @classmethod
+    def start(cls, spider, now=None, run_id=None):
+        started_at = now or datetime.now(timezone.utc)
+        return cls(run_id=run_id or new_run_id(started_at), spider=spider, started_at=started_at)
+
+    def finish(self, rows, status=FINISHED, now=None):
+        self.finished_at = now or datetime.now(timezone.utc)
+        self.rows = rows
+        self.status = status
+        return self
+
+    def as_record(self):
+        """The ``upsert_run`` record: a plain dict, safe to queue, spool and replay."""
+        return asdict(self)
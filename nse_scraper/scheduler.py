@@ -0,0 +1,373 @@
+"""
+Trading-calendar-aware scheduling for the daily scrape.
+
+Knows the NSE trading calendar (weekdays minus Kenyan public holidays, with
+configurable extra holidays for gazetted and Eid dates) and session hours,
+and decides whether a scheduled run needs a full crawl:
+
+- A run targets the most recent trading session whose post-close time has
+  passed. If that session was already captured, the run is skipped.
+- When there is no local record of the last captured session, a cheap
+  freshness check asks the storage backend for its newest quote instead of
+  re-crawling.
+
+Usage (Windows task, cron or systemd):
+
+    python -m nse_scraper.scheduler plan            # exit 0 = crawl, 10 = skip
+    python -m nse_scraper.scheduler run             # plan, crawl if needed, record success
+    python -m nse_scraper.scheduler mark-success    # after an external crawl succeeded
+    python -m nse_scraper.scheduler next-run        # next post-close run time
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Nairobi is UTC+3 all year (no DST), so a fixed offset avoids a tzdata dependency.
+NSE_TZ = timezone(timedelta(hours=3), "EAT")
+
+DEFAULT_SESSION_OPEN = time(9, 30)
+DEFAULT_SESSION_CLOSE = time(15, 0)
+DEFAULT_POST_CLOSE_DELAY = timedelta(minutes=30)
+DEFAULT_STATE_PATH = os.path.join("reports", "scheduler_state.json")
+DEFAULT_SPIDERS = ("afx_scraper", "stockanalysis_scraper")
+
+EXIT_RUN = 0
+EXIT_SKIP = 10
+
+# (month, day) of fixed-date Kenyan public holidays observed by the NSE.
+_FIXED_HOLIDAYS = (
+    (1, 1),  # New Year's Day
+    (5, 1),  # Labour Day
+    (6, 1),  # Madaraka Day
+    (10, 10),  # Mazingira Day
+    (10, 20),  # Mashujaa Day
+    (12, 12),  # Jamhuri Day
+    (12, 25),  # Christmas Day
+    (12, 26),  # Boxing Day
+)
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _parse_time(value, default):
+    if not value:
+        return default
+    hours, _, minutes = str(value).partition(":")
+    return time(int(hours), int(minutes or 0))
+
+
+def load_holiday_file(path):
+    """Read extra holidays from a file: one ISO date per line, ``#`` comments allowed."""
+    holidays = set()
+    if not path or not os.path.exists(path):
+        return holidays
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            text = line.split("#", 1)[0].strip()
+            if text:
+                holidays.add(date.fromisoformat(text))
+    return holidays
+
+
+class TradingCalendar:
+    """NSE trading days and session hours in Nairobi time."""
+
+    def __init__(
+        self,
+        extra_holidays=(),
+        session_open=DEFAULT_SESSION_OPEN,
+        session_close=DEFAULT_SESSION_CLOSE,
+        post_close_delay=DEFAULT_POST_CLOSE_DELAY,
+    ):
+        self.extra_holidays = {d if isinstance(d, date) else date.fromisoformat(str(d).strip()) for d in extra_holidays}
+        self.session_open = session_open
+        self.session_close = session_close
+        self.post_close_delay = post_close_delay
+        self._year_cache = {}
+
+    @classmethod
+    def from_env(cls, environ=None):
+        env = os.environ if environ is None else environ
+        extra = {d for d in (env.get("NSE_HOLIDAYS") or "").split(",") if d.strip()}
+        extra |= load_holiday_file(env.get("NSE_HOLIDAYS_FILE"))
+        return cls(
+            extra_holidays=extra,
+            session_open=_parse_time(env.get("NSE_SESSION_OPEN"), DEFAULT_SESSION_OPEN),
+            session_close=_parse_time(env.get("NSE_SESSION_CLOSE"), DEFAULT_SESSION_CLOSE),
+            post_close_delay=timedelta(minutes=int(env.get("NSE_POST_CLOSE_DELAY_MINUTES") or 30)),
+        )
+
+    def public_holidays(self, year):
+        """Built-in public holidays for ``year``; Sunday holidays move to Monday."""
+        if year not in self._year_cache:
+            holidays = set()
+            for month, day in _FIXED_HOLIDAYS:
+                holiday = date(year, month, day)
+                holidays.add(holiday)
+                if holiday.weekday() == 6:
+                    holidays.add(holiday + timedelta(days=1))
+            easter = easter_sunday(year)
+            holidays.add(easter - timedelta(days=2))  # Good Friday
+            holidays.add(easter + timedelta(days=1))  # Easter Monday
+            self._year_cache[year] = holidays
+        return self._year_cache[year]
+
+    def is_holiday(self, day):
+        return day in self.extra_holidays or day in self.public_holidays(day.year)
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and not self.is_holiday(day)
+
+    def session_bounds(self, day):
+        """(open, close) of ``day``'s session as aware datetimes in Nairobi time."""
+        return (
+            datetime.combine(day, self.session_open, tzinfo=NSE_TZ),
+            datetime.combine(day, self.session_close, tzinfo=NSE_TZ),
+        )
+
+    def post_close_time(self, day):
+        return self.session_bounds(day)[1] + self.post_close_delay
+
+    def is_session_open(self, now):
+        local = now.astimezone(NSE_TZ)
+        if not self.is_trading_day(local.date()):
+            return False
+        opens, closes = self.session_bounds(local.date())
+        return opens <= local < closes
+
+    def previous_trading_day(self, day):
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_trading_day(self, day):
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def latest_closed_session(self, now):
+        """Most recent trading day whose post-close run time is at or before ``now``."""
+        day = now.astimezone(NSE_TZ).date()
+        if not self.is_trading_day(day) or now < self.post_close_time(day):
+            day = self.previous_trading_day(day)
+        return day
+
+    def next_session_open(self, now):
+        """Open of the current session if it has not started yet, else of the next one."""
+        day = now.astimezone(NSE_TZ).date()
+        if self.is_trading_day(day) and now < self.session_bounds(day)[0]:
+            return self.session_bounds(day)[0]
+        return self.session_bounds(self.next_trading_day(day))[0]
+
+    def next_post_close_run(self, now):
+        """Next post-close run time strictly after ``now``."""
+        day = now.astimezone(NSE_TZ).date()
+        if self.is_trading_day(day) and now < self.post_close_time(day):
+            return self.post_close_time(day)
+        return self.post_close_time(self.next_trading_day(day))
+
+
+@dataclass
+class RunPlan:
+    action: str  # "full" or "skip"
+    reason: str
+    session: str
+    checked_at: str
+
+    @property
+    def exit_code(self):
+        return EXIT_RUN if self.action == "full" else EXIT_SKIP
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path, state):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def backend_freshness(reference_ticker="SCOM"):
+    """Timestamp of the newest stored quote for ``reference_ticker``, or None."""
+    from . import settings
+    from .db import create_backend_from_settings
+
+    backend = create_backend_from_settings(settings)
+    backend.open()
+    try:
+        latest = backend.get_latest_by_ticker(reference_ticker)
+    finally:
+        backend.close()
+    if not latest:
+        return None
+    return _as_datetime(latest.get("scraped_at") or latest.get("created_at"))
+
+
+def plan_run(now, calendar, state, freshness_check=None, force=False):
+    """Decide whether the run at ``now`` needs a full crawl.
+
+    ``freshness_check`` is a zero-argument callable returning the newest stored
+    quote time; it is only consulted when ``state`` has no captured session.
+    """
+    session = calendar.latest_closed_session(now)
+    session_close = calendar.session_bounds(session)[1]
+    checked_at = now.astimezone(timezone.utc).isoformat()
+    if force:
+        return RunPlan("full", "forced", session.isoformat(), checked_at)
+
+    captured = state.get("last_session")
+    if captured:
+        if captured >= session.isoformat():
+            return RunPlan("skip", f"session {session} already captured", session.isoformat(), checked_at)
+        return RunPlan("full", f"session {session} not captured yet (last {captured})", session.isoformat(), checked_at)
+
+    if freshness_check is not None:
+        try:
+            latest = freshness_check()
+        except Exception as exc:
+            logger.warning("Freshness check failed (%s); running full crawl", exc)
+            return RunPlan("full", "freshness check failed", session.isoformat(), checked_at)
+        if latest is not None and latest >= session_close:
+            return RunPlan("skip", f"stored data at {latest.isoformat()} is after session {session} close",
+                           session.isoformat(), checked_at)
+        return RunPlan("full", f"stored data is older than session {session} close", session.isoformat(), checked_at)
+
+    return RunPlan("full", "no record of a captured session", session.isoformat(), checked_at)
+
+
+def mark_success(path, session, now):
+    state = load_state(path)
+    if session > state.get("last_session", ""):
+        state["last_session"] = session
+    state["last_success_at"] = now.astimezone(timezone.utc).isoformat()
+    save_state(path, state)
+    return state
+
+
+def _now(value):
+    if value:
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=NSE_TZ)
+    return datetime.now(timezone.utc)
+
+
+def _plan_from_args(args, calendar, now):
+    freshness = None if args.no_freshness_check else (lambda: backend_freshness(args.reference_ticker))
+    return plan_run(now, calendar, load_state(args.state), freshness_check=freshness, force=args.force)
+
+
+def _cmd_plan(args, calendar):
+    plan = _plan_from_args(args, calendar, _now(args.at))
+    if args.json:
+        print(json.dumps(dict(asdict(plan), exit_code=plan.exit_code)))
+    else:
+        print(f"{plan.action}: {plan.reason}")
+    return plan.exit_code
+
+
+def _cmd_run(args, calendar):
+    now = _now(args.at)
+    plan = _plan_from_args(args, calendar, now)
+    logger.info("Scheduler plan: %s (%s)", plan.action, plan.reason)
+    if plan.action != "full":
+        return EXIT_SKIP
+    env = dict(os.environ)
+    env.setdefault("NSE_RUN_ID", now.astimezone(NSE_TZ).strftime("%Y-%m-%d_%H%M%S"))
+    failed = []
+    for spider in args.spiders:
+        cmd = [sys.executable, "-m", "scrapy", "crawl", spider]
+        logger.info("Running %s", " ".join(cmd))
+        if subprocess.run(cmd, env=env, check=False).returncode != 0:
+            failed.append(spider)
+    if failed:
+        logger.error("Spiders failed: %s", ", ".join(failed))
+        return 1
+    mark_success(args.state, plan.session, now)
+    return EXIT_RUN
+
+
+def _cmd_mark_success(args, calendar):
+    now = _now(args.at)
+    session = args.session or calendar.latest_closed_session(now).isoformat()
+    state = mark_success(args.state, session, now)
+    print(json.dumps(state))
+    return 0
+
+
+def _cmd_next_run(args, calendar):
+    now = _now(args.at)
+    next_run = calendar.next_post_close_run(now)
+    print(f"{next_run.isoformat()} ({next_run.astimezone(timezone.utc).isoformat()})")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.scheduler", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--state", default=os.getenv("SCHEDULER_STATE_PATH") or DEFAULT_STATE_PATH)
+    parser.add_argument("--at", help="Evaluate at this ISO datetime (default: now; naive = Nairobi time)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func in (("plan", _cmd_plan), ("run", _cmd_run)):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--force", action="store_true", help="Always run a full crawl")
+        cmd.add_argument("--no-freshness-check", action="store_true", help="Do not query the backend")
+        cmd.add_argument("--reference-ticker", default="SCOM")
+        cmd.set_defaults(func=func)
+    sub.choices["plan"].add_argument("--json", action="store_true")
+    sub.choices["run"].add_argument("--spiders", nargs="+", default=list(DEFAULT_SPIDERS))
+
+    success = sub.add_parser("mark-success")
+    success.add_argument("--session", help="Captured session date (default: latest closed session)")
+    success.set_defaults(func=_cmd_mark_success)
+
+    sub.add_parser("next-run").set_defaults(func=_cmd_next_run)
+
+    args = parser.parse_args(argv)
+    return args.func(args, TradingCalendar.from_env())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+In-memory columnar screener over the latest StockAnalysis snapshot.
+
+The latest metrics of every ticker are loaded once into NumPy columns (one
+array per metric, ``NaN``/``NaT``/``None`` where a ticker has no value), and
+screens are vectorized filter/sort/top-N passes over those arrays, so ranking
+the whole exchange takes microseconds and never touches the database:
+
+    screener = Screener("stockanalysis_output.jsonl")
+    screener.screen(where=["revenue > 1e11", "dividend_yield >= 5"], sort="-dividend_yield", limit=10)
+
+Metrics are named by their StockAnalysis column id (``marketCap``,
+``dividendYield``) or, for the catalogued ones, by their typed column name
+(``market_cap``, ``dividend_yield``). The source is a spider feed file
+(``scrapy crawl stockanalysis_scraper -o stockanalysis_output.jsonl``) or a
+backend with ``iter_stockanalysis_stocks``. Results are cached per snapshot;
+a file source reloads when the file changes (the next scrape), a backend
+source after ``max_age`` seconds or an explicit ``refresh()``.
+
+    python -m nse_scraper.screener --source stockanalysis_output.jsonl --where "market_cap > 1e10" --sort=-tr1y
+    python -m nse_scraper.screener --backend embedded --sort=-dividend_yield --limit 5 --fields sector,revenue
+"""
+import argparse
+import logging
+import operator
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from .db.stockanalysis_metrics import METRICS, VIEWS, coerce, normalize_metric_value
+from .serialization import dumps, loads, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 60.0
+BASE_COLUMNS = ("rank", "stock_price", "stock_change")
+
+ALIASES = {metric.column: metric.key for metric in METRICS}
+_KINDS = {metric.key: metric.kind for metric in METRICS}
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+              "==": operator.eq, "=": operator.eq, "!=": operator.ne}
+_CONDITION = re.compile(r"^\s*([A-Za-z_]\w*)\s*(<=|>=|==|!=|<|>|=)\s*(.+?)\s*$")
+
+
+def parse_condition(condition):
+    """``"revenue > 1e11"`` -> ``("revenue", ">", 1e11)``; tuples pass through."""
+    if not isinstance(condition, str):
+        return tuple(condition)
+    match = _CONDITION.match(condition)
+    if match is None:
+        raise ValueError(f"Cannot parse screen condition {condition!r}")
+    name, op, raw = match.groups()
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in "'\"":
+        return name, op, raw[1:-1]
+    try:
+        return name, op, float(raw)
+    except ValueError:
+        return name, op, raw
+
+
+def records_from_feed(path):
+    """Latest per-ticker records from a spider feed (JSON lines or a JSON array)."""
+    with open(path, encoding="utf-8") as handle:
+        text = handle.read()
+    if text.lstrip().startswith("["):
+        items = loads(text)
+    else:
+        items = [loads(line) for line in text.splitlines() if line.strip()]
+    latest = {}
+    for item in items:
+        ticker = item.get("ticker_symbol")
+        if not ticker:
+            continue
+        scraped_at = parse_timestamp(item.get("scraped_at"))
+        record = latest.get(ticker)
+        if record is None or (scraped_at is not None and record["_at"] is not None and scraped_at > record["_at"]):
+            record = latest[ticker] = {"ticker_symbol": ticker, "_at": scraped_at, "metrics": {}}
+        elif scraped_at is not None and record["_at"] is not None and scraped_at < record["_at"]:
+            continue  # an older scrape of this ticker
+        for column in BASE_COLUMNS:
+            if item.get(column) is not None:
+                record[column] = item[column]
+        record["metrics"].update(item.get("metrics") or {})
+    for record in latest.values():
+        record.update(record.pop("metrics"))
+    return list(latest.values())
+
+
+def flatten_row(row):
+    """One screener record from a StockAnalysis row or pipeline record (``*_metrics`` blobs merged)."""
+    record = {"ticker_symbol": row["ticker_symbol"], "_at": parse_timestamp(row.get("scraped_at"))}
+    record.update({column: row.get(column) for column in BASE_COLUMNS})
+    for view in VIEWS:
+        for key, value in (row.get(f"{view}_metrics") or {}).items():
+            record.setdefault(key, value)
+    return record
+
+
+def records_from_backend(backend):
+    """Latest per-ticker records from a backend's StockAnalysis rows (blobs flattened)."""
+    return [flatten_row(row) for row in backend.iter_stockanalysis_stocks()]
+
+
+def _column(name, values):
+    """One NumPy column: float64 (NaN), datetime64[D] (NaT) or object (None) for text."""
+    kind = _KINDS.get(name)
+    if kind == "date":
+        return np.array([np.datetime64(coerce(value, "date") or "NaT", "D") for value in values])
+    if kind != "text":
+        numbers = [coerce(value, "numeric") for value in values]
+        # Numeric unless some present value is not a number.
+        if all(number is not None or normalize_metric_value(value) is None for number, value in zip(numbers, values)):
+            return np.array([np.nan if number is None else number for number in numbers], dtype=np.float64)
+    return np.array([coerce(value, "text") for value in values], dtype=object)
+
+
+class Snapshot:
+    """Columnar view of one scrape: ``tickers`` plus a NumPy array per metric."""
+
+    def __init__(self, records, version=None):
+        records = sorted(records, key=lambda record: record["ticker_symbol"])
+        self.version = version
+        self.tickers = np.array([record["ticker_symbol"] for record in records], dtype=object)
+        names = sorted({key for record in records for key in record
+                        if key != "ticker_symbol" and not key.startswith("_")})
+        self.columns = {name: _column(name, [record.get(name) for record in records]) for name in names}
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def column(self, name):
+        """The array for metric ``name`` (column id or typed column name)."""
+        values = self.columns.get(name)
+        if values is None:
+            values = self.columns.get(ALIASES.get(name))
+        if values is None:
+            raise KeyError(f"Unknown metric {name!r}; available: {', '.join(sorted(self.columns))}")
+        return values
+
+    def mask(self, *conditions):
+        """Boolean array of the tickers matching every condition; missing values never match."""
+        selected = np.ones(len(self), dtype=bool)
+        for condition in conditions:
+            name, op, value = parse_condition(condition)
+            values = self.column(name)
+            compare = _OPERATORS[op]
+            if values.dtype.kind == "f":
+                selected &= ~np.isnan(values) & compare(values, float(value))
+            elif values.dtype.kind == "M":
+                selected &= ~np.isnat(values) & compare(values, np.datetime64(str(value), "D"))
+            else:
+                text = value if isinstance(value, str) else format(value, "g")
+                present = values != None  # noqa: E711 - elementwise
+                hits = np.zeros(len(self), dtype=bool)
+                hits[present] = [compare(item, text) for item in values[present]]
+                selected &= hits
+        return selected
+
+    def order(self, sort, index=None, limit=None):
+        """Indices sorted by ``sort`` (``"-name"`` for descending), missing values last."""
+        if index is None:
+            index = np.arange(len(self))
+        descending = sort.startswith("-")
+        values = self.column(sort.lstrip("-+"))[index]
+        if values.dtype.kind in "fM":
+            missing = np.isnan(values) if values.dtype.kind == "f" else np.isnat(values)
+            key = values.astype(np.int64).astype(np.float64) if values.dtype.kind == "M" else values
+            key = np.where(missing, np.inf, -key if descending else key)
+            if limit is not None and limit < len(index):
+                # Top-N: partition first, then sort only the survivors.
+                top = np.argpartition(key, limit - 1)[:limit]
+                return index[top[np.argsort(key[top], kind="stable")]]
+            return index[np.argsort(key, kind="stable")]
+        missing = values == None  # noqa: E711 - elementwise
+        text = np.array(["" if item is None else item for item in values], dtype=str)
+        ranks = np.unique(text, return_inverse=True)[1]
+        order = np.lexsort((-ranks if descending else ranks, missing))
+        return index[order][:limit]
+
+    def select(self, where=(), sort=None, limit=None):
+        """Indices of the screen; cached for the lifetime of this snapshot."""
+        if isinstance(where, str):
+            where = [where]
+        key = (tuple(parse_condition(condition) for condition in where), sort, limit)
+        index = self._cache.get(key)
+        if index is None:
+            index = np.flatnonzero(self.mask(*where))
+            index = self.order(sort, index, limit) if sort else index[:limit]
+            self._cache[key] = index
+        return index
+
+    def rows(self, index, fields=None):
+        """Materialize ``index`` as dicts of ``ticker_symbol`` and ``fields`` (default: all)."""
+        names = list(fields) if fields else list(self.columns)
+        arrays = [self.column(name) for name in names]
+        rows = []
+        for position in index:
+            row = {"ticker_symbol": self.tickers[position]}
+            for name, values in zip(names, arrays):
+                value = values[position]
+                if values.dtype.kind == "f":
+                    value = None if np.isnan(value) else float(value)
+                elif values.dtype.kind == "M":
+                    value = None if np.isnat(value) else str(value)
+                row[name] = value
+            rows.append(row)
+        return rows
+
+    def screen(self, where=(), sort=None, limit=None, fields=None):
+        """Rows matching ``where``, ordered by ``sort``, at most ``limit``.
+
+        ``fields`` defaults to the sort and filter metrics (every metric when
+        there are neither).
+        """
+        if isinstance(where, str):
+            where = [where]
+        if fields is None:
+            names = ([sort.lstrip("-+")] if sort else []) + [parse_condition(condition)[0] for condition in where]
+            fields = list(dict.fromkeys(names)) or None
+        return self.rows(self.select(where, sort, limit), fields)
+
+
+class Screener:
+    """Keeps a ``Snapshot`` of ``source`` (feed path or backend) and reloads it after each scrape."""
+
+    def __init__(self, source, max_age=DEFAULT_MAX_AGE):
+        self.source = source
+        self.max_age = max_age
+        self._snapshot = None
+        self._loaded_at = 0.0
+
+    def _version(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            stat = os.stat(self.source)
+            return stat.st_mtime_ns, stat.st_size
+        return None
+
+    def _load(self, version):
+        if isinstance(self.source, (str, os.PathLike)):
+            records = records_from_feed(self.source)
+        else:
+            records = records_from_backend(self.source)
+        self._snapshot = Snapshot(records, version)
+        self._loaded_at = time.monotonic()
+        logger.info("Screener loaded %s tickers, %s metrics", len(self._snapshot), len(self._snapshot.columns))
+
+    def refresh(self):
+        self._load(self._version())
+        return self._snapshot
+
+    def snapshot(self):
+        """The current snapshot, reloaded if the source has a newer scrape."""
+        version = self._version()
+        if self._snapshot is None:
+            self._load(version)
+        elif version is not None:
+            if version != self._snapshot.version:
+                self._load(version)
+        elif time.monotonic() - self._loaded_at > self.max_age:
+            self._load(version)
+        return self._snapshot
+
+    def screen(self, where=(), sort=None, limit=None, fields=None):
+        return self.snapshot().screen(where, sort, limit, fields)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.screener", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--source", help="Spider feed file (JSON lines or JSON array)")
+    source.add_argument("--backend", help="Read from this backend instead of DB_BACKEND")
+    parser.add_argument("--where", action="append", default=[], help='e.g. "revenue > 1e11"; repeatable')
+    parser.add_argument("--sort", help="Metric to sort by; --sort=-name for descending")
+    parser.add_argument("--limit", type=int, help="Top N rows")
+    parser.add_argument("--fields", help="Comma-separated metrics to show")
+    parser.add_argument("--columns", action="store_true", help="List the available metrics and exit")
+    args = parser.parse_args(argv)
+
+    backend = None
+    if args.source:
+        screener = Screener(args.source)
+    else:
+        from . import settings
+        from .db import create_backend_from_settings
+
+        backend = create_backend_from_settings(settings, backend_name=args.backend)
+        if not hasattr(backend, "iter_stockanalysis_stocks"):
+            parser.error(f"{type(backend).__name__} has no StockAnalysis data; use --source")
+        backend.open()
+        screener = Screener(backend)
+    try:
+        snapshot = screener.snapshot()
+        if args.columns:
+            for name, values in sorted(snapshot.columns.items()):
+                print(f"{name}\t{values.dtype}")
+            return 0
+        fields = args.fields.split(",") if args.fields else None
+        started = time.perf_counter()
+        rows = snapshot.screen(args.where, args.sort, args.limit, fields)
+        elapsed = time.perf_counter() - started
+    except (KeyError, ValueError) as exc:
+        parser.error(str(exc))
+    finally:
+        if backend is not None:
+            backend.close()
+    for row in rows:
+        print(dumps(row))
+    logger.info("%s of %s tickers matched in %.1f us", len(rows), len(snapshot), elapsed * 1e6)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), stream=sys.stderr,
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
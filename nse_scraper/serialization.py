@@ -0,0 +1,103 @@
+"""JSON encoding and decoding for backend payloads, spool files, exports and API responses.
+
+orjson is used when it is installed: it encodes datetimes, dates, dataclass
+items and numpy scalars natively and returns UTF-8 bytes, which can be
+written or sent as a request body without another copy. Without it the
+stdlib ``json`` module is used with a ``default`` hook that gives the same
+output: timestamps as ``isoformat()``, compact separators, non-ASCII text
+unescaped. ``ENGINE`` names the one in use. ``parse_timestamp`` reads those
+timestamps back.
+"""
+
+import json
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+ENGINE = "orjson" if orjson is not None else "json"
+
+JSONDecodeError = json.JSONDecodeError  # orjson.JSONDecodeError subclasses it
+
+
+def _default(value):
+    """Encode what JSON has no type for; the same rules for both engines."""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return str(value)
+
+
+def _json_dumpb(value):
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumpb(value):
+        """``value`` as UTF-8 JSON bytes."""
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+    def loads(data):
+        """Decode JSON from ``str``, ``bytes`` or ``memoryview``."""
+        return orjson.loads(data)
+else:
+    def dumpb(value):
+        """``value`` as UTF-8 JSON bytes."""
+        return _json_dumpb(value)
+
+    def loads(data):
+        """Decode JSON from ``str``, ``bytes`` or ``memoryview``."""
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+def dumps(value):
+    """``value`` as JSON text."""
+    return dumpb(value).decode("utf-8")
+
+
+def dump_lines(records):
+    """One JSON-lines body for ``records`` (each line newline-terminated)."""
+    return b"".join(dumpb(record) + b"\n" for record in records)
+
+
+def encoded_size(value):
+    """Bytes ``value`` takes as compact JSON, or None if it cannot be encoded."""
+    try:
+        return len(dumpb(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def to_iso(value):
+    """``value.isoformat()`` for datetimes and dates; anything else unchanged."""
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def parse_timestamp(value):
+    """Return an aware datetime for ``value`` (datetime or ISO string), or None."""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
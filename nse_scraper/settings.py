@@ -11,22 +11,95 @@ NEWSPIDER_MODULE = 'nse_scraper.spiders'
 # MongoDB configuration
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGO_DATABASE = os.getenv("MONGODB_DATABASE", "nse_data")
+# Optional time-series history of every scrape (collection defaults to <STOCK_TABLE>_history)
+MONGO_HISTORY_MODE = os.getenv("MONGO_HISTORY_MODE", "false").strip().lower() in {"1", "true", "yes", "on"}
+MONGO_HISTORY_COLLECTION = os.getenv("MONGO_HISTORY_COLLECTION")
+MONGO_TS_GRANULARITY = os.getenv("MONGO_TS_GRANULARITY", "minutes").strip().lower()
+MONGO_HISTORY_TTL_DAYS = float(os.getenv("MONGO_HISTORY_TTL_DAYS", "0") or 0)
+MONGO_HISTORY_BATCH_SIZE = int(os.getenv("MONGO_HISTORY_BATCH_SIZE", "500") or 500)
 
 # Unified storage configuration
 DB_BACKEND = os.getenv("DB_BACKEND", "mongo").strip().lower()
 STOCK_TABLE = os.getenv("STOCK_TABLE", "stock_data")
 SQL_DATABASE_URL = os.getenv("SQL_DATABASE_URL")
 SQL_ECHO = os.getenv("SQL_ECHO", "false").strip().lower() in {"1", "true", "yes", "on"}
+# Rows per pipelined upsert batch for DB_BACKEND=postgres_async
+SQL_ASYNC_BATCH_SIZE = int(os.getenv("SQL_ASYNC_BATCH_SIZE", "200") or 200)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_TABLE = os.getenv("SUPABASE_TABLE", STOCK_TABLE)
 STOCKANALYSIS_TABLE = os.getenv("STOCKANALYSIS_TABLE", "stockanalysis_stocks")
+# Local SQLite file for DB_BACKEND=embedded, and quotes per write transaction
+EMBEDDED_DB_PATH = os.getenv("EMBEDDED_DB_PATH", "data/nse.sqlite3")
+EMBEDDED_BATCH_SIZE = int(os.getenv("EMBEDDED_BATCH_SIZE", "500") or 500)
+# Comma-separated DB_BACKEND (e.g. "supabase,postgres") mirrors writes to every
+# listed backend concurrently. Queue size and records per write batch; each
+# is one value for every backend or per-backend pairs ("100" or
+# "supabase=50,postgres=500"). Every listed backend gets the WRITE_* retries.
+FANOUT_QUEUE_SIZE = os.getenv("FANOUT_QUEUE_SIZE", "10000")
+FANOUT_BATCH_SIZE = os.getenv("FANOUT_BATCH_SIZE", "100")
+
+# Failed writes are retried with jittered exponential backoff from a bounded
+# in-memory queue; after CIRCUIT_BREAKER_THRESHOLD consecutive failures writes
+# are spooled locally (WRITE_SPOOL_DIR) for CIRCUIT_BREAKER_RESET_SECONDS, and
+# spooled records are re-drained in batches once the backend is healthy.
+WRITE_RESILIENCE = os.getenv("WRITE_RESILIENCE", "true").strip().lower() in {"1", "true", "yes", "on"}
+WRITE_SPOOL_DIR = os.getenv("WRITE_SPOOL_DIR", "reports/local_fallback")
+WRITE_RETRIES = int(os.getenv("WRITE_RETRIES", "3") or 0)
+WRITE_RETRY_BASE_DELAY = float(os.getenv("WRITE_RETRY_BASE_DELAY", "1.0") or 0)
+WRITE_RETRY_MAX_DELAY = float(os.getenv("WRITE_RETRY_MAX_DELAY", "60") or 0)
+WRITE_RETRY_QUEUE_SIZE = int(os.getenv("WRITE_RETRY_QUEUE_SIZE", "1000") or 1000)
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "5") or 5)
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30") or 0)
+SPOOL_DRAIN_BATCH_SIZE = int(os.getenv("SPOOL_DRAIN_BATCH_SIZE", "100") or 100)
+
+# Price history downsampling (python -m nse_scraper.retention compact):
+# every tick for RETENTION_FULL_DAYS, daily closes to RETENTION_DAILY_DAYS,
+# weekly closes after that; RETENTION_MAX_DAYS > 0 drops anything older.
+RETENTION_FULL_DAYS = int(os.getenv("RETENTION_FULL_DAYS", "30") or 0)
+RETENTION_DAILY_DAYS = int(os.getenv("RETENTION_DAILY_DAYS", "365") or 0)
+RETENTION_MAX_DAYS = int(os.getenv("RETENTION_MAX_DAYS", "0") or 0)
+
+# Local memory-mapped tick store the pipeline appends to (empty disables it)
+TICKSTORE_PATH = os.getenv("TICKSTORE_PATH", "")
+# Per-ticker rolling statistics (moving averages, 52-week range, volatility) updated on write (empty disables)
+ROLLING_STATE_PATH = os.getenv("ROLLING_STATE_PATH", "")
 
 # Item pipelines
 ITEM_PIPELINES = {
     'nse_scraper.pipelines.NseScraperPipeline': 300,
 }
 
+# Per-stage timing (spider callbacks); pipeline and backend timings are
+# recorded by the pipelines themselves. All land in the stats collector.
+SPIDER_MIDDLEWARES = {
+    'nse_scraper.instrumentation.StageTimingSpiderMiddleware': 1000,
+}
+
+# Prometheus export of crawl metrics (disabled unless one is set)
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE")
+PROMETHEUS_PORT = int(os.getenv("PROMETHEUS_PORT", "0") or 0)
+EXTENSIONS = {
+    'nse_scraper.instrumentation.PrometheusExporter': 500,
+    'nse_scraper.telemetry.RunTelemetry': 510,
+    'nse_scraper.profiling.CrawlProfiler': 520,
+}
+
+# Opt-in profiling: comma-separated cprofile | sampling | tracemalloc
+NSE_PROFILE = os.getenv("NSE_PROFILE", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "reports/profiles")
+
+# Structured run telemetry (one JSON line per spider run; empty disables)
+TELEMETRY_PATH = os.getenv("TELEMETRY_PATH", "reports/telemetry/runs.jsonl")
+# Shared identifier for all spiders launched by one scheduled run
+NSE_RUN_ID = os.getenv("NSE_RUN_ID")
+
+# AFX vs StockAnalysis reconciliation (python -m nse_scraper.reconcile; empty path disables the report file)
+RECONCILE_PATH = os.getenv("RECONCILE_PATH", "reports/reconciliation/runs.jsonl")
+RECONCILE_PRICE_TOLERANCE_PCT = float(os.getenv("RECONCILE_PRICE_TOLERANCE_PCT", "1.0"))
+RECONCILE_CHANGE_TOLERANCE_PCT = float(os.getenv("RECONCILE_CHANGE_TOLERANCE_PCT", "0.5"))
+RECONCILE_STALE_AFTER = float(os.getenv("RECONCILE_STALE_AFTER", "1800"))
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FORMAT = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
@@ -1,8 +1,10 @@
 import logging
-from datetime import datetime, timezone
 from bs4 import BeautifulSoup
 from scrapy import Spider
 
+from ..items import AfxQuote, InvalidItem
+from ..runs import ScrapeRun
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,9 +14,29 @@ class AfxScraperSpider(Spider):
     start_urls = ['https://afx.kwayisi.org/nse/']
     user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.run = ScrapeRun.start(self.name)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # A scheduled run's id (NSE_RUN_ID) is shared with its telemetry and reports.
+        run_id = crawler.settings.get("NSE_RUN_ID")
+        if run_id:
+            spider.run = ScrapeRun.start(spider.name, run_id=run_id)
+        return spider
+
+    def start_run(self):
+        """Begin a new run (the polling daemon starts one per cycle); returns it."""
+        self.run = ScrapeRun.start(self.name)
+        return self.run
+
     def parse(self, response):
         """Parse stock data from the response"""
         logger.info(f"Processing: {response.url}")
+        # Every row of the run shares its id and timestamp, so a board is one snapshot.
+        run_id, scraped_at = self.run.run_id, self.run.started_at
         
         try:
             rows = response.css('table tbody tr')
@@ -27,27 +49,20 @@ class AfxScraperSpider(Spider):
                     raw_price = row.xpath('td[4]//text()').getall()
                     raw_change = row.xpath('td[5]//text()').getall()
                     
-                    # Clean and process data
-                    ticker_symbol = self._clean_text(raw_ticker)
-                    stock_name = self._clean_text(raw_name)
-                    stock_price = self._clean_price(raw_price)
-                    stock_change = self._clean_price(raw_change)
-                    
-                    # Validate data
-                    if not ticker_symbol or not stock_name or stock_price is None:
-                        logger.debug(f"Skipping incomplete row: {raw_ticker}")
-                        continue
-                    
-                    scraped_at = datetime.now(timezone.utc)
-                    yield {
-                        'ticker_symbol': ticker_symbol,
-                        'stock_name': stock_name,
-                        'stock_price': stock_price,
-                        'stock_change': stock_change,
-                        'scraped_at': scraped_at,
-                        'created_at': scraped_at
-                    }
+                    # Clean, validate and coerce once; pipelines trust the typed item
+                    yield AfxQuote.build(
+                        ticker_symbol=self._clean_text(raw_ticker),
+                        stock_name=self._clean_text(raw_name),
+                        stock_price=self._clean_price(raw_price),
+                        stock_change=self._clean_price(raw_change),
+                        scraped_at=scraped_at,
+                        created_at=scraped_at,
+                        run_id=run_id,
+                    )
                     
+                except InvalidItem as e:
+                    logger.debug(f"Skipping incomplete row {raw_ticker}: {e}")
+                    continue
                 except Exception as e:
                     logger.error(f"Error processing row: {e}", exc_info=True)
                     continue
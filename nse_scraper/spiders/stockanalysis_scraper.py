@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import re
@@ -7,12 +6,17 @@ from datetime import datetime, timezone
 
 from scrapy import Request, Spider
 
+from ..db import STOCKANALYSIS_BACKENDS, backend_names
+from ..db.stockanalysis_metrics import normalize_metric_value
+from ..items import StockAnalysisRecord
+from ..serialization import loads
+
 
 logger = logging.getLogger(__name__)
 
 
 def _stockanalysis_pipelines():
-    if os.getenv("DB_BACKEND", "").strip().lower() == "supabase":
+    if any(name in STOCKANALYSIS_BACKENDS for name in backend_names(os.getenv("DB_BACKEND"))):
         return {"nse_scraper.pipelines.StockAnalysisPipeline": 300}
     return {}
 
@@ -65,14 +69,6 @@ class StockAnalysisScraperSpider(Spider):
         "profile": ["no", "s", "n", "industry", "country", "employees", "founded"],
     }
 
-    _KEYWORDS_TO_NULL = {"", "-", "--", "n/a", "na", "null", "none"}
-    _UNIT_MULTIPLIERS = {
-        "K": 1_000,
-        "M": 1_000_000,
-        "B": 1_000_000_000,
-        "T": 1_000_000_000_000,
-    }
-
     def parse(self, response):
         stock_data, view_map, stock_query = self._extract_embedded_payload(response.text)
         scraped_at = datetime.now(timezone.utc).isoformat()
@@ -99,21 +95,21 @@ class StockAnalysisScraperSpider(Spider):
                         raw_value = row.get(column_id)
                         metrics_raw[column_id] = raw_value
                         metrics[column_id] = self._normalize_metric_value(raw_value)
-                    yield {
-                        "source": "stockanalysis",
-                        "view": "overview",
-                        "symbol": symbol,
-                        "ticker_symbol": symbol,
-                        "rank": row.get("no"),
-                        "company_name": row.get("n"),
-                        "stock_name": row.get("n"),
-                        "stock_price": row.get("price"),
-                        "stock_change": row.get("change"),
-                        "created_at": scraped_at,
-                        "metrics_raw": metrics_raw,
-                        "metrics": metrics,
-                        "scraped_at": scraped_at,
-                    }
+                    yield StockAnalysisRecord.build(
+                        source="stockanalysis",
+                        view="overview",
+                        symbol=symbol,
+                        ticker_symbol=symbol,
+                        rank=row.get("no"),
+                        company_name=row.get("n"),
+                        stock_name=row.get("n"),
+                        stock_price=row.get("price"),
+                        stock_change=row.get("change"),
+                        created_at=scraped_at,
+                        metrics_raw=metrics_raw,
+                        metrics=metrics,
+                        scraped_at=scraped_at,
+                    )
 
                 for view_name, column_ids in self._TARGET_VIEW_COLUMNS.items():
                     if view_name == "overview":
@@ -153,21 +149,21 @@ class StockAnalysisScraperSpider(Spider):
                         metrics_raw[column_id] = raw_value
                         metrics[column_id] = self._normalize_metric_value(raw_value)
 
-                    yield {
-                        "source": "stockanalysis",
-                        "view": view_name,
-                        "symbol": symbol,
-                        "ticker_symbol": symbol,
-                        "rank": row.get("no"),
-                        "company_name": row.get("n"),
-                        "stock_name": row.get("n"),
-                        "stock_price": row.get("price"),
-                        "stock_change": row.get("change"),
-                        "created_at": scraped_at,
-                        "metrics_raw": metrics_raw,
-                        "metrics": metrics,
-                        "scraped_at": scraped_at,
-                    }
+                    yield StockAnalysisRecord.build(
+                        source="stockanalysis",
+                        view=view_name,
+                        symbol=symbol,
+                        ticker_symbol=symbol,
+                        rank=row.get("no"),
+                        company_name=row.get("n"),
+                        stock_name=row.get("n"),
+                        stock_price=row.get("price"),
+                        stock_change=row.get("change"),
+                        created_at=scraped_at,
+                        metrics_raw=metrics_raw,
+                        metrics=metrics,
+                        scraped_at=scraped_at,
+                    )
             return
 
         logger.warning(
@@ -286,7 +282,7 @@ class StockAnalysisScraperSpider(Spider):
         self, response, view_name, column_ids, base_by_symbol, scraped_at
     ):
         try:
-            payload = json.loads(response.text)
+            payload = loads(response.body)
             rows = (payload.get("data") or {}).get("data") or []
         except Exception:
             logger.exception("Failed to parse screener API JSON for view '%s'", view_name)
@@ -311,27 +307,27 @@ class StockAnalysisScraperSpider(Spider):
                 metrics_raw[column_id] = raw_value
                 metrics[column_id] = self._normalize_metric_value(raw_value)
 
-            yield {
-                "source": "stockanalysis",
-                "view": view_name,
-                "symbol": symbol,
-                "ticker_symbol": symbol,
-                "rank": row.get("no") if row.get("no") is not None else base.get("no"),
-                "company_name": row.get("n") or base.get("n"),
-                "stock_name": row.get("n") or base.get("n"),
-                "stock_price": (
+            yield StockAnalysisRecord.build(
+                source="stockanalysis",
+                view=view_name,
+                symbol=symbol,
+                ticker_symbol=symbol,
+                rank=row.get("no") if row.get("no") is not None else base.get("no"),
+                company_name=row.get("n") or base.get("n"),
+                stock_name=row.get("n") or base.get("n"),
+                stock_price=(
                     row.get("price") if row.get("price") is not None else base.get("price")
                 ),
-                "stock_change": (
+                stock_change=(
                     row.get("change")
                     if row.get("change") is not None
                     else base.get("change")
                 ),
-                "created_at": scraped_at,
-                "metrics_raw": metrics_raw,
-                "metrics": metrics,
-                "scraped_at": scraped_at,
-            }
+                created_at=scraped_at,
+                metrics_raw=metrics_raw,
+                metrics=metrics,
+                scraped_at=scraped_at,
+            )
 
     def _view_map_from_payload(self, views_payload):
         items = views_payload.get("items", [])
@@ -366,7 +362,7 @@ class StockAnalysisScraperSpider(Spider):
         text = re.sub(r"([:\[,]\s*)-(\.\d+)", r"\g<1>-0\2", text)
         text = re.sub(r"([{\[,]\s*)([A-Za-z_][A-Za-z0-9_]*)\s*:", r'\1"\2":', text)
         text = re.sub(r",\s*([}\]])", r"\1", text)
-        return json.loads(text)
+        return loads(text)
 
     def _parse_visible_table(self, response, scraped_at):
         table = response.css("#main-table-wrap table#main-table")
@@ -405,21 +401,21 @@ class StockAnalysisScraperSpider(Spider):
                 metrics_raw[key] = value
                 metrics[key] = self._normalize_metric_value(value)
 
-            yield {
-                "source": "stockanalysis",
-                "view": "overview",
-                "symbol": symbol,
-                "ticker_symbol": symbol,
-                "rank": self._normalize_metric_value(row_data.get("no")),
-                "company_name": row_data.get("n") or row_data.get("company_name"),
-                "stock_name": row_data.get("n") or row_data.get("company_name"),
-                "stock_price": self._normalize_metric_value(row_data.get("price")),
-                "stock_change": self._normalize_metric_value(row_data.get("change")),
-                "created_at": scraped_at,
-                "metrics_raw": metrics_raw,
-                "metrics": metrics,
-                "scraped_at": scraped_at,
-            }
+            yield StockAnalysisRecord.build(
+                source="stockanalysis",
+                view="overview",
+                symbol=symbol,
+                ticker_symbol=symbol,
+                rank=row_data.get("no"),
+                company_name=row_data.get("n") or row_data.get("company_name"),
+                stock_name=row_data.get("n") or row_data.get("company_name"),
+                stock_price=row_data.get("price"),
+                stock_change=row_data.get("change"),
+                created_at=scraped_at,
+                metrics_raw=metrics_raw,
+                metrics=metrics,
+                scraped_at=scraped_at,
+            )
 
     @staticmethod
     def _extract_symbol(value):
@@ -433,35 +429,4 @@ class StockAnalysisScraperSpider(Spider):
         return text.upper()
 
     def _normalize_metric_value(self, value):
-        if value is None:
-            return None
-
-        if isinstance(value, (int, float)):
-            return value
-
-        text = str(value).strip()
-        if text.lower() in self._KEYWORDS_TO_NULL:
-            return None
-
-        if text.endswith("%"):
-            percent = text[:-1].replace(",", "").strip()
-            try:
-                return float(percent)
-            except ValueError:
-                return text
-
-        compact = text.replace(",", "")
-        if compact and compact[-1].upper() in self._UNIT_MULTIPLIERS:
-            unit = compact[-1].upper()
-            number_part = compact[:-1]
-            try:
-                return float(number_part) * self._UNIT_MULTIPLIERS[unit]
-            except ValueError:
-                return text
-
-        try:
-            if "." in compact:
-                return float(compact)
-            return int(compact)
-        except ValueError:
-            return text
+        return normalize_metric_value(value)
@@ -3,9 +3,9 @@ import os
 from dotenv import load_dotenv
 
 try:
-    from nse_scraper.db import create_backend
+    from nse_scraper.db import create_backend, sync_backend_name
 except ModuleNotFoundError:  # pragma: no cover - direct script execution fallback
-    from db import create_backend
+    from db import create_backend, sync_backend_name
 
 load_dotenv()
 
@@ -30,7 +30,7 @@ def stock_query(ticker_symbol="BAT", threshold=38.0):
     backend = None
     try:
         backend = create_backend(
-            backend_name=DB_BACKEND,
+            backend_name=sync_backend_name(DB_BACKEND),
             mongodb_uri=MONGODB_URI,
             mongo_database=MONGODB_DATABASE,
             stock_table=STOCK_TABLE,
@@ -0,0 +1,396 @@
+"""
+Structured run telemetry.
+
+``RunTelemetry`` appends one JSON line per spider run to ``TELEMETRY_PATH``
+(default ``reports/telemetry/runs.jsonl``) with duration, item/response
+counts, retries, per-backend write latency and fallback counts.
+
+The ``report`` command aggregates those records and flags duration or
+item-count regressions against a rolling baseline:
+
+    python -m nse_scraper.telemetry report --window 7
+    python -m nse_scraper.telemetry import-logs reports/run-*.log --timezone Africa/Nairobi
+"""
+import argparse
+import ast
+import glob
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .instrumentation import STATS_PREFIX
+from .serialization import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TELEMETRY_PATH = os.path.join("reports", "telemetry", "runs.jsonl")
+
+# Scrapy stat -> telemetry field
+_STAT_FIELDS = {
+    "finish_reason": "finish_reason",
+    "elapsed_time_seconds": "duration_s",
+    "item_scraped_count": "items_scraped",
+    "item_dropped_count": "items_dropped",
+    "response_received_count": "responses",
+    "downloader/response_bytes": "response_bytes",
+    "retry/count": "retries",
+    "log_count/ERROR": "errors",
+    "nse/storage/fallback_writes": "fallback_writes",
+}
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return value
+
+
+def _started(record):
+    """A record's start as an aware datetime for ordering (legacy naive values read as UTC)."""
+    return parse_timestamp(record.get("started_at")) or datetime.min.replace(tzinfo=timezone.utc)
+
+
+def backend_latency_from_stats(stats):
+    """Summarize ``nse/stage/backend/...`` stats as {"<backend>/<method>": {...}}."""
+    prefix = f"{STATS_PREFIX}/backend/"
+    summary = {}
+    for key, value in stats.items():
+        if not key.startswith(prefix) or "/bucket/" in key:
+            continue
+        name, _, field = key[len(prefix):].rpartition("/")
+        summary.setdefault(name, {})[field] = value
+    result = {}
+    for name, data in sorted(summary.items()):
+        count = data.get("count", 0)
+        if not count:
+            continue
+        result[name] = {
+            "count": count,
+            "mean_ms": round(data.get("time_ms_sum", 0.0) / count, 3),
+            "max_ms": round(data.get("time_ms_max", 0.0), 3),
+            "errors": data.get("errors", 0),
+            "bytes": data.get("bytes", 0),
+        }
+    return result
+
+
+def build_record(spider_name, stats, run_id=None):
+    """Build one telemetry record from a finished crawl's stats."""
+    started_at = stats.get("start_time")
+    record = {
+        "run_id": run_id or (_isoformat(started_at) if started_at else None),
+        "spider": spider_name,
+        "started_at": _isoformat(started_at),
+        "finished_at": _isoformat(stats.get("finish_time")),
+        "source": "crawl",
+    }
+    for stat_key, field in _STAT_FIELDS.items():
+        value = stats.get(stat_key)
+        record[field] = value if value is not None else (None if field == "finish_reason" else 0)
+    record["backend_writes"] = backend_latency_from_stats(stats)
+    return record
+
+
+def append_record(path, record):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str, sort_keys=True) + "\n")
+
+
+def load_records(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping malformed telemetry line %s:%s", path, line_no)
+    return records
+
+
+class RunTelemetry:
+    """Appends a telemetry record for every finished spider run.
+
+    Disabled when ``TELEMETRY_PATH`` is set to an empty string.
+    """
+
+    def __init__(self, stats, path, run_id=None):
+        self.stats = stats
+        self.path = path
+        self.run_id = run_id
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("TELEMETRY_PATH", DEFAULT_TELEMETRY_PATH)
+        if not path:
+            raise NotConfigured("TELEMETRY_PATH is empty")
+        ext = cls(crawler.stats, path, run_id=crawler.settings.get("NSE_RUN_ID"))
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_closed(self, spider, reason=None):
+        record = build_record(spider.name, self.stats.get_stats(), run_id=self.run_id)
+        if reason and not record.get("finish_reason"):
+            record["finish_reason"] = reason
+        try:
+            append_record(self.path, record)
+            logger.info("Run telemetry appended to %s", self.path)
+        except OSError:
+            logger.exception("Failed to write run telemetry to %s", self.path)
+
+
+# -- legacy text log import -------------------------------------------------
+
+_LOG_EVENT = re.compile(r"^\[(?P<ts>[0-9T:\-]+)\] (?P<event>START|END) (?P<spider>\S+)(?P<rest>.*)$")
+_LOG_STAT = re.compile(r"^\[(?P<spider>[a-z_]+)\]\s+'(?P<key>[^']+)':\s*(?P<value>.+?),?\s*$")
+_LOG_END = re.compile(r"exit=(?P<exit>-?\d+) durationSec=(?P<duration>[0-9.]+)")
+
+
+def _log_time(value, tz=None):
+    """A legacy log timestamp (local wall-clock time) as UTC ISO-8601.
+
+    ``tz`` is the zone the daily job ran in; None means this machine's zone.
+    """
+    parsed = datetime.fromisoformat(value)
+    local = parsed.replace(tzinfo=tz) if tz is not None else parsed.astimezone()
+    return local.astimezone(timezone.utc).isoformat()
+
+
+def parse_run_log(path, tz=None):
+    """Extract telemetry records from a legacy ``reports/run-*.log`` file.
+
+    The log's timestamps are the job's local time; records get them in UTC
+    like crawl records, so both sort on one time base.
+    """
+    records = []
+    current = {}
+    stats = {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for raw_line in f:
+            line = raw_line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            event = _LOG_EVENT.match(line)
+            if event and event.group("event") == "START":
+                current = {"spider": event.group("spider"), "started_at": _log_time(event.group("ts"), tz)}
+                stats = {}
+                continue
+            if event and event.group("event") == "END" and current:
+                end = _LOG_END.search(event.group("rest"))
+                stats.setdefault("start_time", current["started_at"])
+                stats["finish_time"] = _log_time(event.group("ts"), tz)
+                record = build_record(current["spider"], stats, run_id=os.path.basename(path))
+                record["source"] = "log-import"
+                if end:
+                    record["exit_code"] = int(end.group("exit"))
+                    if not record["duration_s"]:
+                        record["duration_s"] = float(end.group("duration"))
+                records.append(record)
+                current = {}
+                continue
+            stat = _LOG_STAT.match(line)
+            if stat and current and stat.group("spider") == current["spider"]:
+                try:
+                    stats[stat.group("key")] = ast.literal_eval(stat.group("value"))
+                except (ValueError, SyntaxError):
+                    continue
+    return records
+
+
+# -- reporting ----------------------------------------------------------------
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def find_regressions(records, window=7, min_history=3, duration_tolerance=0.5, items_tolerance=0.2):
+    """Flag runs whose duration or item count regresses against the rolling median.
+
+    Each run is compared with the median of up to ``window`` preceding runs of
+    the same spider. Duration regresses when it exceeds the baseline by more
+    than ``duration_tolerance`` (fraction); item count regresses when it falls
+    short of the baseline by more than ``items_tolerance``.
+    """
+    by_spider = {}
+    for record in records:
+        by_spider.setdefault(record.get("spider"), []).append(record)
+
+    flags = []
+    for spider, runs in by_spider.items():
+        runs.sort(key=_started)
+        for idx, run in enumerate(runs):
+            history = runs[max(0, idx - window):idx]
+            if len(history) < min_history:
+                continue
+            durations = [d for d in (_number(r.get("duration_s")) for r in history) if d]
+            items = [n for n in (_number(r.get("items_scraped")) for r in history) if n is not None]
+            duration = _number(run.get("duration_s"))
+            item_count = _number(run.get("items_scraped"))
+            if durations and duration:
+                baseline = statistics.median(durations)
+                if duration > baseline * (1 + duration_tolerance):
+                    flags.append(
+                        {
+                            "spider": spider,
+                            "run_id": run.get("run_id"),
+                            "started_at": run.get("started_at"),
+                            "metric": "duration_s",
+                            "value": duration,
+                            "baseline": baseline,
+                        }
+                    )
+            if items and item_count is not None:
+                baseline = statistics.median(items)
+                if item_count < baseline * (1 - items_tolerance):
+                    flags.append(
+                        {
+                            "spider": spider,
+                            "run_id": run.get("run_id"),
+                            "started_at": run.get("started_at"),
+                            "metric": "items_scraped",
+                            "value": item_count,
+                            "baseline": baseline,
+                        }
+                    )
+    return flags
+
+
+def summarize(records):
+    """Per-spider aggregates: run count, duration percentiles, items and fallbacks."""
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(
+            record.get("spider"),
+            {"runs": 0, "durations": [], "items": [], "fallback_writes": 0, "last_started_at": None,
+             "last": None},
+        )
+        entry["runs"] += 1
+        if _number(record.get("duration_s")):
+            entry["durations"].append(record["duration_s"])
+        if _number(record.get("items_scraped")) is not None:
+            entry["items"].append(record["items_scraped"])
+        entry["fallback_writes"] += _number(record.get("fallback_writes")) or 0
+        started = _started(record)
+        if record.get("started_at") and (entry["last"] is None or started > entry["last"]):
+            entry["last_started_at"], entry["last"] = record["started_at"], started
+
+    result = {}
+    for spider, entry in summary.items():
+        durations = sorted(entry["durations"])
+        result[spider] = {
+            "runs": entry["runs"],
+            "last_started_at": entry["last_started_at"],
+            "duration_p50_s": round(statistics.median(durations), 2) if durations else None,
+            "duration_p90_s": round(durations[int(0.9 * (len(durations) - 1))], 2) if durations else None,
+            "duration_max_s": round(durations[-1], 2) if durations else None,
+            "items_mean": round(statistics.mean(entry["items"]), 1) if entry["items"] else None,
+            "fallback_writes": entry["fallback_writes"],
+        }
+    return result
+
+
+def _cmd_report(args):
+    records = load_records(args.path)
+    if args.spider:
+        records = [r for r in records if r.get("spider") == args.spider]
+    if args.since:
+        since = parse_timestamp(args.since)
+        records = [r for r in records if _started(r) >= since]
+    flags = find_regressions(
+        records,
+        window=args.window,
+        min_history=args.min_history,
+        duration_tolerance=args.duration_tolerance,
+        items_tolerance=args.items_tolerance,
+    )
+    if not args.all_runs:
+        latest = {}
+        for record in records:
+            spider = record.get("spider")
+            if spider not in latest or _started(record) >= latest[spider]:
+                latest[spider] = _started(record)
+        flags = [f for f in flags if _started(f) == latest.get(f["spider"])]
+
+    summary = summarize(records)
+    if args.json:
+        print(json.dumps({"summary": summary, "regressions": flags}, indent=2, default=str))
+    else:
+        if not records:
+            print(f"No telemetry records in {args.path}")
+        for spider, data in sorted(summary.items()):
+            print(
+                f"{spider}: {data['runs']} runs, last {data['last_started_at']}, "
+                f"duration p50 {data['duration_p50_s']}s p90 {data['duration_p90_s']}s max {data['duration_max_s']}s, "
+                f"items mean {data['items_mean']}, fallback writes {data['fallback_writes']}"
+            )
+        for flag in flags:
+            print(
+                f"REGRESSION {flag['spider']} {flag['started_at']}: {flag['metric']}={flag['value']} "
+                f"(baseline {flag['baseline']})"
+            )
+    return 1 if flags and args.fail_on_regression else 0
+
+
+def _cmd_import_logs(args):
+    tz = ZoneInfo(args.timezone) if args.timezone else None
+    existing = {(r.get("run_id"), r.get("spider")) for r in load_records(args.path)}
+    imported = 0
+    for pattern in args.logs:
+        for log_path in sorted(glob.glob(pattern)):
+            for record in parse_run_log(log_path, tz):
+                if (record["run_id"], record["spider"]) in existing:
+                    continue
+                append_record(args.path, record)
+                existing.add((record["run_id"], record["spider"]))
+                imported += 1
+    print(f"Imported {imported} run records into {args.path}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.telemetry", description="Run telemetry tools")
+    parser.add_argument("--path", default=os.getenv("TELEMETRY_PATH") or DEFAULT_TELEMETRY_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report = sub.add_parser("report", help="Aggregate runs and flag regressions")
+    report.add_argument("--spider")
+    report.add_argument("--since", help="Only runs started on/after this ISO date")
+    report.add_argument("--window", type=int, default=7, help="Rolling baseline size (runs)")
+    report.add_argument("--min-history", type=int, default=3)
+    report.add_argument("--duration-tolerance", type=float, default=0.5)
+    report.add_argument("--items-tolerance", type=float, default=0.2)
+    report.add_argument("--all-runs", action="store_true", help="Flag every run, not just the latest per spider")
+    report.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when regressions are found")
+    report.add_argument("--json", action="store_true")
+    report.set_defaults(func=_cmd_report)
+
+    import_logs = sub.add_parser("import-logs", help="Backfill telemetry from legacy run-*.log files")
+    import_logs.add_argument("logs", nargs="+", help="Log files or glob patterns")
+    import_logs.add_argument("--timezone", help="IANA zone the logs were written in (default: this machine's)")
+    import_logs.set_defaults(func=_cmd_import_logs)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Local append-only columnar tick store.
+
+Each ticker gets a directory of three little-endian ``int64`` column files:
+
+    <root>/index.json            row counts and first/last timestamps per ticker
+    <root>/<TICKER>/ts.i8        scraped_at, microseconds since the epoch (UTC)
+    <root>/<TICKER>/price.i8     stock_price * price_scale (fixed point)
+    <root>/<TICKER>/change.i8    stock_change * price_scale, MISSING when absent
+
+Readers memory-map the columns as NumPy arrays (``TickStore.load``), so a
+full history loads without parsing or copying. Writers only ever append
+ticks newer than the ticker's last stored one and publish them by
+rewriting ``index.json`` atomically; readers never look past the indexed
+row count, so a crash mid-append loses at most the unpublished tail (which
+is truncated away on the next open).
+
+The pipeline appends every scraped quote when ``TICKSTORE_PATH`` is set.
+To (re)build the store from the configured backend's history:
+
+    python -m nse_scraper.tickstore sync
+    python -m nse_scraper.tickstore sync --backend postgres
+    python -m nse_scraper.tickstore info
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .serialization import parse_timestamp
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer per store
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+COLUMNS = ("ts", "price", "change")
+DTYPE = np.dtype("<i8")
+DEFAULT_PRICE_SCALE = 10_000
+MISSING = np.iinfo(np.int64).min
+FORMAT_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_micros(value):
+    """Microseconds since the epoch for a datetime or ISO string, or None."""
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        return None
+    delta = parsed - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _as_datetime64(value):
+    if value is None or isinstance(value, np.datetime64):
+        return value
+    return np.datetime64(to_micros(value), "us")
+
+
+@dataclass
+class Ticks:
+    """Column views for one ticker. Arrays are read-only memory maps (or slices of them)."""
+
+    ticker_symbol: str
+    timestamps: np.ndarray  # datetime64[us], UTC
+    price_raw: np.ndarray  # int64 fixed point
+    change_raw: np.ndarray  # int64 fixed point, MISSING when absent
+    price_scale: int = DEFAULT_PRICE_SCALE
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def prices(self):
+        return self.price_raw / self.price_scale
+
+    @property
+    def changes(self):
+        return np.where(self.change_raw == MISSING, np.nan, self.change_raw / self.price_scale)
+
+    def between(self, start=None, end=None):
+        """Ticks in ``[start, end)``; a zero-copy slice found by binary search."""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, _as_datetime64(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamps, _as_datetime64(end), side="left"))
+        return Ticks(self.ticker_symbol, self.timestamps[lo:hi], self.price_raw[lo:hi], self.change_raw[lo:hi],
+                     self.price_scale)
+
+
+class TickStore:
+    def __init__(self, root, price_scale=DEFAULT_PRICE_SCALE, flush_every=1000):
+        self.root = root
+        self.price_scale = price_scale
+        self.flush_every = max(1, flush_every)
+        self.index = {"version": FORMAT_VERSION, "price_scale": price_scale, "tickers": {}}
+        self._buffer = {}
+        self._buffered = 0
+        self.skipped = 0
+
+    def open(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self._locked():
+            self._load_index()
+            self._repair()
+        logger.info("Tick store ready at %s (%s tickers)", self.root, len(self.index["tickers"]))
+        return self
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def tickers(self):
+        return sorted(self.index["tickers"])
+
+    def rows(self, ticker_symbol):
+        return self.index["tickers"].get(ticker_symbol, {}).get("rows", 0)
+
+    def append(self, record):
+        """Buffer one quote; returns False if it is not newer than the stored history."""
+        ticker = record.get("ticker_symbol")
+        micros = to_micros(record.get("scraped_at") or record.get("created_at"))
+        if not ticker or micros is None or record.get("stock_price") is None:
+            self.skipped += 1
+            return False
+        pending = self._buffer.get(ticker)
+        last = pending[-1][0] if pending else self.index["tickers"].get(ticker, {}).get("last_us")
+        if last is not None and micros <= last:
+            self.skipped += 1
+            return False
+        change = record.get("stock_change")
+        self._buffer.setdefault(ticker, []).append((
+            micros,
+            round(float(record["stock_price"]) * self.price_scale),
+            MISSING if change is None else round(float(change) * self.price_scale),
+        ))
+        self._buffered += 1
+        if self._buffered >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Append buffered ticks to the column files and publish them in the index."""
+        if not self._buffered:
+            return 0
+        buffer, self._buffer, self._buffered = self._buffer, {}, 0
+        written = 0
+        with self._locked():
+            # Another process may have appended since we last looked.
+            self._load_index()
+            for ticker, ticks in buffer.items():
+                entry = self.index["tickers"].setdefault(ticker, {"rows": 0, "first_us": None, "last_us": None})
+                if entry["last_us"] is not None:
+                    ticks = [tick for tick in ticks if tick[0] > entry["last_us"]]
+                if not ticks:
+                    continue
+                columns = np.array(ticks, dtype=DTYPE).T
+                directory = self._ticker_dir(ticker)
+                os.makedirs(directory, exist_ok=True)
+                for name, values in zip(COLUMNS, columns):
+                    path = os.path.join(directory, f"{name}.i8")
+                    with open(path, "ab") as handle:
+                        handle.truncate(entry["rows"] * DTYPE.itemsize)  # drop any unpublished tail
+                        handle.write(np.ascontiguousarray(values).tobytes())
+                        handle.flush()
+                        os.fsync(handle.fileno())
+                entry["rows"] += len(ticks)
+                entry["first_us"] = entry["first_us"] if entry["first_us"] is not None else int(columns[0][0])
+                entry["last_us"] = int(columns[0][-1])
+                written += len(ticks)
+            self._write_index()
+        return written
+
+    def load(self, ticker_symbol, start=None, end=None):
+        """Memory-map one ticker's history, optionally limited to ``[start, end)``."""
+        rows = self.rows(ticker_symbol)
+        scale = self.price_scale
+        if not rows:
+            empty = np.empty(0, dtype=DTYPE)
+            return Ticks(ticker_symbol, empty.view("datetime64[us]"), empty, empty, scale)
+        directory = self._ticker_dir(ticker_symbol)
+        ts, price, change = (
+            np.memmap(os.path.join(directory, f"{name}.i8"), dtype=DTYPE, mode="r", shape=(rows,))
+            for name in COLUMNS
+        )
+        ticks = Ticks(ticker_symbol, ts.view("datetime64[us]"), price, change, scale)
+        return ticks.between(start, end) if start is not None or end is not None else ticks
+
+    def refresh(self):
+        """Re-read the index to see ticks another process has published."""
+        self._load_index()
+        return self
+
+    def _ticker_dir(self, ticker_symbol):
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in ticker_symbol)
+        return os.path.join(self.root, safe)
+
+    def _load_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as handle:
+            index = json.load(handle)
+        if index.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported tick store version {index.get('version')} in {path}")
+        # The scale is fixed when the store is created.
+        self.price_scale = index["price_scale"]
+        self.index = index
+
+    def _write_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump(self.index, handle, indent=1, sort_keys=True)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, path)
+
+    def _repair(self):
+        """Truncate column files to their published row counts."""
+        for ticker, entry in self.index["tickers"].items():
+            size = entry["rows"] * DTYPE.itemsize
+            for name in COLUMNS:
+                path = os.path.join(self._ticker_dir(ticker), f"{name}.i8")
+                if os.path.exists(path) and os.path.getsize(path) > size:
+                    logger.warning("Truncating unpublished ticks in %s", path)
+                    with open(path, "r+b") as handle:
+                        handle.truncate(size)
+
+    def _locked(self):
+        return FileLock(os.path.join(self.root, ".lock"))
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.handle = open(self.path, "a")
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+def rebuild(root, records, price_scale=DEFAULT_PRICE_SCALE):
+    """Replace the store at ``root`` with ``records`` (ordered by ticker, then scraped_at).
+
+    The new store is built next to the old one and swapped in at the end, so
+    readers keep seeing the previous store until the rebuild completes.
+    """
+    staging = f"{root.rstrip(os.sep)}.rebuild"
+    shutil.rmtree(staging, ignore_errors=True)
+    with TickStore(staging, price_scale=price_scale, flush_every=50_000) as store:
+        for record in records:
+            store.append(record)
+    previous = f"{root.rstrip(os.sep)}.previous"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(root):
+        os.rename(root, previous)
+    os.rename(staging, root)
+    shutil.rmtree(previous, ignore_errors=True)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nse_scraper.tickstore", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", help="Tick store directory (default: TICKSTORE_PATH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="Rebuild the store from a backend's price history")
+    sync.add_argument("--backend", help="Override DB_BACKEND")
+    info = sub.add_parser("info", help="Show stored tickers, row counts and time ranges")
+    info.add_argument("tickers", nargs="*")
+    args = parser.parse_args(argv)
+
+    from . import settings
+
+    path = args.path or settings.TICKSTORE_PATH
+    if not path:
+        parser.error("--path or TICKSTORE_PATH is required")
+
+    if args.command == "info":
+        store = TickStore(path).open()
+        for ticker in args.tickers or store.tickers():
+            ticks = store.load(ticker)
+            span = f"{ticks.timestamps[0]} .. {ticks.timestamps[-1]}" if len(ticks) else "-"
+            print(f"{ticker:<10} {len(ticks):>10} ticks  {span}")
+        return 0
+
+    from .db import create_backend_from_settings
+
+    backend = create_backend_from_settings(settings, backend_name=args.backend)
+    if not hasattr(backend, "iter_history"):
+        parser.error(f"{type(backend).__name__} does not store price history")
+    backend.open()
+    try:
+        store = rebuild(path, backend.iter_history())
+    finally:
+        backend.close()
+    total = sum(store.rows(ticker) for ticker in store.tickers())
+    print(f"synced {total} ticks for {len(store.tickers())} tickers into {path} (skipped {store.skipped})")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    sys.exit(main())
@@ -1,6 +1,10 @@
 param(
     [switch]$NoGitPush,
-    [switch]$BootstrapDeps
+    [switch]$BootstrapDeps,
+    # Profile both spiders: cprofile, sampling and/or tracemalloc (comma-separated)
+    [string]$ProfileMode = "",
+    # Crawl even when the scheduler reports the latest session as captured
+    [switch]$Force
 )
 
 Set-StrictMode -Version Latest
@@ -157,9 +161,10 @@ function Invoke-SpiderRun {
 
     Add-Content -LiteralPath $RunLogPath -Value ("[{0}] START {1}" -f $spiderStart.ToString("s"), $SpiderName)
     $result = Invoke-NativeCaptured -FilePath $PythonPath -Arguments $cmdArgs
-    foreach ($line in $result.Output) {
-        Add-Content -LiteralPath $RunLogPath -Value ("[{0}] {1}" -f $SpiderName, $line)
-    }
+    # Full Scrapy output goes to an untracked per-spider log; metrics are kept
+    # as structured telemetry in reports/telemetry/runs.jsonl (local, untracked).
+    $spiderLogPath = Join-Path (Split-Path -Parent $RunLogPath) ("last-{0}.log" -f $SpiderName)
+    Set-Content -LiteralPath $spiderLogPath -Value $result.Output
 
     $spiderEnd = Get-Date
     $duration = [Math]::Round(($spiderEnd - $spiderStart).TotalSeconds, 2)
@@ -180,6 +185,11 @@ New-DirectoryIfMissing -Path $reportsDir
 $dateStamp = Get-Date -Format "yyyy-MM-dd"
 $runStamp = Get-Date -Format "yyyy-MM-dd_HHmmss"
 $runLogPath = Join-Path $reportsDir ("run-{0}.log" -f $runStamp)
+$reconcilePath = Join-Path $reportsDir "reconciliation\runs.jsonl"
+$env:NSE_RUN_ID = $runStamp
+if ($ProfileMode) {
+    $env:NSE_PROFILE = $ProfileMode
+}
 $taskRunnerLogPath = Join-Path $reportsDir "task-runner.log"
 $runStartedAt = Get-Date
 
@@ -210,19 +220,46 @@ try {
         }
     }
 
-    $afxRun = Invoke-SpiderRun -PythonPath $pythonPath -SpiderName "afx_scraper" -RunLogPath $runLogPath
-    $stockRun = Invoke-SpiderRun -PythonPath $pythonPath -SpiderName "stockanalysis_scraper" -RunLogPath $runLogPath -DisableHttpCache
-
-    $runEndedAt = Get-Date
-    $duration = [Math]::Round(($runEndedAt - $runStartedAt).TotalSeconds, 2)
-    $overallSuccess = ($afxRun.ExitCode -eq 0 -and $stockRun.ExitCode -eq 0)
+    # Ask the trading-calendar scheduler whether the latest closed NSE session
+    # still needs capturing; weekends and holidays after a captured session skip.
+    $planArgs = @("-m", "nse_scraper.scheduler", "plan")
+    if ($Force) {
+        $planArgs += "--force"
+    }
+    $plan = Invoke-NativeCaptured -FilePath $pythonPath -Arguments $planArgs
+    foreach ($line in $plan.Output) {
+        Add-Content -LiteralPath $runLogPath -Value ("[{0}] SCHEDULE {1}" -f (Get-Date).ToString("s"), $line)
+    }
 
-    Add-Content -LiteralPath $runLogPath -Value ("[{0}] SUMMARY afx_exit={1} stockanalysis_exit={2} durationSec={3}" -f $runEndedAt.ToString("s"), $afxRun.ExitCode, $stockRun.ExitCode, $duration)
-    if ($overallSuccess) {
-        Add-Content -LiteralPath $runLogPath -Value ("[{0}] RUN_STATUS SUCCESS" -f $runEndedAt.ToString("s"))
+    if ($plan.ExitCode -eq 10) {
+        $overallSuccess = $true
+        $runEndedAt = Get-Date
+        Add-Content -LiteralPath $runLogPath -Value ("[{0}] RUN_STATUS SKIPPED reason=session_already_captured" -f $runEndedAt.ToString("s"))
     }
     else {
-        Add-Content -LiteralPath $runLogPath -Value ("[{0}] RUN_STATUS FAILED reason=one_or_more_spiders_failed" -f $runEndedAt.ToString("s"))
+        $afxRun = Invoke-SpiderRun -PythonPath $pythonPath -SpiderName "afx_scraper" -RunLogPath $runLogPath
+        $stockRun = Invoke-SpiderRun -PythonPath $pythonPath -SpiderName "stockanalysis_scraper" -RunLogPath $runLogPath -DisableHttpCache
+
+        $runEndedAt = Get-Date
+        $duration = [Math]::Round(($runEndedAt - $runStartedAt).TotalSeconds, 2)
+        $overallSuccess = ($afxRun.ExitCode -eq 0 -and $stockRun.ExitCode -eq 0)
+
+        Add-Content -LiteralPath $runLogPath -Value ("[{0}] SUMMARY afx_exit={1} stockanalysis_exit={2} durationSec={3}" -f $runEndedAt.ToString("s"), $afxRun.ExitCode, $stockRun.ExitCode, $duration)
+        if ($overallSuccess) {
+            Add-Content -LiteralPath $runLogPath -Value ("[{0}] RUN_STATUS SUCCESS" -f $runEndedAt.ToString("s"))
+            $marked = Invoke-NativeCaptured -FilePath $pythonPath -Arguments @("-m", "nse_scraper.scheduler", "mark-success")
+            Add-Content -LiteralPath $runLogPath -Value ("[{0}] SCHEDULE mark-success exit={1}" -f (Get-Date).ToString("s"), $marked.ExitCode)
+
+            # Cross-check the two sources now that both have written this run;
+            # divergences are reported (exit 1) but do not fail the run.
+            $reconciled = Invoke-NativeCaptured -FilePath $pythonPath -Arguments @("-m", "nse_scraper.reconcile")
+            foreach ($line in $reconciled.Output) {
+                Add-Content -LiteralPath $runLogPath -Value ("[{0}] RECONCILE {1}" -f (Get-Date).ToString("s"), $line)
+            }
+        }
+        else {
+            Add-Content -LiteralPath $runLogPath -Value ("[{0}] RUN_STATUS FAILED reason=one_or_more_spiders_failed" -f $runEndedAt.ToString("s"))
+        }
     }
 
     # Always commit and push logs and local fallback data regardless of success/failure
@@ -232,7 +269,8 @@ try {
         $localFallbackFiles = Get-ChildItem -LiteralPath $localFallbackDir -File -ErrorAction SilentlyContinue | ForEach-Object { $_.FullName }
     }
 
-    $tracked = @($runLogPath, $taskRunnerLogPath) + $localFallbackFiles
+    $schedulerStatePath = Join-Path $reportsDir "scheduler_state.json"
+    $tracked = @($runLogPath, $taskRunnerLogPath, $reconcilePath, $schedulerStatePath) + $localFallbackFiles
     $tracked = $tracked | Where-Object { Test-Path -LiteralPath $_ }
     $tracked = $tracked | ForEach-Object { Get-RelativePath -FromPath $repoRoot -ToPath $_ } | Where-Object { $_ -and $_ -ne "." }
     if (@($tracked).Count -gt 0) {
@@ -241,7 +279,7 @@ try {
             & git diff --cached --quiet
             $hasChanges = ($LASTEXITCODE -ne 0)
             if ($hasChanges) {
-                $statusText = if ($overallSuccess) { "SUCCESS" } else { "FAILED" }
+                $statusText = if ($plan.ExitCode -eq 10) { "SKIPPED" } elseif ($overallSuccess) { "SUCCESS" } else { "FAILED" }
                 $commitMessage = "chore(log): daily scraper run $dateStamp - $statusText"
                 & git commit -m $commitMessage 2>&1 | Out-Null
                 $commitExitCode = $LASTEXITCODE
@@ -13,11 +13,12 @@ SELECT ticker_symbol, company_name,
 FROM stockanalysis_stocks
 WHERE ticker_symbol = 'SCOM';
 
--- Query by metric value (e.g., revenue > 100B)
-SELECT ticker_symbol, company_name,
-       overview_metrics->>'revenue' AS revenue
+-- Screen on typed metric columns (008), e.g. revenue > 100B by dividend yield.
+-- Both filters have btree indexes; the *_metrics blobs only hold unknown keys.
+SELECT ticker_symbol, company_name, revenue, dividend_yield
 FROM stockanalysis_stocks
-WHERE (overview_metrics->>'revenue')::bigint > 100000000000;
+WHERE revenue > 100000000000
+ORDER BY dividend_yield DESC NULLS LAST;
 
 -- Get latest scraped data
 SELECT ticker_symbol, company_name, scraped_at
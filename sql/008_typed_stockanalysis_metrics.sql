@@ -0,0 +1,200 @@
+-- Migration: typed, indexable columns for the StockAnalysis screener metrics
+-- Run in Supabase SQL Editor or via psql (after 003 and 007). Idempotent.
+--
+-- The known screener metrics move out of the *_metrics JSONB blobs into typed
+-- columns (see nse_scraper/db/stockanalysis_metrics.py). The blobs keep only
+-- keys that have no column, or whose value does not parse, so filters and sorts such as
+--   WHERE revenue > 100000000000 ORDER BY dividend_yield DESC
+-- use btree indexes instead of scanning and casting every row.
+
+-- ============================================
+-- 1. Columns
+-- ============================================
+
+ALTER TABLE stockanalysis_stocks
+    ADD COLUMN IF NOT EXISTS market_cap DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS revenue DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS volume DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS industry TEXT,
+    ADD COLUMN IF NOT EXISTS sector TEXT,
+    ADD COLUMN IF NOT EXISTS revenue_growth DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS net_income DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS fcf DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS net_cash DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS tr_1m DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS tr_6m DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS tr_ytd DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS tr_1y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS tr_5y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS tr_10y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS dps DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS dividend_yield DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS dividend_growth DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS ex_div_date DATE,
+    ADD COLUMN IF NOT EXISTS payout_ratio DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS payout_frequency TEXT,
+    ADD COLUMN IF NOT EXISTS low_52w DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS low_52w_change DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS high_52w DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS high_52w_change DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS country TEXT,
+    ADD COLUMN IF NOT EXISTS employees BIGINT,
+    ADD COLUMN IF NOT EXISTS founded BIGINT;
+
+-- ============================================
+-- 2. Backfill from the JSONB blobs
+-- ============================================
+
+-- Numbers may have been stored as display text ("1.36T", "-2.28%", "-"); this
+-- parses the same formats as the scraper and returns NULL for anything else.
+CREATE OR REPLACE FUNCTION stockanalysis_metric_number(raw TEXT)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+    cleaned TEXT := replace(btrim(raw), ',', '');
+    multiplier DOUBLE PRECISION := 1;
+BEGIN
+    IF cleaned IS NULL OR lower(cleaned) IN ('', '-', '--', 'n/a', 'na', 'null', 'none') THEN
+        RETURN NULL;
+    END IF;
+    IF right(cleaned, 1) = '%' THEN
+        cleaned := btrim(left(cleaned, -1));
+    ELSIF upper(right(cleaned, 1)) IN ('K', 'M', 'B', 'T') THEN
+        multiplier := CASE upper(right(cleaned, 1))
+            WHEN 'K' THEN 1e3 WHEN 'M' THEN 1e6 WHEN 'B' THEN 1e9 ELSE 1e12 END;
+        cleaned := left(cleaned, -1);
+    END IF;
+    IF cleaned ~ '^[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?$' THEN
+        RETURN cleaned::DOUBLE PRECISION * multiplier;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION stockanalysis_metric_date(raw TEXT)
+RETURNS DATE AS $$
+BEGIN
+    IF raw IS NULL OR btrim(raw) = '' THEN
+        RETURN NULL;
+    END IF;
+    IF raw ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' THEN
+        RETURN left(raw, 10)::DATE;
+    END IF;
+    RETURN to_date(raw, 'Mon DD, YYYY');
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Any write that still sends metrics inside the blobs (the RPC in 004, manual
+-- inserts, older scrapers) is promoted into the typed columns by this trigger.
+CREATE OR REPLACE FUNCTION promote_stockanalysis_metrics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.overview_metrics ? 'marketCap' THEN NEW.market_cap := stockanalysis_metric_number(NEW.overview_metrics->>'marketCap'); END IF;
+    IF NEW.overview_metrics ? 'revenue' THEN NEW.revenue := stockanalysis_metric_number(NEW.overview_metrics->>'revenue'); END IF;
+    IF NEW.overview_metrics ? 'volume' OR NEW.price_metrics ? 'volume' THEN
+        NEW.volume := COALESCE(stockanalysis_metric_number(NEW.overview_metrics->>'volume'), stockanalysis_metric_number(NEW.price_metrics->>'volume'));
+    END IF;
+    IF NEW.overview_metrics ? 'industry' OR NEW.profile_metrics ? 'industry' THEN
+        NEW.industry := COALESCE(NULLIF(btrim(NEW.overview_metrics->>'industry'), ''), NULLIF(btrim(NEW.profile_metrics->>'industry'), ''));
+    END IF;
+    IF NEW.overview_metrics ? 'sector' THEN NEW.sector := NULLIF(btrim(NEW.overview_metrics->>'sector'), ''); END IF;
+    IF NEW.overview_metrics ? 'revenueGrowth' THEN NEW.revenue_growth := stockanalysis_metric_number(NEW.overview_metrics->>'revenueGrowth'); END IF;
+    IF NEW.overview_metrics ? 'netIncome' THEN NEW.net_income := stockanalysis_metric_number(NEW.overview_metrics->>'netIncome'); END IF;
+    IF NEW.overview_metrics ? 'fcf' THEN NEW.fcf := stockanalysis_metric_number(NEW.overview_metrics->>'fcf'); END IF;
+    IF NEW.overview_metrics ? 'netCash' THEN NEW.net_cash := stockanalysis_metric_number(NEW.overview_metrics->>'netCash'); END IF;
+    IF NEW.performance_metrics ? 'tr1m' THEN NEW.tr_1m := stockanalysis_metric_number(NEW.performance_metrics->>'tr1m'); END IF;
+    IF NEW.performance_metrics ? 'tr6m' THEN NEW.tr_6m := stockanalysis_metric_number(NEW.performance_metrics->>'tr6m'); END IF;
+    IF NEW.performance_metrics ? 'trYTD' THEN NEW.tr_ytd := stockanalysis_metric_number(NEW.performance_metrics->>'trYTD'); END IF;
+    IF NEW.performance_metrics ? 'tr1y' THEN NEW.tr_1y := stockanalysis_metric_number(NEW.performance_metrics->>'tr1y'); END IF;
+    IF NEW.performance_metrics ? 'tr5y' THEN NEW.tr_5y := stockanalysis_metric_number(NEW.performance_metrics->>'tr5y'); END IF;
+    IF NEW.performance_metrics ? 'tr10y' THEN NEW.tr_10y := stockanalysis_metric_number(NEW.performance_metrics->>'tr10y'); END IF;
+    IF NEW.dividends_metrics ? 'dps' THEN NEW.dps := stockanalysis_metric_number(NEW.dividends_metrics->>'dps'); END IF;
+    IF NEW.dividends_metrics ? 'dividendYield' THEN NEW.dividend_yield := stockanalysis_metric_number(NEW.dividends_metrics->>'dividendYield'); END IF;
+    IF NEW.dividends_metrics ? 'dividendGrowth' THEN NEW.dividend_growth := stockanalysis_metric_number(NEW.dividends_metrics->>'dividendGrowth'); END IF;
+    IF NEW.dividends_metrics ? 'exDivDate' THEN NEW.ex_div_date := stockanalysis_metric_date(NEW.dividends_metrics->>'exDivDate'); END IF;
+    IF NEW.dividends_metrics ? 'payoutRatio' THEN NEW.payout_ratio := stockanalysis_metric_number(NEW.dividends_metrics->>'payoutRatio'); END IF;
+    IF NEW.dividends_metrics ? 'payoutFrequency' THEN NEW.payout_frequency := NULLIF(btrim(NEW.dividends_metrics->>'payoutFrequency'), ''); END IF;
+    IF NEW.price_metrics ? 'low52' THEN NEW.low_52w := stockanalysis_metric_number(NEW.price_metrics->>'low52'); END IF;
+    IF NEW.price_metrics ? 'low52ch' THEN NEW.low_52w_change := stockanalysis_metric_number(NEW.price_metrics->>'low52ch'); END IF;
+    IF NEW.price_metrics ? 'high52' THEN NEW.high_52w := stockanalysis_metric_number(NEW.price_metrics->>'high52'); END IF;
+    IF NEW.price_metrics ? 'high52ch' THEN NEW.high_52w_change := stockanalysis_metric_number(NEW.price_metrics->>'high52ch'); END IF;
+    IF NEW.profile_metrics ? 'country' THEN NEW.country := NULLIF(btrim(NEW.profile_metrics->>'country'), ''); END IF;
+    IF NEW.profile_metrics ? 'employees' THEN NEW.employees := round(stockanalysis_metric_number(NEW.profile_metrics->>'employees'))::BIGINT; END IF;
+    IF NEW.profile_metrics ? 'founded' THEN NEW.founded := round(stockanalysis_metric_number(NEW.profile_metrics->>'founded'))::BIGINT; END IF;
+    -- A key leaves its blob only once its value is in the typed column; values
+    -- that do not parse stay in the blob as scraped.
+    NEW.overview_metrics := NULLIF(NEW.overview_metrics - array_remove(ARRAY[
+        CASE WHEN NEW.overview_metrics->'marketCap' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'marketCap') IS NOT NULL THEN 'marketCap' END,
+        CASE WHEN NEW.overview_metrics->'revenue' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'revenue') IS NOT NULL THEN 'revenue' END,
+        CASE WHEN NEW.overview_metrics->'volume' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'volume') IS NOT NULL THEN 'volume' END,
+        CASE WHEN NEW.overview_metrics->'industry' = 'null'::jsonb OR NULLIF(btrim(NEW.overview_metrics->>'industry'), '') IS NOT NULL THEN 'industry' END,
+        CASE WHEN NEW.overview_metrics->'sector' = 'null'::jsonb OR NULLIF(btrim(NEW.overview_metrics->>'sector'), '') IS NOT NULL THEN 'sector' END,
+        CASE WHEN NEW.overview_metrics->'revenueGrowth' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'revenueGrowth') IS NOT NULL THEN 'revenueGrowth' END,
+        CASE WHEN NEW.overview_metrics->'netIncome' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'netIncome') IS NOT NULL THEN 'netIncome' END,
+        CASE WHEN NEW.overview_metrics->'fcf' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'fcf') IS NOT NULL THEN 'fcf' END,
+        CASE WHEN NEW.overview_metrics->'netCash' = 'null'::jsonb OR stockanalysis_metric_number(NEW.overview_metrics->>'netCash') IS NOT NULL THEN 'netCash' END
+    ], NULL), '{}'::jsonb);
+    NEW.performance_metrics := NULLIF(NEW.performance_metrics - array_remove(ARRAY[
+        CASE WHEN NEW.performance_metrics->'tr1m' = 'null'::jsonb OR stockanalysis_metric_number(NEW.performance_metrics->>'tr1m') IS NOT NULL THEN 'tr1m' END,
+        CASE WHEN NEW.performance_metrics->'tr6m' = 'null'::jsonb OR stockanalysis_metric_number(NEW.performance_metrics->>'tr6m') IS NOT NULL THEN 'tr6m' END,
+        CASE WHEN NEW.performance_metrics->'trYTD' = 'null'::jsonb OR stockanalysis_metric_number(NEW.performance_metrics->>'trYTD') IS NOT NULL THEN 'trYTD' END,
+        CASE WHEN NEW.performance_metrics->'tr1y' = 'null'::jsonb OR stockanalysis_metric_number(NEW.performance_metrics->>'tr1y') IS NOT NULL THEN 'tr1y' END,
+        CASE WHEN NEW.performance_metrics->'tr5y' = 'null'::jsonb OR stockanalysis_metric_number(NEW.performance_metrics->>'tr5y') IS NOT NULL THEN 'tr5y' END,
+        CASE WHEN NEW.performance_metrics->'tr10y' = 'null'::jsonb OR stockanalysis_metric_number(NEW.performance_metrics->>'tr10y') IS NOT NULL THEN 'tr10y' END
+    ], NULL), '{}'::jsonb);
+    NEW.dividends_metrics := NULLIF(NEW.dividends_metrics - array_remove(ARRAY[
+        CASE WHEN NEW.dividends_metrics->'dps' = 'null'::jsonb OR stockanalysis_metric_number(NEW.dividends_metrics->>'dps') IS NOT NULL THEN 'dps' END,
+        CASE WHEN NEW.dividends_metrics->'dividendYield' = 'null'::jsonb OR stockanalysis_metric_number(NEW.dividends_metrics->>'dividendYield') IS NOT NULL THEN 'dividendYield' END,
+        CASE WHEN NEW.dividends_metrics->'dividendGrowth' = 'null'::jsonb OR stockanalysis_metric_number(NEW.dividends_metrics->>'dividendGrowth') IS NOT NULL THEN 'dividendGrowth' END,
+        CASE WHEN NEW.dividends_metrics->'exDivDate' = 'null'::jsonb OR stockanalysis_metric_date(NEW.dividends_metrics->>'exDivDate') IS NOT NULL THEN 'exDivDate' END,
+        CASE WHEN NEW.dividends_metrics->'payoutRatio' = 'null'::jsonb OR stockanalysis_metric_number(NEW.dividends_metrics->>'payoutRatio') IS NOT NULL THEN 'payoutRatio' END,
+        CASE WHEN NEW.dividends_metrics->'payoutFrequency' = 'null'::jsonb OR NULLIF(btrim(NEW.dividends_metrics->>'payoutFrequency'), '') IS NOT NULL THEN 'payoutFrequency' END
+    ], NULL), '{}'::jsonb);
+    NEW.price_metrics := NULLIF(NEW.price_metrics - array_remove(ARRAY[
+        CASE WHEN NEW.price_metrics->'volume' = 'null'::jsonb OR stockanalysis_metric_number(NEW.price_metrics->>'volume') IS NOT NULL THEN 'volume' END,
+        CASE WHEN NEW.price_metrics->'low52' = 'null'::jsonb OR stockanalysis_metric_number(NEW.price_metrics->>'low52') IS NOT NULL THEN 'low52' END,
+        CASE WHEN NEW.price_metrics->'low52ch' = 'null'::jsonb OR stockanalysis_metric_number(NEW.price_metrics->>'low52ch') IS NOT NULL THEN 'low52ch' END,
+        CASE WHEN NEW.price_metrics->'high52' = 'null'::jsonb OR stockanalysis_metric_number(NEW.price_metrics->>'high52') IS NOT NULL THEN 'high52' END,
+        CASE WHEN NEW.price_metrics->'high52ch' = 'null'::jsonb OR stockanalysis_metric_number(NEW.price_metrics->>'high52ch') IS NOT NULL THEN 'high52ch' END
+    ], NULL), '{}'::jsonb);
+    NEW.profile_metrics := NULLIF(NEW.profile_metrics - array_remove(ARRAY[
+        CASE WHEN NEW.profile_metrics->'industry' = 'null'::jsonb OR NULLIF(btrim(NEW.profile_metrics->>'industry'), '') IS NOT NULL THEN 'industry' END,
+        CASE WHEN NEW.profile_metrics->'country' = 'null'::jsonb OR NULLIF(btrim(NEW.profile_metrics->>'country'), '') IS NOT NULL THEN 'country' END,
+        CASE WHEN NEW.profile_metrics->'employees' = 'null'::jsonb OR stockanalysis_metric_number(NEW.profile_metrics->>'employees') IS NOT NULL THEN 'employees' END,
+        CASE WHEN NEW.profile_metrics->'founded' = 'null'::jsonb OR stockanalysis_metric_number(NEW.profile_metrics->>'founded') IS NOT NULL THEN 'founded' END
+    ], NULL), '{}'::jsonb);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_stockanalysis_stocks_promote_metrics ON stockanalysis_stocks;
+CREATE TRIGGER tr_stockanalysis_stocks_promote_metrics
+    BEFORE INSERT OR UPDATE ON stockanalysis_stocks
+    FOR EACH ROW
+    EXECUTE PROCEDURE promote_stockanalysis_metrics();
+
+-- Backfill existing rows through the trigger.
+UPDATE stockanalysis_stocks SET overview_metrics = overview_metrics
+WHERE overview_metrics ?| ARRAY['marketCap', 'revenue', 'volume', 'industry', 'sector', 'revenueGrowth', 'netIncome', 'fcf', 'netCash'] OR performance_metrics ?| ARRAY['tr1m', 'tr6m', 'trYTD', 'tr1y', 'tr5y', 'tr10y'] OR dividends_metrics ?| ARRAY['dps', 'dividendYield', 'dividendGrowth', 'exDivDate', 'payoutRatio', 'payoutFrequency'] OR price_metrics ?| ARRAY['volume', 'low52', 'low52ch', 'high52', 'high52ch'] OR profile_metrics ?| ARRAY['industry', 'country', 'employees', 'founded'];
+
+-- ============================================
+-- 3. Indexes
+-- ============================================
+
+-- The blobs are now small or empty; their GIN indexes only cost writes.
+DROP INDEX IF EXISTS ix_stockanalysis_stocks_overview_metrics;
+DROP INDEX IF EXISTS ix_stockanalysis_stocks_performance_metrics;
+DROP INDEX IF EXISTS ix_stockanalysis_stocks_dividends_metrics;
+DROP INDEX IF EXISTS ix_stockanalysis_stocks_price_metrics;
+DROP INDEX IF EXISTS ix_stockanalysis_stocks_profile_metrics;
+
+CREATE INDEX IF NOT EXISTS ix_stockanalysis_stocks_market_cap ON stockanalysis_stocks (market_cap);
+CREATE INDEX IF NOT EXISTS ix_stockanalysis_stocks_revenue ON stockanalysis_stocks (revenue);
+CREATE INDEX IF NOT EXISTS ix_stockanalysis_stocks_dividend_yield ON stockanalysis_stocks (dividend_yield);
+CREATE INDEX IF NOT EXISTS ix_stockanalysis_stocks_tr_1y ON stockanalysis_stocks (tr_1y);
+CREATE INDEX IF NOT EXISTS ix_stockanalysis_stocks_tr_ytd ON stockanalysis_stocks (tr_ytd);
+CREATE INDEX IF NOT EXISTS ix_stockanalysis_stocks_sector ON stockanalysis_stocks (sector);
+
+-- Reclaim the space freed in the blobs (optional; takes a brief lock)
+-- VACUUM (ANALYZE) stockanalysis_stocks;
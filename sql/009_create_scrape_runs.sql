@@ -0,0 +1,34 @@
+-- Migration: scrape runs
+-- Run in Supabase SQL Editor or via psql (after 001 and 007). Idempotent.
+--
+-- Every AFX crawl is one run (see nse_scraper/runs.py): its quotes share one
+-- scraped_at and carry its run_id, in stock_data.price_history entries as
+-- {"scraped_at": ..., "stock_price": ..., "stock_change": ..., "run_id": ...}.
+-- This table records one row per run, written when it starts and again when
+-- it finishes.
+
+-- ============================================
+-- 1. Runs table
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    run_id VARCHAR(40) PRIMARY KEY,
+    spider VARCHAR(64) NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ,
+    status VARCHAR(16) NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS ix_scrape_runs_started_at ON scrape_runs (started_at DESC);
+
+-- ============================================
+-- 2. Looking up a run's quotes
+-- ============================================
+
+-- The GIN index from 007 (ix_stock_data_price_history) serves containment, so
+-- the rows a run touched are found without scanning every history array:
+--   SELECT ticker_symbol, entry
+--   FROM stock_data, jsonb_array_elements(price_history) AS entry
+--   WHERE price_history @> '[{"run_id": "20261019T063000Z-1a2b3c4d"}]'
+--     AND entry->>'run_id' = '20261019T063000Z-1a2b3c4d';
@@ -0,0 +1,47 @@
+-- Migration: market index points
+-- Run in Supabase SQL Editor or via psql (after 003). Idempotent.
+--
+-- After each StockAnalysis crawl nse_scraper/indices.py groups the overview
+-- snapshot into market-cap-weighted index points: one for the whole exchange
+-- (scope 'exchange', name 'NSE All-Share') and one per sector and industry.
+-- Dashboards read these series instead of aggregating the metric columns on
+-- every page load.
+
+-- ============================================
+-- 1. Index points table
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS market_index_points (
+    scope VARCHAR(16) NOT NULL,
+    name TEXT NOT NULL,
+    as_of TIMESTAMPTZ NOT NULL,
+    trade_date DATE NOT NULL,
+    run_id VARCHAR(40),
+    constituents INTEGER NOT NULL,
+    market_cap DOUBLE PRECISION NOT NULL,
+    weight_pct DOUBLE PRECISION,
+    change_pct DOUBLE PRECISION,
+    mean_change_pct DOUBLE PRECISION,
+    level DOUBLE PRECISION NOT NULL,
+    advancers INTEGER NOT NULL DEFAULT 0,
+    decliners INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, name, as_of)
+);
+
+CREATE INDEX IF NOT EXISTS ix_market_index_points_trade_date ON market_index_points (trade_date);
+
+-- ============================================
+-- 2. Reading a series
+-- ============================================
+
+-- The primary key serves one series in time order:
+--   SELECT trade_date, level, change_pct
+--   FROM market_index_points
+--   WHERE scope = 'exchange' AND name = 'NSE All-Share' AND as_of >= '2026-01-01'
+--   ORDER BY as_of;
+--
+-- Today's sector board:
+--   SELECT name, weight_pct, change_pct, level
+--   FROM market_index_points
+--   WHERE scope = 'sector' AND trade_date = current_date
+--   ORDER BY weight_pct DESC;
@@ -0,0 +1,143 @@
+"""
+Shared test helpers: quote factories and an in-memory Supabase client
+
+Test modules import these with ``from helpers import ...``; both
+``unittest discover -s tests`` and pytest put this directory on ``sys.path``.
+"""
+from datetime import datetime, timedelta, timezone
+
+from yarl import URL
+
+T0 = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+def make_quote(ticker="SCOM", price=10.0, at=T0, **fields):
+    """A quote record scraped (and created) at ``at``; ``fields`` override or add keys."""
+    record = {"ticker_symbol": ticker, "stock_name": f"{ticker} Plc", "stock_price": price,
+              "stock_change": None, "created_at": at, "scraped_at": at}
+    record.update(fields)
+    return record
+
+
+def quote_at(ticker, minutes, price, start=T0, **fields):
+    """A quote record ``minutes`` after ``start``."""
+    return make_quote(ticker, price, start + timedelta(minutes=minutes), **fields)
+
+
+class FakeResponse:
+    def __init__(self, data=None):
+        self.data = data
+
+    def raise_for_status(self):
+        return None
+
+
+class FakeSession:
+    """Raw HTTP session stand-in; records every POST.
+
+    Like httpx, it only takes a ``str`` URL: postgrest builders carry a
+    ``yarl.URL`` that callers must convert.
+    """
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, params, headers, content, auth=None):
+        if not isinstance(url, str):
+            raise TypeError(f"Invalid type for url. Expected str or httpx.URL, got {type(url)}")
+        self.posts.append((url, params, headers, content))
+        return FakeResponse()
+
+
+class FakeQuery:
+    """One PostgREST request builder over a ``FakeSupabaseClient`` table.
+
+    ``path`` and ``auth`` mirror postgrest's ``SyncRequestBuilder``.
+    """
+
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+        self.session = client.session
+        self.path, self.headers, self.auth = URL(f"https://x.supabase.co/rest/v1/{name}"), {"apikey": "key"}, None
+        self.action, self.filters, self.after, self.count, self.payload = "select", {}, None, None, None
+
+    def select(self, columns):
+        return self
+
+    def order(self, column):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = [value]
+        return self
+
+    def in_(self, column, values):
+        self.filters[column] = list(values)
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload, on_conflict):
+        self.action, self.payload = "upsert", payload
+        self.filters = {on_conflict: [payload[on_conflict]]}
+        return self
+
+    def execute(self):
+        client = self.client
+        if client.failing.get(self.action):
+            client.failing[self.action] -= 1
+            raise ConnectionError("PostgREST unavailable")
+        rows = client.tables.setdefault(self.name, [])
+        if self.action == "update":
+            client.updates.append(({column: values[0] for column, values in self.filters.items()}, self.payload))
+            return FakeResponse([])
+        if self.action == "upsert":
+            client.upserts.append(self.payload)
+            rows[:] = [row for row in rows if not self._matches(row)] + [self.payload]
+            return FakeResponse([self.payload])
+        client.selects.append({column: values for column, values in self.filters.items()})
+        matched = [row for row in rows if self._matches(row)
+                   and (self.after is None or row["ticker_symbol"] > self.after)]
+        limit = min(filter(None, (self.count, client.max_rows)), default=None)
+        return FakeResponse(matched[:limit])
+
+    def _matches(self, row):
+        return all(row.get(column) in values for column, values in self.filters.items())
+
+
+class FakeSupabaseClient:
+    """In-memory PostgREST client: ``tables`` maps a table name to its rows.
+
+    ``max_rows`` caps every response like the server's row limit, ``failing``
+    maps an action (``select``, ``upsert``, ``update``) to how many of its next
+    requests raise, and ``session`` takes the backend's raw POSTs.
+    """
+
+    def __init__(self, tables=None, max_rows=None):
+        self.tables = tables if tables is not None else {}
+        self.max_rows = max_rows
+        self.failing = {}
+        self.selects, self.upserts, self.updates = [], [], []
+        self.session = FakeSession()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def supabase_backend(tables=None, **client_options):
+    """A ``SupabaseBackend`` on ``stock_data`` talking to a ``FakeSupabaseClient``."""
+    from nse_scraper.db.supabase_backend import SupabaseBackend
+
+    backend = SupabaseBackend("https://x.supabase.co", "key", "stock_data")
+    backend.client = FakeSupabaseClient(tables, **client_options)
+    return backend
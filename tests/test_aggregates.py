@@ -0,0 +1,116 @@
+"""
+Tests for the daily OHLC and summary aggregates
+
+Database tests need NSE_TEST_POSTGRES_URL (see tests/test_postgres_bulk.py).
+"""
+import os
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from nse_scraper.db.aggregates import ohlc_upsert_sql, summary_refresh_sql
+from nse_scraper.db.models import StockPriceHistory
+
+TEST_URL = os.getenv("NSE_TEST_POSTGRES_URL")
+
+EAT = timezone(timedelta(hours=3))
+
+
+def _tick(price, day, hour, minute=0, ticker="ZZG1"):
+    at = datetime(2026, 3, day, hour, minute, tzinfo=EAT)
+    return {"ticker_symbol": ticker, "stock_name": "Agg Co", "stock_price": price, "stock_change": price / 100,
+            "created_at": at, "scraped_at": at}
+
+
+class TestAggregateSql(unittest.TestCase):
+    """Test the OHLC and summary SQL builders"""
+
+    def test_upsert_reads_from_given_source(self):
+        """Test the OHLC upsert reads from the given source"""
+        sql = ohlc_upsert_sql("new_ticks")
+        self.assertIn("FROM new_ticks", sql)
+        self.assertIn("ON CONFLICT (ticker_symbol, trade_date)", sql)
+
+    def test_summary_filter_is_inlined(self):
+        """Test the summary refresh inlines its ticker filter"""
+        self.assertIn("WHERE ticker_symbol = ANY(:tickers)", summary_refresh_sql("= ANY(:tickers)"))
+
+    def test_tick_insert_binds_every_history_column(self):
+        """Test the tick insert binds one parameter per history column"""
+        from nse_scraper.db.postgres_backend import _INSERT_TICK
+
+        params = _INSERT_TICK.compile(dialect=postgresql.dialect()).params
+        self.assertEqual(set(params), {column.name for column in StockPriceHistory.__table__.columns})
+
+
+@unittest.skipUnless(TEST_URL, "NSE_TEST_POSTGRES_URL not set")
+class TestIncrementalAggregates(unittest.TestCase):
+    """Test incremental aggregate refreshes against PostgreSQL"""
+
+    def setUp(self):
+        from nse_scraper.db.postgres_backend import PostgresBackend
+
+        self.backend = PostgresBackend(sql_database_url=TEST_URL)
+        self.backend.open()
+        self._cleanup()
+
+    def tearDown(self):
+        self._cleanup()
+        self.backend.close()
+
+    def _cleanup(self):
+        from sqlalchemy import text
+
+        with self.backend.engine.begin() as conn:
+            for table in ("stock_summary", "stock_daily_ohlc", "stock_price_history", "stock_data"):
+                conn.execute(text(f"DELETE FROM {table} WHERE ticker_symbol LIKE 'ZZG%'"))
+
+    def test_out_of_order_ticks_keep_open_and_close(self):
+        """Test out-of-order ticks keep the first open and last close"""
+        for tick in (_tick(10.0, 2, 11), _tick(9.0, 2, 10), _tick(12.5, 2, 14), _tick(8.0, 2, 12)):
+            self.backend.upsert_stock(tick)
+        self.backend.upsert_stock(_tick(12.5, 2, 14))  # replay is not double counted
+        (day,) = self.backend.get_daily_ohlc("ZZG1")
+        self.assertEqual(day["trade_date"], date(2026, 3, 2))
+        self.assertEqual((day["open"], day["high"], day["low"], day["close"]), (9.0, 12.5, 8.0, 12.5))
+        self.assertEqual(day["sample_count"], 4)
+
+    def test_sync_summaries_are_refreshed_once_per_flush(self):
+        """Test summaries are refreshed once per flush"""
+        for day in (2, 3):
+            self.backend.upsert_stock(_tick(10.0 * (day - 1), day, 15))
+        self.assertEqual(self.backend._stale_summaries, {"ZZG1"})
+        self.backend.flush()
+        self.assertEqual(self.backend._stale_summaries, set())
+        summary = self.backend.get_summary("ZZG1")
+        self.assertEqual(summary["latest_price"], 20.0)
+        self.assertAlmostEqual(summary["change_1d_pct"], 100.0)
+
+    def test_trade_date_is_nse_local(self):
+        # 23:30 UTC on the 2nd is 02:30 EAT on the 3rd.
+        """Test trade dates use the NSE local date"""
+        self.backend.upsert_stock(_tick(10.0, 3, 2, 30))
+        self.assertEqual(self.backend.get_daily_ohlc("ZZG1")[0]["trade_date"], date(2026, 3, 3))
+
+    def test_summary_changes_and_bulk_matches_rebuild(self):
+        """Test summary changes and that bulk loads match a full rebuild"""
+        from nse_scraper.db.aggregates import rebuild
+
+        ticks = [_tick(10.0 + day, day, 15) for day in range(2, 28)]
+        self.backend.bulk_load(ticks)
+        summary = self.backend.get_summary("ZZG1")
+        self.assertEqual(summary["latest_price"], 37.0)
+        self.assertAlmostEqual(summary["change_1d_pct"], 100.0 / 36)
+        self.assertAlmostEqual(summary["change_1w_pct"], 100.0 * 7 / 30)
+        self.assertEqual((summary["high_52w"], summary["low_52w"]), (37.0, 12.0))
+
+        incremental = self.backend.get_daily_ohlc("ZZG1")
+        with self.backend.engine.begin() as conn:
+            rebuild(conn, ticker_symbols=["ZZG1"])
+        rebuilt = self.backend.get_daily_ohlc("ZZG1")
+        self.assertEqual(incremental, rebuilt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests for the intraday AFX polling daemon
+"""
+import unittest
+from unittest import mock
+
+from nse_scraper.daemon import AfxPollingDaemon
+
+BOARD_HTML = """
+<html><body><table><tbody>
+<tr><td>SCOM</td><td>Safaricom</td><td>x</td><td>{scom}</td><td>-0.30</td></tr>
+<tr><td>EQTY</td><td>Equity Group</td><td>x</td><td>75.00</td><td>2.28</td></tr>
+</tbody></table></body></html>
+"""
+
+
+class _FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class _FakeHttp:
+    def __init__(self, responses):
+        self.headers = {}
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+class _FakeBackend:
+    def __init__(self):
+        self.written = []
+
+        self.retries = 0
+
+    def upsert_stock(self, record):
+        self.written.append(record["ticker_symbol"])
+
+    def retry_due(self):
+        self.retries += 1
+
+
+def _board(scom):
+    return _FakeResponse(200, BOARD_HTML.format(scom=scom).encode("utf-8"), {"ETag": '"v1"'})
+
+
+class TestAfxPollingDaemon(unittest.TestCase):
+    """Test polling cycles write only changed tickers"""
+
+    def test_only_changed_tickers_are_written(self):
+        """Test only tickers whose quote changed are written"""
+        http = _FakeHttp([_board("33.85"), _board("33.85"), _board("34.10")])
+        backend = _FakeBackend()
+        daemon = AfxPollingDaemon(backend, http)
+
+        first = daemon.run_cycle()
+        second = daemon.run_cycle()
+        third = daemon.run_cycle()
+
+        self.assertEqual((first.rows, first.changed), (2, 2))
+        self.assertEqual((second.rows, second.changed), (2, 0))
+        self.assertEqual((third.rows, third.changed), (2, 1))
+        self.assertEqual(backend.written, ["SCOM", "EQTY", "SCOM"])
+        self.assertEqual(http.requests[1].get("If-None-Match"), '"v1"')
+
+    def test_not_modified_skips_parse_and_writes(self):
+        """Test a 304 response skips parsing and writing"""
+        http = _FakeHttp([_FakeResponse(304)])
+        backend = _FakeBackend()
+        report = AfxPollingDaemon(backend, http).run_cycle()
+        self.assertEqual(report.status, 304)
+        self.assertEqual(report.changed, 0)
+        self.assertEqual(backend.written, [])
+
+    def test_sleep_retries_pending_writes(self):
+        """Test idle sleeps keep retrying failed writes between cycles"""
+        backend = _FakeBackend()
+        daemon = AfxPollingDaemon(backend, _FakeHttp([]))
+        with mock.patch("nse_scraper.daemon._RETRY_INTERVAL", 0.01):
+            daemon._sleep(0.05)
+        self.assertGreaterEqual(backend.retries, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for the embedded (SQLite) storage backend
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from helpers import T0, quote_at
+from nse_scraper.db import create_backend
+
+
+class TestEmbeddedBackend(unittest.TestCase):
+    """Test the embedded SQLite backend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "db", "nse.sqlite3")
+        self.backend = create_backend("embedded", embedded_path=self.path, embedded_batch_size=3)
+        self.backend.open()
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_wal_mode_and_batched_writes(self):
+        """Test WAL mode and batched writes"""
+        self.assertEqual(self.backend.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        for minute in range(4):
+            self.backend.upsert_stock(quote_at("SCOM", minute, 14.0 + minute))
+        # Three quotes were committed as one batch; the fourth is still buffered.
+        other = sqlite3.connect(self.path)
+        self.assertEqual(other.execute("SELECT count(*) FROM stock_price_history").fetchone()[0], 3)
+        other.close()
+        self.assertEqual(len(self.backend.get_history("SCOM")), 4)
+
+    def test_failed_flush_keeps_the_batch(self):
+        """Test a batch whose commit fails stays buffered for the next flush"""
+        self.backend.conn.execute("PRAGMA busy_timeout=0")
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        self.backend.upsert_stock(quote_at("SCOM", 0, 14.0))
+        self.backend.upsert_stock(quote_at("EQTY", 0, 45.0))
+        with self.assertRaises(sqlite3.OperationalError):
+            self.backend.upsert_stock(quote_at("KCB", 0, 30.0))
+        other.execute("ROLLBACK")
+        other.close()
+        self.assertEqual(self.backend.flush(), 3)
+        self.assertEqual([row["ticker_symbol"] for row in self.backend.iter_history()], ["EQTY", "KCB", "SCOM"])
+
+    def test_latest_row_ignores_older_quotes(self):
+        """Test the latest row ignores older quotes"""
+        self.backend.upsert_stock(quote_at("SCOM", 5, 15.0))
+        self.backend.upsert_stock(quote_at("SCOM", 1, 13.0))
+        self.backend.upsert_stock(quote_at("SCOM", 5, 15.0))  # replay
+        latest = self.backend.get_latest_by_ticker("SCOM")
+        self.assertEqual(latest["stock_price"], 15.0)
+        self.assertEqual([row["stock_price"] for row in self.backend.get_history("SCOM")], [13.0, 15.0])
+
+    def test_history_range_and_iteration(self):
+        """Test reading a history range and iterating history"""
+        for minute in range(6):
+            self.backend.upsert_stock(quote_at("EQTY", minute, 45.0 + minute))
+        self.backend.upsert_stock(quote_at("ABSA", 0, 12.0))
+        window = self.backend.get_history("EQTY", T0 + timedelta(minutes=2), "2026-03-02T12:04:00+03:00")
+        self.assertEqual([row["stock_price"] for row in window], [47.0, 48.0])
+        self.assertEqual([row["ticker_symbol"] for row in self.backend.iter_history()], ["ABSA"] + ["EQTY"] * 6)
+
+    def test_stockanalysis_records(self):
+        """Test StockAnalysis records are upserted and read back"""
+        record = {"ticker_symbol": "KCB", "company_name": "KCB Group", "rank": 3, "stock_price": 30.5,
+                  "stock_change": -0.2, "scraped_at": T0, "overview_metrics": {"marketCap": 98e9},
+                  "performance_metrics": None}
+        self.backend.upsert_stockanalysis_stock(record)
+        self.backend.upsert_stockanalysis_stock({**record, "stock_price": 31.0, "scraped_at": T0 + timedelta(hours=1)})
+        stored = self.backend.get_stockanalysis_stock("KCB")
+        self.assertEqual(stored["stock_price"], 31.0)
+        self.assertEqual(stored["overview_metrics"], {"marketCap": 98e9})
+        history = self.backend.get_history("KCB", table="stockanalysis_price_history")
+        self.assertEqual([row["stock_price"] for row in history], [30.5, 31.0])
+
+    def test_compaction(self):
+        """Test compaction thins history by the retention policy"""
+        from nse_scraper.retention import RetentionPolicy
+
+        for minute in range(0, 300, 60):
+            self.backend.upsert_stock(quote_at("SCOM", minute, 14.0 + minute / 60))
+        policy = RetentionPolicy(full_days=7, daily_days=60)
+        now = datetime(2026, 3, 20, tzinfo=timezone.utc)
+        report = self.backend.compact_history(policy, now=now)
+        self.assertEqual((report.rows_scanned, report.rows_removed), (5, 4))
+        self.assertEqual([row["stock_price"] for row in self.backend.get_history("SCOM")], [18.0])
+        self.assertEqual(self.backend.compact_history(policy, now=now).rows_removed, 0)
+
+
+class TestStockAnalysisRouting(unittest.TestCase):
+    """Test StockAnalysis records routed to the embedded backend"""
+
+    def test_pipeline_active_for_embedded(self):
+        """Test the StockAnalysis pipeline stores to the embedded backend"""
+        from nse_scraper.pipelines import StockAnalysisPipeline
+
+        pipeline = StockAnalysisPipeline("embedded", None, None, "stockanalysis_stocks",
+                                         embedded_path=":memory:")
+        self.assertIsNotNone(pipeline.storage)
+        self.assertIsNone(StockAnalysisPipeline("postgres", None, None, "stockanalysis_stocks").storage)
+
+
+if __name__ == "__main__":
+    unittest.main()
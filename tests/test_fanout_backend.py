@@ -0,0 +1,233 @@
+"""
+Tests for the concurrent multi-backend fan-out
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from nse_scraper.db import backend_names, create_backend, create_backend_from_settings, sync_backend_name
+from nse_scraper.db.fanout_backend import FanoutBackend, per_backend
+from nse_scraper.db.resilience import ResilientBackend
+
+
+class _Recorder:
+    """Backend stand-in that records writes, optionally slowly or failing."""
+
+    def __init__(self, delay=0.0, failures=0, fail_open=False):
+        self.delay, self.failures, self.fail_open = delay, failures, fail_open
+        self.records, self.closed, self.calls = [], False, 0
+        self.threads, self.flushes = set(), []
+
+    def open(self):
+        if self.fail_open:
+            raise ConnectionError("unreachable")
+
+    def close(self):
+        self.closed = True
+
+    def upsert_stock(self, record):
+        self.calls += 1
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("transient")
+        self.records.append(record)
+
+    def flush(self):
+        self.flushes.append((threading.current_thread().name, len(self.records)))
+
+
+def _quotes(count):
+    return [{"ticker_symbol": f"T{index}", "stock_price": 1.0} for index in range(count)]
+
+
+class TestFanoutBackend(unittest.TestCase):
+    """Test FanoutBackend queueing, batching and failure isolation"""
+
+    def test_writes_reach_every_backend_concurrently(self):
+        """Test writes reach every backend concurrently"""
+        slow, fast = _Recorder(delay=0.05), _Recorder(delay=0.05)
+        fanout = FanoutBackend([("slow", slow), ("fast", fast)], batch_size=1)
+        fanout.open()
+        start = time.perf_counter()
+        for quote in _quotes(10):
+            fanout.upsert_stock(quote)
+        enqueued = time.perf_counter() - start
+        fanout.close()
+        elapsed = time.perf_counter() - start
+        self.assertLess(enqueued, 0.05)
+        # Roughly the slowest backend's time (0.5s), not the sum (1s).
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual([r["ticker_symbol"] for r in slow.records], [r["ticker_symbol"] for r in fast.records])
+        self.assertEqual(slow.threads, {"fanout-slow"})
+        self.assertTrue(slow.closed and fast.closed)
+
+    def test_failed_writes_are_spooled_per_backend(self):
+        """Test failed writes are spooled per backend"""
+        with tempfile.TemporaryDirectory() as tmp:
+            broken, healthy = _Recorder(failures=100), _Recorder()
+            resilient = ResilientBackend(broken, "broken", spool_dir=tmp, retries=0, failure_threshold=100)
+            fanout = FanoutBackend([("broken", resilient), ("healthy", healthy)])
+            fanout.open()
+            for quote in _quotes(3):
+                fanout.upsert_stock(quote)
+            fanout.close()
+            self.assertEqual(len(healthy.records), 3)
+            self.assertEqual(broken.records, [])
+            self.assertEqual(resilient.spool.pending("upsert_stock"), 3)
+            counts = {target.name: target.counts for target in fanout.targets}
+            self.assertEqual(counts["broken"]["failed"], 0)
+            self.assertEqual(counts["healthy"]["written"], 3)
+
+    def test_full_queue_waits_instead_of_dropping(self):
+        """Test full queue waits instead of dropping"""
+        gate = threading.Event()
+        stuck, healthy = _Recorder(), _Recorder()
+        original = stuck.upsert_stock
+        stuck.upsert_stock = lambda record: (gate.wait(5), original(record))
+        fanout = FanoutBackend([("stuck", stuck), ("healthy", healthy)], queue_size="stuck=2,healthy=100",
+                               batch_size=1)
+        fanout.open()
+        producer = threading.Thread(target=lambda: [fanout.upsert_stock(quote) for quote in _quotes(10)])
+        producer.start()
+        producer.join(0.3)
+        self.assertTrue(producer.is_alive())
+        self.assertGreater(fanout.targets[0].counts["waits"], 0)
+        gate.set()
+        producer.join(5)
+        fanout.close()
+        self.assertEqual(len(stuck.records), 10)
+        self.assertEqual(len(healthy.records), 10)
+
+    def test_flush_runs_on_each_worker_after_queued_writes(self):
+        """Test flush runs on each worker after queued writes"""
+        slow, fast = _Recorder(delay=0.01), _Recorder()
+        fanout = FanoutBackend([("slow", slow), ("fast", fast)], batch_size=2)
+        fanout.open()
+        for quote in _quotes(5):
+            fanout.upsert_stock(quote)
+        fanout.flush()
+        self.assertEqual(slow.flushes, [("fanout-slow", 5)])
+        self.assertEqual(fast.flushes, [("fanout-fast", 5)])
+        fanout.close()
+        self.assertEqual(fanout.targets[0].counts["written"], 5)
+
+    def test_idle_workers_retry_due_writes(self):
+        """Test idle workers retry due writes"""
+        recorder = _Recorder()
+        recorder.retry_due = lambda: recorder.flushes.append(threading.current_thread().name)
+        fanout = FanoutBackend([("a", recorder)])
+        with mock.patch("nse_scraper.db.fanout_backend.IDLE_RETRY_INTERVAL", 0.0):
+            fanout.open()
+            time.sleep(0.5)
+            fanout.close()
+        self.assertGreater(len(recorder.flushes), 0)
+        self.assertEqual(set(recorder.flushes), {"fanout-a"})
+
+    def test_unopenable_backend_is_skipped(self):
+        """Test a backend that fails to open is skipped"""
+        down, up = _Recorder(fail_open=True), _Recorder()
+        fanout = FanoutBackend([("down", down), ("up", up)])
+        fanout.open()
+        fanout.upsert_stock({"ticker_symbol": "SCOM"})
+        fanout.close()
+        self.assertEqual(len(up.records), 1)
+        self.assertFalse(down.closed)
+        with self.assertRaises(RuntimeError):
+            FanoutBackend([("down", _Recorder(fail_open=True))]).open()
+
+    def test_record_stats(self):
+        """Test per-target stats are recorded on the crawler"""
+        stats = {}
+        fanout = FanoutBackend([("a", _Recorder()), ("b", _Recorder())])
+        fanout.open()
+        fanout.upsert_stock({"ticker_symbol": "SCOM"})
+        fanout.close()
+        fanout.record_stats(type("Stats", (), {"set_value": lambda self, key, value: stats.__setitem__(key, value)})())
+        self.assertEqual(stats["nse/fanout/a/written"], 1)
+        self.assertIn("nse/fanout/b/busy_ms", stats)
+
+
+class TestFanoutConfiguration(unittest.TestCase):
+    """Test building fan-out backends from settings"""
+
+    def test_backend_names(self):
+        """Test parsing backend lists and per-backend options"""
+        self.assertEqual(backend_names(" Supabase, postgres ,supabase"), ["supabase", "postgres"])
+        self.assertEqual(sync_backend_name("postgres_async,supabase"), "postgres")
+        self.assertEqual(per_backend("supabase=5,postgres=1", "postgres", 3), "1")
+        self.assertEqual(per_backend("supabase=5", "postgres", 3), 3)
+        self.assertEqual(per_backend(2, "postgres", 3), 2)
+
+    def test_create_backend_builds_fanout(self):
+        """Test create_backend builds a fan-out for several backends"""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = create_backend("embedded,postgres_async", embedded_path=os.path.join(tmp, "nse.sqlite3"),
+                                     sql_database_url="postgresql+psycopg2://nse@localhost/nse",
+                                     fanout_batch_size="embedded=5", resilience={"spool_dir": tmp, "retries": 5})
+            self.assertIsInstance(backend, FanoutBackend)
+            self.assertEqual(backend.names, ["embedded", "postgres_async"])
+            self.assertTrue(all(isinstance(target.backend, ResilientBackend) for target in backend.targets))
+            self.assertEqual(type(backend.targets[1].backend.backend).__name__, "PostgresBackend")
+            self.assertEqual(backend.targets[0].backend.policy.retries, 5)
+            self.assertEqual(backend.targets[0].batch_size, 5)
+
+    def test_fanout_targets_are_resilient_without_settings(self):
+        """Test fanout targets are resilient without settings"""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = create_backend("embedded,postgres", embedded_path=os.path.join(tmp, "nse.sqlite3"),
+                                     sql_database_url="postgresql+psycopg2://nse@localhost/nse")
+            self.assertTrue(all(isinstance(target.backend, ResilientBackend) for target in backend.targets))
+
+    def test_writer_settings_keep_every_backend(self):
+        """Test writer settings keep every backend"""
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = {"DB_BACKEND": "embedded,postgres_async", "EMBEDDED_DB_PATH": os.path.join(tmp, "nse.sqlite3"),
+                        "SQL_DATABASE_URL": "postgresql+psycopg2://nse@localhost/nse", "WRITE_SPOOL_DIR": tmp}
+            writer = create_backend_from_settings(settings, writer=True)
+            self.assertIsInstance(writer, FanoutBackend)
+            self.assertEqual(writer.names, ["embedded", "postgres"])
+            reader = create_backend_from_settings(settings)
+            self.assertEqual(type(reader).__name__, "EmbeddedBackend")
+
+    def test_single_writer_backend_is_resilient(self):
+        """Test a single writer backend is wrapped for resilience"""
+        with tempfile.TemporaryDirectory() as tmp:
+            settings = {"DB_BACKEND": "embedded", "EMBEDDED_DB_PATH": os.path.join(tmp, "nse.sqlite3"),
+                        "WRITE_SPOOL_DIR": tmp}
+            self.assertIsInstance(create_backend_from_settings(settings, writer=True), ResilientBackend)
+            settings["WRITE_RESILIENCE"] = "false"
+            self.assertEqual(type(create_backend_from_settings(settings, writer=True)).__name__, "EmbeddedBackend")
+
+    def test_embedded_writes_through_fanout(self):
+        """Test the embedded backend receives writes through the fan-out"""
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, name) for name in ("a.sqlite3", "b.sqlite3")]
+            fanout = FanoutBackend([(path, create_backend("embedded", embedded_path=path)) for path in paths])
+            fanout.open()
+            for minute in range(3):
+                fanout.upsert_stock({"ticker_symbol": "SCOM", "stock_name": "Safaricom", "stock_price": 14.0 + minute,
+                                     "scraped_at": f"2026-03-02T09:0{minute}:00+00:00"})
+            fanout.close()
+            for path in paths:
+                backend = create_backend("embedded", embedded_path=path)
+                backend.open()
+                self.assertEqual(len(backend.get_history("SCOM")), 3)
+                backend.close()
+
+    def test_stockanalysis_pipeline_uses_listed_stockanalysis_backends(self):
+        """Test the StockAnalysis pipeline uses its listed backends"""
+        from nse_scraper.pipelines import StockAnalysisPipeline
+
+        pipeline = StockAnalysisPipeline("postgres,embedded", None, None, "stockanalysis_stocks",
+                                         embedded_path=":memory:")
+        self.assertEqual(pipeline.db_backend, "embedded")
+        self.assertEqual(type(pipeline.storage).__name__, "EmbeddedBackend")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Tests for the market-cap-weighted exchange, sector and industry indices
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from nse_scraper.db import create_backend
+from nse_scraper.indices import ALL_SHARE, EXCHANGE, INDUSTRY, SECTOR, compute, publish, trade_date
+from nse_scraper.screener import Snapshot
+
+T0 = datetime(2026, 3, 2, 13, 0, tzinfo=timezone.utc)  # 16:00 EAT, after the close
+
+
+def _stock(ticker, cap, change, sector, industry, price=10.0):
+    return {"ticker_symbol": ticker, "stock_price": price, "stock_change": change, "marketCap": cap,
+            "sector": sector, "industry": industry, "_at": T0}
+
+
+SNAPSHOT = [
+    _stock("SCOM", "1.2T", 2.0, "Communication Services", "Telecom Services"),
+    _stock("EQTY", 180e9, -1.0, "Financials", "Banks - Regional"),
+    _stock("KCB", 120e9, 4.0, "Financials", "Banks - Regional"),
+    _stock("JUB", 30e9, None, "Financials", "Insurance - Life"),
+    _stock("EABL", 150e9, 0.0, "Consumer Staples", "Beverages - Brewers"),
+    _stock("NOCAP", None, 5.0, "Financials", "Banks - Regional"),
+    _stock("NOSECT", 5e9, 1.0, None, None),
+]
+
+
+def _points(points, scope):
+    return {point["name"]: point for point in points if point["scope"] == scope}
+
+
+class TestCompute(unittest.TestCase):
+    """Test index level computation"""
+
+    def test_cap_weighted_aggregates(self):
+        """Test index levels are weighted by market cap"""
+        points = compute(Snapshot(SNAPSHOT), T0, run_id="r1")
+        (exchange,) = _points(points, EXCHANGE).values()
+        caps = [1.2e12, 180e9, 120e9, 30e9, 150e9, 5e9]
+        previous = [1.2e12 / 1.02, 180e9 / 0.99, 120e9 / 1.04, 30e9, 150e9, 5e9 / 1.01]
+        self.assertEqual((exchange["name"], exchange["constituents"]), (ALL_SHARE, 6))
+        self.assertEqual(exchange["market_cap"], sum(caps))
+        self.assertAlmostEqual(exchange["change_pct"], (sum(caps) / sum(previous) - 1) * 100, places=6)
+        self.assertEqual((exchange["advancers"], exchange["decliners"]), (3, 1))
+        self.assertEqual((exchange["level"], exchange["weight_pct"], exchange["trade_date"]),
+                         (100.0, 100.0, "2026-03-02"))
+
+        sectors = _points(points, SECTOR)
+        self.assertEqual(sorted(sectors), ["Communication Services", "Consumer Staples", "Financials"])
+        financials = sectors["Financials"]
+        self.assertEqual((financials["constituents"], financials["market_cap"]), (3, 330e9))
+        self.assertAlmostEqual(financials["change_pct"],
+                               (330e9 / (180e9 / 0.99 + 120e9 / 1.04 + 30e9) - 1) * 100, places=6)
+        self.assertAlmostEqual(financials["mean_change_pct"], 1.5)  # JUB has no change
+        self.assertAlmostEqual(sum(point["weight_pct"] for point in sectors.values()), 100 * (1 - 5e9 / sum(caps)),
+                               places=4)
+        self.assertEqual(_points(points, INDUSTRY)["Banks - Regional"]["constituents"], 2)
+        self.assertEqual({point["run_id"] for point in points}, {"r1"})
+
+    def test_levels_chain_from_previous_trading_date(self):
+        """Test levels chain from the previous trading date"""
+        previous = {(EXCHANGE, ALL_SHARE): 120.0, (SECTOR, "Consumer Staples"): 90.0}
+        points = compute(Snapshot(SNAPSHOT), T0, previous)
+        exchange = _points(points, EXCHANGE)[ALL_SHARE]
+        self.assertAlmostEqual(exchange["level"], 120.0 * (1 + exchange["change_pct"] / 100), places=6)
+        self.assertEqual(_points(points, SECTOR)["Consumer Staples"]["level"], 90.0)  # unchanged today
+        self.assertEqual(_points(points, SECTOR)["Financials"]["level"], 100.0)  # new series
+
+    def test_snapshot_without_market_caps(self):
+        """Test a snapshot without market caps yields no points"""
+        self.assertEqual(compute(Snapshot([{"ticker_symbol": "SCOM", "stock_price": 10.0}]), T0), [])
+
+
+class TestEmbeddedIndex(unittest.TestCase):
+    """Test index storage in the embedded backend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "nse.sqlite3")
+        self.backend = create_backend("embedded", embedded_path=self.path)
+        self.backend.open()
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_series_chain_across_runs(self):
+        """Test index series chain across runs and days"""
+        first = publish(self.backend, SNAPSHOT, run_id="r1")
+        rerun = publish(self.backend, SNAPSHOT, as_of=T0 + timedelta(hours=1))
+        next_day = [dict(stock, _at=T0 + timedelta(days=1)) for stock in SNAPSHOT]
+        publish(self.backend, next_day)
+        self.assertEqual(trade_date(T0 + timedelta(hours=1)), trade_date(T0))
+
+        series = self.backend.get_index_series(EXCHANGE, ALL_SHARE)
+        self.assertEqual([point["trade_date"] for point in series], ["2026-03-02", "2026-03-02", "2026-03-03"])
+        change = _points(first, EXCHANGE)[ALL_SHARE]["change_pct"]
+        self.assertEqual([point["level"] for point in series[:2]], [100.0, 100.0])  # a rerun restates the day
+        self.assertAlmostEqual(series[2]["level"], 100.0 * (1 + change / 100), places=6)
+        self.assertEqual(series[0]["run_id"], "r1")
+        self.assertEqual(len(self.backend.get_index_series(SECTOR, since="2026-03-03")), 3)
+        self.assertEqual(len(rerun), len(first))
+        levels = self.backend.latest_index_levels(trade_date(T0 + timedelta(days=2)))
+        self.assertAlmostEqual(levels[(EXCHANGE, ALL_SHARE)], series[2]["level"])
+
+    def test_pipeline_publishes_when_the_crawl_closes(self):
+        """Test pipeline publishes when the crawl closes"""
+        from nse_scraper.pipelines import StockAnalysisPipeline
+
+        self.backend.close()
+        pipeline = StockAnalysisPipeline("embedded", None, None, "stockanalysis_stocks", run_id="r7",
+                                         embedded_path=self.path)
+        pipeline.open_spider()
+        for stock in SNAPSHOT[:3]:
+            for view in ("overview", "performance", "dividends", "price", "profile"):
+                metrics = {"marketCap": stock["marketCap"], "sector": stock["sector"],
+                           "industry": stock["industry"]} if view == "overview" else {}
+                pipeline.process_item({"source": "stockanalysis", "view": view, "ticker_symbol": stock["ticker_symbol"],
+                                       "company_name": stock["ticker_symbol"], "stock_price": 10.0,
+                                       "stock_change": stock["stock_change"], "scraped_at": T0.isoformat(),
+                                       "metrics": metrics})
+        pipeline.close_spider()
+        self.backend.open()
+        (exchange,) = self.backend.get_index_series(EXCHANGE)
+        self.assertEqual((exchange["constituents"], exchange["market_cap"], exchange["run_id"]), (3, 1.5e12, "r7"))
+        self.assertEqual(len(self.backend.get_index_series(SECTOR)), 2)
+
+
+class _Upserts:
+    def __init__(self):
+        self.calls = []
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict):
+        self.calls.append((rows, on_conflict))
+        return self
+
+    def execute(self):
+        return None
+
+
+class TestSupabaseIndex(unittest.TestCase):
+    """Test index storage in the Supabase backend"""
+
+    def test_point_row(self):
+        """Test an index point is upserted as a Supabase row"""
+        from nse_scraper.db.supabase_backend import SupabaseBackend
+
+        backend = SupabaseBackend("https://x.supabase.co", "key", "stock_data")
+        backend.client = _Upserts()
+        point = _points(compute(Snapshot(SNAPSHOT), T0), EXCHANGE)[ALL_SHARE]
+        backend.upsert_index_point(point)
+        ((row, on_conflict),) = backend.client.calls
+        self.assertEqual(on_conflict, "scope,name,as_of")
+        self.assertEqual((row["as_of"], row["trade_date"], row["level"]),
+                         ("2026-03-02T13:00:00+00:00", "2026-03-02", 100.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
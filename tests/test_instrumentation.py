@@ -0,0 +1,127 @@
+"""
+Tests for per-stage timing instrumentation and Prometheus rendering
+"""
+import unittest
+from types import SimpleNamespace
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from nse_scraper.instrumentation import (
+    InstrumentedBackend,
+    StageMetrics,
+    StageTimingSpiderMiddleware,
+    instrument_backend,
+    render_prometheus,
+)
+from nse_scraper.spiders.afx_scraper import AfxScraperSpider
+
+AFX_HTML = """
+<html><body><table><tbody>
+<tr><td>SCOM</td><td>Safaricom</td><td>x</td><td>33.85</td><td>-0.30</td></tr>
+<tr><td>EQTY</td><td>Equity Group</td><td>x</td><td>75.00</td><td>2.28</td></tr>
+</tbody></table></body></html>
+"""
+
+
+class _FakeBackend:
+    def __init__(self):
+        self.written = []
+
+    def upsert_stock(self, record):
+        self.written.append(record)
+
+    def get_latest_by_ticker(self, ticker_symbol):
+        raise RuntimeError("boom")
+
+    def record_stats(self, stats):
+        stats.set_value("fake/records", len(self.written))
+
+
+class TestStageMetrics(unittest.TestCase):
+    """Test stage observations land in the stats collector"""
+
+    def setUp(self):
+        self.stats = MemoryStatsCollector(SimpleNamespace(settings=Settings()))
+        self.metrics = StageMetrics(self.stats)
+
+    def test_observe_records_count_sum_and_bucket(self):
+        """Test observe records the count, sum and bucket"""
+        self.metrics.observe("pipeline/process_item", 0.003)
+        self.metrics.observe("pipeline/process_item", 0.2, error=True, nbytes=10)
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["nse/stage/pipeline/process_item/count"], 2)
+        self.assertAlmostEqual(stats["nse/stage/pipeline/process_item/time_ms_sum"], 203.0)
+        self.assertEqual(stats["nse/stage/pipeline/process_item/bucket/5"], 1)
+        self.assertEqual(stats["nse/stage/pipeline/process_item/bucket/250"], 1)
+        self.assertEqual(stats["nse/stage/pipeline/process_item/errors"], 1)
+        self.assertEqual(stats["nse/stage/pipeline/process_item/bytes"], 10)
+
+    def test_disabled_metrics_are_noop(self):
+        """Test disabled metrics record nothing"""
+        metrics = StageMetrics(None)
+        with metrics.time("anything"):
+            pass
+        backend = _FakeBackend()
+        self.assertIs(instrument_backend(backend, metrics, "fake"), backend)
+
+    def test_instrumented_backend_times_calls_and_errors(self):
+        """Test instrumented backend times calls and errors"""
+        backend = InstrumentedBackend(_FakeBackend(), self.metrics, "fake")
+        backend.upsert_stock({"ticker_symbol": "SCOM"})
+        with self.assertRaises(RuntimeError):
+            backend.get_latest_by_ticker("SCOM")
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["nse/stage/backend/fake/upsert_stock/count"], 1)
+        self.assertGreater(stats["nse/stage/backend/fake/upsert_stock/bytes"], 0)
+        self.assertEqual(stats["nse/stage/backend/fake/get_latest_by_ticker/errors"], 1)
+
+    def test_instrumented_backend_samples_bytes_and_skips_bookkeeping(self):
+        """Test instrumented backend samples bytes and skips bookkeeping"""
+        backend = InstrumentedBackend(_FakeBackend(), self.metrics, "fake", byte_sample_every=4)
+        for _ in range(5):
+            backend.upsert_stock({"ticker_symbol": "SCOM"})
+        backend.record_stats(self.stats)
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["nse/stage/backend/fake/upsert_stock/count"], 5)
+        self.assertEqual(stats["nse/stage/backend/fake/upsert_stock/bytes"], 2 * 4 * len(b'{"ticker_symbol":"SCOM"}'))
+        self.assertEqual(stats["fake/records"], 5)
+        self.assertFalse(any("record_stats" in key for key in stats))
+
+    def test_unencodable_records_are_still_written(self):
+        """Test a record that cannot be encoded is written without a byte sample"""
+        inner = _FakeBackend()
+        backend = InstrumentedBackend(inner, self.metrics, "fake")
+        backend.upsert_stock({"ticker_symbol": "SCOM", "stock_price": 2 ** 70})
+        self.assertEqual(len(inner.written), 1)
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["nse/stage/backend/fake/upsert_stock/count"], 1)
+        self.assertNotIn("nse/stage/backend/fake/upsert_stock/bytes", stats)
+
+    def test_spider_middleware_times_callback(self):
+        """Test the spider middleware times the parse callback"""
+        spider = AfxScraperSpider()
+        request = Request(url="https://afx.kwayisi.org/nse/", callback=spider.parse)
+        response = HtmlResponse(url=request.url, request=request, body=AFX_HTML.encode("utf-8"), encoding="utf-8")
+        middleware = StageTimingSpiderMiddleware(self.metrics)
+        items = list(middleware.process_spider_output(response, spider.parse(response), spider))
+        self.assertEqual(len(items), 2)
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["nse/stage/spider/parse/count"], 1)
+        self.assertEqual(stats["nse/stage/spider/parse/bytes"], len(response.body))
+
+    def test_render_prometheus_histogram_is_cumulative(self):
+        """Test rendered Prometheus histograms are cumulative"""
+        self.metrics.observe("spider/parse", 0.002)
+        self.metrics.observe("spider/parse", 0.040)
+        self.stats.set_value("item_scraped_count", 67)
+        text = render_prometheus(self.stats.get_stats(), "afx_scraper")
+        self.assertIn('nse_stage_latency_seconds_bucket{spider="afx_scraper",stage="spider/parse",le="0.005"} 1', text)
+        self.assertIn('nse_stage_latency_seconds_bucket{spider="afx_scraper",stage="spider/parse",le="0.05"} 2', text)
+        self.assertIn('nse_stage_latency_seconds_count{spider="afx_scraper",stage="spider/parse"} 2', text)
+        self.assertIn('nse_scrapy_items_scraped{spider="afx_scraper"} 67', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
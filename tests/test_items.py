@@ -2,8 +2,14 @@
 Tests for nse_scraper items.py - Data schema validation
 """
 import unittest
-from datetime import datetime
-from nse_scraper.items import NseScraperItem
+from datetime import datetime, timezone
+
+from itemadapter import ItemAdapter
+from scrapy.http import HtmlResponse
+
+from nse_scraper.items import AfxQuote, InvalidItem, NseScraperItem, StockAnalysisRecord
+from nse_scraper.pipelines import NseScraperPipeline
+from nse_scraper.spiders.afx_scraper import AfxScraperSpider
 
 
 class TestNseScraperItem(unittest.TestCase):
@@ -54,5 +60,71 @@ class TestNseScraperItem(unittest.TestCase):
         self.assertEqual(item["stock_change"], -0.25)
 
 
+class TestTypedItems(unittest.TestCase):
+    """Typed item schemas validated and coerced at the spider boundary"""
+
+    SCRAPED_AT = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+    def test_afx_quote_build_coerces(self):
+        """Test building an AFX quote coerces its fields"""
+        quote = AfxQuote.build(ticker_symbol=" SCOM ", stock_name="Safaricom", stock_price="14.50",
+                               stock_change=-0.25, scraped_at="2026-03-02T09:00:00")
+        self.assertEqual(quote.ticker_symbol, "SCOM")
+        self.assertEqual(quote.stock_price, 14.5)
+        self.assertEqual(quote.scraped_at, self.SCRAPED_AT)
+        self.assertIsNone(quote.created_at)
+        self.assertFalse(hasattr(quote, "__dict__"))
+
+    def test_missing_required_field_is_rejected(self):
+        """Test a missing required field is rejected"""
+        with self.assertRaises(InvalidItem):
+            AfxQuote.build(ticker_symbol="SCOM", stock_name="Safaricom", stock_price="n/a",
+                           scraped_at=self.SCRAPED_AT)
+        with self.assertRaises(InvalidItem):
+            StockAnalysisRecord.build(source="stockanalysis", view="overview", symbol=" ", ticker_symbol=" ")
+
+    def test_stockanalysis_record_build_coerces(self):
+        """Test building a StockAnalysis record coerces its fields"""
+        record = StockAnalysisRecord.build(source="stockanalysis", view="overview", symbol="scom",
+                                           ticker_symbol="scom", rank="1", stock_price="14.5",
+                                           metrics={"marketCap": 5.6e11}, scraped_at=self.SCRAPED_AT)
+        self.assertEqual((record.ticker_symbol, record.rank, record.stock_price), ("SCOM", 1, 14.5))
+        self.assertEqual(record.scraped_at, "2026-03-02T09:00:00+00:00")
+        self.assertEqual(record.metrics_raw, {})
+
+    def test_mapping_access_and_scrapy_support(self):
+        """Test typed items support mapping access and Scrapy item adapters"""
+        quote = AfxQuote.build(ticker_symbol="SCOM", stock_name="Safaricom", stock_price=14.5,
+                               scraped_at=self.SCRAPED_AT)
+        self.assertEqual(quote["stock_name"], "Safaricom")
+        self.assertIsNone(quote.get("volume"))
+        self.assertNotIn("volume", quote)
+        with self.assertRaises(KeyError):
+            quote["volume"]
+        self.assertEqual(dict(quote), quote.as_dict())
+        self.assertTrue(ItemAdapter.is_item(quote))
+        self.assertEqual(ItemAdapter(quote).asdict(), quote.as_dict())
+
+    def test_pipeline_trusts_typed_items(self):
+        """Test pipeline trusts typed items"""
+        quote = AfxQuote.build(ticker_symbol="SCOM", stock_name="Safaricom", stock_price=14.5,
+                               scraped_at=self.SCRAPED_AT)
+        record = NseScraperPipeline._record(quote)
+        self.assertIs(type(record), dict)
+        self.assertEqual(record["stock_price"], 14.5)
+
+    def test_afx_spider_yields_typed_items(self):
+        """Test AFX spider yields typed items"""
+        body = (b"<table><tbody>"
+                b"<tr><td>SCOM</td><td>Safaricom</td><td>1</td><td>14.50</td><td>0.25</td></tr>"
+                b"<tr><td>BAD</td><td></td><td>1</td><td>9.00</td><td></td></tr>"
+                b"</tbody></table>")
+        response = HtmlResponse(url="https://afx.kwayisi.org/nse/", body=body, encoding="utf-8")
+        items = list(AfxScraperSpider().parse(response))
+        self.assertEqual(len(items), 1)
+        self.assertIsInstance(items[0], AfxQuote)
+        self.assertEqual((items[0]["ticker_symbol"], items[0]["stock_change"]), ("SCOM", 0.25))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests for the MongoDB time-series history mode
+"""
+import unittest
+from datetime import datetime, timezone
+
+import pymongo
+
+from helpers import quote_at
+from nse_scraper.db import backend_options_from_settings, create_backend
+from nse_scraper.db.mongo_backend import MongoBackend, history_window_pipeline
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.replaced = []
+        self.inserted = []
+        self.indexes = []
+        self.documents = []
+        self.pipelines = []
+        self.failures = []
+
+    def replace_one(self, query, document, upsert=False):
+        self.replaced.append(document)
+
+    def insert_many(self, documents, ordered=True):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.inserted.append((list(documents), ordered))
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append(keys)
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        firsts = {}
+        for doc in self.documents:
+            firsts[doc["ticker_symbol"]] = min(firsts.get(doc["ticker_symbol"], doc["scraped_at"]), doc["scraped_at"])
+        return [{"_id": ticker, "first": first} for ticker, first in sorted(firsts.items())]
+
+    def find(self, query, projection=None):
+        bounds = query["scraped_at"]
+        return [d for d in self.documents if d["ticker_symbol"] == query["ticker_symbol"]
+                and bounds["$gte"] <= d["scraped_at"].replace(tzinfo=timezone.utc) < bounds["$lt"]]
+
+    def delete_many(self, query):
+        ids = set(query["_id"]["$in"])
+        self.documents = [d for d in self.documents if d["_id"] not in ids]
+
+
+class _FakeDb:
+    def __init__(self, existing=None):
+        self.collections = {}
+        self.existing = existing or []
+        self.created = []
+        self.commands = []
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, _FakeCollection())
+
+    def list_collections(self, filter=None):
+        return [c for c in self.existing if c["name"] == filter["name"]]
+
+    def create_collection(self, name, **options):
+        self.created.append((name, options))
+
+    def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+def _backend(**kwargs):
+    backend = MongoBackend("mongodb://localhost", "nse_data", "stock_data", history_mode=True, **kwargs)
+    backend.db = _FakeDb()
+    return backend
+
+
+class TestMongoHistoryMode(unittest.TestCase):
+    """Test the MongoDB history storage modes"""
+
+    def test_creates_time_series_collection_with_ttl(self):
+        """Test a time series collection is created with a TTL"""
+        backend = _backend(history_granularity="seconds", history_ttl_days=30)
+        backend._ensure_history_collection()
+        name, options = backend.db.created[0]
+        self.assertEqual(name, "stock_data_history")
+        self.assertEqual(options["timeseries"],
+                         {"timeField": "scraped_at", "metaField": "ticker_symbol", "granularity": "seconds"})
+        self.assertEqual(options["expireAfterSeconds"], 30 * 86400)
+
+    def test_changed_ttl_is_applied_with_collmod(self):
+        """Test a changed TTL is applied with collMod"""
+        backend = _backend(history_ttl_days=7)
+        backend.db.existing = [{"name": "stock_data_history",
+                                "options": {"timeseries": {}, "expireAfterSeconds": 86400}}]
+        backend._ensure_history_collection()
+        self.assertEqual(backend.db.created, [])
+        self.assertEqual(backend.db.commands[0][1]["expireAfterSeconds"], 7 * 86400)
+
+    def test_history_is_written_in_batches(self):
+        """Test history is written in batches"""
+        backend = _backend(history_batch_size=3)
+        for minute in range(7):
+            backend.upsert_stock(quote_at("SCOM", minute, 14.0 + minute))
+        history = backend.db["stock_data_history"]
+        self.assertEqual([len(docs) for docs, _ in history.inserted], [3, 3])
+        self.assertFalse(history.inserted[0][1])
+        self.assertEqual(len(backend.db["stock_data"].replaced), 7)
+        self.assertEqual(backend.flush_history(), 1)
+
+    def test_failed_insert_keeps_the_batch(self):
+        """Test a failed history insert keeps the batch buffered"""
+        backend = _backend(history_batch_size=3)
+        history = backend.db["stock_data_history"]
+        history.failures.append(pymongo.errors.AutoReconnect("primary stepped down"))
+        backend.upsert_stock(quote_at("SCOM", 0, 14.0))
+        backend.upsert_stock(quote_at("SCOM", 1, 14.5))
+        with self.assertRaises(pymongo.errors.AutoReconnect):
+            backend.upsert_stock(quote_at("SCOM", 2, 15.0))
+        # The failed call is retried by its caller; the two before it are still buffered.
+        backend.upsert_stock(quote_at("SCOM", 2, 15.0))
+        self.assertEqual([doc["stock_price"] for doc in history.inserted[0][0]], [14.0, 14.5, 15.0])
+        self.assertEqual(backend._history_buffer, [])
+
+    def test_partial_insert_keeps_only_failed_documents(self):
+        """Test a partial history insert keeps only the documents that failed"""
+        backend = _backend(history_batch_size=10)
+        for minute in range(3):
+            backend.upsert_stock(quote_at("SCOM", minute, 14.0 + minute))
+        history = backend.db["stock_data_history"]
+        history.failures.append(pymongo.errors.BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}]}))
+        with self.assertRaises(pymongo.errors.BulkWriteError):
+            backend.flush_history()
+        self.assertEqual([doc["stock_price"] for doc in backend._history_buffer], [15.0])
+        self.assertEqual(backend.flush_history(), 1)
+
+    def test_string_timestamps_become_dates(self):
+        """Test string timestamps become dates"""
+        backend = _backend()
+        record = quote_at("EQTY", 0, 45.0)
+        record["scraped_at"] = "2026-03-02T09:00:00+00:00"
+        backend.upsert_stock(record)
+        self.assertIsInstance(backend._history_buffer[0]["scraped_at"], datetime)
+
+    def test_invalid_granularity_rejected(self):
+        """Test an invalid granularity is rejected"""
+        with self.assertRaises(ValueError):
+            MongoBackend("mongodb://localhost", "nse_data", "stock_data", history_granularity="days")
+
+    def test_window_pipeline_shape(self):
+        """Test the shape of the window aggregation pipeline"""
+        pipeline = history_window_pipeline(["SCOM"], window=3, start=datetime(2026, 1, 1, tzinfo=timezone.utc))
+        self.assertIn("$gte", pipeline[0]["$match"]["scraped_at"])
+        window = pipeline[1]["$setWindowFields"]
+        self.assertEqual(window["partitionBy"], "$ticker_symbol")
+        self.assertEqual(window["output"]["moving_average"]["window"], {"documents": [-2, 0]})
+        self.assertEqual(window["output"]["previous_price"]["$shift"]["by"], -1)
+
+    def test_settings_flags_reach_backend(self):
+        """Test the history settings reach the backend"""
+        options = backend_options_from_settings({"MONGO_HISTORY_MODE": "false"})
+        self.assertFalse(options["mongo_history_mode"])
+        options = backend_options_from_settings({"MONGO_HISTORY_MODE": "true", "MONGO_HISTORY_TTL_DAYS": "90"})
+        backend = create_backend("mongo", mongodb_uri="mongodb://localhost", **options)
+        self.assertTrue(backend.history_mode)
+        self.assertEqual(backend.history_ttl_seconds, 90 * 86400)
+
+    def test_compaction_keeps_daily_close(self):
+        """Test compaction keeps the daily close"""
+        from nse_scraper.retention import RetentionPolicy
+
+        backend = _backend()
+        history = backend.db["stock_data_history"]
+        history.documents = [
+            {"_id": minute, "ticker_symbol": "SCOM", "stock_price": 14.0 + minute,
+             "scraped_at": datetime(2026, 3, 2, 9, minute)}  # naive UTC, as pymongo returns
+            for minute in range(5)
+        ]
+        policy = RetentionPolicy(full_days=7, daily_days=60)
+        now = datetime(2026, 3, 20, tzinfo=timezone.utc)
+        report = backend.compact_history(policy, now=now)
+        self.assertEqual((report.rows_scanned, report.rows_removed), (5, 4))
+        self.assertEqual([d["_id"] for d in history.documents], [4])
+        self.assertEqual(backend.compact_history(policy, now=now).rows_removed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
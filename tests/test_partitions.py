@@ -0,0 +1,104 @@
+"""
+Tests for monthly history partition management
+
+Database tests need NSE_TEST_POSTGRES_URL (see tests/test_postgres_bulk.py).
+"""
+import os
+import unittest
+from datetime import date
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from nse_scraper.db.models import Base, StockPriceHistory
+from nse_scraper.db.partitions import (
+    add_months,
+    ensure_partitions,
+    expire_partitions,
+    list_partitions,
+    months_between,
+    partition_name,
+)
+
+TEST_URL = os.getenv("NSE_TEST_POSTGRES_URL")
+TABLE = "zz_test_price_history"
+
+
+class TestPartitionCalendar(unittest.TestCase):
+    """Test monthly partition bounds and names"""
+
+    def test_add_months_crosses_years(self):
+        """Test adding months crosses year boundaries"""
+        self.assertEqual(add_months(date(2026, 11, 1), 3), date(2027, 2, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+
+    def test_months_between_is_inclusive(self):
+        """Test months_between includes both ends"""
+        months = list(months_between(date(2026, 11, 20), date(2027, 1, 3)))
+        self.assertEqual(months, [date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1)])
+
+    def test_partition_name(self):
+        """Test the monthly partition name"""
+        self.assertEqual(partition_name(date(2026, 3, 1)), "stock_price_history_p2026_03")
+
+    def test_models_compile_to_partitioned_ddl(self):
+        """Test every table and index renders as PostgreSQL DDL with history partitioned"""
+        dialect = postgresql.dialect()
+        for table in Base.metadata.sorted_tables:
+            self.assertIn(f"CREATE TABLE {table.name}", str(CreateTable(table).compile(dialect=dialect)))
+            for index in table.indexes:
+                self.assertIn(f"ON {table.name}", str(CreateIndex(index).compile(dialect=dialect)))
+        history = str(CreateTable(StockPriceHistory.__table__).compile(dialect=dialect))
+        self.assertIn("PARTITION BY RANGE (scraped_at)", history)
+
+
+@unittest.skipUnless(TEST_URL, "NSE_TEST_POSTGRES_URL not set")
+class TestPartitionMaintenance(unittest.TestCase):
+    """Test creating and dropping history partitions"""
+
+    def setUp(self):
+        from sqlalchemy import create_engine, text
+
+        self.text = text
+        self.engine = create_engine(TEST_URL, future=True)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE} CASCADE"))
+            conn.execute(text(
+                f"CREATE TABLE {TABLE} (ticker_symbol varchar(20) NOT NULL, scraped_at timestamptz NOT NULL, "
+                f"stock_price float NOT NULL, stock_change float, PRIMARY KEY (ticker_symbol, scraped_at)) "
+                f"PARTITION BY RANGE (scraped_at)"
+            ))
+
+    def tearDown(self):
+        with self.engine.begin() as conn:
+            conn.execute(self.text(f"DROP TABLE IF EXISTS {TABLE} CASCADE"))
+            for name in conn.execute(self.text(
+                "SELECT tablename FROM pg_tables WHERE tablename LIKE :prefix"), {"prefix": f"{TABLE}_p%"}
+            ).scalars():
+                conn.execute(self.text(f'DROP TABLE "{name}"'))
+        self.engine.dispose()
+
+    def test_rows_in_default_partition_move_to_new_month(self):
+        """Test rows in the default partition move to the new month"""
+        with self.engine.begin() as conn:
+            ensure_partitions(conn, date(2026, 3, 1), date(2026, 3, 1), table=TABLE)
+            conn.execute(self.text(f"INSERT INTO {TABLE} VALUES ('SCOM', '2026-01-15T09:00Z', 14.0, NULL)"))
+            created = ensure_partitions(conn, date(2026, 1, 1), date(2026, 3, 1), table=TABLE)
+            self.assertEqual(created, [f"{TABLE}_p2026_01", f"{TABLE}_p2026_02"])
+            self.assertEqual(conn.execute(self.text(f"SELECT count(*) FROM {TABLE}_p2026_01")).scalar(), 1)
+            self.assertEqual(conn.execute(self.text(f"SELECT count(*) FROM {TABLE}_default")).scalar(), 0)
+            self.assertEqual(ensure_partitions(conn, date(2026, 1, 1), date(2026, 3, 1), table=TABLE), [])
+
+    def test_expired_partitions_are_detached_then_dropped(self):
+        """Test expired partitions are detached then dropped"""
+        with self.engine.begin() as conn:
+            ensure_partitions(conn, date(2026, 1, 1), date(2026, 6, 1), table=TABLE)
+            detached = expire_partitions(conn, 3, today=date(2026, 6, 10), table=TABLE)
+            self.assertEqual(detached, [f"{TABLE}_p2026_01", f"{TABLE}_p2026_02", f"{TABLE}_p2026_03"])
+            self.assertEqual([p.month.month for p in list_partitions(conn, TABLE)], [4, 5, 6])
+            self.assertEqual(expire_partitions(conn, 2, today=date(2026, 6, 10), drop=True, table=TABLE),
+                             [f"{TABLE}_p2026_04"])
+
+
+if __name__ == "__main__":
+    unittest.main()
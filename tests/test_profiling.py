@@ -0,0 +1,80 @@
+"""
+Tests for the opt-in crawl profiler
+"""
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from nse_scraper.pipelines import _record_fallback_writes
+from nse_scraper.profiling import CrawlProfiler, StackSampler, parse_modes
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+class TestProfiling(unittest.TestCase):
+    """Test profile mode parsing, stack sampling and profile output"""
+
+    def test_parse_modes(self):
+        """Test parsing the profiling modes"""
+        self.assertEqual(parse_modes(""), ())
+        self.assertEqual(parse_modes(None), ())
+        self.assertEqual(parse_modes("off"), ())
+        self.assertEqual(parse_modes("cProfile, sampling,cprofile"), ("cprofile", "sampling"))
+        with self.assertRaises(ValueError):
+            parse_modes("perf")
+
+    def test_stack_sampler_collects_collapsed_stacks(self):
+        """Test the stack sampler collects collapsed stacks"""
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        _busy(0.1)
+        sampler.stop()
+        self.assertGreater(sampler.samples, 0)
+        self.assertTrue(any("test_profiling:_busy" in stack for stack in sampler.stacks))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stacks.collapsed")
+            sampler.write_collapsed(path)
+            with open(path, encoding="utf-8") as f:
+                first = f.readline().rstrip("\n")
+        stack, _, count = first.rpartition(" ")
+        self.assertTrue(stack)
+        self.assertGreater(int(count), 0)
+
+    def test_profiler_writes_all_outputs(self):
+        """Test profiler writes all outputs"""
+        spider = SimpleNamespace(name="afx_scraper")
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = CrawlProfiler(("cprofile", "sampling", "tracemalloc"), tmp, sample_interval=0.001)
+            profiler.spider_opened(spider)
+            _busy(0.05)
+            _record_fallback_writes(SimpleNamespace(fallback_count=0), SimpleNamespace(stats=None))
+            profiler.spider_closed(spider, reason="finished")
+            files = set(os.listdir(profiler.run_dir))
+            with open(os.path.join(profiler.run_dir, "callbacks.txt"), encoding="utf-8") as f:
+                callbacks = f.read()
+        self.assertTrue(
+            {
+                "profile.pstats",
+                "profile.txt",
+                "callbacks.txt",
+                "stacks.collapsed",
+                "callbacks-sampled.txt",
+                "allocations.txt",
+                "summary.json",
+            }
+            <= files
+        )
+        self.assertIn("nse_scraper.pipelines:_record_fallback_writes", callbacks)
+        self.assertNotIn("nse_scraper.profiling", callbacks)
+
+
+if __name__ == "__main__":
+    unittest.main()
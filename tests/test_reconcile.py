@@ -0,0 +1,132 @@
+"""
+Tests for AFX vs StockAnalysis price reconciliation
+"""
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from helpers import make_quote
+from nse_scraper.db import create_backend
+from nse_scraper.reconcile import AFX, STOCKANALYSIS, Quotes, Reconciler, reconcile
+
+T0 = "2026-03-02T09:00:00+00:00"
+T1 = "2026-03-02T10:00:00+00:00"
+
+# AFX changes are in shillings, StockAnalysis changes in percent.
+AFX_BOARD = [
+    make_quote("SCOM", 30.0, T0, stock_change=0.6),    # +2.04%
+    make_quote("EQTY", 45.0, T0, stock_change=-0.5),   # -1.10%
+    make_quote("KCB", 40.0, T0, stock_change=0.0),
+    make_quote("BAT", 380.0, T0, stock_change=None),
+    make_quote("ABSA", 18.0, T0, stock_change=0.1),    # only on AFX
+]
+STOCKANALYSIS_BOARD = [
+    make_quote("SCOM", 30.1, T0, stock_change=2.04),   # within both tolerances
+    make_quote("EQTY", 46.0, T0, stock_change=-1.10),  # price 2.2% apart
+    make_quote("KCB", 40.0, T0, stock_change=1.5),     # change 1.5 points apart
+    make_quote("BAT", 385.0, T0, stock_change=0.4),    # price apart, no AFX change to compare
+    make_quote("NCBA", 50.0, T0, stock_change=0.0),    # only on StockAnalysis
+    make_quote("SCOM", 29.0, "2026-03-01T09:00:00+00:00", stock_change=0.0),  # older scrape, ignored
+]
+
+
+class TestReconcile(unittest.TestCase):
+    """Test comparing quotes across sources"""
+
+    def test_divergence_and_coverage(self):
+        """Test divergences and coverage between the sources"""
+        report = reconcile(Quotes(AFX, AFX_BOARD), Quotes(STOCKANALYSIS, STOCKANALYSIS_BOARD), run_id="r1")
+        self.assertEqual((report.afx_tickers, report.stockanalysis_tickers, report.matched), (5, 5, 4))
+        self.assertEqual((report.missing_in_afx, report.missing_in_stockanalysis), (["NCBA"], ["ABSA"]))
+        rows = {row["ticker_symbol"]: row for row in report.divergences}
+        self.assertEqual(sorted(rows), ["BAT", "EQTY", "KCB"])
+        self.assertEqual((report.price_diverged, report.change_diverged), (2, 1))
+        self.assertEqual(rows["EQTY"]["price_gap_pct"], 2.2222)
+        self.assertEqual(rows["EQTY"]["afx_change_pct"], -1.0989)
+        self.assertFalse(rows["EQTY"]["change_diverged"])
+        self.assertEqual((rows["KCB"]["price_diverged"], rows["KCB"]["change_diverged"]), (False, True))
+        self.assertIsNone(rows["BAT"]["afx_change_pct"])
+        self.assertEqual(report.stats["abs_price_gap_pct"]["max"], 2.2222)
+        self.assertEqual((report.stale, report.stale_source), ({AFX: 0, STOCKANALYSIS: 0}, None))
+        self.assertFalse(report.ok)
+        json.loads(json.dumps(report.as_dict()))
+
+    def test_stale_source(self):
+        """Test a lagging source is flagged as stale"""
+        afx = Quotes(AFX, [make_quote("SCOM", 30.0, T1, stock_change=0.6), make_quote("EQTY", 45.0, T1, stock_change=-0.5)])
+        stockanalysis = Quotes(STOCKANALYSIS, [make_quote("SCOM", 31.0, T0, stock_change=2.04),
+                                               make_quote("EQTY", 45.0, T1, stock_change=-1.1)])
+        report = reconcile(afx, stockanalysis, stale_after=1800)
+        (row,) = report.divergences
+        self.assertEqual((row["ticker_symbol"], row["stale"], row["lag_s"]), ("SCOM", STOCKANALYSIS, 3600.0))
+        self.assertEqual(report.stale, {AFX: 0, STOCKANALYSIS: 1})
+        self.assertIsNone(report.stale_source)  # median lag is 30 minutes, not past it
+        report = reconcile(afx, Quotes(STOCKANALYSIS, [make_quote("SCOM", 31.0, T0, stock_change=2.04)]), stale_after=1800)
+        self.assertEqual((report.stale_source, report.stockanalysis_latest_at), (STOCKANALYSIS, T0))
+
+    def test_matching_boards_are_ok(self):
+        """Test matching boards report no divergences"""
+        report = reconcile(Quotes(AFX, AFX_BOARD[:1]), Quotes(STOCKANALYSIS, STOCKANALYSIS_BOARD[:1]))
+        self.assertTrue(report.ok)
+        self.assertIn("matched=1 price_diverged=0", report.summary())
+
+
+class TestReconciler(unittest.TestCase):
+    """Test the reconciler reading from backends"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.feed = os.path.join(self.tmp.name, "stockanalysis_output.jsonl")
+        self.reports = os.path.join(self.tmp.name, "reconciliation", "runs.jsonl")
+        self._write(STOCKANALYSIS_BOARD)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, records):
+        with open(self.feed, "w", encoding="utf-8") as handle:
+            handle.writelines(json.dumps(record) + "\n" for record in records)
+
+    def test_feed_snapshot_is_cached_until_it_changes(self):
+        """Test the feed snapshot is cached until it changes"""
+        reconciler = Reconciler(self.feed, path=self.reports)
+        first = reconciler.snapshot()
+        self.assertIs(reconciler.snapshot(), first)
+        self._write(STOCKANALYSIS_BOARD + [make_quote("ABSA", 18.0, T1, stock_change=0.56)])
+        os.utime(self.feed, ns=(1, 1))
+        report = reconciler.reconcile(AFX_BOARD, run_id="r2")
+        self.assertIsNot(reconciler.snapshot(), first)
+        self.assertEqual(report.missing_in_stockanalysis, [])
+        with open(self.reports, encoding="utf-8") as handle:
+            (line,) = [json.loads(line) for line in handle]
+        self.assertEqual((line["run_id"], line["matched"]), ("r2", 5))
+
+    def test_backend_sources_and_daemon_items(self):
+        """Test reading from backends and daemon items"""
+        from nse_scraper.daemon import AfxPollingDaemon
+
+        backend = create_backend("embedded", embedded_path=os.path.join(self.tmp.name, "nse.sqlite3"))
+        backend.open()
+        self.addCleanup(backend.close)
+        for record in STOCKANALYSIS_BOARD[:3]:
+            backend.upsert_stockanalysis_stock(dict(record, company_name=record["ticker_symbol"]))
+        reconciler = Reconciler(backend, path=self.reports)
+        self.assertEqual(reconciler.snapshot().tickers.tolist(), ["EQTY", "KCB", "SCOM"])
+
+        board = (b"<table><tbody><tr><td>SCOM</td><td>Safaricom</td><td>x</td><td>33.85</td><td>-0.30</td></tr>"
+                 b"<tr><td>EQTY</td><td>Equity Group</td><td>x</td><td>75.00</td><td>2.28</td></tr></tbody></table>")
+        http = SimpleNamespace(headers={}, get=lambda url, headers=None, timeout=None: SimpleNamespace(
+            status_code=200, content=board, headers={}, encoding="utf-8", raise_for_status=lambda: None))
+        daemon = AfxPollingDaemon(SimpleNamespace(upsert_stock=lambda record: None), http, reconciler=reconciler)
+        daemon.run_cycle()
+        with open(self.reports, encoding="utf-8") as handle:
+            (line,) = [json.loads(line) for line in handle]
+        self.assertEqual(line["run_id"], daemon.spider.run.run_id)
+        self.assertEqual((line["matched"], line["missing_in_afx"]), (2, ["KCB"]))
+        self.assertEqual([row["ticker_symbol"] for row in line["divergences"]], ["EQTY", "SCOM"])
+
+
+if __name__ == "__main__":
+    unittest.main()
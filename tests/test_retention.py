@@ -0,0 +1,187 @@
+"""
+Tests for history retention / downsampling
+
+Database tests need NSE_TEST_POSTGRES_URL (see tests/test_postgres_bulk.py).
+"""
+import os
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from helpers import supabase_backend
+from nse_scraper.retention import NSE_TZ, RetentionPolicy, compaction_windows, split_points
+
+TEST_URL = os.getenv("NSE_TEST_POSTGRES_URL")
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+POLICY = RetentionPolicy(full_days=7, daily_days=60)
+
+
+def _ticks(days_ago, hours=(10, 12, 14)):
+    day = NOW.astimezone(NSE_TZ).date() - timedelta(days=days_ago)
+    return [{"scraped_at": datetime(day.year, day.month, day.day, hour, tzinfo=NSE_TZ).isoformat(),
+             "stock_price": float(hour)} for hour in hours]
+
+
+class TestRetentionPolicy(unittest.TestCase):
+    """Test parsing retention policies"""
+
+    def test_cutoffs_fall_on_local_midnights(self):
+        """Test retention cutoffs fall on local midnights"""
+        cutoffs = POLICY.cutoffs(NOW)
+        self.assertEqual(cutoffs.full, datetime(2026, 10, 11, tzinfo=NSE_TZ))
+        self.assertEqual(cutoffs.daily.weekday(), 0)
+        self.assertLessEqual(cutoffs.daily, datetime(2026, 8, 19, tzinfo=NSE_TZ))
+        self.assertIsNone(cutoffs.drop)
+
+    def test_invalid_policy_rejected(self):
+        """Test an invalid policy is rejected"""
+        with self.assertRaises(ValueError):
+            RetentionPolicy(full_days=30, daily_days=7)
+        with self.assertRaises(ValueError):
+            RetentionPolicy(full_days=7, daily_days=30, max_days=10)
+
+    def test_from_settings(self):
+        """Test building a policy from settings"""
+        policy = RetentionPolicy.from_settings({"RETENTION_FULL_DAYS": "3", "RETENTION_DAILY_DAYS": "90"})
+        self.assertEqual((policy.full_days, policy.daily_days, policy.max_days), (3, 90, 0))
+
+
+class TestSplitPoints(unittest.TestCase):
+    """Test choosing compaction split points"""
+
+    def test_recent_ticks_all_kept(self):
+        """Test every recent tick is kept"""
+        points = _ticks(1) + _ticks(6)
+        kept, removed = split_points(points, POLICY.cutoffs(NOW))
+        self.assertEqual((kept, removed), (points, []))
+
+    def test_daily_close_kept(self):
+        """Test the daily close is kept"""
+        kept, removed = split_points(_ticks(20), POLICY.cutoffs(NOW))
+        self.assertEqual([p["stock_price"] for p in kept], [14.0])
+        self.assertEqual(len(removed), 2)
+
+    def test_weekly_close_kept(self):
+        """Test the weekly close is kept"""
+        cutoffs = POLICY.cutoffs(NOW)
+        # 2026-06-01 is a Monday; ticks every day of that week.
+        points = []
+        for day in range(1, 8):
+            points.append({"scraped_at": datetime(2026, 6, day, 15, tzinfo=NSE_TZ), "stock_price": float(day)})
+        kept, _removed = split_points(points, cutoffs)
+        self.assertEqual([p["stock_price"] for p in kept], [7.0])
+
+    def test_idempotent_and_order_preserving(self):
+        """Test split points are idempotent and keep order"""
+        points = _ticks(90) + _ticks(30) + _ticks(29) + _ticks(2)
+        cutoffs = POLICY.cutoffs(NOW)
+        kept, _removed = split_points(points, cutoffs)
+        again, removed = split_points(kept, cutoffs)
+        self.assertEqual((again, removed), (kept, []))
+        self.assertEqual(kept, sorted(kept, key=lambda p: p["scraped_at"]))
+
+    def test_max_age_drops_and_unparseable_kept(self):
+        """Test max age drops old ticks and keeps unparseable ones"""
+        policy = RetentionPolicy(full_days=7, daily_days=60, max_days=120)
+        points = _ticks(200, hours=(10,)) + [{"scraped_at": "not a date", "stock_price": 1.0}]
+        kept, removed = split_points(points, policy.cutoffs(NOW))
+        self.assertEqual(kept, points[1:])
+        self.assertEqual(removed, points[:1])
+
+    def test_windows_cover_whole_weeks(self):
+        """Test compaction windows cover whole weeks"""
+        cutoffs = POLICY.cutoffs(NOW)
+        windows = list(compaction_windows(datetime(2026, 3, 4, tzinfo=timezone.utc), cutoffs))
+        self.assertEqual(windows[0][0].weekday(), 0)
+        self.assertEqual(windows[-1][1], cutoffs.full)
+        for (_lower, upper), (lower, _upper) in zip(windows, windows[1:]):
+            self.assertEqual(upper, lower)
+
+
+class TestSupabaseCompaction(unittest.TestCase):
+    """Test compacting history in Supabase"""
+
+    def test_rewrites_only_shrinking_rows(self):
+        """Test only rows that shrink are rewritten"""
+        stale = {"ticker_symbol": "AAA", "scraped_at": "t1", "price_history": _ticks(20) + _ticks(1)}
+        fresh = {"ticker_symbol": "BBB", "scraped_at": "t2", "price_history": _ticks(1)}
+        backend = supabase_backend({"stock_data": [stale, fresh], "stockanalysis_stocks": []})
+
+        report = backend.compact_history(POLICY, now=NOW, page_size=1)
+        self.assertEqual((report.rows_scanned, report.rows_removed), (9, 2))
+        self.assertGreater(report.bytes_reclaimed, 0)
+        ((filters, payload),) = backend.client.updates
+        self.assertEqual(filters, {"ticker_symbol": "AAA", "scraped_at": "t1"})
+        self.assertEqual(len(payload["price_history"]), 4)
+
+        backend.client.updates.clear()
+        backend.compact_history(POLICY, now=NOW, dry_run=True)
+        self.assertEqual(backend.client.updates, [])
+
+
+class TestCompactionSql(unittest.TestCase):
+    """Test the PostgreSQL compaction statements"""
+
+    def test_compaction_variants_compile(self):
+        """Test each compaction variant binds drop_before only when it drops"""
+        from sqlalchemy.dialects import postgresql
+
+        from nse_scraper.db.postgres_backend import _compaction_sql
+
+        for drop_expired in (False, True):
+            for dry_run in (False, True):
+                params = set(_compaction_sql(drop_expired, dry_run).compile(dialect=postgresql.dialect()).params)
+                self.assertTrue({"daily", "ticker", "lower", "upper"} <= params)
+                self.assertEqual("drop_before" in params, drop_expired)
+
+
+@unittest.skipUnless(TEST_URL, "NSE_TEST_POSTGRES_URL not set")
+class TestPostgresCompaction(unittest.TestCase):
+    """Test compacting history in PostgreSQL"""
+
+    def setUp(self):
+        from nse_scraper.db.postgres_backend import PostgresBackend
+
+        self.backend = PostgresBackend(sql_database_url=TEST_URL)
+        self.backend.open()
+        self._cleanup()
+
+    def tearDown(self):
+        self._cleanup()
+        self.backend.close()
+
+    def _cleanup(self):
+        from sqlalchemy import text
+
+        with self.backend.engine.begin() as conn:
+            for table in ("stock_summary", "stock_daily_ohlc", "stock_price_history", "stock_data"):
+                conn.execute(text(f"DELETE FROM {table} WHERE ticker_symbol LIKE 'ZZR%'"))
+
+    def test_compaction_matches_policy_and_is_idempotent(self):
+        """Test compaction matches the policy and is idempotent"""
+        records = []
+        for days_ago in (90, 89, 88, 20, 2):
+            for tick in _ticks(days_ago):
+                at = datetime.fromisoformat(tick["scraped_at"])
+                records.append({"ticker_symbol": "ZZR1", "stock_name": "Ret Co", "stock_price": tick["stock_price"],
+                                "stock_change": None, "created_at": at, "scraped_at": at})
+        self.backend.bulk_load(records)
+        expected, _removed = split_points(records, POLICY.cutoffs(NOW))
+        daily_before = self.backend.get_daily_ohlc("ZZR1")
+
+        dry = self.backend.compact_history(POLICY, now=NOW, dry_run=True)
+        self.assertEqual(len(self.backend.get_history("ZZR1")), len(records))
+
+        report = self.backend.compact_history(POLICY, now=NOW)
+        self.assertEqual(report.rows_removed, len(records) - len(expected))
+        self.assertEqual(dry.rows_removed, report.rows_removed)
+        self.assertGreater(report.bytes_reclaimed, 0)
+        self.assertEqual([row["scraped_at"] for row in self.backend.get_history("ZZR1")],
+                         [record["scraped_at"] for record in expected])
+        self.assertEqual(self.backend.get_daily_ohlc("ZZR1"), daily_before)
+
+        self.assertEqual(self.backend.compact_history(POLICY, now=NOW).rows_removed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
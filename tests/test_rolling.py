@@ -0,0 +1,157 @@
+"""
+Tests for the incremental rolling statistics
+"""
+import math
+import os
+import random
+import statistics
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from helpers import make_quote
+from nse_scraper.db import create_backend
+from nse_scraper.retention import NSE_TZ
+from nse_scraper.rolling import RollingStore, Windows, rebuild
+
+T0 = datetime(2025, 1, 6, 7, 0, tzinfo=timezone.utc)  # 10:00 EAT
+WINDOWS = Windows(sma_periods=(5, 20), volatility_period=10, extreme_days=30)
+
+
+def _series(ticker="SCOM", days=60, seed=7):
+    """Three intraday quotes per weekday (the second one is the day's high or low)."""
+    rng = random.Random(seed)
+    price, quotes = 20.0, []
+    day = 0
+    while len({q["scraped_at"].astimezone(NSE_TZ).date() for q in quotes}) < days:
+        at = T0 + timedelta(days=day)
+        day += 1
+        if at.astimezone(NSE_TZ).weekday() >= 5:
+            continue
+        for hour, move in ((0, 0.0), (2, rng.uniform(-1, 1)), (5, rng.uniform(-0.5, 0.5))):
+            quotes.append(make_quote(ticker, round(price + move, 2), at + timedelta(hours=hour)))
+        price = max(1.0, price + rng.uniform(-0.6, 0.6))
+    return quotes
+
+
+def _expected(quotes, windows):
+    """Brute force over the full history."""
+    days = {}
+    for quote in quotes:
+        days.setdefault(quote["scraped_at"].astimezone(NSE_TZ).date(), []).append(quote["stock_price"])
+    dates = sorted(days)
+    closes = [days[d][-1] for d in dates]
+    last = dates[-1]
+    recent = [d for d in dates if (last - d).days < windows.extreme_days]
+    expected = {
+        "price": closes[-1],
+        "high_52w": max(max(days[d]) for d in recent),
+        "low_52w": min(min(days[d]) for d in recent),
+    }
+    for period in windows.sma_periods:
+        expected[f"sma_{period}"] = statistics.fmean(closes[-period:]) if len(closes) >= period else None
+    returns = [math.log(b / a) for a, b in zip(closes, closes[1:])][-windows.volatility_period:]
+    expected[f"volatility_{windows.volatility_period}d_pct"] = (
+        statistics.stdev(returns) * math.sqrt(252) * 100 if len(returns) == windows.volatility_period else None)
+    return expected
+
+
+class TestRollingStore(unittest.TestCase):
+    """Test the rolling window store"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "rolling", "state.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertStats(self, stats, expected):
+        self.assertEqual(set(expected) - set(stats), set())
+        for key, value in expected.items():
+            if value is None:
+                self.assertIsNone(stats[key], key)
+            else:
+                self.assertAlmostEqual(stats[key], value, places=9, msg=key)
+
+    def test_matches_full_history_after_every_quote(self):
+        """Test the rolling state matches full history after every quote"""
+        quotes = _series(days=45)
+        store = RollingStore(self.path, WINDOWS)
+        for n, quote in enumerate(quotes, 1):
+            self.assertTrue(store.update(quote))
+            if n % 7 == 0 or n == len(quotes):
+                self.assertStats(store.stats("SCOM"), _expected(quotes[:n], WINDOWS))
+        self.assertIsNotNone(store.stats("SCOM")["volatility_10d_pct"])
+        self.assertFalse(store.update(quotes[-2]))  # replayed
+        self.assertEqual(store.skipped, 1)
+        self.assertIsNone(store.stats("NONE"))
+
+    def test_persisted_state_resumes(self):
+        """Test persisted state resumes"""
+        quotes = _series(days=40)
+        with RollingStore(self.path, WINDOWS) as store:
+            for quote in quotes[:70]:
+                store.update(quote)
+        with RollingStore(self.path) as store:
+            self.assertEqual(store.windows, WINDOWS)  # taken from the file
+            for quote in quotes[60:]:
+                store.update(quote)
+            self.assertStats(store.stats("SCOM"), _expected(quotes, WINDOWS))
+        with open(self.path, "rb") as handle:
+            self.assertLess(len(handle.read()), 2000)
+        self.assertStats(RollingStore(self.path).open().stats("SCOM"), _expected(quotes, WINDOWS))
+
+    def test_save_keeps_other_writers_newer_tickers(self):
+        """Test saving keeps newer tickers from other writers"""
+        quotes = _series("SCOM", days=3)
+        first, second = RollingStore(self.path, WINDOWS).open(), RollingStore(self.path, WINDOWS).open()
+        for quote in quotes:
+            first.update(quote)
+        second.update(quotes[0])
+        second.update(make_quote("EQTY", 45.0, quotes[0]["scraped_at"]))
+        first.save()
+        second.save()
+        reopened = RollingStore(self.path).open()
+        self.assertEqual(reopened.tickers(), ["EQTY", "SCOM"])
+        self.assertEqual(reopened.stats("SCOM")["price"], quotes[-1]["stock_price"])
+
+    def test_rebuild_from_backend_history(self):
+        """Test rebuilding from backend history"""
+        backend = create_backend("embedded", embedded_path=os.path.join(self.tmp.name, "nse.sqlite3"))
+        backend.open()
+        self.addCleanup(backend.close)
+        quotes = _series("SCOM", days=25) + _series("EQTY", days=25, seed=3)
+        for quote in quotes:
+            backend.upsert_stock(dict(quote, stock_name=quote["ticker_symbol"], created_at=quote["scraped_at"]))
+        store = rebuild(self.path, backend.iter_history(), WINDOWS)
+        self.assertEqual(store.tickers(), ["EQTY", "SCOM"])
+        reopened = RollingStore(self.path).open()
+        self.assertStats(reopened.stats("EQTY"), _expected(quotes[len(quotes) // 2:], WINDOWS))
+
+        rebuild(self.path, backend.iter_history(tickers=["SCOM"]), WINDOWS, tickers=["SCOM"])
+        reopened = RollingStore(self.path).open()
+        self.assertEqual(reopened.tickers(), ["EQTY", "SCOM"])
+        self.assertStats(reopened.stats("SCOM"), _expected(quotes[:len(quotes) // 2], WINDOWS))
+        with self.assertRaises(ValueError):
+            rebuild(self.path, [], Windows(), tickers=["SCOM"])
+
+    def test_pipeline_updates_on_write(self):
+        """Test the pipeline updates the store on write"""
+        from nse_scraper.pipelines import NseScraperPipeline
+
+        pipeline = NseScraperPipeline("embedded", None, None, "stock_data", None, False, None, None, "stock_data",
+                                      embedded_path=os.path.join(self.tmp.name, "nse.sqlite3"),
+                                      rolling_state_path=self.path)
+        pipeline.open_spider()
+        quotes = _series(days=2)
+        for quote in quotes:
+            pipeline.process_item(dict(quote, stock_name="Safaricom", created_at=quote["scraped_at"]))
+        pipeline.close_spider()
+        stats = RollingStore(self.path).open().stats("SCOM")
+        self.assertEqual(stats["price"], quotes[-1]["stock_price"])
+        self.assertEqual(stats["high_52w"], max(quote["stock_price"] for quote in quotes))
+
+
+if __name__ == "__main__":
+    unittest.main()
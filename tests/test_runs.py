@@ -0,0 +1,211 @@
+"""
+Tests for scrape runs and as-of board queries
+
+Database tests need NSE_TEST_POSTGRES_URL (see tests/test_postgres_bulk.py).
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import timedelta
+from types import SimpleNamespace
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from helpers import T0, make_quote
+from nse_scraper.db import create_backend
+from nse_scraper.runs import FINISHED, RUNNING, ScrapeRun
+from nse_scraper.spiders.afx_scraper import AfxScraperSpider
+
+TEST_URL = os.getenv("NSE_TEST_POSTGRES_URL")
+
+BOARD = (b"<table><tbody>"
+         b"<tr><td>SCOM</td><td>Safaricom</td><td>1</td><td>14.50</td><td>0.25</td></tr>"
+         b"<tr><td>EQTY</td><td>Equity Group</td><td>1</td><td>45.00</td><td>-0.50</td></tr>"
+         b"</tbody></table>")
+
+
+def _run(minutes, spider="afx_scraper"):
+    return ScrapeRun.start(spider, now=T0 + timedelta(minutes=minutes))
+
+
+class TestScrapeRun(unittest.TestCase):
+    """Test scrape run records and their lifecycle"""
+
+    def test_run_ids_sort_by_start(self):
+        """Test run IDs sort by start time"""
+        first, second = _run(0), _run(61)
+        self.assertTrue(first.run_id.startswith("20260302T090000Z-"))
+        self.assertLess(first.run_id, second.run_id)
+        self.assertNotEqual(_run(0).run_id, first.run_id)
+        record = first.finish(42, now=T0 + timedelta(seconds=5)).as_record()
+        self.assertEqual((record["status"], record["rows"]), (FINISHED, 42))
+        self.assertEqual(record["finished_at"], T0 + timedelta(seconds=5))
+
+    def test_spider_rows_share_run_timestamp(self):
+        """Test rows from one crawl share the run timestamp"""
+        spider = AfxScraperSpider()
+        response = HtmlResponse(url="https://afx.kwayisi.org/nse/", body=BOARD, encoding="utf-8")
+        items = list(spider.parse(response))
+        self.assertEqual({item.run_id for item in items}, {spider.run.run_id})
+        self.assertEqual({item.scraped_at for item in items}, {spider.run.started_at})
+        previous = spider.run.run_id
+        self.assertNotEqual(spider.start_run().run_id, previous)
+        self.assertEqual(next(spider.parse(response)).run_id, spider.run.run_id)
+
+    def test_spider_uses_scheduled_run_id(self):
+        """Test the spider uses the scheduled run ID"""
+        def crawler(values):
+            return SimpleNamespace(settings=Settings(values), signals=SimpleNamespace(connect=lambda *a, **k: None))
+
+        spider = AfxScraperSpider.from_crawler(crawler({"NSE_RUN_ID": "2026-03-02_153000"}))
+        self.assertEqual(spider.run.run_id, "2026-03-02_153000")
+        self.assertNotEqual(AfxScraperSpider.from_crawler(crawler({})).run.run_id, "2026-03-02_153000")
+
+    def test_supabase_history_entries_carry_run_id(self):
+        """Test Supabase history entries carry run ID"""
+        from nse_scraper.db.supabase_backend import SupabaseBackend
+
+        run = _run(0)
+        row = SupabaseBackend._stock_row(make_quote("SCOM", 14.5, run.started_at, run_id=run.run_id), [])
+        self.assertEqual(row["price_history"], [{"scraped_at": "2026-03-02T09:00:00+00:00", "stock_price": 14.5,
+                                                 "stock_change": None, "run_id": run.run_id}])
+
+    def test_postgres_statements_compile(self):
+        """Test the run upsert and as-of board query compile for PostgreSQL"""
+        from sqlalchemy.dialects import postgresql
+
+        from nse_scraper.db.postgres_backend import BOARD_AS_OF, board_params, run_upsert
+
+        dialect = postgresql.dialect()
+        sql = str(run_upsert(_run(0).finish(3).as_record()).compile(dialect=dialect))
+        self.assertIn("ON CONFLICT (run_id) DO UPDATE", sql)
+        self.assertIn("status = excluded.status", sql)
+        params = board_params("2026-03-02T09:00:00+00:00", ["SCOM"])
+        self.assertEqual(set(BOARD_AS_OF.compile(dialect=dialect).params), set(params))
+        self.assertEqual(params["as_of"], T0)
+
+
+class BoardQueriesMixin:
+    """Shared checks; subclasses provide ``self.backend``."""
+
+    def _write_runs(self):
+        runs = [_run(0), _run(60), _run(120)]
+        for ticker, price, run in (("ZZR1", 10.0, runs[0]), ("ZZR2", 20.0, runs[0]), ("ZZR1", 11.0, runs[1]),
+                                   ("ZZR1", 12.0, runs[2]), ("ZZR3", 30.0, runs[2])):
+            self.backend.upsert_stock(make_quote(ticker, price, run.started_at, run_id=run.run_id))
+        for run in runs:
+            self.backend.upsert_run(run.as_record())
+            self.backend.upsert_run(run.finish(2, now=run.started_at + timedelta(seconds=3)).as_record())
+        return runs
+
+    def test_board_as_of(self):
+        """Test the board as of a point in time"""
+        runs = self._write_runs()
+        board = self.backend.get_board_as_of(T0 + timedelta(minutes=90))
+        board = {row["ticker_symbol"]: row for row in board if row["ticker_symbol"].startswith("ZZR")}
+        self.assertEqual(sorted(board), ["ZZR1", "ZZR2"])  # ZZR3 was first quoted later
+        self.assertEqual((board["ZZR1"]["stock_price"], board["ZZR1"]["run_id"]), (11.0, runs[1].run_id))
+        self.assertEqual(board["ZZR2"]["run_id"], runs[0].run_id)  # unchanged since the first run
+        self.assertEqual(board["ZZR2"]["stock_name"], "ZZR2 Plc")
+        exact = self.backend.get_board_as_of(runs[2].started_at, tickers=["ZZR1", "ZZR3"])
+        self.assertEqual([(row["ticker_symbol"], row["stock_price"]) for row in exact],
+                         [("ZZR1", 12.0), ("ZZR3", 30.0)])
+        self.assertEqual(self.backend.get_board_as_of(T0 - timedelta(days=1), tickers=["ZZR1"]), [])
+
+    def test_run_board_and_runs(self):
+        """Test the board for one run and the run list"""
+        runs = self._write_runs()
+        board = self.backend.get_run_board(runs[2].run_id)
+        self.assertEqual([(row["ticker_symbol"], row["stock_price"]) for row in board],
+                         [("ZZR1", 12.0), ("ZZR3", 30.0)])
+        recorded = [run for run in self.backend.list_runs(limit=50) if run["run_id"] in {r.run_id for r in runs}]
+        self.assertEqual([run["run_id"] for run in recorded], [run.run_id for run in reversed(runs)])
+        self.assertEqual({(run["status"], run["rows"]) for run in recorded}, {(FINISHED, 2)})
+
+
+class TestEmbeddedBoard(BoardQueriesMixin, unittest.TestCase):
+    """Test run board queries on the embedded backend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "nse.sqlite3")
+        self.backend = create_backend("embedded", embedded_path=self.path)
+        self.backend.open()
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_board_queries_use_indexes(self):
+        """Test board queries use indexes"""
+        def plan(sql, params):
+            return " ".join(row["detail"] for row in self.backend.query(f"EXPLAIN QUERY PLAN {sql}", params))
+
+        self.assertIn("ix_stock_price_history_run_id",
+                      plan("SELECT * FROM stock_price_history WHERE run_id = ?", ("x",)))
+        self.assertIn("SEARCH stock_price_history USING PRIMARY KEY (ticker_symbol=? AND scraped_at<?)",
+                      plan("SELECT scraped_at FROM stock_price_history WHERE ticker_symbol = ? AND scraped_at <= ? "
+                           "ORDER BY scraped_at DESC LIMIT 1", ("ZZR1", "x")))
+
+    def test_existing_database_gains_run_column(self):
+        """Test an existing database gains the run column"""
+        self.backend.close()
+        path = os.path.join(self.tmp.name, "old.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE stock_price_history (ticker_symbol TEXT NOT NULL, scraped_at TEXT NOT NULL, "
+                     "stock_price REAL NOT NULL, stock_change REAL, PRIMARY KEY (ticker_symbol, scraped_at)) "
+                     "WITHOUT ROWID")
+        conn.close()
+        self.backend = create_backend("embedded", embedded_path=path)
+        self.backend.open()
+        run = _run(0)
+        self.backend.upsert_stock(make_quote("ZZR1", 10.0, run.started_at, run_id=run.run_id))
+        self.assertEqual(self.backend.get_run_board(run.run_id)[0]["stock_price"], 10.0)
+
+    def test_pipeline_records_the_crawl_run(self):
+        """Test the pipeline records the crawl run"""
+        from nse_scraper.pipelines import NseScraperPipeline
+
+        spider = AfxScraperSpider()
+        pipeline = NseScraperPipeline("embedded", None, None, "stock_data", None, False, None, None, "stock_data",
+                                      embedded_path=self.path)
+        pipeline.crawler = SimpleNamespace(spider=spider)
+        pipeline.open_spider()
+        self.assertEqual(self.backend.list_runs()[0]["status"], RUNNING)
+        response = HtmlResponse(url="https://afx.kwayisi.org/nse/", body=BOARD, encoding="utf-8")
+        for item in spider.parse(response):
+            pipeline.process_item(item)
+        pipeline.close_spider()
+        (run,) = self.backend.list_runs()
+        self.assertEqual((run["run_id"], run["status"], run["rows"]), (spider.run.run_id, FINISHED, 2))
+        self.assertEqual(len(self.backend.get_run_board(spider.run.run_id)), 2)
+
+
+@unittest.skipUnless(TEST_URL, "NSE_TEST_POSTGRES_URL not set")
+class TestPostgresBoard(BoardQueriesMixin, unittest.TestCase):
+    """Test run board queries on PostgreSQL"""
+
+    def setUp(self):
+        from nse_scraper.db.postgres_backend import PostgresBackend
+
+        self.backend = PostgresBackend(sql_database_url=TEST_URL)
+        self.backend.open()
+        self._cleanup()
+
+    def tearDown(self):
+        self._cleanup()
+        self.backend.close()
+
+    def _cleanup(self):
+        from sqlalchemy import text
+
+        with self.backend.engine.begin() as conn:
+            for table in ("stock_summary", "stock_daily_ohlc", "stock_price_history", "stock_data"):
+                conn.execute(text(f"DELETE FROM {table} WHERE ticker_symbol LIKE 'ZZR%'"))
+            conn.execute(text("DELETE FROM scrape_runs WHERE run_id LIKE '20260302T%'"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for the trading-calendar-aware scheduler
+"""
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+from nse_scraper.scheduler import (
+    EXIT_RUN,
+    EXIT_SKIP,
+    NSE_TZ,
+    TradingCalendar,
+    easter_sunday,
+    load_state,
+    mark_success,
+    plan_run,
+)
+
+
+def _eat(*args):
+    return datetime(*args, tzinfo=NSE_TZ)
+
+
+class TestTradingCalendar(unittest.TestCase):
+    """Test NSE trading days, holidays and session hours"""
+
+    def setUp(self):
+        self.calendar = TradingCalendar(extra_holidays=["2026-03-20"])
+
+    def test_easter(self):
+        """Test Easter Sunday dates"""
+        self.assertEqual(easter_sunday(2026), date(2026, 4, 5))
+        self.assertEqual(easter_sunday(2025), date(2025, 4, 20))
+
+    def test_weekends_and_holidays(self):
+        """Test weekends and holidays are not trading days"""
+        self.assertFalse(self.calendar.is_trading_day(date(2026, 2, 21)))  # Saturday
+        self.assertFalse(self.calendar.is_trading_day(date(2026, 3, 1)))  # Sunday
+        self.assertTrue(self.calendar.is_trading_day(date(2026, 3, 2)))
+        self.assertFalse(self.calendar.is_trading_day(date(2026, 4, 3)))  # Good Friday
+        self.assertFalse(self.calendar.is_trading_day(date(2026, 4, 6)))  # Easter Monday
+        self.assertFalse(self.calendar.is_trading_day(date(2026, 3, 20)))  # configured extra
+
+    def test_sunday_holiday_observed_on_monday(self):
+        # Mashujaa Day 2024 fell on a Sunday
+        """Test a Sunday holiday is observed on Monday"""
+        self.assertFalse(self.calendar.is_trading_day(date(2024, 10, 21)))
+
+    def test_session_open(self):
+        """Test whether the session is open"""
+        self.assertTrue(self.calendar.is_session_open(_eat(2026, 3, 2, 10, 0)))
+        self.assertFalse(self.calendar.is_session_open(_eat(2026, 3, 2, 15, 0)))
+        self.assertFalse(self.calendar.is_session_open(_eat(2026, 3, 7, 10, 0)))
+        self.assertTrue(self.calendar.is_session_open(datetime(2026, 3, 2, 7, 0, tzinfo=timezone.utc)))
+
+    def test_latest_closed_session(self):
+        # Saturday/Sunday and Monday morning all target Friday's session
+        """Test the latest closed session"""
+        self.assertEqual(self.calendar.latest_closed_session(_eat(2026, 3, 7, 9, 0)), date(2026, 3, 6))
+        self.assertEqual(self.calendar.latest_closed_session(_eat(2026, 3, 9, 9, 0)), date(2026, 3, 6))
+        self.assertEqual(self.calendar.latest_closed_session(_eat(2026, 3, 9, 15, 30)), date(2026, 3, 9))
+
+    def test_next_session_open(self):
+        """Test the next session open"""
+        self.assertEqual(self.calendar.next_session_open(_eat(2026, 3, 9, 8, 0)), _eat(2026, 3, 9, 9, 30))
+        self.assertEqual(self.calendar.next_session_open(_eat(2026, 3, 6, 10, 0)), _eat(2026, 3, 9, 9, 30))
+
+    def test_next_post_close_run(self):
+        """Test the next post-close run"""
+        self.assertEqual(self.calendar.next_post_close_run(_eat(2026, 3, 6, 16, 0)), _eat(2026, 3, 9, 15, 30))
+        self.assertEqual(self.calendar.next_post_close_run(_eat(2026, 3, 9, 8, 0)), _eat(2026, 3, 9, 15, 30))
+
+
+class TestRunPlanning(unittest.TestCase):
+    """Test skip/full decisions"""
+
+    def setUp(self):
+        self.calendar = TradingCalendar()
+
+    def test_weekend_run_skips_when_friday_captured(self):
+        """Test a weekend run skips when Friday was captured"""
+        plan = plan_run(_eat(2026, 3, 7, 9, 0), self.calendar, {"last_session": "2026-03-06"})
+        self.assertEqual(plan.action, "skip")
+        self.assertEqual(plan.exit_code, EXIT_SKIP)
+
+    def test_uncaptured_session_runs(self):
+        """Test an uncaptured session runs"""
+        plan = plan_run(_eat(2026, 3, 7, 9, 0), self.calendar, {"last_session": "2026-03-05"})
+        self.assertEqual(plan.action, "full")
+        self.assertEqual(plan.exit_code, EXIT_RUN)
+        self.assertEqual(plan.session, "2026-03-06")
+
+    def test_force(self):
+        """Test force runs even when captured"""
+        plan = plan_run(_eat(2026, 3, 7, 9, 0), self.calendar, {"last_session": "2026-03-06"}, force=True)
+        self.assertEqual(plan.action, "full")
+
+    def test_freshness_check_without_state(self):
+        """Test a freshness check runs without state"""
+        fresh = plan_run(_eat(2026, 3, 8, 9, 0), self.calendar, {},
+                         freshness_check=lambda: _eat(2026, 3, 7, 9, 1))
+        stale = plan_run(_eat(2026, 3, 8, 9, 0), self.calendar, {},
+                         freshness_check=lambda: _eat(2026, 3, 6, 9, 1))
+        self.assertEqual(fresh.action, "skip")
+        self.assertEqual(stale.action, "full")
+
+    def test_failed_freshness_check_runs(self):
+        """Test a failed freshness check runs"""
+        def broken():
+            raise ConnectionError("down")
+
+        plan = plan_run(_eat(2026, 3, 8, 9, 0), self.calendar, {}, freshness_check=broken)
+        self.assertEqual(plan.action, "full")
+
+    def test_mark_success_persists_latest_session(self):
+        """Test mark_success persists the latest session"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            mark_success(path, "2026-03-06", _eat(2026, 3, 7, 9, 2))
+            mark_success(path, "2026-03-05", _eat(2026, 3, 7, 9, 3))
+            self.assertEqual(load_state(path)["last_session"], "2026-03-06")
+
+
+if __name__ == "__main__":
+    unittest.main()
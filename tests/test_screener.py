@@ -0,0 +1,127 @@
+"""
+Tests for the in-memory StockAnalysis screener
+"""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from nse_scraper.db import create_backend
+from nse_scraper.screener import Screener, Snapshot, parse_condition
+
+T0 = "2026-03-02T09:00:00+00:00"
+T1 = "2026-03-02T10:00:00+00:00"
+
+
+def _item(ticker, view, metrics, scraped_at=T0, price=10.0):
+    return {"ticker_symbol": ticker, "view": view, "stock_price": price, "scraped_at": scraped_at,
+            "metrics": metrics}
+
+
+FEED = [
+    _item("SCOM", "overview", {"marketCap": 1.36e12, "revenue": 388.69e9, "sector": "Communication"}),
+    _item("SCOM", "dividends", {"dividendYield": 4.5, "exDivDate": "Feb 26, 2026"}),
+    _item("EQTY", "overview", {"marketCap": 180e9, "revenue": 150e9, "sector": "Financials"}),
+    _item("EQTY", "dividends", {"dividendYield": 9.1, "exDivDate": "Apr 10, 2026"}),
+    _item("BAT", "overview", {"marketCap": 40e9, "revenue": 25e9, "sector": "Consumer Staples"}),
+    _item("BAT", "dividends", {"dividendYield": None}),
+    _item("KCB", "overview", {"marketCap": 98e9, "revenue": "-", "sector": "Financials"}),
+]
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test building screener snapshots"""
+
+    def setUp(self):
+        from nse_scraper.screener import records_from_feed
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "stockanalysis_output.jsonl")
+        self._write(FEED)
+        self.snapshot = Snapshot(records_from_feed(self.path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, items):
+        with open(self.path, "w", encoding="utf-8") as handle:
+            handle.writelines(json.dumps(item) + "\n" for item in items)
+
+    def test_parse_condition(self):
+        """Test parsing screen conditions"""
+        self.assertEqual(parse_condition("revenue > 1e11"), ("revenue", ">", 1e11))
+        self.assertEqual(parse_condition("sector == 'Financials'"), ("sector", "==", "Financials"))
+        with self.assertRaises(ValueError):
+            parse_condition("revenue is big")
+
+    def test_columns(self):
+        """Test typed snapshot columns"""
+        self.assertEqual(list(self.snapshot.tickers), ["BAT", "EQTY", "KCB", "SCOM"])
+        self.assertEqual(self.snapshot.column("market_cap").dtype.kind, "f")
+        self.assertEqual(self.snapshot.column("exDivDate").dtype.kind, "M")
+        self.assertEqual(self.snapshot.column("sector").dtype.kind, "O")
+        with self.assertRaises(KeyError):
+            self.snapshot.column("nope")
+
+    def test_filter_sort_top_n(self):
+        """Test filtering, sorting and limiting results"""
+        rows = self.snapshot.screen(["revenue > 1e11"], sort="-dividend_yield")
+        self.assertEqual(rows, [{"ticker_symbol": "EQTY", "dividend_yield": 9.1, "revenue": 150e9},
+                                {"ticker_symbol": "SCOM", "dividend_yield": 4.5, "revenue": 388.69e9}])
+        # Missing values never match a filter and sort last.
+        self.assertEqual([row["ticker_symbol"] for row in self.snapshot.screen(["revenue != 0"])],
+                         ["BAT", "EQTY", "SCOM"])
+        top = self.snapshot.screen(sort="-dividendYield", limit=3)
+        self.assertEqual([row["ticker_symbol"] for row in top], ["EQTY", "SCOM", "BAT"])
+        self.assertEqual([row["ticker_symbol"] for row in self.snapshot.screen(sort="market_cap", limit=2)],
+                         ["BAT", "KCB"])
+
+    def test_text_and_date_conditions(self):
+        """Test text and date conditions"""
+        rows = self.snapshot.screen(["sector == Financials"], sort="sector")
+        self.assertEqual([row["ticker_symbol"] for row in rows], ["EQTY", "KCB"])
+        rows = self.snapshot.screen(["ex_div_date >= 2026-03-01"])
+        self.assertEqual(rows, [{"ticker_symbol": "EQTY", "ex_div_date": "2026-04-10"}])
+
+    def test_results_cached_until_next_scrape(self):
+        """Test results are cached until the next scrape"""
+        screener = Screener(self.path)
+        first = screener.snapshot()
+        screener.screen(["revenue > 1e11"], sort="-dividend_yield")
+        self.assertIs(screener.snapshot(), first)
+        self.assertEqual(len(first._cache), 1)
+
+        self._write(FEED + [_item("SCOM", "dividends", {"dividendYield": 12.0}, scraped_at=T1)])
+        os.utime(self.path, ns=(0, first.version[0] + 1))
+        rows = screener.screen(["revenue > 1e11"], sort="-dividend_yield")
+        self.assertIsNot(screener.snapshot(), first)
+        # The newer scrape of SCOM replaces its older views.
+        self.assertEqual(rows, [{"ticker_symbol": "EQTY", "dividend_yield": 9.1, "revenue": 150e9}])
+
+
+class TestBackendSource(unittest.TestCase):
+    """Test reading screener data from a backend"""
+
+    def test_embedded_backend_source(self):
+        """Test reading a snapshot from the embedded backend"""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = create_backend("embedded", embedded_path=os.path.join(tmp, "nse.sqlite3"))
+            backend.open()
+            try:
+                for ticker, market_cap, yield_ in (("SCOM", "1.36T", "4.5%"), ("EQTY", "180B", "9.1%")):
+                    backend.upsert_stockanalysis_stock({
+                        "ticker_symbol": ticker, "company_name": ticker, "stock_price": 10.0,
+                        "scraped_at": datetime(2026, 3, 2, tzinfo=timezone.utc),
+                        "overview_metrics": {"marketCap": market_cap},
+                        "dividends_metrics": {"dividendYield": yield_}})
+                screener = Screener(backend, max_age=3600)
+                rows = screener.screen(["market_cap > 1e11"], sort="-dividend_yield", limit=1)
+                self.assertEqual(rows, [{"ticker_symbol": "EQTY", "dividend_yield": 9.1, "market_cap": 180e9}])
+                self.assertIs(screener.snapshot(), screener.snapshot())
+            finally:
+                backend.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for the shared JSON serialization layer
+"""
+import json
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from helpers import T0, quote_at, supabase_backend
+from nse_scraper import serialization
+from nse_scraper.items import AfxQuote
+
+RECORD = {
+    "ticker_symbol": "SCOM",
+    "stock_name": "Safaricom Plc – Kenya",
+    "stock_price": 14.5,
+    "stock_change": None,
+    "scraped_at": datetime(2026, 3, 2, 9, 0, 1, 250000, tzinfo=timezone.utc),
+    "created_at": datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc),
+    "ex_dividend_date": date(2026, 2, 26),
+    "price_history": [{"scraped_at": "2026-03-01T09:00:00+00:00", "stock_price": 14.0}],
+    "dps": Decimal("1.20"),
+    "views": ("overview", "dividends"),
+}
+
+
+class TestSerialization(unittest.TestCase):
+    """Test shared record serialization helpers"""
+
+    def test_engines_agree(self):
+        """Test the orjson and json engines agree"""
+        self.assertEqual(serialization.dumpb(RECORD), serialization._json_dumpb(RECORD))
+        decoded = serialization.loads(serialization.dumpb(RECORD))
+        self.assertEqual(decoded["scraped_at"], "2026-03-02T09:00:01.250000+00:00")
+        self.assertEqual(decoded["created_at"], RECORD["created_at"].isoformat())
+        self.assertEqual(decoded["ex_dividend_date"], "2026-02-26")
+        self.assertEqual(decoded["dps"], 1.2)
+        self.assertEqual(decoded["views"], ["overview", "dividends"])
+        self.assertEqual(decoded["stock_name"], RECORD["stock_name"])
+
+    def test_loads_accepts_text_bytes_and_memoryview(self):
+        """Test loads accepts text, bytes and memoryview"""
+        body = b'{"data":{"data":[{"s":"nase/scom","price":14.5}]}}'
+        for data in (body, body.decode(), memoryview(body)):
+            self.assertEqual(serialization.loads(data)["data"]["data"][0]["price"], 14.5)
+        with self.assertRaises(json.JSONDecodeError):
+            serialization.loads(b"{not json")
+
+    def test_dump_lines_and_sizes(self):
+        """Test dumping lines and payload sizes"""
+        quote = AfxQuote.build(ticker_symbol="SCOM", stock_name="Safaricom", stock_price=14.5,
+                               scraped_at=RECORD["scraped_at"])
+        body = serialization.dump_lines([RECORD, quote])
+        lines = body.splitlines()
+        self.assertTrue(body.endswith(b"\n"))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(serialization.loads(lines[1])["scraped_at"], "2026-03-02T09:00:01.250000+00:00")
+        self.assertEqual(serialization.encoded_size({"a": 1}), len(b'{"a":1}'))
+        self.assertEqual(serialization.to_iso(RECORD["created_at"]), "2026-03-02T09:00:00+00:00")
+        self.assertEqual(serialization.to_iso("2026-03-02"), "2026-03-02")
+
+
+class TestSupabasePayload(unittest.TestCase):
+    """Test the payloads sent to Supabase"""
+
+    def setUp(self):
+        history = [{"scraped_at": "2026-03-01T09:00:00+00:00", "stock_price": 13.5, "stock_change": None}]
+        self.backend = supabase_backend({"stock_data": [{"ticker_symbol": "SCOM", "price_history": history}]})
+
+    def test_upsert_posts_pre_serialized_body(self):
+        """Test upserts post a pre-serialized body"""
+        self.backend.upsert_stock(quote_at("SCOM", 0, 14.0))
+        url, params, headers, content = self.backend.client.session.posts[0]
+        self.assertEqual(url, "https://x.supabase.co/rest/v1/stock_data")
+        self.assertEqual(params, {"on_conflict": "ticker_symbol"})
+        self.assertIn("resolution=merge-duplicates", headers["Prefer"])
+        self.assertEqual(headers["apikey"], "key")
+        row = serialization.loads(content)
+        self.assertEqual(row["scraped_at"], "2026-03-02T09:00:00+00:00")
+        self.assertEqual([point["stock_price"] for point in row["price_history"]], [13.5, 14.0])
+
+    def test_upsert_stocks_batches_reads_and_writes(self):
+        """Test upsert_stocks batches reads and writes"""
+        self.backend.upsert_stocks([quote_at("SCOM", 0, 14.0), quote_at("EQTY", 0, 45.0),
+                                    quote_at("SCOM", 5, 14.5)])
+        client = self.backend.client
+        self.assertEqual(client.selects, [{"ticker_symbol": ["EQTY", "SCOM"]}])
+        self.assertEqual(len(client.session.posts), 1)
+        rows = {row["ticker_symbol"]: row for row in serialization.loads(client.session.posts[0][3])}
+        self.assertEqual([point["stock_price"] for point in rows["SCOM"]["price_history"]], [13.5, 14.0, 14.5])
+        self.assertEqual(rows["SCOM"]["stock_price"], 14.5)
+        self.assertEqual(len(rows["EQTY"]["price_history"]), 1)
+
+    def test_upsert_through_postgrest_client(self):
+        """Test upserts go through a real postgrest client over a mock transport"""
+        import httpx
+        from postgrest import SyncPostgrestClient
+
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.method == "GET":
+                return httpx.Response(200, json=[])
+            return httpx.Response(201)
+
+        session = httpx.Client(transport=httpx.MockTransport(handler))
+        self.backend.client = SyncPostgrestClient("https://x.supabase.co/rest/v1", headers={"apikey": "key"},
+                                                  http_client=session).auth(None, username="u", password="p")
+        self.backend.upsert_run({"run_id": "r1", "spider": "afx_scraper", "started_at": T0, "status": "running"})
+        self.backend.upsert_stock(quote_at("SCOM", 0, 14.0))
+        posts = [request for request in requests if request.method == "POST"]
+        self.assertEqual([str(request.url) for request in posts], [
+            "https://x.supabase.co/rest/v1/scrape_runs?on_conflict=run_id",
+            "https://x.supabase.co/rest/v1/stock_data?on_conflict=ticker_symbol",
+        ])
+        for request in posts:
+            self.assertEqual(request.headers["apikey"], "key")
+            self.assertEqual(request.headers["Authorization"], httpx.BasicAuth("u", "p")._auth_header)
+        self.assertEqual(serialization.loads(posts[0].content)["started_at"], T0.isoformat())
+        self.assertEqual(serialization.loads(posts[1].content)["stock_price"], 14.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for cold-start import cost - guards against heavy imports creeping back
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Cumulative -X importtime budget for ``import nse_scraper.pipelines`` in a
+# fresh interpreter. Scrapy itself accounts for most of it; drivers must not.
+PIPELINE_IMPORT_BUDGET_MS = float(os.getenv("NSE_PIPELINE_IMPORT_BUDGET_MS", "750"))
+
+DRIVER_MODULES = ("pymongo", "sqlalchemy", "supabase", "psycopg2")
+
+
+def _run_isolated(code):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+class TestColdStartImports(unittest.TestCase):
+    """Test that the pipeline module imports no storage drivers"""
+
+    def test_pipelines_do_not_import_drivers(self):
+        """Test importing pipelines leaves every driver unloaded"""
+        proc = _run_isolated(
+            "import json, sys\n"
+            "import nse_scraper.pipelines\n"
+            f"print(json.dumps([m for m in {DRIVER_MODULES!r} if m in sys.modules]))\n"
+        )
+        self.assertEqual(json.loads(proc.stdout), [])
+
+    def test_pipeline_import_within_budget(self):
+        """Test cold-start import of pipelines stays under the budget"""
+        sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+        try:
+            from startup_importtime import parse_importtime
+        finally:
+            sys.path.pop(0)
+
+        proc = _run_isolated("import nse_scraper.pipelines")
+        modules = parse_importtime(proc.stderr)
+        cumulative_ms = modules["nse_scraper.pipelines"][1] / 1000.0
+        self.assertLess(
+            cumulative_ms,
+            PIPELINE_IMPORT_BUDGET_MS,
+            f"import nse_scraper.pipelines took {cumulative_ms:.1f} ms",
+        )
+
+    def test_backend_class_lazy_attribute(self):
+        """Test backend classes remain importable from db.backends"""
+        proc = _run_isolated(
+            "import sys\n"
+            "from nse_scraper.db import backends\n"
+            "assert 'pymongo' not in sys.modules\n"
+            "backends.MongoBackend\n"
+            "assert 'pymongo' in sys.modules\n"
+        )
+        self.assertEqual(proc.returncode, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
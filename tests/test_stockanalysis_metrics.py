@@ -0,0 +1,105 @@
+"""
+Tests for the typed StockAnalysis metric columns
+"""
+import os
+import re
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+from nse_scraper.db import create_backend
+from nse_scraper.db.stockanalysis_metrics import METRICS, coerce, merge_metrics, split_metrics
+
+MIGRATION = os.path.join(os.path.dirname(__file__), "..", "sql", "008_typed_stockanalysis_metrics.sql")
+
+
+def _record(ticker, market_cap, revenue, dividend_yield):
+    return {"ticker_symbol": ticker, "company_name": ticker, "rank": 1, "stock_price": 10.0,
+            "scraped_at": datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc),
+            "overview_metrics": {"marketCap": market_cap, "revenue": revenue, "customKey": "x"},
+            "dividends_metrics": {"dividendYield": dividend_yield, "exDivDate": "Feb 26, 2026"},
+            "profile_metrics": {"employees": "6,300"}}
+
+
+class TestMetricCoercion(unittest.TestCase):
+    """Test coercing StockAnalysis metric values"""
+
+    def test_coerce(self):
+        """Test coercing metric strings to typed values"""
+        self.assertEqual(coerce("1.36T", "numeric"), 1.36e12)
+        self.assertEqual(coerce("-2.28%", "numeric"), -2.28)
+        self.assertIsNone(coerce("-", "numeric"))
+        self.assertIsNone(coerce("Banks", "numeric"))
+        self.assertEqual(coerce("6,300", "integer"), 6300)
+        self.assertEqual(coerce("Feb 26, 2026", "date"), date(2026, 2, 26))
+        self.assertEqual(coerce(12, "text"), "12")
+
+    def test_split_and_merge(self):
+        """Test splitting metrics into columns and merging them back"""
+        columns, blobs = split_metrics(_record("SCOM", "1.36T", "388.69B", "4.5%"))
+        self.assertEqual(columns["market_cap"], 1.36e12)
+        self.assertEqual(columns["ex_div_date"], date(2026, 2, 26))
+        self.assertIsNone(columns["tr_1y"])
+        self.assertEqual(blobs["overview_metrics"], {"customKey": "x"})
+        self.assertIsNone(blobs["dividends_metrics"])
+        merged = merge_metrics({**columns, **blobs})
+        self.assertEqual(merged["overview_metrics"], {"marketCap": 1.36e12, "revenue": 388.69e9, "customKey": "x"})
+        self.assertEqual(merged["dividends_metrics"]["exDivDate"], "2026-02-26")
+
+    def test_unparsable_values_stay_in_the_blob(self):
+        """Test unparsable values stay in the blob"""
+        record = _record("SCOM", "n/a", None, "4.5%")
+        record["dividends_metrics"]["exDivDate"] = "sometime in March"
+        record["price_metrics"] = {"volume": "1.2M"}
+        record["overview_metrics"]["volume"] = "-"
+        columns, blobs = split_metrics(record)
+        self.assertEqual((columns["market_cap"], columns["revenue"], columns["ex_div_date"]), (None, None, None))
+        self.assertEqual(columns["volume"], 1.2e6)
+        self.assertEqual(blobs["overview_metrics"], {"marketCap": "n/a", "volume": "-", "customKey": "x"})
+        self.assertEqual(blobs["dividends_metrics"], {"exDivDate": "sometime in March"})
+        self.assertIsNone(blobs["price_metrics"])
+        merged = merge_metrics({**columns, **blobs})
+        self.assertEqual(merged["dividends_metrics"], {"dividendYield": 4.5, "exDivDate": "sometime in March"})
+
+    def test_migration_covers_every_metric(self):
+        """Test the migration covers every metric"""
+        with open(MIGRATION, encoding="utf-8") as handle:
+            sql = handle.read()
+        for metric in METRICS:
+            self.assertRegex(sql, rf"ADD COLUMN IF NOT EXISTS {re.escape(metric.column)} ")
+            self.assertIn(f"'{metric.key}'", sql)
+
+
+class TestEmbeddedTypedMetrics(unittest.TestCase):
+    """Test typed metric columns in the embedded backend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = create_backend("embedded", embedded_path=os.path.join(self.tmp.name, "nse.sqlite3"))
+        self.backend.open()
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_screen_on_typed_columns(self):
+        """Test screening on typed columns"""
+        self.backend.upsert_stockanalysis_stock(_record("SCOM", "1.36T", "388.69B", "4.5%"))
+        self.backend.upsert_stockanalysis_stock(_record("EQTY", "180B", "150B", "9.1%"))
+        self.backend.upsert_stockanalysis_stock(_record("BAT", "40B", "25B", "11%"))
+        rows = self.backend.query("SELECT ticker_symbol FROM stockanalysis_stocks WHERE revenue > ? "
+                                  "ORDER BY dividend_yield DESC", (1e11,))
+        self.assertEqual([row["ticker_symbol"] for row in rows], ["EQTY", "SCOM"])
+        plan = " ".join(str(tuple(row)) for row in self.backend.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT ticker_symbol FROM stockanalysis_stocks WHERE market_cap > 1e11"))
+        self.assertIn("ix_stockanalysis_stocks_market_cap", plan)
+        stored = self.backend.get_stockanalysis_stock("SCOM")
+        self.assertEqual(stored["employees"], 6300)
+        self.assertEqual(stored["overview_metrics"]["marketCap"], 1.36e12)
+        raw = self.backend.conn.execute("SELECT overview_metrics, dividends_metrics FROM stockanalysis_stocks "
+                                        "WHERE ticker_symbol = 'SCOM'").fetchone()
+        self.assertEqual(tuple(raw), ('{"customKey":"x"}', None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Tests for the keyset-paginated readers and the export command
+
+Database tests need NSE_TEST_POSTGRES_URL (see tests/test_postgres_bulk.py).
+"""
+import io
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+from helpers import T0, quote_at, supabase_backend
+from nse_scraper.db import create_backend
+from nse_scraper.export import write_rows
+
+
+TEST_URL = os.getenv("NSE_TEST_POSTGRES_URL")
+
+
+def _quotes(prefix=""):
+    return [quote_at(prefix + ticker, minute, 10.0 + minute, stock_name=ticker)
+            for ticker in ("ABSA", "EQTY", "SCOM") for minute in range(3)]
+
+
+class TestEmbeddedReaders(unittest.TestCase):
+    """Test streaming reads from the embedded backend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = create_backend("embedded", embedded_path=os.path.join(self.tmp.name, "nse.sqlite3"))
+        self.backend.open()
+        self.backend.upsert_stocks(_quotes())
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_pages_cross_ticker_boundaries(self):
+        """Test pages cross ticker boundaries"""
+        rows = list(self.backend.iter_history(page_size=2))
+        self.assertEqual(len(rows), 9)
+        keys = [(row["ticker_symbol"], row["scraped_at"]) for row in rows]
+        self.assertEqual(keys, sorted(set(keys)))
+
+    def test_filters(self):
+        """Test history filters by ticker and time"""
+        rows = list(self.backend.iter_history(tickers=["SCOM", "ABSA"], since=T0 + timedelta(minutes=1),
+                                              until=T0 + timedelta(minutes=2), page_size=1))
+        self.assertEqual([row["ticker_symbol"] for row in rows], ["ABSA", "SCOM"])
+
+    def test_iter_stocks(self):
+        """Test iterating stocks in pages"""
+        self.assertEqual([row["ticker_symbol"] for row in self.backend.iter_stocks(page_size=2)],
+                         ["ABSA", "EQTY", "SCOM"])
+
+    def test_export_formats(self):
+        """Test exporting CSV and JSON lines"""
+        out = io.StringIO()
+        self.assertEqual(write_rows(self.backend.iter_stocks(), out, "csv"), 3)
+        self.assertTrue(out.getvalue().startswith("ticker_symbol,stock_name"))
+        out = io.StringIO()
+        write_rows(self.backend.iter_history(tickers=["SCOM"]), out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class TestSupabaseReaders(unittest.TestCase):
+    """Test paged reads from Supabase"""
+
+    def test_history_pages_past_row_cap(self):
+        """Test history pages past the row cap"""
+        rows = [{"ticker_symbol": f"T{index:03d}", "price_history": [
+            {"scraped_at": "2026-03-02T10:00:00+00:00", "stock_price": 2.0},
+            {"scraped_at": "2026-03-02T09:00:00+00:00", "stock_price": 1.0},
+        ]} for index in range(25)]
+        backend = supabase_backend({"stock_data": rows}, max_rows=10)
+        history = list(backend.iter_history(page_size=10, since="2026-03-02T09:30:00+00:00"))
+        self.assertEqual(len(history), 25)
+        self.assertEqual({point["stock_price"] for point in history}, {2.0})
+
+
+@unittest.skipUnless(TEST_URL, "NSE_TEST_POSTGRES_URL not set")
+class TestPostgresReaders(unittest.TestCase):
+    """Test streaming reads from PostgreSQL"""
+
+    def setUp(self):
+        from nse_scraper.db.postgres_backend import PostgresBackend
+
+        self.backend = PostgresBackend(sql_database_url=TEST_URL)
+        self.backend.open()
+        self._cleanup()
+        self.backend.bulk_load(_quotes(prefix="ZZK"))
+
+    def tearDown(self):
+        self._cleanup()
+        self.backend.close()
+
+    def _cleanup(self):
+        from sqlalchemy import text
+
+        with self.backend.engine.begin() as conn:
+            for table in ("stock_summary", "stock_daily_ohlc", "stock_price_history", "stock_data"):
+                conn.execute(text(f"DELETE FROM {table} WHERE ticker_symbol LIKE 'ZZK%'"))
+
+    def test_keyset_history_and_stocks(self):
+        """Test keyset paging over history and stocks"""
+        tickers = ["ZZKABSA", "ZZKEQTY", "ZZKSCOM"]
+        rows = list(self.backend.iter_history(tickers=tickers, page_size=2))
+        self.assertEqual(len(rows), 9)
+        keys = [(row["ticker_symbol"], row["scraped_at"]) for row in rows]
+        self.assertEqual(keys, sorted(set(keys)))
+        since = list(self.backend.iter_history(tickers=tickers, since=T0 + timedelta(minutes=2), page_size=2))
+        self.assertEqual(len(since), 3)
+        stocks = [row["ticker_symbol"] for row in self.backend.iter_stocks(page_size=1)
+                  if row["ticker_symbol"].startswith("ZZK")]
+        self.assertEqual(stocks, tickers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for structured run telemetry and regression reporting
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+
+from nse_scraper.retention import NSE_TZ
+from nse_scraper.telemetry import (
+    append_record,
+    build_record,
+    find_regressions,
+    load_records,
+    parse_run_log,
+    summarize,
+)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def _run(day, duration, items, spider="afx_scraper"):
+    return {
+        "spider": spider,
+        "run_id": f"2026-03-{day:02d}",
+        "started_at": f"2026-03-{day:02d}T09:00:00",
+        "duration_s": duration,
+        "items_scraped": items,
+    }
+
+
+class TestRunTelemetry(unittest.TestCase):
+    """Test telemetry record building, storage and reporting"""
+
+    def test_build_record_from_stats(self):
+        """Test building a run record from crawler stats"""
+        stats = {
+            "start_time": datetime(2026, 3, 7, 9, 14, 35, tzinfo=timezone.utc),
+            "finish_reason": "finished",
+            "elapsed_time_seconds": 43.4,
+            "item_scraped_count": 67,
+            "response_received_count": 1,
+            "nse/stage/backend/supabase/upsert_stock/count": 4,
+            "nse/stage/backend/supabase/upsert_stock/time_ms_sum": 400.0,
+            "nse/stage/backend/supabase/upsert_stock/time_ms_max": 250.0,
+            "nse/stage/backend/supabase/upsert_stock/bucket/250": 1,
+            "nse/storage/fallback_writes": 2,
+        }
+        record = build_record("afx_scraper", stats, run_id="2026-03-07_091432")
+        self.assertEqual(record["run_id"], "2026-03-07_091432")
+        self.assertEqual(record["items_scraped"], 67)
+        self.assertEqual(record["retries"], 0)
+        self.assertEqual(record["fallback_writes"], 2)
+        self.assertEqual(record["backend_writes"]["supabase/upsert_stock"]["mean_ms"], 100.0)
+        self.assertEqual(record["started_at"], "2026-03-07T09:14:35+00:00")
+
+    def test_append_and_load_roundtrip(self):
+        """Test appending and loading run records"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "telemetry", "runs.jsonl")
+            append_record(path, _run(1, 40.0, 67))
+            append_record(path, _run(2, 41.0, 67))
+            self.assertEqual([r["run_id"] for r in load_records(path)], ["2026-03-01", "2026-03-02"])
+
+    def test_find_regressions_flags_duration_and_items(self):
+        """Test find_regressions flags duration and item counts"""
+        runs = [_run(day, 40.0, 67) for day in range(1, 6)]
+        runs.append(_run(6, 118.0, 67))
+        runs.append(_run(7, 41.0, 0))
+        flags = find_regressions(runs, window=5)
+        self.assertEqual(
+            [(f["run_id"], f["metric"]) for f in flags],
+            [("2026-03-06", "duration_s"), ("2026-03-07", "items_scraped")],
+        )
+
+    def test_find_regressions_needs_history(self):
+        """Test find_regressions needs history"""
+        self.assertEqual(find_regressions([_run(1, 40.0, 67), _run(2, 400.0, 0)]), [])
+
+    def test_summarize(self):
+        """Test summarizing runs per spider"""
+        summary = summarize([_run(1, 40.0, 60), _run(2, 50.0, 70)])
+        self.assertEqual(summary["afx_scraper"]["runs"], 2)
+        self.assertEqual(summary["afx_scraper"]["duration_p50_s"], 45.0)
+        self.assertEqual(summary["afx_scraper"]["items_mean"], 65)
+
+    def test_parse_legacy_run_log(self):
+        """Test parsing a legacy run log"""
+        records = parse_run_log(PROJECT_ROOT / "reports" / "run-2026-03-07_091432.log")
+        self.assertEqual([r["spider"] for r in records], ["afx_scraper", "stockanalysis_scraper"])
+        self.assertEqual(records[0]["items_scraped"], 67)
+        self.assertAlmostEqual(records[0]["duration_s"], 43.459687)
+        self.assertEqual(records[1]["responses"], 5)
+
+    def test_legacy_log_times_are_converted_to_utc(self):
+        """Test legacy log times are converted to UTC"""
+        records = parse_run_log(PROJECT_ROOT / "reports" / "run-2026-03-07_091432.log", NSE_TZ)
+        self.assertEqual(records[0]["started_at"], "2026-03-07T06:14:35+00:00")
+        crawl = dict(_run(7, 40.0, 67), started_at="2026-03-07T06:30:00+00:00")
+        summary = summarize([crawl, records[0]])
+        self.assertEqual(summary["afx_scraper"]["last_started_at"], crawl["started_at"])
+
+
+if __name__ == "__main__":
+    unittest.main()
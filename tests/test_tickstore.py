@@ -0,0 +1,121 @@
+"""
+Tests for the local memory-mapped tick store
+"""
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+import numpy as np
+
+from helpers import T0, quote_at
+from nse_scraper.tickstore import TickStore, rebuild
+
+
+class TestTickStore(unittest.TestCase):
+    """Test the tick store"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "ticks")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_memory_map(self):
+        """Test appending ticks and memory mapping them"""
+        with TickStore(self.root, flush_every=2) as store:
+            for minute in range(5):
+                store.append(quote_at("SCOM", minute, 14.05 + minute, stock_change=0.1 if minute else None))
+        ticks = TickStore(self.root).open().load("SCOM")
+        self.assertIsInstance(ticks.price_raw, np.memmap)
+        self.assertEqual(len(ticks), 5)
+        self.assertEqual(ticks.timestamps[0], np.datetime64("2026-03-02T09:00:00", "us"))
+        np.testing.assert_allclose(ticks.prices, [14.05, 15.05, 16.05, 17.05, 18.05])
+        self.assertTrue(np.isnan(ticks.changes[0]))
+        self.assertAlmostEqual(ticks.changes[1], 0.1)
+
+    def test_only_newer_ticks_are_appended(self):
+        """Test only newer ticks are appended"""
+        with TickStore(self.root) as store:
+            self.assertTrue(store.append(quote_at("SCOM", 5, 14.0)))
+            self.assertFalse(store.append(quote_at("SCOM", 5, 14.0)))
+            self.assertFalse(store.append(quote_at("SCOM", 1, 13.0)))
+        with TickStore(self.root) as store:
+            self.assertFalse(store.append(quote_at("SCOM", 4, 13.0)))
+            self.assertTrue(store.append(quote_at("SCOM", 6, 14.5)))
+        self.assertEqual(len(TickStore(self.root).open().load("SCOM")), 2)
+
+    def test_between_is_a_view(self):
+        """Test between returns a view"""
+        with TickStore(self.root) as store:
+            for minute in range(10):
+                store.append(quote_at("EQTY", minute, 45.0 + minute))
+        ticks = TickStore(self.root).open().load("EQTY")
+        window = ticks.between(T0 + timedelta(minutes=3), "2026-03-02T09:06:00+00:00")
+        self.assertEqual(list(window.prices), [48.0, 49.0, 50.0])
+        self.assertTrue(np.shares_memory(window.price_raw, ticks.price_raw))
+
+    def test_unpublished_tail_is_truncated(self):
+        """Test an unpublished tail is truncated"""
+        with TickStore(self.root) as store:
+            store.append(quote_at("KCB", 0, 30.0))
+        with open(os.path.join(self.root, "KCB", "price.i8"), "ab") as handle:
+            handle.write(b"\x00" * 8)  # crash after writing data, before the index
+        store = TickStore(self.root).open()
+        self.assertEqual(os.path.getsize(os.path.join(self.root, "KCB", "price.i8")), 8)
+        store.append(quote_at("KCB", 1, 31.0))
+        store.close()
+        self.assertEqual(list(TickStore(self.root).open().load("KCB").prices), [30.0, 31.0])
+
+    def test_rebuild_replaces_store(self):
+        """Test rebuild replaces the store"""
+        with TickStore(self.root) as store:
+            store.append(quote_at("OLD", 0, 1.0))
+        records = [quote_at("ABSA", minute, 12.0) for minute in range(3)] + [quote_at("SCOM", 0, 14.0)]
+        rebuilt = rebuild(self.root, iter(records))
+        self.assertEqual(rebuilt.tickers(), ["ABSA", "SCOM"])
+        self.assertEqual(TickStore(self.root).open().tickers(), ["ABSA", "SCOM"])
+        self.assertFalse(os.path.exists(self.root + ".rebuild"))
+
+    def test_missing_ticker_loads_empty(self):
+        """Test a missing ticker loads empty"""
+        ticks = TickStore(self.root).open().load("NONE")
+        self.assertEqual(len(ticks), 0)
+        self.assertEqual(len(ticks.prices), 0)
+
+
+class _Storage:
+    def __init__(self):
+        self.records = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def upsert_stock(self, record):
+        self.records.append(record)
+
+
+class TestPipelineTickStore(unittest.TestCase):
+    """Test the pipeline writing to the tick store"""
+
+    def test_pipeline_appends_stored_quotes(self):
+        """Test the pipeline appends stored quotes"""
+        from nse_scraper.pipelines import NseScraperPipeline
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = NseScraperPipeline("mongo", "mongodb://localhost", "nse_data", "stock_data", None, False,
+                                          None, None, None, tickstore_path=tmp)
+            pipeline.storage = _Storage()
+            pipeline.open_spider()
+            for minute in range(3):
+                pipeline.process_item({**quote_at("SCOM", minute, 14.0 + minute), "stock_name": "Safaricom"})
+            pipeline.close_spider()
+            self.assertEqual(len(TickStore(tmp).open().load("SCOM")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,239 @@
+"""
+Tests for the retrying, circuit-breaking write layer
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from helpers import make_quote, supabase_backend
+from nse_scraper.db import backend_options_from_settings, create_backend
+from nse_scraper.db.resilience import CircuitBreaker, ResilientBackend, RetryPolicy
+from nse_scraper.serialization import loads
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Flaky:
+    """Backend stand-in whose writes fail while ``down`` is set."""
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+        self.written = []
+        self.batches = []
+        self.closed = False
+
+    def upsert_stock(self, record):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("503")
+        self.written.append((record["ticker_symbol"], record["stock_price"]))
+
+    def upsert_stocks(self, records):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("503")
+        self.batches.append(len(records))
+        self.written.extend((record["ticker_symbol"], record["stock_price"]) for record in records)
+
+    def close(self):
+        self.closed = True
+
+
+class TestResilientBackend(unittest.TestCase):
+    """Test retries and spooling around a failing backend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = _Clock()
+        self.inner = _Flaky()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _backend(self, **options):
+        options = {"retries": 3, "base_delay": 1.0, "max_delay": 8.0, "failure_threshold": 3,
+                   "reset_timeout": 30.0, "drain_batch_size": 2, **options}
+        return ResilientBackend(self.inner, "flaky", spool_dir=self.tmp.name, clock=self.clock, **options)
+
+    def test_transient_failure_is_retried_in_order(self):
+        """Test a transient failure is retried in order"""
+        backend = self._backend()
+        self.inner.down = True
+        backend.upsert_stock(make_quote("SCOM", 14.0))
+        self.inner.down = False
+        # A newer quote for the same ticker waits behind the queued one.
+        backend.upsert_stock(make_quote("SCOM", 14.5))
+        backend.upsert_stock(make_quote("EQTY", 45.0))
+        self.assertEqual(self.inner.written, [("EQTY", 45.0)])
+        self.clock.now += 60
+        backend.upsert_stock(make_quote("KCB", 30.0))
+        self.assertEqual(self.inner.written, [("EQTY", 45.0), ("SCOM", 14.0), ("SCOM", 14.5), ("KCB", 30.0)])
+        self.assertEqual(backend.counts["recovered"], 1)
+        self.assertEqual(backend.counts["spooled"], 0)
+
+    def test_circuit_opens_spools_and_redrains(self):
+        """Test the circuit opens, spools and drains again"""
+        backend = self._backend()
+        self.inner.down = True
+        for index in range(3):
+            backend.upsert_stock(make_quote(f"T{index}", 1.0))
+        self.assertEqual(backend.breaker.state, CircuitBreaker.OPEN)
+        calls = self.inner.calls
+        for index in range(3, 10):
+            backend.upsert_stock(make_quote(f"T{index}", 1.0))
+        # An open circuit makes no calls; everything is spooled.
+        self.assertEqual(self.inner.calls, calls)
+        self.assertEqual(backend.spool.pending("upsert_stock"), 10)
+
+        self.inner.down = False
+        self.clock.now += 31
+        backend.upsert_stock(make_quote("SCOM", 14.0))
+        self.assertEqual(backend.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual([ticker for ticker, _ in self.inner.written], [f"T{index}" for index in range(10)] + ["SCOM"])
+        self.assertEqual(self.inner.batches, [2, 2, 2, 2, 2])
+        self.assertFalse(os.path.exists(backend.spool.path("upsert_stock")))
+        self.assertEqual(backend.breaker.opens, 1)
+
+    def test_spool_survives_to_next_run(self):
+        """Test the spool survives to the next run"""
+        backend = self._backend(failure_threshold=1)
+        self.inner.down = True
+        backend.upsert_stock(make_quote("SCOM", 14.0))
+        backend.close()
+        self.assertTrue(self.inner.closed)
+        with open(backend.spool.path("upsert_stock"), encoding="utf-8") as handle:
+            self.assertEqual(json.loads(handle.readline())["ticker_symbol"], "SCOM")
+
+        self.inner = _Flaky()
+        nxt = self._backend()
+        nxt.upsert_stock(make_quote("SCOM", 14.5))
+        self.assertEqual(self.inner.written, [("SCOM", 14.0), ("SCOM", 14.5)])
+        self.assertEqual(nxt.counts["drained"], 1)
+
+    def test_exhausted_retries_are_spooled(self):
+        """Test exhausted retries are spooled"""
+        backend = self._backend(retries=1, failure_threshold=10)
+        self.inner.down = True
+        backend.upsert_stock(make_quote("SCOM", 14.0))
+        self.clock.now += 60
+        backend.upsert_stock(make_quote("EQTY", 45.0))
+        self.assertEqual(backend.spool.pending("upsert_stock"), 1)
+        self.assertTrue(backend.spool.holds("upsert_stock", "SCOM"))
+        self.assertEqual(backend.fallback_count, 1)
+        # Other tickers keep being written directly while SCOM waits in the spool.
+        self.inner.down = False
+        backend.upsert_stock(make_quote("KCB", 30.0))
+        backend.upsert_stock(make_quote("SCOM", 14.5))
+        self.assertEqual(self.inner.written, [("KCB", 30.0)])
+        self.clock.now += 60
+        backend.upsert_stock(make_quote("ABSA", 12.0))
+        self.assertEqual(self.inner.written, [("KCB", 30.0), ("EQTY", 45.0), ("SCOM", 14.0), ("SCOM", 14.5),
+                                              ("ABSA", 12.0)])
+
+    def test_retry_due_runs_without_further_writes(self):
+        """Test retry_due drains without further writes"""
+        backend = self._backend(failure_threshold=10)
+        self.inner.down = True
+        backend.upsert_stock(make_quote("SCOM", 14.0))
+        self.inner.down = False
+        backend.retry_due()
+        self.assertEqual(self.inner.written, [])
+        self.clock.now += 60
+        backend.retry_due()
+        self.assertEqual(self.inner.written, [("SCOM", 14.0)])
+
+        backend.spool.append("upsert_stock", [make_quote("EQTY", 45.0)])
+        backend.retry_due()
+        self.assertEqual(self.inner.written, [("SCOM", 14.0), ("EQTY", 45.0)])
+        self.assertFalse(os.path.exists(backend.spool.path("upsert_stock")))
+
+    def test_interrupted_drain_keeps_the_undrained_tail(self):
+        """Test interrupted drain keeps the undrained tail"""
+        backend = self._backend()
+        backend.spool.append("upsert_stock", [make_quote(f"T{index}", 1.0) for index in range(7)])
+        writes = self.inner.upsert_stocks
+
+        def upsert_stocks(records):
+            if len(self.inner.batches) == 2:
+                raise ConnectionError("503")
+            writes(records)
+
+        self.inner.upsert_stocks = upsert_stocks
+        backend.retry_due()
+        self.assertEqual(self.inner.batches, [2, 2])
+        self.assertEqual(backend.spool.pending("upsert_stock"), 3)
+        with open(backend.spool.path("upsert_stock"), encoding="utf-8") as handle:
+            self.assertEqual([json.loads(line)["ticker_symbol"] for line in handle], ["T4", "T5", "T6"])
+        self.inner.upsert_stocks = writes
+        self.clock.now += 31
+        backend.retry_due()
+        self.assertEqual([ticker for ticker, _ in self.inner.written], [f"T{index}" for index in range(7)])
+        self.assertFalse(os.path.exists(backend.spool.path("upsert_stock")))
+
+    def test_retry_delays_are_jittered_and_capped(self):
+        """Test retry delays are jittered and capped"""
+        policy = RetryPolicy(retries=5, base_delay=1.0, max_delay=4.0)
+        delays = [policy.delay(attempt) for attempt in range(6) for _ in range(20)]
+        self.assertTrue(all(0 <= delay <= 4.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
+class TestSupabaseHistory(unittest.TestCase):
+    """Test Supabase history writes"""
+
+    def test_failed_select_does_not_reset_history(self):
+        """Test failed select does not reset history"""
+        history = [{"scraped_at": "2026-03-02T08:00:00+00:00", "stock_price": 13.0, "stock_change": None}]
+        supabase = supabase_backend({"stock_data": [{"ticker_symbol": "SCOM", "price_history": history}]})
+        supabase.client.failing["select"] = 1
+        clock = _Clock()
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = ResilientBackend(supabase, "supabase", spool_dir=tmp, clock=clock)
+            backend.upsert_stock(make_quote("SCOM", 14.0))
+            self.assertEqual(supabase.client.session.posts, [])
+            clock.now += 120
+            backend.flush()
+        row = loads(supabase.client.session.posts[-1][3])
+        self.assertEqual([entry["stock_price"] for entry in row["price_history"]], [13.0, 14.0])
+
+
+class TestResilienceConfiguration(unittest.TestCase):
+    """Test building resilient backends from settings"""
+
+    def test_pipeline_options_enable_resilience(self):
+        """Test pipeline options enable resilience"""
+        options = backend_options_from_settings({"WRITE_RETRIES": "5", "WRITE_SPOOL_DIR": "spool"})
+        self.assertEqual(options["resilience"]["retries"], 5)
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = create_backend("embedded", **{**options, "embedded_path": os.path.join(tmp, "nse.sqlite3")})
+            self.assertIsInstance(backend, ResilientBackend)
+            self.assertEqual(backend.spool.path("upsert_stock"), os.path.join("spool", "embedded.upsert_stock.jsonl"))
+        self.assertIsNone(backend_options_from_settings({"WRITE_RESILIENCE": "false"})["resilience"])
+
+    def test_spool_label_separates_writers(self):
+        """Test spool label separates writers"""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = create_backend("embedded", embedded_path=os.path.join(tmp, "nse.sqlite3"),
+                                     resilience={"spool_dir": tmp}, spool_label="stockanalysis")
+            self.assertEqual(backend.name, "embedded-stockanalysis")
+            self.assertEqual(os.path.basename(backend.spool.path("upsert_stockanalysis_stock")),
+                             "embedded-stockanalysis.upsert_stockanalysis_stock.jsonl")
+
+    def test_async_backends_are_not_wrapped(self):
+        """Test async backends are not wrapped"""
+        backend = create_backend("postgres_async", sql_database_url="postgresql://u:p@db/nse",
+                                 resilience={"retries": 1})
+        self.assertTrue(backend.is_async)
+        self.assertNotIsInstance(backend, ResilientBackend)
+
+
+if __name__ == "__main__":
+    unittest.main()